@@ -1,18 +1,29 @@
 ﻿from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass, asdict
-from typing import Any, Dict, List
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+from bots.options_profile import PROFILE_KEYS
+FRAMEWORKS = ("none", "langgraph", "crewai", "autogen")
+COMPILED_CACHE_SIZE = int(os.environ.get("CITL_SPEC_CACHE_SIZE", "128"))
 def default_spec() -> Dict[str, Any]:
     return {
         "name": "New Bot",
         "description": "",
         "runtime": {"provider": "ollama", "base_url": "http://localhost:11434", "model": "llama3.1:8b", "stream": True},
-        "generation": {"temperature": 0.2, "top_p": 0.9, "num_ctx": 8192, "max_tokens": 512},
+        # num_ctx None = sized to the machine (bots/options_profile.py); a number pins it
+        "generation": {"temperature": 0.2, "top_p": 0.9, "num_ctx": None, "max_tokens": 512},
         "system": {"prompt": "You are a helpful assistant. If you don't know, say you don't know."},
         "identity": {"role": "Tutor", "goal": "", "backstory": ""},
         "agent": {
             "framework": "none",          # none | langgraph | crewai | autogen
             "mode": "single",             # single | planner_executor | verifier
-            "tools": [],                  # calculator | rag_retriever | kb_search | file_lookup
+            "tools": [],                  # calculator | rag_retriever (built in); kb_search | file_lookup | ... once
+                                          # registered with runtime_engine.register_tool
             "crew": {"agents": [], "tasks": []},     # for crewai
             "langgraph": {"nodes": ["planner", "tool", "writer", "verifier"]},  # simple starter
             "autogen": {"pattern": "two_agent"}       # two_agent | group_chat
@@ -30,10 +41,205 @@ def default_spec() -> Dict[str, Any]:
         },
         "export": {"include_requirements": True}
     }
+class SpecError(ValueError):
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+def _is_num(v: Any) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+def _is_int(v: Any) -> bool:
+    return isinstance(v, int) and not isinstance(v, bool)
 def validate_spec(spec: Dict[str, Any]) -> List[str]:
-    errors = []
+    # Every field the runtime and export read; sections / keys left out take default_spec()'s values
+    if not isinstance(spec, dict):
+        return ["spec must be a JSON object"]
+    errors = [f"{section} must be an object"
+              for section in ("runtime", "generation", "system", "identity", "agent", "rag", "safety", "export")
+              if not isinstance(spec.get(section, {}), dict)]
+    if errors:
+        return errors
     if not spec.get("name"):
         errors.append("name is required")
-    if spec.get("runtime", {}).get("provider") != "ollama":
+    rt, gen = spec.get("runtime", {}), spec.get("generation", {})
+    agent = spec.get("agent", {})
+    if rt.get("provider", "ollama") != "ollama":
         errors.append("only ollama provider supported in this hub version")
+    base_url = rt.get("base_url", "http://")
+    if not isinstance(base_url, str) or not base_url.startswith(("http://", "https://")):
+        errors.append("runtime.base_url must be an http(s) URL")
+    if "model" in rt and (not isinstance(rt["model"], str) or not rt["model"].strip()):
+        errors.append("runtime.model must be a model tag")
+    if not isinstance(rt.get("stream", True), bool):
+        errors.append("runtime.stream must be true or false")
+    if not (_is_num(gen.get("temperature", 0)) and 0 <= gen.get("temperature", 0) <= 2):
+        errors.append("generation.temperature must be a number between 0 and 2")
+    if not (_is_num(gen.get("top_p", 1)) and 0 <= gen.get("top_p", 1) <= 1):
+        errors.append("generation.top_p must be a number between 0 and 1")
+    if not (_is_int(gen.get("max_tokens", 1)) and (gen.get("max_tokens", 1) > 0 or gen.get("max_tokens") == -1)):
+        errors.append("generation.max_tokens must be a positive integer (or -1 for no limit)")
+    for k in PROFILE_KEYS:
+        if gen.get(k) is not None and not (_is_int(gen[k]) and gen[k] >= 0):
+            errors.append(f"generation.{k} must be a non-negative integer or null")
+    if not isinstance(spec.get("system", {}).get("prompt", ""), str):
+        errors.append("system.prompt must be a string")
+    if agent.get("framework", "none") not in FRAMEWORKS:
+        errors.append(f"agent.framework must be one of {', '.join(FRAMEWORKS)}")
+    tools = agent.get("tools", [])
+    if not isinstance(tools, list) or not all(isinstance(t, str) for t in tools):
+        errors.append("agent.tools must be a list of tool names")
+    nodes = agent.get("langgraph", {}).get("nodes", []) if isinstance(agent.get("langgraph", {}), dict) else None
+    if not isinstance(nodes, list):
+        errors.append("agent.langgraph.nodes must be a list")
+    else:
+        seen: List[str] = []
+        for n in nodes:
+            name = n.get("name") if isinstance(n, dict) else n
+            if not isinstance(name, str) or not name:
+                errors.append("agent.langgraph.nodes entries must be names or {\"name\": ...} objects")
+                continue
+            if name in seen:
+                errors.append(f"agent.langgraph node {name!r} is declared twice")
+            after = n.get("after", []) if isinstance(n, dict) else []
+            if not isinstance(after, list) or any(a not in seen for a in after):
+                errors.append(f"agent.langgraph node {name!r}: after must list nodes declared before it")
+            if isinstance(n, dict) and not isinstance(n.get("prompt", ""), str):
+                errors.append(f"agent.langgraph node {name!r}: prompt must be a string")
+            seen.append(name)
+    rag = spec.get("rag", {})
+    if not isinstance(rag.get("enabled", False), bool):
+        errors.append("rag.enabled must be true or false")
+    if not (_is_int(rag.get("top_k", 1)) and rag.get("top_k", 1) > 0):
+        errors.append("rag.top_k must be a positive integer")
     return errors
+# ── compiled specs ──────────────────────────────────────────────────────────────
+# Starter langgraph steps: name -> (after, prompt). {question} and {inputs} (the outputs of `after`) are
+# filled in at run time; "tool" becomes one node per spec tool, so the tool calls run alongside the planner
+GRAPH_STEPS = {
+    "planner": ([], "Write a short numbered plan (at most 5 steps) for answering the question below. "
+                    "Do not answer it yet.\n\nQuestion:\n{question}"),
+    "writer": (["planner", "tool"], "{inputs}\n\nFollow the plan (and use the tool results, if any) to answer "
+                                    "the question.\n\nQuestion:\n{question}"),
+    "verifier": (["writer"], "Check the draft answer below for errors. Reply with the corrected final answer "
+                             "only.\n\nQuestion:\n{question}\n\n{inputs}"),
+}
+@dataclass(frozen=True)
+class GraphStep:
+    name: str
+    after: Tuple[str, ...]
+    prompt: Optional[str]       # None for tool steps
+    tool: Optional[str] = None
+def graph_steps(agent: Dict[str, Any]) -> Tuple[GraphStep, ...]:
+    # agent["langgraph"]["nodes"] -> steps in declared order. A node is a starter name, any other name
+    # (a step after the previous one) or {"name": ..., "after": [...], "prompt": "... {question} ... {inputs}"}
+    declared = agent.get("langgraph", {}).get("nodes") or ["planner", "writer"]
+    tools = [t for t in agent.get("tools", []) if t]
+    steps: List[GraphStep] = []
+    groups: Dict[str, List[str]] = {}   # declared name -> step names ("tool" -> tool:<name> ...)
+    for item in declared:
+        node = dict(item) if isinstance(item, dict) else {"name": item}
+        name = node["name"]
+        if name == "tool" and "prompt" not in node:
+            groups["tool"] = [f"tool:{t}" for t in tools]
+            steps += [GraphStep(f"tool:{t}", (), None, t) for t in tools]
+            continue
+        after, prompt = GRAPH_STEPS.get(name, ([steps[-1].name] if steps else [],
+                                               "{inputs}\n\nCarry out the " + name + " step for the "
+                                               "question.\n\nQuestion:\n{question}"))
+        after = node.get("after", after)
+        deps = [d for a in after for d in groups.get(a, [a] if any(s.name == a for s in steps) else [])]
+        steps.append(GraphStep(name, tuple(deps), node.get("prompt", prompt)))
+        groups[name] = [name]
+    if not steps or steps[-1].tool:
+        # The answer comes from a model call: add a writer after the steps nothing depends on
+        used = {d for s in steps for d in s.after}
+        steps.append(GraphStep("writer", tuple(s.name for s in steps if s.name not in used), GRAPH_STEPS["writer"][1]))
+    return tuple(steps)
+@dataclass(frozen=True)
+class CompiledBot:
+    # A validated spec with everything the runtime and export derive from it worked out once.
+    # Built by compile_spec() and shared through an LRU keyed by the spec's content hash: treat as read-only.
+    key: str                             # sha256 of the spec's canonical JSON
+    name: str
+    slug: str                            # export folder name
+    base_url: str
+    model: str
+    stream: bool
+    framework: str                       # none | langgraph | crewai | autogen
+    system_prompt: str
+    options: Mapping[str, Any]           # generation options; the machine profile goes underneath at call time
+    crew_system: str                     # crewai: role / goal / backstory system prompt
+    graph: Tuple[GraphStep, ...]         # langgraph: steps in declared order, the last one answers
+    rag_enabled: bool
+    rag_citations: bool                  # RAG context ends with the "cite it like [1]" instruction
+    rag_collection: str                  # RagStore collection the rag_retriever tool searches
+    rag_top_k: int
+    requirements: Tuple[str, ...]        # exported project's requirements.txt
+    spec_json: str                       # the spec with defaults filled in (export's bot.json)
+    def to_spec(self) -> Dict[str, Any]:
+        return json.loads(self.spec_json)
+SpecLike = Union[Dict[str, Any], CompiledBot]
+def _with_defaults(spec: Dict[str, Any]) -> Dict[str, Any]:
+    merged = default_spec()
+    for k, v in spec.items():
+        if isinstance(v, dict) and isinstance(merged.get(k), dict):
+            merged[k] = {**merged[k], **v}
+        else:
+            merged[k] = v
+    return merged
+def _compile(key: str, spec: Dict[str, Any]) -> CompiledBot:
+    errors = validate_spec(spec)
+    if errors:
+        raise SpecError(errors)
+    ident = spec.get("identity", {})
+    spec = _with_defaults(spec)
+    rt, gen, agent = spec["runtime"], spec["generation"], spec["agent"]
+    options = {"temperature": gen["temperature"], "top_p": gen["top_p"], "num_predict": gen["max_tokens"]}
+    options.update({k: gen[k] for k in PROFILE_KEYS if gen.get(k) is not None})
+    fw = agent.get("framework", "none")
+    reqs = ["requests"] + {"langgraph": ["langgraph"], "crewai": ["crewai"], "autogen": ["pyautogen"]}.get(fw, [])
+    if spec["rag"].get("enabled"):
+        reqs += ["chromadb", "sentence-transformers", "pypdf"]
+    return CompiledBot(
+        key=key,
+        name=spec["name"],
+        slug=(spec.get("name") or "bot").strip().replace(" ", "-").lower(),
+        base_url=rt["base_url"],
+        model=rt["model"],
+        stream=rt.get("stream", True),
+        framework=fw,
+        system_prompt=spec["system"]["prompt"],
+        options=MappingProxyType(options),
+        crew_system=(f"You are acting as: {ident.get('role', 'Assistant')}.\nGoal: {ident.get('goal', '')}\n"
+                     f"Backstory: {ident.get('backstory', '')}\nComplete the task."),
+        graph=graph_steps(agent) if fw == "langgraph" else (),
+        rag_enabled=bool(spec["rag"].get("enabled")),
+        rag_citations=bool(spec["rag"].get("citations", True)),
+        rag_collection=str(spec["rag"].get("collection") or "default"),
+        rag_top_k=int(spec["rag"].get("top_k", 5)),
+        requirements=tuple(reqs),
+        spec_json=json.dumps(spec, ensure_ascii=False),
+    )
+_COMPILED: "OrderedDict[str, CompiledBot]" = OrderedDict()
+_COMPILED_LOCK = threading.Lock()
+def spec_key(spec: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+def compile_spec(spec: SpecLike) -> CompiledBot:
+    # Validated, compiled bot for this spec content (raises SpecError); one per content hash, kept in an LRU
+    # so a hub serving many bots compiles each once. Editing a spec changes its hash and compiles it again.
+    if isinstance(spec, CompiledBot):
+        return spec
+    key = spec_key(spec)
+    with _COMPILED_LOCK:
+        bot = _COMPILED.get(key)
+        if bot is not None:
+            _COMPILED.move_to_end(key)
+            return bot
+    bot = _compile(key, spec)
+    with _COMPILED_LOCK:
+        _COMPILED[key] = bot
+        while len(_COMPILED) > max(1, COMPILED_CACHE_SIZE):
+            _COMPILED.popitem(last=False)
+    return bot
+def clear_compiled() -> None:
+    with _COMPILED_LOCK:
+        _COMPILED.clear()
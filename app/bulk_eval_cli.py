@@ -0,0 +1,79 @@
+﻿from __future__ import annotations
+# Bulk evaluation: every bot spec against the same question set, one JSONL result per (spec, question).
+#   python -m app.bulk_eval_cli bots/*.json --questions questions.txt --concurrency 8 --out results.jsonl
+#   python -m app.bulk_eval_cli projects/specs/ -q "What is DNS?" -q "Reset my password" --host http://gpu-box:11434
+# Questions: .txt (one per line) or .jsonl ({"prompt", "id"}), as for the sandbox's --batch.
+# Results stream out in (spec, question) order; a summary per bot goes to stderr.
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+from bots.batch import load_prompts
+from bots.telemetry import percentile
+from app.runtime_engine import run_bot_many
+def load_specs(paths: List[str]) -> List[Dict[str, Any]]:
+    # Files or directories of *.json; anything that is not a bot spec (no "runtime") is skipped with a warning
+    specs = []
+    for p in map(Path, paths):
+        for f in sorted(p.glob("*.json")) if p.is_dir() else [p]:
+            try:
+                spec = json.loads(f.read_text(encoding="utf-8-sig"))
+            except (OSError, ValueError) as e:
+                print(f"skipped {f}: {e}", file=sys.stderr)
+                continue
+            if not isinstance(spec, dict) or "runtime" not in spec:
+                print(f"skipped {f}: not a bot spec", file=sys.stderr)
+                continue
+            spec.setdefault("name", f.stem)
+            specs.append(spec)
+    return specs
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Run bot specs against a question set; JSONL results")
+    ap.add_argument("specs", nargs="+", help="spec .json files or directories of them")
+    ap.add_argument("--questions", help=".txt (one per line) or .jsonl ({\"prompt\", \"id\"}) question file")
+    ap.add_argument("-q", "--question", action="append", default=[], help="a question (repeatable)")
+    ap.add_argument("--concurrency", type=int, default=4, help="requests in flight per Ollama host")
+    ap.add_argument("--host", help="send every spec to this Ollama URL instead of its runtime.base_url")
+    ap.add_argument("--out", help="JSONL output file (default: stdout)")
+    args = ap.parse_args(argv)
+    specs = load_specs(args.specs)
+    inputs: List[Any] = [{"prompt": it.prompt, "id": it.id} for it in load_prompts(args.questions)] if args.questions else []
+    inputs += args.question
+    if not specs or not inputs:
+        ap.error("need at least one bot spec and one question")
+    if args.host:
+        for spec in specs:
+            spec["runtime"]["base_url"] = args.host.rstrip("/")
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    done: Dict[int, Dict[str, Any]] = {}
+    cursor = 0
+    def on_result(k: int, res: Dict[str, Any]) -> None:
+        # Write in (spec, question) order as soon as every earlier result is in
+        nonlocal cursor
+        done[k] = res
+        while cursor in done:
+            out.write(json.dumps(done.pop(cursor), ensure_ascii=False) + "\n")
+            out.flush()
+            cursor += 1
+    t0 = time.perf_counter()
+    try:
+        results = run_bot_many(specs, inputs, args.concurrency, on_result=on_result)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    wall = time.perf_counter() - t0
+    ok = sum(r["ok"] for r in results)
+    print(f"{len(results)} runs ({len(specs)} bots x {len(inputs)} questions) in {wall:.1f} s, {ok} ok",
+          file=sys.stderr)
+    for i, spec in enumerate(specs):
+        rows = [r for r in results if r["spec_index"] == i]
+        lat = [r["latency_s"] for r in rows if r["ok"]]
+        errors = [r["error"] for r in rows if not r["ok"]]
+        p50 = f"{percentile(lat, 50):.2f} s" if lat else "—"
+        print(f"  {spec['name']:<32} {spec['runtime'].get('model', ''):<28} p50 {p50:>8}  "
+              f"{len(errors)} error(s){'  ' + errors[0] if errors else ''}", file=sys.stderr)
+    return 0 if ok == len(results) else 1
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,35 +1,31 @@
 ﻿from __future__ import annotations
 from pathlib import Path
-from typing import Dict, Any
 import json
 import shutil
-def export_project(repo_root: Path, spec: Dict[str, Any]) -> Path:
+from app.bot_schema import SpecLike, compile_spec
+from bots.options_profile import MAX_NUM_CTX
+def export_project(repo_root: Path, spec: SpecLike) -> Path:
     """
     Export a runnable student project that loads bot.json and chats via Ollama.
     The goal: students can open the exported folder in VS Code and run it.
+    spec: a spec dict or its CompiledBot; invalid specs raise bot_schema.SpecError.
     """
+    bot = compile_spec(spec)
     exports_dir = repo_root / "projects" / "exports"
     exports_dir.mkdir(parents=True, exist_ok=True)
-    name = (spec.get("name") or "bot").strip().replace(" ", "-").lower()
-    out = exports_dir / name
+    out = exports_dir / bot.slug
     # overwrite existing export
     if out.exists():
         shutil.rmtree(out)
     out.mkdir(parents=True, exist_ok=True)
-    # Save spec into project
-    (out / "bot.json").write_text(json.dumps(spec, indent=2), encoding="utf-8")
+    # Save spec (defaults filled in) into project
+    # The exported runner has no machine profile: an unset num_ctx gets the hub's cap for unprofiled hosts
+    exported = bot.to_spec()
+    if not exported["generation"].get("num_ctx"):
+        exported["generation"]["num_ctx"] = MAX_NUM_CTX
+    (out / "bot.json").write_text(json.dumps(exported, indent=2), encoding="utf-8")
     # Requirements based on framework / RAG
-    fw = spec.get("agent", {}).get("framework", "none")
-    reqs = ["requests"]
-    if fw == "langgraph":
-        reqs += ["langgraph"]
-    elif fw == "crewai":
-        reqs += ["crewai"]
-    elif fw == "autogen":
-        reqs += ["pyautogen"]
-    if spec.get("rag", {}).get("enabled"):
-        reqs += ["chromadb", "sentence-transformers", "pypdf"]
-    (out / "requirements.txt").write_text("\n".join(reqs) + "\n", encoding="utf-8")
+    (out / "requirements.txt").write_text("\n".join(bot.requirements) + "\n", encoding="utf-8")
     runner = r'''
 import json
 import requests
@@ -44,9 +40,10 @@ def chat(messages, options):
 opts = {
   "temperature": spec["generation"]["temperature"],
   "top_p": spec["generation"]["top_p"],
-  "num_ctx": spec["generation"]["num_ctx"],
   "num_predict": spec["generation"]["max_tokens"]
 }
+if spec["generation"].get("num_ctx"):
+    opts["num_ctx"] = spec["generation"]["num_ctx"]
 history = [{"role":"system","content": spec["system"]["prompt"]}]
 print("Loaded bot:", spec["name"])
 print("Type 'exit' to quit.")
@@ -60,7 +57,7 @@ while True:
     print("\nBot:", a)
 '''
     (out / "run_chat.py").write_text(runner.strip() + "\n", encoding="utf-8")
-    readme = f"""# {spec.get('name','Bot')}
+    readme = f"""# {bot.name}
 Exported from AI-Training-Hub.
 ## Setup
 python -m venv .venv
@@ -70,8 +67,8 @@ pip install -r requirements.txt
 ## Run
 python run_chat.py
 ## Notes
-Framework selected: {fw}
-RAG enabled: {spec.get('rag',{}).get('enabled')}
+Framework selected: {bot.framework}
+RAG enabled: {bot.rag_enabled}
 """
     (out / "README.md").write_text(readme, encoding="utf-8")
     return out
@@ -8,7 +8,7 @@ import socket
 import shutil
 import subprocess
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Any, Callable, Dict, List, Optional
 import streamlit as st
 
 # === CITL_PATCH_NEW_TERMINAL_CLI_V1 ================================================================
@@ -54,9 +54,10 @@ def _citl_open_terminal(cmd, cwd=None):
 # === END CITL_PATCH_NEW_TERMINAL_CLI_V1 ============================================================
 
 
-import requests
+# requests, bots.gpu_status, bots.residency, bots.ollama_supervisor and bots.resilience load inside the tabs that use them,
+# so the page title and tab strip render before they are imported.
 from bots.registry import list_bots, get_registry
-from bots.gpu_status import get_gpus
+from bots.cancel import CancelToken
 APP_TITLE = "AI Training Hub (Local Ollama + Agent Frameworks)"
 DEFAULT_PORT = int(os.environ.get("AI_TRAINING_HUB_PORT", "8502"))
 DEFAULT_API_PORT = int(os.environ.get("AI_TRAINING_HUB_API_PORT", "8787"))
@@ -114,23 +115,33 @@ def css():
     """, unsafe_allow_html=True)
 def h_badge(text: str, color: str):
     return f"<span class='badge' style='color:{color}; border-color:{color}55'>{text}</span>"
+@st.cache_data(ttl=300, show_spinner=False)
 def internet_ok() -> bool:
+    # Cached: every widget click reruns the script, and offline this waits out the timeout.
+    import requests
     try:
         requests.get("https://pypi.org", timeout=2)
         return True
     except Exception:
         return False
+@st.cache_data(ttl=10, show_spinner=False)
+def gpu_snapshot() -> List[Dict[str, Any]]:
+    # nvidia-smi takes a few hundred ms; once per 10 s is plenty for the Environment tab.
+    from bots.gpu_status import get_gpus
+    return get_gpus()
 def ollama_status(host: str) -> Dict[str, Any]:
-    try:
-        r = requests.get(f"{host.rstrip('/')}/api/tags", timeout=2)
-        r.raise_for_status()
-        models = (r.json() or {}).get("models") or []
-        names = [m.get("name") for m in models if m.get("name")]
-        return {"ok": True, "models": sorted(names)}
-    except Exception as e:
-        return {"ok": False, "error": str(e)}
-def run_cli_bot(bot_id: str, args: Dict[str, Any]) -> str:
-    # Runs CLI subprocess to prove CLI-only behavior; returns stdout+stderr
+    # Ask this machine's Ollama supervisor (it probes every few seconds); without one,
+    # or for a remote host, one cached /api/tags probe answers both tabs.
+    from bots.ollama_supervisor import get_supervisor
+    sup = get_supervisor(host).status()
+    if sup.ready:
+        return {"ok": True, "models": sup.models, "supervisor": sup}
+    return {"ok": False, "error": sup.error or sup.state, "supervisor": sup}
+def run_cli_bot(bot_id: str, args: Dict[str, Any], cancel: Optional[CancelToken] = None,
+                on_tick: Optional[Callable[[float], None]] = None) -> str:
+    # Runs CLI subprocess to prove CLI-only behavior; returns stdout+stderr.
+    # cancel (or a Streamlit rerun interrupting on_tick) terminates the bot, which
+    # closes its Ollama connection so the model stops generating.
     py = sys.executable
     cmd = [py, "-m", "bots.run_bot", "--bot", bot_id, "--json"]
     if args.get("text"):
@@ -143,8 +154,27 @@ def run_cli_bot(bot_id: str, args: Dict[str, Any]) -> str:
         cmd += ["--target", str(args["target"])]
     for f in (args.get("files") or []):
         cmd += ["--file", str(f)]
-    p = subprocess.run(cmd, capture_output=True, text=True)
-    out = (p.stdout or "") + (("\n" + p.stderr) if p.stderr else "")
+    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    release = cancel.on_cancel(p.terminate) if cancel is not None else None
+    t0 = time.monotonic()
+    stdout, stderr = "", ""
+    try:
+        while True:
+            try:
+                stdout, stderr = p.communicate(timeout=0.25)
+                break
+            except subprocess.TimeoutExpired:
+                if on_tick is not None:
+                    on_tick(time.monotonic() - t0)
+    finally:
+        if release is not None:
+            release()
+        if p.poll() is None:   # interrupted (rerun / Stop) — never leave the bot running
+            p.kill()
+            p.communicate()
+    out = (stdout or "") + (("\n" + stderr) if stderr else "")
+    if cancel is not None and cancel.cancelled:
+        out += f"\n[cancelled: {cancel.reason}]"
     return out.strip()
 def tab_environment():
     st.subheader("Environment")
@@ -155,7 +185,7 @@ def tab_environment():
     st.markdown("<div class='hr'></div>", unsafe_allow_html=True)
     # GPU
     st.subheader("GPU / VRAM / Temperature")
-    gpus = get_gpus()
+    gpus = gpu_snapshot()
     # CITL: normalize GPU records into SafeNS so Hub never crashes on missing attrs
     from types import SimpleNamespace
 
@@ -210,12 +240,64 @@ def tab_environment():
     st.subheader("Ollama")
     st.write(f"Host: `{DEFAULT_OLLAMA_HOST}`")
     stt = ollama_status(DEFAULT_OLLAMA_HOST)
+    sup = stt["supervisor"]
+    st.caption(f"Supervisor: {sup.describe()}")
+    if sup.restarts:
+        with st.expander(f"Restart history ({len(sup.restarts)})"):
+            st.table([{
+                "When": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(r.at)),
+                "Reason": r.reason,
+                "Took (s)": f"{r.took_s:.1f}",
+                "Result": "ok" if r.ok else f"failed: {r.error}",
+            } for r in reversed(sup.restarts)])
+    # Circuit breaker / adaptive timeouts for every host this hub process has called
+    from bots.resilience import status as breaker_status
+    for g in breaker_status():
+        retry = f", next probe in {g['retry_in_s']:.0f} s" if g["state"] == "open" else ""
+        st.caption(f"Breaker `{g['host']}`: {g['state']}{retry}  •  {g['successes']} ok, {g['failures']} failed, "
+                   f"{g['rejected']} failed fast, {g['retries']} retried"
+                   + (f"  •  last error: {g['last_error']}" if g["state"] != "closed" else ""))
+        if g["timeouts"]:
+            with st.expander(f"Adaptive timeouts — {g['host']}"):
+                st.table([{
+                    "Request": kind,
+                    "Samples": t["samples"],
+                    "TTFB p95 (s)": f"{t['ttfb_p95_s']:.2f}",
+                    "Connect (s)": "default" if t["connect_s"] is None else f"{t['connect_s']:.1f}",
+                    "Read (s)": "default" if t["read_s"] is None else f"{t['read_s']:.0f}",
+                } for kind, t in g["timeouts"].items()])
     if stt["ok"]:
         st.markdown("<div class='ok'>Ollama reachable. Models detected.</div>", unsafe_allow_html=True)
         st.code("\n".join(stt["models"]) if stt["models"] else "(no models)", language="text")
     else:
         st.markdown("<div class='bad'>Ollama NOT reachable. Start Ollama to enable local LLM features.</div>", unsafe_allow_html=True)
         st.code(stt["error"], language="text")
+        return
+    # Resident models (/api/ps)
+    from bots.residency import get_residency
+    st.subheader("Resident Models")
+    res = get_residency(DEFAULT_OLLAMA_HOST)
+    rows = res.ps(max_age=0)
+    if not rows:
+        st.caption("No models loaded — the next request pays the model load time.")
+    else:
+        def _expiry(left):
+            if left is None:
+                return "never (pinned)"
+            return f"{left / 60:.0f} min" if left >= 90 else f"{left:.0f} s"
+        st.table([{
+            "Model": m.name,
+            "Host": m.host,
+            "VRAM (MB)": f"{m.vram_mb:.0f}",
+            "Size (MB)": f"{m.size_mb:.0f}",
+            "Unloads in": _expiry(m.expires_in_s),
+            "Keep-alive": str(res.keep_alive(m.name)),
+        } for m in rows])
+    budget = res.vram_budget_mb()
+    st.caption(
+        f"Default keep_alive: {res.policy.default_keep_alive}  •  "
+        f"pinning: {res.policy.pin_n or 'off'}  •  VRAM budget: {'N/A' if budget is None else f'{budget} MB'}"
+    )
 def tab_install():
     st.subheader("Install Packages (Start from Zero)")
     ok = internet_ok()
@@ -283,9 +365,23 @@ def tab_chat():
     reg = get_registry()
     bot_ids = sorted(reg.keys())
     bot_id = st.selectbox("Bot", bot_ids, index=0)
+    # Preload the bot's model as soon as it is selected, not on the first run
+    if st.session_state.get("chat_preloaded_bot") != bot_id:
+        st.session_state["chat_preloaded_bot"] = bot_id
+        from bots.residency import get_residency, model_for_bot, options_for_bot
+        model = model_for_bot(bot_id, "")
+        # with the bot's own num_ctx etc. — a preload with other load options is reloaded by its first request
+        opts = options_for_bot(bot_id, model, DEFAULT_OLLAMA_HOST) if model else {}
+        if model and get_residency(DEFAULT_OLLAMA_HOST).preload(model, opts):
+            st.caption(f"Loading {model} in the background ...")
     msg = st.text_area("Message", "Hello! Show me what you can do.")
     run_new_terminal = st.button("Run (New Terminal CLI)")
     run_capture = st.button("Run (Capture Output)")
+    # Stop reruns the script: the running capture is interrupted at its next tick
+    # and run_cli_bot's cleanup terminates the bot; the token covers anything still in flight
+    if st.button("Stop") and st.session_state.get("chat_cancel") is not None:
+        st.session_state["chat_cancel"].cancel("stopped from the hub")
+        st.caption("Stopped — the bot was terminated and Ollama stops generating.")
     if run_new_terminal:
         hub = _citl_find_hub_root()
         cli = str((hub / "bots" / "citl_cli.py").resolve())
@@ -297,7 +393,12 @@ def tab_chat():
     if run_capture:
 
         meta = reg[bot_id]
-        out = run_cli_bot(bot_id, {"text": msg})
+        token = st.session_state["chat_cancel"] = CancelToken()
+        status = st.empty()
+        out = run_cli_bot(bot_id, {"text": msg}, cancel=token,
+                          on_tick=lambda s: status.caption(f"Running {bot_id} … {s:.0f} s (Stop cancels it)"))
+        status.empty()
+        st.session_state["chat_cancel"] = None
         st.markdown(f"{h_badge(meta.name, meta.color)}", unsafe_allow_html=True)
         st.markdown(f"<div class='bot-line' style='border-color:{meta.color}55'>"
                     f"<span style='color:{meta.color}'>CLI Output</span>\n\n{out}"
@@ -311,6 +412,7 @@ def tab_tests():
 python -m pytest -q
 """.strip(), language="text")
 def tab_deploy_demo():
+    import requests
     st.subheader("Deployment Demo (Faux Local Server + CLI Runs)")
     st.write("This page demonstrates production-like behavior:")
     st.markdown("""
@@ -0,0 +1,142 @@
+﻿from __future__ import annotations
+# Packs retrieved RAG hits into the system prompt under a token budget instead of appending them verbatim:
+#   1. adjacent chunks of one source (rag_engine.simple_chunk's chunk i and i+1 share a 150-char overlap)
+#      merge into one span, the overlap kept once
+#   2. spans that add little new text to what is already packed (the same passage ingested twice, a
+#      re-chunked copy) are dropped as near-duplicates
+#   3. spans fill the budget in relevance order (hits as RagStore.query returns them, best first); the
+#      one that no longer fits is cut down if enough room is left, lower-ranked spans that still fit go in
+# Citations [1]..[n] number the packed spans in relevance order, so [1] is always the best hit that made it in.
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Set
+from bots.context_window import MESSAGE_OVERHEAD, estimate_tokens
+from bots.options_profile import MAX_NUM_CTX
+DEFAULT_NUM_CTX = MAX_NUM_CTX  # what an unprofiled host is sent when neither the spec nor the profile sets num_ctx
+DEFAULT_REPLY_TOKENS = 512     # reply reserve when num_predict is unset or unlimited (-1)
+MIN_OVERLAP = 20               # shortest suffix/prefix match taken as chunk overlap when merging
+SHINGLE_WORDS = 5              # near-duplicate detection compares 5-word shingles
+DUPLICATE_SHARE = 0.8          # a span whose shingles are this much already packed is a duplicate
+MIN_CUT_TOKENS = 64            # cut a span to fit only if at least this many tokens are left
+HEADER = "You may use the following sources:"
+FOOTER = "If you use a source, cite it like: [1], [2]."
+@dataclass
+class Span:
+    source: str
+    chunks: List[int]              # chunk indices merged into this span (empty: hit had no chunk metadata)
+    ranks: List[int]               # 0-based relevance ranks of the hits it came from
+    text: str
+    @property
+    def rank(self) -> int:
+        return min(self.ranks)
+@dataclass
+class PackedContext:
+    text: str                      # goes after the system prompt ("" = nothing fit, or no hits)
+    budget: Optional[int]          # tokens allowed (None = unlimited)
+    used: int = 0                  # tokens in text
+    hits: int = 0
+    merged: int = 0                # hits folded into a neighbouring chunk's span
+    duplicates: int = 0            # spans dropped as near-duplicates
+    over_budget: int = 0           # spans left out for lack of room
+    cut: int = 0                   # spans shortened to fit
+    sources: List[Dict[str, Any]] = field(default_factory=list)   # {"n", "source", "chunks", "ranks", "tokens", "cut"}
+    arithmetic: Dict[str, int] = field(default_factory=dict)      # context_budget(): where the budget came from
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+def context_budget(num_ctx: Optional[int], system_prompt: str, history: List[Dict[str, str]], user_text: str,
+                   reply_tokens: Optional[int] = None) -> Dict[str, int]:
+    # What num_ctx leaves for RAG context after the system prompt, history, question and reply reserve
+    # -> {"num_ctx", "system", "history", "user", "reply", "rag"} in (estimated) tokens
+    parts = {
+        "num_ctx": int(num_ctx or DEFAULT_NUM_CTX),
+        "system": estimate_tokens(system_prompt) + MESSAGE_OVERHEAD,
+        "history": sum(estimate_tokens(m.get("content") or "") + MESSAGE_OVERHEAD for m in history),
+        "user": estimate_tokens(user_text) + MESSAGE_OVERHEAD,
+        "reply": int(reply_tokens) if reply_tokens and reply_tokens > 0 else DEFAULT_REPLY_TOKENS,
+    }
+    parts["rag"] = max(0, parts["num_ctx"] - parts["system"] - parts["history"] - parts["user"] - parts["reply"])
+    return parts
+def _join(a: str, b: str) -> str:
+    # b continues a: drop the longest prefix of b that a already ends with
+    for k in range(min(len(a), len(b)), MIN_OVERLAP - 1, -1):
+        if a.endswith(b[:k]):
+            return a + b[k:]
+    return f"{a} {b}"
+def merge_adjacent(hits: List[Dict[str, Any]]) -> List[Span]:
+    # One span per run of consecutive chunk indices of the same source, in relevance order of its best hit
+    spans: List[Span] = []
+    by_source: Dict[str, List[tuple]] = {}
+    for rank, h in enumerate(hits):
+        meta = h.get("meta") or {}
+        src, chunk = str(meta.get("source", "source")), meta.get("chunk")
+        if isinstance(chunk, int) and not isinstance(chunk, bool):
+            by_source.setdefault(src, []).append((chunk, rank, h.get("text") or ""))
+        else:
+            spans.append(Span(src, [], [rank], h.get("text") or ""))
+    for src, items in by_source.items():
+        items.sort()
+        cur: Optional[Span] = None
+        for chunk, rank, text in items:
+            if cur is not None and chunk == cur.chunks[-1]:
+                cur.ranks.append(rank)                 # the same chunk retrieved twice
+            elif cur is not None and chunk == cur.chunks[-1] + 1:
+                cur.chunks.append(chunk)
+                cur.ranks.append(rank)
+                cur.text = _join(cur.text, text)
+            else:
+                cur = Span(src, [chunk], [rank], text)
+                spans.append(cur)
+    spans.sort(key=lambda s: s.rank)
+    return spans
+def shingles(text: str) -> Set[int]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= SHINGLE_WORDS:
+        return {hash(" ".join(words))} if words else set()
+    return {hash(" ".join(words[i:i + SHINGLE_WORDS])) for i in range(len(words) - SHINGLE_WORDS + 1)}
+def _cut(text: str, tokens: int) -> str:
+    # Longest word-boundary prefix of text (plus "…") within tokens
+    keep = text[: max(1, tokens * 4)]
+    while keep and estimate_tokens(keep + "…") > tokens:
+        keep = keep[: int(len(keep) * 0.9)]
+    return keep.rsplit(" ", 1)[0] + "…" if " " in keep else keep + "…"
+def pack_hits(hits: List[Dict[str, Any]], budget: Optional[int] = None, citations: bool = True,
+              arithmetic: Optional[Dict[str, int]] = None) -> PackedContext:
+    # hits: [{"text", "meta": {"source", "chunk"}, "distance"?}, ...] best first (RagStore.query)
+    packed = PackedContext(text="", budget=budget, hits=len(hits), arithmetic=dict(arithmetic or {}))
+    if not hits:
+        return packed
+    spans = merge_adjacent(hits)
+    packed.merged = len(hits) - len(spans)
+    lines = [HEADER]
+    fixed = estimate_tokens(HEADER + ("\n" + FOOTER if citations else ""))
+    left = None if budget is None else budget - fixed
+    seen: Set[int] = set()
+    for span in spans:
+        sh = shingles(span.text)
+        if sh and len(sh & seen) >= DUPLICATE_SHARE * len(sh):
+            packed.duplicates += 1
+            continue
+        n = len(packed.sources) + 1
+        line = f"[{n}] ({span.source}) {span.text}"
+        cost = estimate_tokens("\n" + line)
+        was_cut = False
+        if left is not None and cost > left:
+            if left < MIN_CUT_TOKENS:
+                packed.over_budget += 1
+                continue
+            line = _cut(line, left - 1)
+            cost, was_cut = estimate_tokens("\n" + line), True
+            packed.cut += 1
+        lines.append(line)
+        seen |= sh
+        if left is not None:
+            left -= cost
+        packed.sources.append({"n": n, "source": span.source, "chunks": span.chunks, "ranks": span.ranks,
+                               "tokens": cost, "cut": was_cut})
+    if not packed.sources:
+        return packed
+    if citations:
+        lines.append(FOOTER)
+    packed.text = "\n".join(lines)
+    packed.used = estimate_tokens(packed.text)
+    return packed
@@ -1,58 +1,382 @@
 ﻿from __future__ import annotations
-from typing import Dict, Any, List, Optional
-import requests
-def ollama_chat(base_url: str, model: str, messages: List[Dict[str, str]], options: Dict[str, Any]) -> str:
-    payload = {"model": model, "messages": messages, "stream": False, "options": options or {}}
-    r = requests.post(f"{base_url}/api/chat", json=payload, timeout=180)
-    r.raise_for_status()
-    return r.json()["message"]["content"]
-def build_context_with_rag(rag_hits: List[Dict[str, Any]], citations: bool = True) -> str:
-    if not rag_hits:
-        return ""
-    parts = ["You may use the following sources:"]
-    for i, h in enumerate(rag_hits, start=1):
-        src = h.get("meta", {}).get("source", "source")
-        parts.append(f"[{i}] ({src}) {h.get('text','')}")
-    parts.append("If you use a source, cite it like: [1], [2].")
-    return "\n".join(parts)
-def run_bot(spec: Dict[str, Any], user_text: str, chat_history: List[Dict[str, str]], rag_context: str = "") -> str:
-    base_url = spec["runtime"]["base_url"]
-    model = spec["runtime"]["model"]
-    sys_prompt = spec["system"]["prompt"]
+import ast
+import asyncio
+import operator
+import re
+import threading
+import time
+import warnings
+from dataclasses import replace
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Dict, Any, AsyncIterator, Callable, Generator, Iterator, List, Optional, Tuple, Union
+from app.bot_schema import CompiledBot, GraphStep, SpecError, SpecLike, compile_spec, graph_steps
+from app.rag_packer import PackedContext, context_budget, pack_hits
+from bots.cancel import CancelToken
+from bots.graph_executor import GraphNode, iter_graph, run_graph
+from bots.ollama_client import get_client
+from bots.options_profile import profile_options
+from bots.response_cache import cache_enabled, get_cache, replay
+from bots.telemetry import TurnStats
+def ollama_chat(base_url: str, model: str, messages: List[Dict[str, str]], options: Dict[str, Any],
+                cancel: Optional[CancelToken] = None) -> str:
+    # cancel: cancelling it from another thread (e.g. a Stop button) aborts the request
+    # and raises bots.cancel.Cancelled; Ollama stops generating when the connection closes
+    # Opt-in response cache (CITL_RESPONSE_CACHE=1), shared with the sandbox
+    cache = get_cache() if cache_enabled() else None
+    key = None
+    if cache is not None and cache.should_bypass(options):
+        cache.note_bypass()
+    elif cache is not None:
+        key = cache.key(base_url, model, messages, options or {})
+        hit = cache.get(key)
+        if hit:
+            return hit["reply"]
+    data = get_client(base_url).chat(model, messages, options or {}, timeout=180, cancel=cancel)
+    reply = data["message"]["content"]
+    if key:
+        cache.put(key, model, reply, final=data)
+    return reply
+class _StreamedTurn:
+    # One streamed call: cache lookup, then turns Ollama chunks into events:
+    #   {"type": "token", "stage": ..., "text": ...}                  per chunk
+    #   {"type": "done", "stage": ..., "reply": ..., "stats": {...}}  once, last (stats = TurnStats.to_dict())
+    def __init__(self, base_url: str, model: str, messages: List[Dict[str, str]], options: Dict[str, Any],
+                 stage: str, bot: str = ""):
+        self.base_url, self.model, self.stage, self.bot = base_url, model, stage, bot
+        self.cache = get_cache() if cache_enabled() else None
+        self.key = None
+        self.hit = None
+        if self.cache is not None and self.cache.should_bypass(options):
+            self.cache.note_bypass()
+        elif self.cache is not None:
+            self.key = self.cache.key(base_url, model, messages, options or {})
+            self.hit = self.cache.get(self.key)
+        self.t_start = time.perf_counter()
+        self.t_first: Optional[float] = None
+        self.parts: List[str] = []
+        self.tokens: List[Tuple[float, str]] = []
+        self.final: Optional[Dict[str, Any]] = None
+    def feed(self, chunk: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if chunk.get("done"):
+            self.final = chunk
+        text = (chunk.get("message") or {}).get("content", "")
+        if not text:
+            return None
+        now = time.perf_counter()
+        if self.t_first is None:
+            self.t_first = now
+        self.parts.append(text)
+        self.tokens.append((now - self.t_start, text))
+        return {"type": "token", "stage": self.stage, "text": text}
+    def done(self) -> Dict[str, Any]:
+        reply = "".join(self.parts)
+        if self.key and self.hit is None and self.final is not None:
+            self.cache.put(self.key, self.model, reply, tokens=self.tokens, final=self.final)
+        stats = TurnStats.from_response(self.final, self.model, self.t_start, time.perf_counter(), self.t_first,
+                                        host=self.base_url, bot=self.bot, cached=self.hit is not None)
+        return {"type": "done", "stage": self.stage, "reply": reply, "stats": stats.to_dict()}
+def ollama_chat_stream(base_url: str, model: str, messages: List[Dict[str, str]], options: Dict[str, Any],
+                       cancel: Optional[CancelToken] = None, stage: str = "answer",
+                       bot: str = "") -> Iterator[Dict[str, Any]]:
+    # Streaming ollama_chat: token events as they arrive, then one "done" event (see _StreamedTurn)
+    turn = _StreamedTurn(base_url, model, messages, options, stage, bot)
+    if turn.hit is not None:
+        source = replay(turn.hit)
+    else:
+        source = get_client(base_url).chat_stream(model, messages, options or {}, timeout=180, cancel=cancel)
+    for chunk in source:
+        ev = turn.feed(chunk)
+        if ev is not None:
+            yield ev
+    yield turn.done()
+async def aollama_chat_stream(base_url: str, model: str, messages: List[Dict[str, str]], options: Dict[str, Any],
+                              cancel: Optional[CancelToken] = None, stage: str = "answer",
+                              bot: str = "") -> AsyncIterator[Dict[str, Any]]:
+    turn = _StreamedTurn(base_url, model, messages, options, stage, bot)
+    if turn.hit is not None:
+        for chunk in replay(turn.hit):
+            ev = turn.feed(chunk)
+            if ev is not None:
+                yield ev
+    else:
+        async for chunk in get_client(base_url).achat_stream(model, messages, options or {}, timeout=180,
+                                                               cancel=cancel):
+            ev = turn.feed(chunk)
+            if ev is not None:
+                yield ev
+    yield turn.done()
+# rag_context: the text to append to the system prompt, or RagStore.query hits to pack into what num_ctx leaves
+RagContext = Union[str, List[Dict[str, Any]]]
+def build_context_with_rag(rag_hits: List[Dict[str, Any]], citations: bool = True, budget: Optional[int] = None) -> str:
+    # Adjacent chunks merged, near-duplicates dropped, at most `budget` tokens (app/rag_packer.py)
+    return pack_hits(rag_hits, budget, citations).text
+def _options(bot: CompiledBot) -> Dict[str, Any]:
+    # Machine profile first; anything the spec sets explicitly (e.g. num_ctx) wins
+    options = profile_options(bot.model, bot.base_url)
+    options.update(bot.options)
+    return options
+def _pack(bot: CompiledBot, options: Dict[str, Any], rag_hits: List[Dict[str, Any]], user_text: str,
+          history: List[Dict[str, str]]) -> PackedContext:
+    budget = context_budget(options.get("num_ctx"), bot.system_prompt, history, user_text, options.get("num_predict"))
+    return pack_hits(rag_hits, budget["rag"], bot.rag_citations, budget)
+def pack_rag_context(spec: SpecLike, rag_hits: List[Dict[str, Any]], user_text: str,
+                     chat_history: List[Dict[str, str]]) -> PackedContext:
+    # What run_bot(spec, user_text, chat_history, rag_hits) sends as RAG context, with the budget arithmetic
+    # (.arithmetic: num_ctx - system - history - user - reply = rag) and what was merged / dropped / cut
+    bot = compile_spec(spec)
+    return _pack(bot, _options(bot), rag_hits, user_text, [m for m in chat_history if m["role"] != "system"])
+def _prepare(spec: SpecLike, user_text: str, chat_history: List[Dict[str, str]],
+             rag_context: RagContext = "") -> Tuple[CompiledBot, List[Dict[str, str]], Dict[str, Any]]:
+    # -> compiled bot (validated once per spec content, app/bot_schema.py), messages, options
+    bot = compile_spec(spec)
+    options = _options(bot)
+    history = [m for m in chat_history if m["role"] != "system"]
+    if isinstance(rag_context, list):
+        rag_context = _pack(bot, options, rag_context, user_text, history).text
+    sys_prompt = bot.system_prompt
     if rag_context:
         sys_prompt = sys_prompt + "\n\n" + rag_context
-    framework = spec.get("agent", {}).get("framework", "none")
-    mode = spec.get("agent", {}).get("mode", "single")
-    options = {
-        "temperature": spec["generation"]["temperature"],
-        "top_p": spec["generation"]["top_p"],
-        "num_ctx": spec["generation"]["num_ctx"],
-        "num_predict": spec["generation"]["max_tokens"]
-    }
     # Always enforce system message at beginning
-    messages = [{"role": "system", "content": sys_prompt}] + [m for m in chat_history if m["role"] != "system"]
+    messages = [{"role": "system", "content": sys_prompt}] + history
     messages.append({"role": "user", "content": user_text})
-    # Starter “agentic” behaviors (teaching)
-    if framework == "none":
-        return ollama_chat(base_url, model, messages, options)
-    if framework == "langgraph":
-        # Simulate planner -> answer (simple)
-        planner = "First, write a short plan. Then answer."
-        messages2 = messages[:-1] + [{"role": "user", "content": planner + "\n\nUser question:\n" + user_text}]
-        return ollama_chat(base_url, model, messages2, options)
-    if framework == "crewai":
+    return bot, messages, options
+# Tools a langgraph "tool" node can call: name -> fn(question) -> text. calculator ships here and rag_retriever
+# below (it searches the bot's own collection); anything else (kb_search, file_lookup, ...) needs a
+# register_tool call first, or the node is left out of the graph with a warning
+TOOLS: Dict[str, Callable[[str], str]] = {}
+def register_tool(name: str, fn: Callable[[str], str]) -> None:
+    TOOLS[name] = fn
+RAG_DIR = Path(__file__).resolve().parents[1] / "data" / "chroma"   # the hub's RagStore
+_RAG_STORE: Any = None
+_RAG_LOCK = threading.Lock()
+def _rag_store() -> Any:
+    # chromadb / sentence-transformers load on the first retrieval, not at import
+    global _RAG_STORE
+    with _RAG_LOCK:
+        if _RAG_STORE is None:
+            from app.rag_engine import RagStore
+            _RAG_STORE = RagStore(RAG_DIR)
+        return _RAG_STORE
+def _rag_retriever(bot: CompiledBot, question: str) -> str:
+    hits = _rag_store().query(bot.rag_collection, question, bot.rag_top_k)
+    return build_context_with_rag(hits, citations=False) or "(no matching passages)"
+def _tool(bot: CompiledBot, name: str) -> Optional[Callable[[str], str]]:
+    if name in TOOLS:
+        return TOOLS[name]
+    if name == "rag_retriever" and find_spec("chromadb") and find_spec("sentence_transformers"):
+        return lambda q: _rag_retriever(bot, q)
+    return None
+def _graph_plan(bot: CompiledBot) -> Tuple[Tuple[GraphStep, ...], List[str]]:
+    # -> (steps to run, warnings): tool steps with no implementation are dropped, nothing waits on them
+    steps = bot.graph or graph_steps({})
+    missing = [s.tool for s in steps if s.tool and _tool(bot, s.tool) is None]
+    if not missing:
+        return steps, []
+    gone = {f"tool:{t}" for t in missing}
+    steps = tuple(replace(s, after=tuple(a for a in s.after if a not in gone)) for s in steps if s.name not in gone)
+    needs = {"rag_retriever": " (needs chromadb and sentence-transformers)"}
+    return steps, [f"tool {t!r} is not available in this hub{needs.get(t, '')}; left out of the graph" for t in missing]
+_CALC_OPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+             ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: operator.pow,
+             ast.USub: operator.neg, ast.UAdd: operator.pos}
+def _calc(node: ast.AST) -> float:
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _CALC_OPS:
+        return _CALC_OPS[type(node.op)](_calc(node.operand))
+    if isinstance(node, ast.BinOp) and type(node.op) in _CALC_OPS:
+        left, right = _calc(node.left), _calc(node.right)
+        if isinstance(node.op, ast.Pow) and abs(right) > 100:
+            raise ValueError("exponent too large")
+        return _CALC_OPS[type(node.op)](left, right)
+    raise ValueError("not arithmetic")
+def _calculator(question: str) -> str:
+    # Evaluates the arithmetic expressions in the question (numbers, + - * / // % ** and parentheses only)
+    results = []
+    for expr in re.findall(r"[\d.(][\d.\s()+\-*/%]*[\d.)]", question):
+        expr = expr.strip()
+        if not re.search(r"\d\s*[-+*/%]", expr):
+            continue
+        try:
+            results.append(f"{expr} = {_calc(ast.parse(expr, mode='eval').body):g}")
+        except (SyntaxError, ValueError, ZeroDivisionError, OverflowError):
+            continue
+    return "\n".join(results) or "(no arithmetic found)"
+TOOLS["calculator"] = _calculator
+_GRAPH_LABELS = {"planner": "Plan", "writer": "Draft answer", "verifier": "Checked answer"}
+def _graph_messages(step: GraphStep, messages: List[Dict[str, str]], user_text: str,
+                    inputs: Dict[str, str]) -> List[Dict[str, str]]:
+    parts = []
+    for name, out in inputs.items():
+        label = f"Tool result ({name[5:]})" if name.startswith("tool:") else _GRAPH_LABELS.get(name, name)
+        parts.append(f"{label}:\n{out}")
+    prompt = step.prompt.replace("{inputs}", "\n\n".join(parts)).replace("{question}", user_text)
+    return messages[:-1] + [{"role": "user", "content": prompt.strip()}]
+def _graph_nodes(bot: CompiledBot, steps: Tuple[GraphStep, ...], messages: List[Dict[str, str]],
+                 options: Dict[str, Any], user_text: str, cancel: Optional[CancelToken]) -> List[GraphNode]:
+    nodes = []
+    for step in steps:
+        if step.tool:
+            fn = _tool(bot, step.tool)
+            scope = [bot.rag_collection, bot.rag_top_k] if step.tool not in TOOLS else []
+            nodes.append(GraphNode(step.name, lambda ins, fn=fn: fn(user_text), list(step.after),
+                                   key=["tool", step.tool, *scope, user_text]))
+        else:
+            nodes.append(GraphNode(
+                step.name,
+                lambda ins, step=step: ollama_chat(bot.base_url, bot.model,
+                                                   _graph_messages(step, messages, user_text, ins), options, cancel),
+                list(step.after), key=["llm", bot.base_url, bot.model, options, messages, step.prompt]))
+    return nodes
+def run_bot_graph(spec: SpecLike, user_text: str, chat_history: List[Dict[str, str]], rag_context: RagContext = "",
+                  cancel: Optional[CancelToken] = None) -> Dict[str, Any]:
+    # The spec's langgraph nodes as a DAG (bots/graph_executor.py): independent branches run concurrently,
+    # node outputs are memoized. -> {"reply", "nodes": {name: timing}, "wall_ms", "sum_ms", "critical_path", ...,
+    # "warnings": [tools left out]}
+    return _run_graph(*_prepare(spec, user_text, chat_history, rag_context), user_text, cancel)
+def _run_graph(bot: CompiledBot, messages: List[Dict[str, str]], options: Dict[str, Any], user_text: str,
+               cancel: Optional[CancelToken]) -> Dict[str, Any]:
+    steps, notes = _graph_plan(bot)
+    result = run_graph(_graph_nodes(bot, steps, messages, options, user_text, cancel), cancel)
+    return {"reply": result.outputs[steps[-1].name], **result.to_dict(), "warnings": notes}
+def _early_stages(bot: CompiledBot, messages: List[Dict[str, str]], options: Dict[str, Any], user_text: str,
+                  cancel: Optional[CancelToken]) -> Generator[Dict[str, Any], None, List[Dict[str, str]]]:
+    # Multi-call patterns: runs every call before the final one, yielding
+    # {"type": "stage", "stage", "reply", ...} for each; returns the final call's messages.
+    # langgraph first yields {"type": "warning", "text"} per tool left out of the graph
+    if bot.framework == "autogen":
+        draft = ollama_chat(bot.base_url, bot.model, messages, options, cancel)
+        yield {"type": "stage", "stage": "draft", "reply": draft}
+        return _final_messages(bot, messages, user_text, draft)
+    if bot.framework == "langgraph":
+        steps, notes = _graph_plan(bot)
+        for note in notes:
+            yield {"type": "warning", "text": note}
+        nodes = _graph_nodes(bot, steps[:-1], messages, options, user_text, cancel)
+        outputs: Dict[str, str] = {}
+        for name, out, timing in iter_graph(nodes, cancel, outputs=outputs):
+            yield {"type": "stage", "stage": name, "reply": out, "ms": round(timing.ms, 1), "cached": timing.cached}
+        final = steps[-1]
+        return _graph_messages(final, messages, user_text, {d: outputs[d] for d in final.after})
+    return _final_messages(bot, messages, user_text)
+def _final_messages(bot: CompiledBot, messages: List[Dict[str, str]], user_text: str,
+                    draft: str = "") -> List[Dict[str, str]]:
+    # Starter “agentic” behaviors (teaching): the messages of the call whose reply is the answer
+    if bot.framework == "crewai":
         # Simulate role/task prompting; real CrewAI projects happen in exported scaffold
-        role = spec.get("identity", {}).get("role", "Assistant")
-        goal = spec.get("identity", {}).get("goal", "")
-        backstory = spec.get("identity", {}).get("backstory", "")
-        crew_sys = f"You are acting as: {role}.\nGoal: {goal}\nBackstory: {backstory}\nComplete the task."
-        messages2 = [{"role": "system", "content": crew_sys}] + messages[1:]
-        return ollama_chat(base_url, model, messages2, options)
-    if framework == "autogen":
-        # Simulate 2-agent pattern: critic + assistant (simple)
-        assistant = ollama_chat(base_url, model, messages, options)
+        return [{"role": "system", "content": bot.crew_system}] + messages[1:]
+    if bot.framework == "autogen":
+        # Simulate 2-agent pattern: critic + assistant (simple); draft = the assistant's answer
         critic_prompt = "Critique the assistant answer for errors. Then provide a corrected final answer."
-        critic_messages = [{"role": "system", "content": critic_prompt},
-                           {"role": "user", "content": f"Question: {user_text}\n\nAssistant answer:\n{assistant}"}]
-        return ollama_chat(base_url, model, critic_messages, options)
-    return ollama_chat(base_url, model, messages, options)
+        return [{"role": "system", "content": critic_prompt},
+                {"role": "user", "content": f"Question: {user_text}\n\nAssistant answer:\n{draft}"}]
+    return messages
+def _next_stage(stages: Generator[Dict[str, Any], None, List[Dict[str, str]]]) -> Tuple[bool, Any]:
+    # -> (False, stage event) or (True, final messages); StopIteration can't cross asyncio.to_thread
+    try:
+        return False, next(stages)
+    except StopIteration as stop:
+        return True, stop.value
+def run_bot(spec: SpecLike, user_text: str, chat_history: List[Dict[str, str]], rag_context: RagContext = "",
+            cancel: Optional[CancelToken] = None) -> str:
+    # spec: a spec dict or its CompiledBot (bot_schema.compile_spec); invalid specs raise SpecError
+    bot, messages, options = _prepare(spec, user_text, chat_history, rag_context)
+    if bot.framework == "langgraph":
+        result = _run_graph(bot, messages, options, user_text, cancel)   # already prepared: RAG packed once
+        for note in result["warnings"]:
+            warnings.warn(f"{bot.name}: {note}", RuntimeWarning, stacklevel=2)
+        return result["reply"]
+    stages = _early_stages(bot, messages, options, user_text, cancel)
+    finished, final = _next_stage(stages)
+    while not finished:
+        finished, final = _next_stage(stages)
+    return ollama_chat(bot.base_url, bot.model, final, options, cancel)
+def run_bot_stream(spec: SpecLike, user_text: str, chat_history: List[Dict[str, str]], rag_context: RagContext = "",
+                   cancel: Optional[CancelToken] = None) -> Iterator[Dict[str, Any]]:
+    # run_bot as events: token events of the final stage, then {"type": "done", "reply", "stats"}.
+    # Multi-call patterns run their earlier calls first and report each as
+    # {"type": "stage", "stage", "reply"} (langgraph nodes add "ms" and "cached"); only the final stage streams.
+    # {"type": "warning", "text"}: a langgraph tool that is not available was left out
+    bot, messages, options = _prepare(spec, user_text, chat_history, rag_context)
+    final = yield from _early_stages(bot, messages, options, user_text, cancel)
+    yield from ollama_chat_stream(bot.base_url, bot.model, final, options, cancel, bot=bot.name)
+async def arun_bot_stream(spec: SpecLike, user_text: str, chat_history: List[Dict[str, str]],
+                          rag_context: RagContext = "",
+                          cancel: Optional[CancelToken] = None) -> AsyncIterator[Dict[str, Any]]:
+    # Async twin of run_bot_stream (same events)
+    bot, messages, options = await asyncio.to_thread(_prepare, spec, user_text, chat_history, rag_context)
+    stages = _early_stages(bot, messages, options, user_text, cancel)
+    finished, value = await asyncio.to_thread(_next_stage, stages)
+    while not finished:
+        yield value
+        finished, value = await asyncio.to_thread(_next_stage, stages)
+    async for ev in aollama_chat_stream(bot.base_url, bot.model, value, options, cancel, bot=bot.name):
+        yield ev
+async def _run_item(spec: Dict[str, Any], bot: Union[CompiledBot, SpecError], item: Any,
+                    cancel: Optional[CancelToken]) -> Dict[str, Any]:
+    # One (spec, input) of run_bot_many; item = "question" or {"prompt", "id"?, "history"?}
+    if not isinstance(item, dict):
+        item = {"prompt": str(item)}
+    res = {"bot": spec.get("name", ""), "model": spec.get("runtime", {}).get("model", ""), "id": item.get("id", ""),
+           "input": item["prompt"], "reply": "", "ok": False, "error": "", "latency_s": None, "ttft_s": None,
+           "stages": [], "warnings": [], "stats": None}
+    if isinstance(bot, SpecError):
+        res["error"] = f"SpecError: {bot}"
+        return res
+    t0 = time.perf_counter()
+    try:
+        async for ev in arun_bot_stream(bot, item["prompt"], item.get("history") or [], cancel=cancel):
+            if ev["type"] == "token" and res["ttft_s"] is None:
+                res["ttft_s"] = round(time.perf_counter() - t0, 3)
+            elif ev["type"] == "stage":
+                res["stages"].append(ev["stage"])
+            elif ev["type"] == "warning":
+                res["warnings"].append(ev["text"])
+            elif ev["type"] == "done":
+                res.update(reply=ev["reply"], stats=ev["stats"], ok=True)
+    except Exception as e:
+        res["error"] = f"{type(e).__name__}: {e}"
+    res["latency_s"] = round(time.perf_counter() - t0, 3)
+    return res
+async def arun_bot_many(specs: List[Dict[str, Any]], inputs: List[Any], concurrency: int = 4,
+                        cancel: Optional[CancelToken] = None,
+                        on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+    # Every spec x every input over the async client. Requests are grouped by host and (model, num_ctx) and a
+    # host's groups run one after another, so Ollama loads each model once instead of swapping (or reloading
+    # for another num_ctx) between requests; at most `concurrency` requests per host, hosts in parallel.
+    # -> one result per (spec, input), spec-major, with "spec_index" / "input_index", latency and any error;
+    # on_result(position, result) is called as each finishes
+    bots: List[Union[CompiledBot, SpecError]] = []
+    for spec in specs:
+        try:
+            bots.append(compile_spec(spec))
+        except SpecError as e:
+            bots.append(e)
+    jobs = [(i, j) for i in range(len(specs)) for j in range(len(inputs))]
+    results: List[Dict[str, Any]] = [{} for _ in jobs]
+    hosts: Dict[str, Dict[Tuple[str, Any], List[int]]] = {}
+    for k, (i, _) in enumerate(jobs):
+        bot = bots[i]
+        if isinstance(bot, CompiledBot):
+            hosts.setdefault(bot.base_url, {}).setdefault((bot.model, bot.options.get("num_ctx")), []).append(k)
+        else:
+            hosts.setdefault("", {}).setdefault(("", None), []).append(k)
+    async def _one(k: int, sem: asyncio.Semaphore) -> None:
+        i, j = jobs[k]
+        async with sem:
+            res = await _run_item(specs[i], bots[i], inputs[j], cancel)
+        results[k] = {"spec_index": i, "input_index": j, **res}
+        if on_result is not None:
+            on_result(k, results[k])
+    async def _host(groups: Dict[Tuple[str, Any], List[int]]) -> None:
+        sem = asyncio.Semaphore(max(1, concurrency))
+        for ks in groups.values():
+            await asyncio.gather(*(_one(k, sem) for k in ks))
+    await asyncio.gather(*(_host(groups) for groups in hosts.values()))
+    return results
+def run_bot_many(specs: List[Dict[str, Any]], inputs: List[Any], concurrency: int = 4,
+                 cancel: Optional[CancelToken] = None,
+                 on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+    # Bulk evaluation (e.g. grading student specs against one question set); see arun_bot_many
+    return asyncio.run(arun_bot_many(specs, inputs, concurrency, cancel, on_result))
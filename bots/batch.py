@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+batch.py — Non-interactive prompt runs for load tests and Modelfile regressions.
+
+Runs every prompt in a file through one model / bot and writes one JSONL
+result per prompt (reply, token counts, TTFT, latency, decode tokens/sec):
+
+  • independent mode — each prompt is its own conversation; up to
+    ``concurrency`` prompts are in flight at once (load-testing a box)
+  • chain mode       — prompts are one conversation, sent in order, each
+    seeing the earlier turns through the session's ContextWindow
+
+Prompt files:
+    *.txt    one prompt per line; blank lines and lines starting with '#' skipped
+    *.jsonl  {"prompt": "...", "id": "...", "model": "...", "system": "...", "options": {...}}
+             (everything but "prompt" is optional and overrides the session)
+
+Usage:
+    python -m bots.ollama_sandbox --batch prompts.txt --concurrency 4
+    python -m bots.ollama_sandbox --bot it_ticket_bot --batch cases.jsonl --chain --out results.jsonl
+
+From Python:
+    items   = load_prompts("prompts.txt")
+    summary = run_batch(host, items, model, system_prompt, options, out_path, concurrency=4)
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from bots.context_window import ContextWindow
+from bots.ollama_client import get_client
+from bots.telemetry import TurnStats, percentile
+
+
+@dataclass
+class BatchItem:
+    index: int
+    prompt: str
+    id: str = ""
+    model: str = ""
+    system: str = ""
+    options: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class BatchSummary:
+    total: int = 0
+    ok: int = 0
+    wall_s: float = 0.0
+    latency_p50: Optional[float] = None
+    latency_p95: Optional[float] = None
+    ttft_p50: Optional[float] = None
+    eval_tokens: int = 0
+    out_path: Optional[Path] = None
+
+    @property
+    def tokens_per_s(self) -> Optional[float]:
+        """Aggregate generated tokens per wall-clock second across all prompts."""
+        return self.eval_tokens / self.wall_s if self.wall_s else None
+
+
+def load_prompts(path: str) -> List[BatchItem]:
+    """Parse a .txt (one prompt per line) or .jsonl prompt file."""
+    p = Path(path)
+    items: List[BatchItem] = []
+    for line in p.read_text(encoding="utf-8-sig").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if p.suffix.lower() == ".jsonl":
+            obj = json.loads(line)
+            items.append(BatchItem(
+                index=len(items),
+                prompt=str(obj["prompt"]),
+                id=str(obj.get("id", "")),
+                model=obj.get("model", ""),
+                system=obj.get("system", ""),
+                options=dict(obj.get("options") or {}),
+            ))
+        else:
+            items.append(BatchItem(index=len(items), prompt=line))
+    return items
+
+
+def _ask(
+    host: str,
+    model: str,
+    messages: List[Dict[str, str]],
+    options: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Stream one chat (so TTFT is measured) and return reply + TurnStats fields."""
+    parts: List[str] = []
+    final: Optional[Dict[str, Any]] = None
+    t_first: Optional[float] = None
+    error = ""
+    t_start = time.perf_counter()
+    try:
+        for chunk in get_client(host).chat_stream(model, messages, options, timeout=300):
+            token = chunk.get("message", {}).get("content", "")
+            if token:
+                if t_first is None:
+                    t_first = time.perf_counter()
+                parts.append(token)
+            if chunk.get("done"):
+                final = chunk
+    except Exception as exc:
+        error = str(exc)
+    stats = TurnStats.from_response(
+        final, model=model, t_start=t_start, t_end=time.perf_counter(), t_first=t_first, host=host,
+    )
+    return {"reply": "".join(parts), "error": error, "stats": stats}
+
+
+def run_batch(
+    host: str,
+    items: List[BatchItem],
+    model: str,
+    system_prompt: str,
+    options: Dict[str, Any],
+    out_path: Path,
+    concurrency: int = 1,
+    chain: bool = False,
+    window: Optional[ContextWindow] = None,
+    on_result: Optional[Callable[[Dict[str, Any], TurnStats], None]] = None,
+) -> BatchSummary:
+    """
+    Run items and append one JSON line per prompt to out_path as each one
+    finishes (completion order; "index" gives the input position).
+    on_result(record, stats) is called after each line is written, under the
+    same lock: one call at a time, in the order the lines were written.
+    """
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    window  = window or ContextWindow()
+    history: List[Dict[str, str]] = []
+    lock    = threading.Lock()
+    summary = BatchSummary(total=len(items), out_path=out_path)
+    latencies: List[float] = []
+    ttfts: List[float] = []
+
+    def _one(item: BatchItem, f) -> None:
+        item_model  = item.model or model
+        item_system = item.system or system_prompt
+        opts = {**options, **item.options}
+        if chain:
+            msgs, _ = window.build(item_system, history, item.prompt)
+        else:
+            msgs = [{"role": "system", "content": item_system}, {"role": "user", "content": item.prompt}]
+        res = _ask(host, item_model, msgs, opts)
+        st: TurnStats = res["stats"]
+        ok = st.ok and not res["error"]
+        record = {
+            "index": item.index, "id": item.id or str(item.index), "model": item_model,
+            "prompt": item.prompt, "reply": res["reply"], "ok": ok, "error": res["error"],
+            "ttft_s": st.ttft_s, "total_s": st.total_s,
+            "prompt_tokens": st.prompt_tokens, "eval_tokens": st.eval_tokens,
+            "prefill_s": st.prefill_s, "decode_tps": st.decode_tps, "load_s": st.load_s,
+        }
+        with lock:
+            if chain:
+                history.append({"role": "user",      "content": item.prompt})
+                history.append({"role": "assistant", "content": res["reply"]})
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            if ok:
+                summary.ok += 1
+                summary.eval_tokens += st.eval_tokens or 0
+                latencies.append(st.total_s)
+                if st.ttft_s is not None:
+                    ttfts.append(st.ttft_s)
+            if on_result is not None:
+                on_result(record, st)   # progress counters in the callback need no lock of their own
+
+    t0 = time.perf_counter()
+    with out_path.open("w", encoding="utf-8") as f:
+        if chain or concurrency <= 1:
+            for item in items:
+                _one(item, f)
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as pool:
+                for fut in as_completed([pool.submit(_one, item, f) for item in items]):
+                    fut.result()
+    summary.wall_s      = time.perf_counter() - t0
+    summary.latency_p50 = percentile(latencies, 50)
+    summary.latency_p95 = percentile(latencies, 95)
+    summary.ttft_p50    = percentile(ttfts, 50)
+    return summary
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+cancel.py — Cooperative cancellation for in-flight Ollama requests.
+
+Ctrl+C (or a Stop button) used to stop only the reader: the HTTP stream was
+left to the garbage collector, or drained to the end by a worker thread, so
+Ollama kept decoding a reply nobody would read.  A CancelToken is handed to
+the request; cancelling it from any thread shuts the request's socket down,
+which makes Ollama stop generating, and the reader raises Cancelled.
+
+Usage:
+    token = CancelToken()
+    threading.Timer(2.0, token.cancel).start()        # or a Stop button / signal
+    try:
+        for chunk in get_client(host).chat_stream(model, msgs, opts, cancel=token):
+            ...
+    except Cancelled:
+        ...                                             # partial reply: drop or mark it
+
+    release = token.on_cancel(lambda: abort_response(resp))  # runs on the cancelling thread
+    release()                                           # request finished — unregister
+"""
+from __future__ import annotations
+
+import socket
+import threading
+from typing import Any, Callable, List, Optional
+
+
+class Cancelled(Exception):
+    """The request was cancelled through its CancelToken."""
+
+
+class CancelToken:
+    """Thread-safe, one-shot cancellation flag with abort callbacks."""
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], Any]] = []
+        self.reason = ""
+
+    def __repr__(self) -> str:
+        return f"CancelToken(cancelled={self.cancelled}, reason={self.reason!r})"
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """Cancel (idempotent) and run the registered callbacks on this thread."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for cb in callbacks:
+            try:
+                cb()
+            except Exception:
+                pass   # aborting is best effort; the reader still sees the flag
+
+    def on_cancel(self, cb: Callable[[], Any]) -> Callable[[], None]:
+        """Run cb when cancelled (at once if already).  Returns an unregister function."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(cb)
+                return lambda: self._discard(cb)
+        cb()
+        return lambda: None
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise Cancelled(self.reason)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until cancelled or timeout; True if cancelled."""
+        return self._event.wait(timeout)
+
+    def child(self) -> "CancelToken":
+        """A token cancelled with this one that can also be cancelled on its own."""
+        token = CancelToken()
+        release = self.on_cancel(lambda: token.cancel(self.reason))
+        token.on_cancel(release)
+        return token
+
+    def _discard(self, cb: Callable[[], Any]) -> None:
+        with self._lock:
+            try:
+                self._callbacks.remove(cb)
+            except ValueError:
+                pass
+
+
+def abort_response(resp: Any) -> None:
+    """
+    Shut a streaming requests.Response's socket down from another thread.
+
+    close() alone is not enough: the reader may be blocked in recv(), and a
+    closed-but-not-shut-down socket does not wake it.  shutdown() unblocks the
+    reader and sends FIN, so the server sees the client go away; the reader's
+    own ``with`` block closes the response afterwards.
+    """
+    raw = getattr(resp, "raw", None)
+    conn = getattr(raw, "_connection", None)
+    sock = getattr(conn, "sock", None)
+    if sock is None:   # urllib3 may have handed the connection back already
+        try:
+            sock = raw._fp.fp.raw._sock
+        except AttributeError:
+            sock = None
+    if sock is None:
+        try:
+            resp.close()
+        except Exception:
+            pass
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
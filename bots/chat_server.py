@@ -0,0 +1,727 @@
+# -*- coding: utf-8 -*-
+"""
+chat_server.py — Multi-user, IRC-style chat server for the sandbox.
+
+In a lab every student ran their own ollama_sandbox process against the one
+Ollama box: 30 connection pools, 30 sets of keep-alive timers, and models
+loaded and evicted over and over as students picked different bots.  With
+--serve one process owns the Ollama side and the sandboxes connect to it as
+IRC-style users:
+
+  • one channel per registered bot (#it_ticket_bot, …) plus #hub for the
+    default assistant; everyone in a channel sees every line, and the bot's
+    reply is streamed token by token to all members
+  • one pooled Ollama client, one ResidencyManager and one keep_alive policy
+    for the whole lab; joining a channel preloads its model
+  • lines that arrive while the channel's bot is still answering (or while
+    its request is queued) are batched into its next request, so a burst of
+    messages from ten seats costs one generation, not ten
+  • a scheduler runs at most --parallel requests at once (match Ollama's
+    OLLAMA_NUM_PARALLEL) and keeps requests for one model together: a model
+    that is already generating goes first, then the last model served, so
+    Ollama is not made to swap models between turns (a request waiting
+    longer than STARVE_S jumps the queue)
+  • /stop cancels the channel's reply for everyone (bots.cancel)
+
+Protocol: newline-delimited JSON over plain TCP, one object per line with a
+"type" (stdlib only; put a WebSocket proxy in front for browsers).
+  client → server  hello {nick} · join / part / names / stop {channel}
+                   say {channel, text} · list · status
+  server → client  welcome · joined · join · part · say · reply_start ·
+                   token · reply_end · names · list · status · error
+
+Usage:
+    python -m bots.ollama_sandbox --serve                        # 0.0.0.0:6680
+    python -m bots.ollama_sandbox --connect labbox --bot it_ticket_bot --nick alice
+    python -m bots.chat_server --listen 0.0.0.0:6680 --ollama http://localhost:11434
+
+From Python:
+    srv = ChatServer("http://localhost:11434")
+    await srv.start("127.0.0.1", 0)                 # srv.port is the bound port
+    client = ChatClient(f"127.0.0.1:{srv.port}", "alice")
+
+Environment overrides:
+    CITL_CHAT_PORT      — port for --serve / --connect (default: 6680)
+    CITL_CHAT_PARALLEL  — Ollama requests in flight at once (default: 4)
+    CITL_CHAT_HISTORY   — channel lines replayed to a user who joins (default: 20)
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import threading
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from bots.cancel import CancelToken, Cancelled
+from bots.context_window import ContextWindow
+from bots.fanout import PALETTE, FanoutTarget, resolve_targets
+from bots.ollama_client import get_client
+from bots.options_profile import MAX_NUM_CTX, profile_options
+from bots.residency import get_residency
+from bots.telemetry import TelemetryLog, TurnStats
+
+DEFAULT_PORT     = int(os.environ.get("CITL_CHAT_PORT", "6680"))
+DEFAULT_PARALLEL = int(os.environ.get("CITL_CHAT_PARALLEL", "4"))
+HISTORY_LINES    = int(os.environ.get("CITL_CHAT_HISTORY", "20"))
+LOBBY            = "#hub"
+MAX_HISTORY      = 400     # messages kept per channel (the context window trims what is sent)
+MAX_LINE         = 4000    # characters per say
+SEND_QUEUE       = 4096    # events buffered per user before a stalled client is dropped
+STARVE_S         = 10.0    # a request queued this long is served next, whatever its model
+SHARED_NOTE      = (
+    "Several people share this conversation. Each user message starts with the "
+    "sender's nick and a colon; answer all of them in one reply."
+)
+
+
+def parse_addr(spec: str, default_host: str = "127.0.0.1") -> Tuple[str, int]:
+    """"host:port", "host", ":port" or "port" → (host, port)."""
+    spec = (spec or "").strip()
+    if spec.isdigit():
+        return default_host, int(spec)
+    host, sep, port = spec.rpartition(":")
+    if not sep:
+        return spec or default_host, DEFAULT_PORT
+    return host or default_host, int(port) if port else DEFAULT_PORT
+
+
+def encode(obj: Dict[str, Any]) -> bytes:
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def nick_color(nick: str) -> str:
+    return PALETTE[zlib.crc32(nick.encode("utf-8")) % len(PALETTE)]
+
+
+# ── Server state ──────────────────────────────────────────────────────────────
+
+@dataclass
+class Channel:
+    name: str
+    target: FanoutTarget
+    members: Set[str] = field(default_factory=set)
+    history: List[Dict[str, str]] = field(default_factory=list)
+    answered: int = 0                        # history[:answered] already has its reply
+    job: Optional["Job"] = None              # reply queued or in progress
+    lines: Deque[Dict[str, Any]] = field(default_factory=lambda: deque(maxlen=HISTORY_LINES))
+    window: ContextWindow = field(default_factory=ContextWindow)
+
+    def info(self) -> Dict[str, Any]:
+        return {"channel": self.name, "label": self.target.label, "model": self.target.model,
+                "color": self.target.color, "members": len(self.members)}
+
+
+@dataclass
+class Job:
+    id: int
+    channel: Channel
+    cancel: CancelToken = field(default_factory=CancelToken)
+    queued_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def model(self) -> str:
+        return self.channel.target.model
+
+
+class Member:
+    """One connected user: a nick and a bounded outgoing event queue."""
+
+    def __init__(self, nick: str, writer: asyncio.StreamWriter):
+        self.nick     = nick
+        self.writer   = writer
+        self.channels: Set[str] = set()
+        self.queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(SEND_QUEUE)
+        self.task = asyncio.create_task(self._pump())
+
+    def send(self, obj: Dict[str, Any]) -> bool:
+        """Queue an event; False if the client has stopped reading."""
+        try:
+            self.queue.put_nowait(obj)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def close(self) -> None:
+        self.task.cancel()
+        self.writer.close()
+
+    async def _pump(self) -> None:
+        try:
+            while True:
+                obj = await self.queue.get()
+                self.writer.write(encode(obj))
+                await self.writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+
+def _report_crash(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        print(f"chat server: {task.get_name()} failed: {task.exception()!r}")
+
+
+class ModelScheduler:
+    """Runs queued jobs, at most `parallel` at a time, keeping one model's requests together."""
+
+    def __init__(self, parallel: int, run: Callable[[Job], Any]):
+        self.parallel = max(1, int(parallel))
+        self.run      = run
+        self.queues: Dict[str, Deque[Job]] = {}
+        self.running: Dict[str, int] = {}
+        self.last_model: Optional[str] = None
+        self._wake = asyncio.Event()
+        self._tasks: Set[asyncio.Task] = set()   # asyncio only keeps weak references to tasks
+
+    def spawn(self, coro: Any, name: str) -> asyncio.Task:
+        """create_task, kept referenced until it is done; a crash is reported, not lost."""
+        task = asyncio.create_task(coro, name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(_report_crash)
+        return task
+
+    def close(self) -> None:
+        """Cancel the loop and every running job."""
+        for task in list(self._tasks):
+            task.cancel()
+
+    def submit(self, job: Job) -> None:
+        self.queues.setdefault(job.model, deque()).append(job)
+        self._wake.set()
+
+    def drop(self, job: Job) -> bool:
+        """Remove a job that has not started. False if it is already running."""
+        q = self.queues.get(job.model)
+        if q is not None and job in q:
+            q.remove(job)
+            return True
+        return False
+
+    def pending(self) -> Dict[str, int]:
+        return {m: len(q) for m, q in self.queues.items() if q}
+
+    def pick(self) -> Optional[Job]:
+        if sum(self.running.values()) >= self.parallel:
+            return None
+        ready = [m for m, q in self.queues.items() if q]
+        if not ready:
+            return None
+        now = time.monotonic()
+
+        def rank(m: str):
+            head = self.queues[m][0]
+            return (
+                now - head.queued_at < STARVE_S,   # starving requests first
+                self.running.get(m, 0) == 0,       # then models already generating
+                m != self.last_model,              # then the model served last (still loaded)
+                -len(self.queues[m]),              # then the longest queue
+                head.queued_at,
+            )
+
+        model = min(ready, key=rank)
+        self.last_model = model
+        return self.queues[model].popleft()
+
+    async def loop(self) -> None:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            job = self.pick()
+            while job is not None:
+                self.running[job.model] = self.running.get(job.model, 0) + 1
+                self.spawn(self._run(job), name=f"job {job.model}")
+                job = self.pick()
+
+    async def _run(self, job: Job) -> None:
+        try:
+            await self.run(job)
+        finally:
+            self.running[job.model] -= 1
+            self._wake.set()
+
+
+# ── Server ────────────────────────────────────────────────────────────────────
+
+class ChatServer:
+    """Channels, members and the shared Ollama side of a --serve process."""
+
+    def __init__(
+        self,
+        ollama_host: str,
+        options: Optional[Dict[str, Any]] = None,
+        default_model: str = "hub-assistant",
+        default_system: str = "You are a concise, helpful AI tutor.",
+        parallel: int = DEFAULT_PARALLEL,
+        telemetry: Optional[TelemetryLog] = None,
+    ):
+        self.host      = ollama_host
+        self.options   = dict(options or {})
+        self.parallel  = parallel
+        self.telemetry = telemetry
+        self.channels: Dict[str, Channel] = {}
+        self.members: Dict[str, Member] = {}
+        self.counts = {"messages": 0, "requests": 0, "batched": 0, "cancelled": 0, "errors": 0}
+        self.port = 0
+        self._ids = itertools.count(1)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.scheduler: Optional[ModelScheduler] = None
+        self._add_channels(default_model, default_system)
+
+    def _add_channels(self, default_model: str, default_system: str) -> None:
+        self.channels[LOBBY] = Channel(LOBBY, FanoutTarget("Hub Assistant", default_model, PALETTE[0], default_system))
+        try:
+            from bots.registry import get_registry
+            bot_ids = list(get_registry())
+        except Exception:
+            bot_ids = []
+        for bot_id, target in zip(bot_ids, resolve_targets(",".join(bot_ids), default_system, default_model)):
+            self.channels[f"#{bot_id}"] = Channel(f"#{bot_id}", target)
+
+    @property
+    def residency(self):
+        return get_residency(self.host)
+
+    async def start(self, listen_host: str = "0.0.0.0", port: int = DEFAULT_PORT) -> None:
+        self.scheduler = ModelScheduler(self.parallel, self._reply)
+        self.scheduler.spawn(self.scheduler.loop(), name="scheduler")
+        self._server = await asyncio.start_server(self._handle, listen_host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        assert self._server is not None
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        if self.scheduler is not None:
+            self.scheduler.close()
+        for m in list(self.members.values()):
+            m.close()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            **self.counts,
+            "users": len(self.members),
+            "queued": self.scheduler.pending() if self.scheduler else {},
+            "running": {m: n for m, n in (self.scheduler.running.items() if self.scheduler else []) if n},
+            "channels": [c.info() for c in self.channels.values() if c.members],
+        }
+
+    # ── connections ───────────────────────────────────────────────────────────
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        member: Optional[Member] = None
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                try:
+                    msg = json.loads(raw)
+                except ValueError:
+                    continue
+                if not isinstance(msg, dict):
+                    continue
+                if member is None:
+                    if msg.get("type") == "hello":
+                        member = self._register(str(msg.get("nick") or "guest"), writer)
+                    else:
+                        writer.write(encode({"type": "error", "text": "send hello {nick} first"}))
+                    continue
+                self._dispatch(member, msg)
+        except (ConnectionError, ValueError):   # reset, or a line over the stream limit
+            pass
+        finally:
+            if member is not None:
+                self._unregister(member)
+            writer.close()
+
+    def _register(self, nick: str, writer: asyncio.StreamWriter) -> Member:
+        base = "".join(c for c in nick if c.isalnum() or c in "-_")[:24] or "guest"
+        nick, n = base, 1
+        while nick in self.members:
+            n += 1
+            nick = f"{base}{n}"
+        member = self.members[nick] = Member(nick, writer)
+        member.send({"type": "welcome", "nick": nick, "channels": [c.info() for c in self.channels.values()]})
+        return member
+
+    def _unregister(self, member: Member) -> None:
+        for name in list(member.channels):
+            self._part(member, self.channels[name])
+        if self.members.get(member.nick) is member:
+            del self.members[member.nick]
+        member.close()
+
+    def _broadcast(self, ch: Channel, event: Dict[str, Any], skip: Optional[str] = None) -> None:
+        for nick in list(ch.members):
+            m = self.members.get(nick)
+            if m is not None and nick != skip and not m.send(event):
+                self._unregister(m)   # stalled client — drop it rather than buffer forever
+
+    # ── commands ──────────────────────────────────────────────────────────────
+
+    def _dispatch(self, member: Member, msg: Dict[str, Any]) -> None:
+        kind = msg.get("type")
+        if kind == "list":
+            member.send({"type": "list", "channels": [c.info() for c in self.channels.values()]})
+            return
+        if kind == "status":
+            member.send({"type": "status", **self.status()})
+            return
+        ch = self.channels.get(str(msg.get("channel") or ""))
+        if ch is None:
+            member.send({"type": "error", "text": f"no such channel: {msg.get('channel')!r} (try list)"})
+            return
+        if kind == "join":
+            self._join(member, ch)
+        elif kind == "part":
+            self._part(member, ch)
+        elif kind == "names":
+            member.send({"type": "names", "channel": ch.name, "members": sorted(ch.members)})
+        elif kind == "say":
+            self._say(member, ch, str(msg.get("text") or ""))
+        elif kind == "stop":
+            self._stop(member, ch)
+        else:
+            member.send({"type": "error", "text": f"unknown type {kind!r}"})
+
+    def _join(self, member: Member, ch: Channel) -> None:
+        if ch.name in member.channels:
+            return
+        member.channels.add(ch.name)
+        ch.members.add(member.nick)
+        member.send({"type": "joined", **ch.info(), "members": sorted(ch.members), "history": list(ch.lines)})
+        self._broadcast(ch, {"type": "join", "channel": ch.name, "nick": member.nick}, skip=member.nick)
+        # first line in the channel skips the cold load (profiling may probe the host: off the loop)
+        asyncio.get_running_loop().run_in_executor(None, self._preload, ch.target.model)
+
+    def _options_for(self, model: str) -> Dict[str, Any]:
+        """Options every request for model sends: machine profile underneath, server options on top."""
+        opts = profile_options(model, self.host)
+        opts.update(self.options)
+        return opts
+
+    def _preload(self, model: str) -> None:
+        self.residency.preload(model, self._options_for(model))
+
+    def _part(self, member: Member, ch: Channel) -> None:
+        member.channels.discard(ch.name)
+        if member.nick in ch.members:
+            ch.members.discard(member.nick)
+            self._broadcast(ch, {"type": "part", "channel": ch.name, "nick": member.nick})
+
+    def _say(self, member: Member, ch: Channel, text: str) -> None:
+        text = text.strip()[:MAX_LINE]
+        if not text:
+            return
+        if ch.name not in member.channels:
+            member.send({"type": "error", "text": f"join {ch.name} first"})
+            return
+        self.counts["messages"] += 1
+        ch.history.append({"role": "user", "content": f"{member.nick}: {text}"})
+        event = {"type": "say", "channel": ch.name, "nick": member.nick, "text": text}
+        ch.lines.append(event)
+        self._broadcast(ch, event)
+        self._schedule(ch)
+
+    def _stop(self, member: Member, ch: Channel) -> None:
+        job = ch.job
+        if job is None:
+            return
+        job.cancel.cancel(f"stopped by {member.nick}")
+        if self.scheduler is not None and self.scheduler.drop(job):
+            ch.job = None   # never started; its lines wait for the next message
+
+    # ── replies ───────────────────────────────────────────────────────────────
+
+    def _schedule(self, ch: Channel) -> None:
+        """Queue a reply unless one is queued or running (it will pick these lines up)."""
+        if ch.job is None and len(ch.history) > ch.answered and self.scheduler is not None:
+            ch.job = Job(next(self._ids), ch)
+            self.scheduler.submit(ch.job)
+
+    async def _reply(self, job: Job) -> None:
+        try:
+            await self._generate(job)
+        finally:
+            ch = job.channel
+            if ch.job is job:
+                ch.job = None
+            self._schedule(ch)   # lines said during the reply get the next one
+
+    async def _generate(self, job: Job) -> None:
+        ch, t = job.channel, job.channel.target
+        upto = len(ch.history)
+        pending = ch.history[ch.answered:upto]
+        self.counts["requests"] += 1
+        self.counts["batched"] += max(0, len(pending) - 1)
+        opts = await asyncio.to_thread(self._options_for, t.model)
+        ch.window.budget = int(opts.get("num_ctx", MAX_NUM_CTX)) - int(opts.get("num_predict", 1024))
+        msgs, _ = ch.window.build(
+            f"{t.system_prompt}\n\n{SHARED_NOTE}",
+            ch.history[:ch.answered],
+            "\n".join(m["content"] for m in pending),
+        )
+        start = {"type": "reply_start", "channel": ch.name, "id": job.id, "label": t.label,
+                 "color": t.color, "model": t.model, "batched": len(pending)}
+        self._broadcast(ch, start)
+
+        parts: List[str] = []
+        final: Optional[Dict[str, Any]] = None
+        t_first: Optional[float] = None
+        error, cancelled = "", False
+        t_start = time.perf_counter()
+        try:
+            async for chunk in get_client(self.host).achat_stream(
+                t.model, msgs, opts, timeout=300, cancel=job.cancel,
+                keep_alive=self.residency.keep_alive(t.model),
+            ):
+                token = (chunk.get("message") or {}).get("content", "")
+                if token:
+                    if t_first is None:
+                        t_first = time.perf_counter()
+                    parts.append(token)
+                    self._broadcast(ch, {"type": "token", "channel": ch.name, "id": job.id, "text": token})
+                if chunk.get("done"):
+                    final = chunk
+        except Cancelled:
+            cancelled = True
+            self.counts["cancelled"] += 1
+        except Exception as exc:
+            error = str(exc) or type(exc).__name__
+            self.counts["errors"] += 1
+
+        reply = "".join(parts)
+        if reply and not cancelled and not error:
+            # the reply answers history[:upto]; lines said meanwhile stay pending after it
+            ch.history.insert(upto, {"role": "assistant", "content": reply})
+            upto += 1
+        ch.answered = upto
+        if len(ch.history) > MAX_HISTORY:
+            cut = len(ch.history) - MAX_HISTORY
+            del ch.history[:cut]
+            ch.answered = max(0, ch.answered - cut)
+            ch.window.reset()
+
+        stats = TurnStats.from_response(
+            final, model=t.model, t_start=t_start, t_end=time.perf_counter(),
+            t_first=t_first, host=self.host, bot=t.label, stream=True,
+        )
+        if self.telemetry is not None:
+            self.telemetry.record(stats)
+        self.residency.note_use(t.model, opts)
+        end = {"type": "reply_end", "channel": ch.name, "id": job.id, "label": t.label, "color": t.color,
+               "text": reply, "error": error, "cancelled": cancelled,
+               "ttft_s": stats.ttft_s, "decode_tps": stats.decode_tps}
+        ch.lines.append(end)
+        self._broadcast(ch, end)
+
+
+async def _serve(server: ChatServer, listen: str, on_ready: Optional[Callable[[ChatServer], None]]) -> None:
+    host, port = parse_addr(listen, default_host="0.0.0.0")
+    await server.start(host, port)
+    if on_ready is not None:
+        on_ready(server)
+    await server.serve_forever()
+
+
+def serve(
+    ollama_host: str,
+    listen: str = f"0.0.0.0:{DEFAULT_PORT}",
+    on_ready: Optional[Callable[[ChatServer], None]] = None,
+    **kwargs: Any,
+) -> int:
+    """Run a ChatServer until Ctrl+C. kwargs go to ChatServer. Returns an exit code."""
+    server = ChatServer(ollama_host, **kwargs)
+    try:
+        asyncio.run(_serve(server, listen, on_ready))
+    except KeyboardInterrupt:
+        pass
+    except OSError as exc:   # port in use, bad address
+        print(f"chat server: {exc}")
+        return 1
+    return 0
+
+
+# ── Client ────────────────────────────────────────────────────────────────────
+
+class ChatClient:
+    """Blocking client: send() from any thread, events() on a reader thread."""
+
+    def __init__(self, addr: str, nick: str, timeout: float = 5.0):
+        host, port = parse_addr(addr)
+        self.addr = f"{host}:{port}"
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.settimeout(None)
+        self._rfile = self.sock.makefile("r", encoding="utf-8", newline="\n")
+        self._wlock = threading.Lock()
+        self.send({"type": "hello", "nick": nick})
+
+    def send(self, obj: Dict[str, Any]) -> None:
+        with self._wlock:
+            self.sock.sendall(encode(obj))
+
+    def events(self) -> Iterator[Dict[str, Any]]:
+        """Server events until the connection closes."""
+        try:
+            for line in self._rfile:
+                if line.strip():
+                    yield json.loads(line)
+        except (OSError, ValueError):
+            return
+
+    def close(self) -> None:
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+CLIENT_HELP = [
+    ("/join #channel", "Switch channel (/list shows them)"),
+    ("/list",          "Channels, their bots and models"),
+    ("/names",         "Who is in this channel"),
+    ("/stop",          "Stop the bot's reply (for everyone)"),
+    ("/status",        "Server queue and request counts"),
+    ("/quit",          "Disconnect"),
+]
+
+
+def run_client(addr: str, nick: str, channel: str, console: Any) -> int:
+    """Interactive client for --connect; console is a rich Console. Returns an exit code."""
+    from rich.markup import escape
+    from rich.text import Text
+
+    try:
+        client = ChatClient(addr, nick)
+    except OSError as exc:
+        console.print(f"[bright_red]Cannot reach chat server {escape(addr)}: {escape(str(exc))}[/bright_red]")
+        return 1
+    state = {"nick": nick, "channel": channel}
+    gone = threading.Event()
+
+    def _line(event: Dict[str, Any]) -> None:
+        if event["type"] == "say":
+            c = nick_color(event["nick"])
+            console.print(f"[{c}]  <{escape(event['nick'])}>[/{c}] {escape(event['text'])}")
+        elif event["type"] == "reply_end":
+            c = event["color"]
+            note = " [dim](stopped)[/dim]" if event.get("cancelled") else ""
+            console.print(f"[{c}]  {escape(event['label'])} ▸[/{c}] {escape(event['text'])}{note}")
+
+    def _render(event: Dict[str, Any]) -> None:
+        kind = event.get("type")
+        if kind == "welcome":
+            state["nick"] = event["nick"]
+            console.print(f"[dim]  Connected to {client.addr} as {escape(event['nick'])} — /help for commands[/dim]")
+        elif kind == "joined":
+            console.print(f"[{event['color']}]  ── {event['channel']} · {escape(event['label'])} "
+                          f"({escape(event['model'])}) · {len(event['members'])} here ──[/{event['color']}]")
+            for old in event.get("history") or []:
+                _line(old)
+        elif kind in ("join", "part"):
+            verb = "joined" if kind == "join" else "left"
+            console.print(f"[dim]  * {escape(event['nick'])} {verb} {event['channel']}[/dim]")
+        elif kind == "say" and event["nick"] != state["nick"]:
+            _line(event)
+        elif kind == "reply_start":
+            batched = f" [dim](answering {event['batched']} lines)[/dim]" if event.get("batched", 1) > 1 else ""
+            console.print(f"[{event['color']}]  {escape(event['label'])} ▸[/{event['color']}]{batched} ", end="")
+        elif kind == "token":
+            console.print(Text(event["text"]), end="")
+        elif kind == "reply_end":
+            if event.get("cancelled"):
+                console.print(" [dim](stopped)[/dim]", end="")
+            if event.get("error"):
+                console.print(f"\n[bright_red]  !! {escape(event['error'])}[/bright_red]", end="")
+            console.print()
+        elif kind == "names":
+            console.print(f"[dim]  {event['channel']}: {escape(', '.join(event['members']))}[/dim]")
+        elif kind == "list":
+            for c in event["channels"]:
+                console.print(f"[{c['color']}]  {c['channel']:<22}[/{c['color']}] [dim]{escape(c['label'])} · "
+                              f"{escape(c['model'])} · {c['members']} here[/dim]")
+        elif kind == "status":
+            console.print(f"[dim]  {event['users']} users · {event['messages']} lines → {event['requests']} "
+                          f"requests ({event['batched']} batched) · queued {event['queued'] or '—'} · "
+                          f"running {event['running'] or '—'}[/dim]")
+        elif kind == "error":
+            console.print(f"[bright_red]  {escape(event.get('text', ''))}[/bright_red]")
+
+    def _reader() -> None:
+        for event in client.events():
+            _render(event)
+        gone.set()
+        console.print("\n[dim]  Disconnected from the chat server.[/dim]")
+
+    client.send({"type": "join", "channel": channel})   # before any line the user types
+    threading.Thread(target=_reader, name="chat-reader", daemon=True).start()
+    try:
+        while not gone.is_set():
+            line = input().strip()
+            if gone.is_set():
+                break
+            if not line:
+                continue
+            cmd, _, rest = line.partition(" ")
+            cmd, rest = cmd.lower(), rest.strip()
+            if cmd in ("/quit", "/exit"):
+                break
+            if cmd == "/help":
+                for c, d in CLIENT_HELP:
+                    console.print(f"[bright_magenta]  {c:<16}[/bright_magenta] [dim]{d}[/dim]")
+            elif cmd == "/join" and rest:
+                target = rest if rest.startswith("#") else f"#{rest}"
+                client.send({"type": "part", "channel": state["channel"]})
+                state["channel"] = target
+                client.send({"type": "join", "channel": target})
+            elif cmd in ("/names", "/stop"):
+                client.send({"type": cmd[1:], "channel": state["channel"]})
+            elif cmd in ("/list", "/status"):
+                client.send({"type": cmd[1:]})
+            elif cmd.startswith("/"):
+                console.print(f"[dim]  Unknown command {escape(cmd)} — /help[/dim]")
+            else:
+                client.send({"type": "say", "channel": state["channel"], "text": line})
+    except (EOFError, KeyboardInterrupt):
+        pass
+    except OSError as exc:
+        console.print(f"[bright_red]  Connection lost: {escape(str(exc))}[/bright_red]")
+    client.close()
+    return 0
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Multi-user IRC-style chat server for the Ollama sandbox")
+    ap.add_argument("--listen", default=f"0.0.0.0:{DEFAULT_PORT}", help="address to listen on (host:port)")
+    ap.add_argument("--ollama", default=os.environ.get("OLLAMA_HOST") or "http://localhost:11434",
+                    help="Ollama host URL (comma-separate several to load-balance)")
+    ap.add_argument("--model", default=os.environ.get("OLLAMA_MODEL", "hub-assistant"), help=f"model for {LOBBY}")
+    ap.add_argument("--parallel", type=int, default=DEFAULT_PARALLEL,
+                    help="Ollama requests in flight at once (match OLLAMA_NUM_PARALLEL)")
+    args = ap.parse_args()
+
+    def _ready(srv: ChatServer) -> None:
+        print(f"Chat server on {args.listen.rsplit(':', 1)[0]}:{srv.port} — {len(srv.channels)} channels,"
+              f" Ollama {srv.host}, {srv.parallel} in flight. Ctrl+C stops.")
+
+    return serve(args.ollama, args.listen, on_ready=_ready, default_model=args.model,
+                 parallel=args.parallel, telemetry=TelemetryLog())
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
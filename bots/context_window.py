@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+context_window.py — Token-budgeted conversation window for chat sessions.
+
+Sending the whole history every turn makes prefill time grow with the
+conversation until it overflows num_ctx.  ContextWindow keeps the payload
+under a token budget instead:
+
+  • the system prompt is always sent
+  • the last ``keep_last`` exchanges (user + assistant) are always sent
+  • older exchanges are added newest-first while they still fit
+  • dropped exchanges can be folded into a rolling summary message
+
+Token counts are cached per message, so each message is counted once no
+matter how many turns it stays in the window.  Counting uses tiktoken when
+installed, otherwise a ~4 chars/token estimate (Ollama does not expose its
+tokenizer, so both are approximations).
+
+Usage:
+    win = ContextWindow(budget=7168, keep_last=2, summarize=True)
+    msgs, usage = win.build(system_prompt, history, user_text)
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+Message = Dict[str, str]
+
+MESSAGE_OVERHEAD = 4      # role + separators per chat message (approximate)
+SUMMARY_HEADER   = "Summary of earlier conversation (older turns were trimmed):"
+COUNT_CACHE      = 2048   # per-window message token counts kept (least recently used dropped)
+
+try:  # optional — a closer estimate than chars/4 when available
+    import tiktoken  # type: ignore
+    _ENC = tiktoken.get_encoding("cl100k_base")
+except Exception:  # pragma: no cover - depends on environment
+    _ENC = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count for text."""
+    if not text:
+        return 0
+    if _ENC is not None:
+        return len(_ENC.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def extractive_summary(dropped: List[Message], width: int = 120) -> str:
+    """Cheap summarizer: one clipped line per dropped message, no model call."""
+    lines = []
+    for m in dropped:
+        text = " ".join((m.get("content") or "").split())
+        if len(text) > width:
+            text = text[: width - 1] + "…"
+        lines.append(f"- {m.get('role', 'user')}: {text}")
+    return "\n".join(lines)
+
+
+@dataclass
+class WindowUsage:
+    budget: int
+    total: int = 0              # tokens in the payload that will be sent
+    system: int = 0
+    history: int = 0
+    user: int = 0
+    summary: int = 0
+    kept_turns: int = 0
+    dropped_turns: int = 0
+
+    @property
+    def pct(self) -> float:
+        return 100.0 * self.total / self.budget if self.budget else 0.0
+
+
+class ContextWindow:
+    """Builds each turn's message list under a token budget."""
+
+    def __init__(
+        self,
+        budget: int = 7168,
+        keep_last: int = 2,
+        summarize: bool = False,
+        summary_budget: int = 256,
+        summarizer: Optional[Callable[[List[Message]], str]] = None,
+        counter: Callable[[str], int] = estimate_tokens,
+    ):
+        self.budget         = int(budget)
+        self.keep_last      = max(0, int(keep_last))
+        self.summarize      = summarize
+        self.summary_budget = int(summary_budget)
+        self.summarizer     = summarizer or extractive_summary
+        self.counter        = counter
+        # (role, len, hash) of a message -> its tokens; keyed by hash so old texts are not kept alive
+        self._counts: "OrderedDict[Tuple[str, int, int], int]" = OrderedDict()
+        # rolling summary state: (number of messages folded in, summary text)
+        self._summary: Tuple[int, str] = (0, "")
+        self._summary_anchor: Optional[int] = None   # id() of history[0] it was built from
+        self.last_usage = WindowUsage(budget=self.budget)
+
+    # ── counting ──────────────────────────────────────────────────────────────
+
+    def count(self, msg: Message) -> int:
+        text = msg.get("content", "")
+        key = (msg.get("role", ""), len(text), hash(text))
+        n = self._counts.get(key)
+        if n is None:
+            n = self.counter(text) + MESSAGE_OVERHEAD
+            self._counts[key] = n
+            if len(self._counts) > COUNT_CACHE:
+                self._counts.popitem(last=False)
+        else:
+            self._counts.move_to_end(key)
+        return n
+
+    def reset(self) -> None:
+        """Forget the rolling summary and counts (call when history is cleared or replaced)."""
+        self._summary = (0, "")
+        self._summary_anchor = None
+        self._counts.clear()
+
+    # ── building ──────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _exchanges(history: List[Message]) -> List[List[Message]]:
+        """Group history into exchanges, each starting at a user message."""
+        groups: List[List[Message]] = []
+        for m in history:
+            if m.get("role") == "user" or not groups:
+                groups.append([m])
+            else:
+                groups[-1].append(m)
+        return groups
+
+    @property
+    def _summary_cap(self) -> int:
+        return min(self.summary_budget, self.budget // 4)
+
+    def _rolling_summary(self, history: List[Message], n_dropped: int) -> str:
+        done, text = self._summary
+        anchor = id(history[0]) if history else None
+        if anchor != self._summary_anchor or n_dropped < done:
+            done, text = 0, ""            # history was replaced — start over
+        if n_dropped > done:
+            addition = self.summarizer(history[done:n_dropped])
+            text = f"{text}\n{addition}" if text else addition
+            # keep the newest lines when the summary outgrows its budget
+            lines = text.splitlines()
+            while len(lines) > 1 and self.counter("\n".join(lines)) > self._summary_cap:
+                lines.pop(0)
+            text = "\n".join(lines)
+        self._summary = (n_dropped, text)
+        self._summary_anchor = anchor
+        return text
+
+    def build(
+        self,
+        system_prompt: str,
+        history: List[Message],
+        user_text: str,
+    ) -> Tuple[List[Message], WindowUsage]:
+        """Return (messages to send, usage) for this turn."""
+        system_msg = {"role": "system", "content": system_prompt}
+        user_msg   = {"role": "user", "content": user_text}
+        usage = WindowUsage(budget=self.budget)
+        usage.system = self.count(system_msg)
+        usage.user   = self.counter(user_text) + MESSAGE_OVERHEAD
+
+        groups = self._exchanges(history)
+        costs  = [sum(self.count(m) for m in g) for g in groups]
+        remaining = self.budget - usage.system - usage.user
+        if self.summarize:
+            remaining -= self._summary_cap + MESSAGE_OVERHEAD
+
+        kept = 0
+        for i in range(len(groups) - 1, -1, -1):
+            pinned = kept < self.keep_last
+            if not pinned and costs[i] > remaining:
+                break
+            remaining -= costs[i]
+            kept += 1
+        first_kept = len(groups) - kept
+
+        msgs: List[Message] = [system_msg]
+        n_dropped = sum(len(g) for g in groups[:first_kept])
+        if self.summarize and n_dropped:
+            summary = self._rolling_summary(history, n_dropped)
+            if summary:
+                smsg = {"role": "system", "content": f"{SUMMARY_HEADER}\n{summary}"}
+                usage.summary = self.count(smsg)
+                msgs.append(smsg)
+        for g in groups[first_kept:]:
+            msgs.extend(g)
+        msgs.append(user_msg)
+
+        usage.history       = sum(costs[first_kept:])
+        usage.kept_turns    = kept
+        usage.dropped_turns = first_kept
+        usage.total         = usage.system + usage.summary + usage.history + usage.user
+        self.last_usage = usage
+        return msgs, usage
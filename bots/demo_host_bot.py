@@ -15,12 +15,11 @@ import os, json, textwrap
 from typing import Any, Dict
 
 def _ollama_generate(prompt: str, model: str | None = None, host: str | None = None) -> str:
-    import requests
+    from bots.ollama_client import get_client
     host = (host or os.environ.get("OLLAMA_HOST","http://127.0.0.1:11434")).rstrip("/")
     model = model or os.environ.get("OLLAMA_MODEL","mistral:7b-instruct")
-    r = requests.post(f"{host}/api/generate", json={"model": model, "prompt": prompt, "stream": False}, timeout=60)
-    r.raise_for_status()
-    return (r.json().get("response") or "").strip()
+    data = get_client(host).generate(model, prompt, timeout=60)
+    return (data.get("response") or "").strip()
 
 def run(message: str = "") -> Dict[str, Any]:
     msg = (message or "").strip()
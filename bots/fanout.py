@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+fanout.py — Send one prompt to several models / bots at once, IRC-style.
+
+Comparing models one run after another costs the sum of every run.  fanout()
+streams the same message to each target on its own worker (bounded by
+concurrency) against the shared pooled client, so the whole comparison takes
+about as long as the slowest single run.
+
+Streams are interleaved a line at a time, each line prefixed with the
+target's label and drawn in its color, like nicks in an IRC channel:
+
+    Hub Assistant ▸ Ollama keeps models in VRAM for keep_alive seconds …
+    llama3.2      ▸ To pin a model, set keep_alive to -1 …
+
+Every target gets a TurnStats record (TTFT, decode tokens/sec, total time)
+for the summary row, and its own options (options_for(target): each model
+is profiled for itself, so one model's num_ctx / num_gpu never goes to
+another).  Ctrl+C cancels one CancelToken shared by every stream, which
+closes their connections: Ollama stops decoding, and streams still in
+prefill or a cold load return at once.
+
+Targets are comma-separated; each is a registry bot id (name, color,
+MODEL and BOT_SYSTEM come from the registry and bot module) or a plain
+Ollama model tag (colored from PALETTE).
+
+Usage:
+    targets = resolve_targets("llama3.2,it_ticket_bot", default_system, default_model)
+    results = fanout(host, targets, lambda t: msgs_for(t), lambda t: apply_profile(opts, t.model, host))
+    for r in results: print(r.target.label, r.stats.decode_tps)
+
+Environment overrides:
+    CITL_FANOUT_CONCURRENCY  — parallel streams (default: 4)
+    CITL_FANOUT_WIDTH        — wrap long lines at this many characters (default: 100)
+"""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, TextIO
+
+from bots.cancel import CancelToken, Cancelled
+from bots.ollama_client import get_client
+from bots.stream_render import ANSI_RESET, ansi_prefix
+from bots.telemetry import TurnStats
+
+DEFAULT_CONCURRENCY = int(os.environ.get("CITL_FANOUT_CONCURRENCY", "4"))
+DEFAULT_WIDTH       = int(os.environ.get("CITL_FANOUT_WIDTH", "100"))
+
+# colors for plain model targets (registry bots bring their own)
+PALETTE = ["#22D3EE", "#F472B6", "#A3E635", "#FBBF24", "#818CF8", "#FB923C", "#2DD4BF", "#E879F9"]
+
+
+@dataclass
+class FanoutTarget:
+    label: str
+    model: str
+    color: str
+    system_prompt: str
+
+
+@dataclass
+class FanoutResult:
+    target: FanoutTarget
+    reply: str = ""
+    stats: Optional[TurnStats] = None
+    error: str = ""
+    cancelled: bool = False        # stopped by Ctrl+C; reply is what arrived before
+
+
+# ── targets ───────────────────────────────────────────────────────────────────
+
+def resolve_targets(spec: str, default_system: str, default_model: str) -> List[FanoutTarget]:
+    """Parse "a,b,c" into targets: registry bot ids first, otherwise model tags."""
+    try:
+        from bots.registry import get_registry
+        reg = get_registry()
+    except Exception:
+        reg = {}
+    targets: List[FanoutTarget] = []
+    for item in (s.strip() for s in spec.split(",")):
+        if not item:
+            continue
+        if item in reg:
+            meta = reg[item]
+            model, system = default_model, default_system
+            try:
+                import importlib
+                mod = importlib.import_module(f"bots.{item}")
+                model  = getattr(mod, "MODEL", model)
+                system = getattr(mod, "BOT_SYSTEM", system)
+            except Exception:
+                pass
+            targets.append(FanoutTarget(meta.name, model, meta.color, system))
+        else:
+            color = PALETTE[len(targets) % len(PALETTE)]
+            targets.append(FanoutTarget(item, item, color, default_system))
+    return targets
+
+
+# ── interleaved line output ───────────────────────────────────────────────────
+
+class _LineWriter:
+    """Buffers one target's tokens and prints whole prefixed lines under a shared lock."""
+
+    def __init__(self, target: FanoutTarget, label_width: int, out: TextIO, lock: threading.Lock, width: int):
+        self.prefix = f"{ansi_prefix(target.color)}  {target.label:<{label_width}} ▸ "
+        self.out    = out
+        self.lock   = lock
+        self.width  = width
+        self._buf   = ""
+
+    def write(self, token: str) -> None:
+        self._buf += token
+        while "\n" in self._buf or len(self._buf) >= self.width:
+            if "\n" in self._buf[: self.width + 1]:
+                line, self._buf = self._buf.split("\n", 1)
+            else:
+                cut = self._buf.rfind(" ", 0, self.width)
+                cut = cut if cut > 0 else self.width
+                line, self._buf = self._buf[:cut], self._buf[cut:].lstrip(" ")
+            self._emit(line)
+
+    def close(self) -> None:
+        if self._buf.strip():
+            self._emit(self._buf)
+        self._buf = ""
+
+    def error(self, message: str) -> None:
+        """One "!! message" line under this target's prefix."""
+        self._emit(f"!! {message}")
+
+    def _emit(self, line: str) -> None:
+        with self.lock:
+            self.out.write(self.prefix + line + ANSI_RESET + "\n")
+            self.out.flush()
+
+
+# ── fan-out ───────────────────────────────────────────────────────────────────
+
+def fanout(
+    host: str,
+    targets: List[FanoutTarget],
+    messages_for: Callable[[FanoutTarget], List[Dict[str, str]]],
+    options_for: Callable[[FanoutTarget], Dict[str, Any]],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    out: Optional[TextIO] = None,
+    width: int = DEFAULT_WIDTH,
+    cancel: Optional[CancelToken] = None,
+) -> List[FanoutResult]:
+    """
+    Stream messages_for(target) with options_for(target) to every target in
+    parallel and interleave their lines on out.  Returns one FanoutResult per
+    target, in input order.  Ctrl+C (or cancelling cancel) aborts every
+    stream; partial replies are kept.
+    """
+    out    = out if out is not None else sys.stdout
+    lock   = threading.Lock()
+    cancel = cancel if cancel is not None else CancelToken()
+    label_width = max((len(t.label) for t in targets), default=0)
+    results = [FanoutResult(t) for t in targets]
+
+    def _one(res: FanoutResult) -> None:
+        t = res.target
+        writer = _LineWriter(t, label_width, out, lock, width)
+        parts: List[str] = []
+        final: Optional[Dict[str, Any]] = None
+        t_first: Optional[float] = None
+        t_start = time.perf_counter()
+        try:
+            cancel.raise_if_cancelled()
+            stream = get_client(host).chat_stream(t.model, messages_for(t), options_for(t), timeout=300, cancel=cancel)
+            for chunk in stream:
+                token = chunk.get("message", {}).get("content", "")
+                if token:
+                    if t_first is None:
+                        t_first = time.perf_counter()
+                    parts.append(token)
+                    writer.write(token)
+                if chunk.get("done"):
+                    final = chunk
+        except Cancelled:
+            res.cancelled = True
+        except Exception as exc:
+            res.error = str(exc)
+        writer.close()
+        if res.error:
+            writer.error(res.error)
+        res.reply = "".join(parts)
+        res.stats = TurnStats.from_response(
+            final, model=t.model, t_start=t_start, t_end=time.perf_counter(),
+            t_first=t_first, host=host, bot=t.label, stream=True,
+        )
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(targets))), thread_name_prefix="fanout")
+    futures = [pool.submit(_one, r) for r in results]
+    try:
+        for f in futures:
+            f.result()
+    except KeyboardInterrupt:
+        for f in futures:
+            f.cancel()
+        cancel.cancel("interrupted")   # closes every open stream, so the join below is quick
+    finally:
+        pool.shutdown(wait=True)
+    return results
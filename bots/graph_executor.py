@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+graph_executor.py — Run a multi-step bot as a DAG: parallel branches, memoized nodes.
+
+Run one step after another, a plan → tools → write → verify bot costs the
+sum of its steps.  iter_graph() / run_graph() start every node as soon as
+the nodes it depends on have finished, on a small thread pool, so
+independent branches (several tool calls, retrieval alongside planning)
+overlap.  The whole graph then takes about as long as its critical path.
+
+Each node's output is memoized in-process by a hash of its name, its key
+(whatever identifies its own inputs: model, options, prompt …) and the
+outputs of the nodes it depends on.  A retry or a rerun of the same
+question skips every node whose inputs have not changed.  A node with
+key=None is never memoized.
+
+Every node gets a NodeTiming (start / end relative to the start of the run,
+cached or not), and the result reports the critical path next to the wall
+time and the sum of all steps.
+
+Usage:
+    nodes = [
+        GraphNode("planner", lambda ins: plan(q),                key=("plan", q)),
+        GraphNode("search",  lambda ins: search(q),              key=("search", q)),
+        GraphNode("writer",  lambda ins: write(q, ins["planner"], ins["search"]),
+                  after=["planner", "search"], key=("write", q)),
+    ]
+    result = run_graph(nodes)
+    result.outputs["writer"], result.timings["search"].ms, result.critical_path
+
+    for name, output, timing in iter_graph(nodes):   # as each node finishes
+        ...
+
+Environment overrides:
+    CITL_GRAPH_CONCURRENCY   — nodes run at once (default: 4)
+    CITL_GRAPH_MEMO_SIZE     — node outputs memoized in memory (default: 256)
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from bots.cancel import CancelToken
+
+DEFAULT_CONCURRENCY = int(os.environ.get("CITL_GRAPH_CONCURRENCY", "4"))
+MEMO_SIZE           = int(os.environ.get("CITL_GRAPH_MEMO_SIZE", "256"))
+
+
+@dataclass
+class GraphNode:
+    name: str
+    fn: Callable[[Dict[str, str]], str]        # outputs of `after` → this node's output
+    after: List[str] = field(default_factory=list)
+    key: Any = None                            # JSON-able identity of the node's own inputs; None = no memo
+
+
+@dataclass
+class NodeTiming:
+    name: str
+    start_s: float
+    end_s: float
+    cached: bool = False
+
+    @property
+    def ms(self) -> float:
+        return (self.end_s - self.start_s) * 1000
+
+
+@dataclass
+class GraphResult:
+    outputs: Dict[str, str]
+    timings: Dict[str, NodeTiming]
+    wall_s: float
+    critical_path: List[str]
+    critical_s: float
+
+    @property
+    def sum_s(self) -> float:
+        return sum(t.end_s - t.start_s for t in self.timings.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "nodes": {n: dict(asdict(t), ms=round(t.ms, 1)) for n, t in self.timings.items()},
+            "wall_ms": round(self.wall_s * 1000, 1),
+            "sum_ms": round(self.sum_s * 1000, 1),
+            "critical_path": self.critical_path,
+            "critical_ms": round(self.critical_s * 1000, 1),
+        }
+
+
+# ── memo ──────────────────────────────────────────────────────────────────────
+
+_MEMO: "OrderedDict[str, str]" = OrderedDict()
+_MEMO_LOCK = threading.Lock()
+
+
+def memo_key(node: GraphNode, inputs: Dict[str, str]) -> Optional[str]:
+    """Hash of the node's name, key and dependency outputs (None if the node is not memoized)."""
+    if node.key is None:
+        return None
+    raw = json.dumps([node.name, node.key, inputs], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def memo_get(key: Optional[str]) -> Optional[str]:
+    if key is None:
+        return None
+    with _MEMO_LOCK:
+        out = _MEMO.get(key)
+        if out is not None:
+            _MEMO.move_to_end(key)
+        return out
+
+
+def memo_put(key: Optional[str], output: str) -> None:
+    if key is None or MEMO_SIZE <= 0:
+        return
+    with _MEMO_LOCK:
+        _MEMO[key] = output
+        _MEMO.move_to_end(key)
+        while len(_MEMO) > MEMO_SIZE:
+            _MEMO.popitem(last=False)
+
+
+def clear_memo() -> None:
+    with _MEMO_LOCK:
+        _MEMO.clear()
+
+
+# ── execution ─────────────────────────────────────────────────────────────────
+
+def check_graph(nodes: List[GraphNode]) -> None:
+    """Raise ValueError on duplicate names, unknown dependencies or cycles."""
+    names = [n.name for n in nodes]
+    if len(set(names)) != len(names):
+        raise ValueError(f"duplicate graph node names: {names}")
+    by_name = {n.name: n for n in nodes}
+    for n in nodes:
+        missing = [d for d in n.after if d not in by_name]
+        if missing:
+            raise ValueError(f"graph node {n.name!r} depends on unknown node(s): {missing}")
+    state: Dict[str, int] = {}   # 1 = visiting, 2 = done
+
+    def _visit(name: str, path: List[str]) -> None:
+        if state.get(name) == 2:
+            return
+        if state.get(name) == 1:
+            raise ValueError("graph has a cycle: " + " → ".join(path + [name]))
+        state[name] = 1
+        for d in by_name[name].after:
+            _visit(d, path + [name])
+        state[name] = 2
+
+    for n in nodes:
+        _visit(n.name, [])
+
+
+def iter_graph(
+    nodes: List[GraphNode],
+    cancel: Optional[CancelToken] = None,
+    concurrency: Optional[int] = None,
+    memo: bool = True,
+    outputs: Optional[Dict[str, str]] = None,
+    t0: Optional[float] = None,
+) -> Iterator[Tuple[str, str, NodeTiming]]:
+    """
+    Run the graph, yielding (name, output, timing) as each node finishes.
+
+    The first node error cancels the nodes not yet started and is re-raised
+    here.  outputs (filled in as nodes finish) and t0 (perf_counter origin of
+    the timings) can be passed in to share them with the caller.
+    """
+    check_graph(nodes)
+    outputs = {} if outputs is None else outputs
+    t0 = time.perf_counter() if t0 is None else t0
+    pending = {n.name: n for n in nodes}
+    running: Dict[Future, GraphNode] = {}
+
+    def _run(node: GraphNode, inputs: Dict[str, str]) -> Tuple[str, NodeTiming]:
+        start = time.perf_counter() - t0
+        key = memo_key(node, inputs) if memo else None
+        hit = memo_get(key)
+        if hit is not None:
+            return hit, NodeTiming(node.name, start, time.perf_counter() - t0, cached=True)
+        out = node.fn(inputs)
+        memo_put(key, out)
+        return out, NodeTiming(node.name, start, time.perf_counter() - t0)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency or DEFAULT_CONCURRENCY),
+                            thread_name_prefix="graph") as pool:
+        try:
+            while pending or running:
+                for name in [n for n, node in pending.items() if all(d in outputs for d in node.after)]:
+                    if cancel is not None:
+                        cancel.raise_if_cancelled()
+                    node = pending.pop(name)
+                    running[pool.submit(_run, node, {d: outputs[d] for d in node.after})] = node
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    node = running.pop(fut)
+                    out, timing = fut.result()
+                    outputs[node.name] = out
+                    yield node.name, out, timing
+        finally:
+            for fut in running:
+                fut.cancel()
+
+
+def critical_path(nodes: List[GraphNode], timings: Dict[str, NodeTiming]) -> Tuple[List[str], float]:
+    """Longest chain of node durations through the graph: (names, seconds)."""
+    by_name = {n.name: n for n in nodes if n.name in timings}
+    best: Dict[str, Tuple[float, List[str]]] = {}
+
+    def _best(name: str) -> Tuple[float, List[str]]:
+        if name not in best:
+            t = timings[name]
+            prev = max((_best(d) for d in by_name[name].after if d in by_name), default=(0.0, []))
+            best[name] = (prev[0] + (t.end_s - t.start_s), prev[1] + [name])
+        return best[name]
+
+    total, path = max((_best(n) for n in by_name), default=(0.0, []))
+    return path, total
+
+
+def run_graph(
+    nodes: List[GraphNode],
+    cancel: Optional[CancelToken] = None,
+    concurrency: Optional[int] = None,
+    memo: bool = True,
+) -> GraphResult:
+    """Run the whole graph and return every output with per-node timings."""
+    t0 = time.perf_counter()
+    outputs: Dict[str, str] = {}
+    timings: Dict[str, NodeTiming] = {}
+    for name, _, timing in iter_graph(nodes, cancel, concurrency, memo, outputs, t0):
+        timings[name] = timing
+    path, crit = critical_path(nodes, timings)
+    return GraphResult(outputs, timings, time.perf_counter() - t0, path, crit)
@@ -0,0 +1,446 @@
+# -*- coding: utf-8 -*-
+"""
+model_bench.py — Repeatable model / option benchmarks (/bench in the sandbox).
+
+Whether a Modelfile edit, a new num_ctx in Session.options or a bot's
+_options() made things faster was judged by feel.  run_bench() answers it with
+numbers from a fixed prompt suite:
+
+  • every registry demo that carries a prompt (text and/or demo files)
+  • long-context prompts of ~2k and ~6k tokens, generated from a fixed seed
+
+For each model × option combination (the cartesian product of the grid, e.g.
+num_ctx 4096,8192) the model is unloaded first, so the first request measures
+a cold start; the remaining requests are warm.  Every run prefixes a run
+number to the system prompt so Ollama's prompt cache cannot skip prefill, and
+options carry a fixed seed, so the suite sends byte-identical requests every
+time it is run.
+
+Reported per combination: cold TTFT and load time, warm TTFT p50/p95, prefill
+and decode tokens/sec p50.  The summary is printed as a table and written as
+CSV next to a per-request CSV (<name>.runs.csv).
+
+Usage:
+    python -m bots.model_bench                                   # hub-assistant, defaults
+    python -m bots.model_bench llama3.2,hub-assistant --runs 3
+    python -m bots.model_bench llama3.2 --num_ctx 4096,8192 --opt num_batch=256,512
+    python -m bots.model_bench hub-assistant --bot ollama_bot --csv logs/modelfile-v2.csv
+
+    (sandbox)  /bench llama3.2,qwen2.5 --runs 2 --num_ctx 4096,8192
+
+Environment overrides:
+    OLLAMA_HOST / CITL_OLLAMA_HOST  — host(s) to benchmark (default: http://localhost:11434)
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import random
+import shlex
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from bots.context_window import estimate_tokens
+from bots.ollama_client import DEFAULT_HOST, get_client, probe_tags
+from bots.options_profile import apply_profile
+from bots.residency import get_residency
+from bots.telemetry import TurnStats, log_dir, percentile
+
+REPO          = Path(__file__).resolve().parents[1]
+DEFAULT_SEED  = 42
+DEFAULT_RUNS  = 2
+LONG_TOKENS   = (2000, 6000)
+BENCH_SYSTEM  = "You are a concise assistant. Answer the request directly."
+UNLOAD_WAIT_S = 10.0
+
+
+@dataclass
+class BenchPrompt:
+    id: str
+    text: str
+    tokens: int = 0
+
+    def __post_init__(self) -> None:
+        self.tokens = self.tokens or estimate_tokens(self.text)
+
+
+@dataclass
+class BenchRun:
+    """One request of the suite (a row of <name>.runs.csv)."""
+    model: str
+    options: str
+    prompt: str
+    run: int
+    cold: bool
+    ok: bool = True
+    error: str = ""
+    prompt_tokens: Optional[int] = None
+    ttft_s: Optional[float] = None
+    load_s: Optional[float] = None
+    prefill_tps: Optional[float] = None
+    decode_tps: Optional[float] = None
+    eval_tokens: Optional[int] = None
+    total_s: Optional[float] = None
+
+
+@dataclass
+class BenchRow:
+    """Summary of one model × option combination."""
+    model: str
+    options: str
+    digest: str = ""
+    n: int = 0
+    errors: int = 0
+    cold_ttft_s: Optional[float] = None
+    cold_load_s: Optional[float] = None
+    warm_ttft_p50: Optional[float] = None
+    warm_ttft_p95: Optional[float] = None
+    prefill_tps_p50: Optional[float] = None
+    decode_tps_p50: Optional[float] = None
+    runs: List[BenchRun] = field(default_factory=list, repr=False)
+
+
+# ── suite ─────────────────────────────────────────────────────────────────────
+
+def _demo_text(args: Dict[str, Any]) -> str:
+    """A registry demo's args as one prompt: task line, text, then file contents."""
+    parts: List[str] = []
+    task = args.get("mode") or args.get("target")
+    if task:
+        parts.append(f"Task: {task}")
+    content = bool(args.get("text"))
+    if content:
+        parts.append(str(args["text"]))
+    for rel in ([args["input_file"]] if args.get("input_file") else []) + list(args.get("files") or []):
+        try:
+            body = (REPO / rel).read_text(encoding="utf-8", errors="ignore").strip()
+        except OSError:
+            continue
+        parts.append(f"--- {Path(rel).name} ---\n{body}")
+        content = True
+    return "\n\n".join(parts) if content else ""
+
+
+def demo_prompts() -> List[BenchPrompt]:
+    """Every registry demo that has something to send, de-duplicated, in registry order."""
+    from bots.registry import get_registry
+    seen = set()
+    out: List[BenchPrompt] = []
+    for bot_id, meta in get_registry().items():
+        for i, demo in enumerate(meta.demos):
+            text = _demo_text(demo.args)
+            if text and text not in seen:
+                seen.add(text)
+                out.append(BenchPrompt(f"{bot_id}#{i}", text))
+    return out
+
+
+def long_prompt(tokens: int, seed: int = DEFAULT_SEED) -> BenchPrompt:
+    """A synthetic service log of about `tokens` tokens with one question about it."""
+    rng = random.Random(seed * 100003 + tokens)
+    hosts    = [f"node{n:02d}" for n in range(1, 17)]
+    services = ["ollama", "slurmd", "kubelet", "dockerd", "sshd", "nginx"]
+    levels   = ["INFO"] * 8 + ["WARN"] * 2 + ["ERROR"]
+    events   = ["request served", "model loaded", "job queued", "health check ok",
+                "GPU memory at {n}%", "retrying connection ({n})", "disk usage {n}%", "timeout after {n}s"]
+    lines: List[str] = []
+    t = 0
+    while estimate_tokens("\n".join(lines)) < tokens:
+        t += rng.randint(1, 30)
+        msg = rng.choice(events).format(n=rng.randint(1, 99))
+        lines.append(f"2025-01-01T{t // 3600 % 24:02d}:{t // 60 % 60:02d}:{t % 60:02d} "
+                     f"{rng.choice(hosts)} {rng.choice(services)} {rng.choice(levels)} {msg}")
+    text = ("Service log:\n" + "\n".join(lines) +
+            "\n\nWhich hosts logged ERROR lines, and for which services? Answer as a short list.")
+    return BenchPrompt(f"long-{tokens}", text)
+
+
+def default_suite(seed: int = DEFAULT_SEED, long_tokens: Sequence[int] = LONG_TOKENS) -> List[BenchPrompt]:
+    return demo_prompts() + [long_prompt(n, seed) for n in long_tokens]
+
+
+# ── option grid ───────────────────────────────────────────────────────────────
+
+def _value(text: str) -> Any:
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_grid(specs: Sequence[str]) -> Dict[str, List[Any]]:
+    """["num_ctx=4096,8192", "top_k=20"] → {"num_ctx": [4096, 8192], "top_k": [20]}."""
+    grid: Dict[str, List[Any]] = {}
+    for spec in specs:
+        key, sep, values = spec.partition("=")
+        if not sep or not key.strip():
+            raise ValueError(f"expected KEY=V1,V2 — got {spec!r}")
+        grid[key.strip()] = [_value(v.strip()) for v in values.split(",") if v.strip()]
+    return grid
+
+
+def expand_grid(base: Dict[str, Any], grid: Dict[str, List[Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Cartesian product of grid over base → [(label, options), ...]; label names the varied keys."""
+    keys = [k for k in grid if grid[k]]
+    if not keys:
+        return [("base", dict(base))]
+    out = []
+    for combo in itertools.product(*(grid[k] for k in keys)):
+        opts = dict(base)
+        opts.update(zip(keys, combo))
+        out.append((" ".join(f"{k}={v}" for k, v in zip(keys, combo)), opts))
+    return out
+
+
+# ── runner ────────────────────────────────────────────────────────────────────
+
+def _unload(host: str, model: str) -> None:
+    """Evict model and wait (briefly) until /api/ps no longer lists it."""
+    res = get_residency(host)
+    res.unload(model)
+    deadline = time.monotonic() + UNLOAD_WAIT_S
+    while res.is_resident(model, max_age=0) and time.monotonic() < deadline:
+        time.sleep(0.2)
+
+
+def _one(host: str, model: str, label: str, options: Dict[str, Any], prompt: BenchPrompt,
+         run: int, cold: bool) -> BenchRun:
+    msgs = [
+        {"role": "system", "content": f"Benchmark run {run}. {BENCH_SYSTEM}"},
+        {"role": "user", "content": prompt.text},
+    ]
+    rec = BenchRun(model, label, prompt.id, run, cold)
+    final: Optional[Dict[str, Any]] = None
+    t_first: Optional[float] = None
+    t0 = time.perf_counter()
+    try:
+        keep_alive = get_residency(host).keep_alive(model)
+        for chunk in get_client(host).chat_stream(model, msgs, options, timeout=(3, 900), keep_alive=keep_alive):
+            if t_first is None and chunk.get("message", {}).get("content"):
+                t_first = time.perf_counter()
+            if chunk.get("done"):
+                final = chunk
+    except Exception as exc:
+        rec.ok, rec.error = False, str(exc)[:200]
+        return rec
+    st = TurnStats.from_response(final, model=model, t_start=t0, t_end=time.perf_counter(), t_first=t_first)
+    for k in ("prompt_tokens", "ttft_s", "load_s", "prefill_tps", "decode_tps", "eval_tokens", "total_s"):
+        setattr(rec, k, getattr(st, k))
+    rec.ok = st.ok
+    return rec
+
+
+def summarize(model: str, label: str, runs: List[BenchRun], digest: str = "") -> BenchRow:
+    ok   = [r for r in runs if r.ok]
+    cold = next((r for r in ok if r.cold), None)
+    warm = [r for r in ok if not r.cold]
+    return BenchRow(
+        model=model, options=label, digest=digest, n=len(runs), errors=len(runs) - len(ok),
+        cold_ttft_s=cold.ttft_s if cold else None,
+        cold_load_s=cold.load_s if cold else None,
+        warm_ttft_p50=percentile([r.ttft_s for r in warm], 50),
+        warm_ttft_p95=percentile([r.ttft_s for r in warm], 95),
+        prefill_tps_p50=percentile([r.prefill_tps for r in ok], 50),
+        decode_tps_p50=percentile([r.decode_tps for r in ok], 50),
+        runs=runs,
+    )
+
+
+def run_bench(
+    host: str,
+    models: Sequence[str],
+    prompts: Sequence[BenchPrompt],
+    base_options: Dict[str, Any],
+    grid: Optional[Dict[str, List[Any]]] = None,
+    runs: int = DEFAULT_RUNS,
+    seed: int = DEFAULT_SEED,
+    cold: bool = True,
+    on_run: Optional[Callable[[BenchRun], None]] = None,
+) -> List[BenchRow]:
+    """
+    Run every prompt `runs` times for each model × option combination, in a
+    fixed order.  With cold=True the model is unloaded before each
+    combination and the first request is the cold one.
+    """
+    base = dict(base_options)
+    base["seed"] = seed
+    probe = probe_tags(host)
+    rows: List[BenchRow] = []
+    for model in models:
+        for label, opts in expand_grid(base, grid or {}):
+            if cold:
+                _unload(host, model)
+            results: List[BenchRun] = []
+            for run in range(1, runs + 1):
+                for prompt in prompts:
+                    rec = _one(host, model, label, opts, prompt, run, cold=cold and not results)
+                    results.append(rec)
+                    if on_run is not None:
+                        on_run(rec)
+            rows.append(summarize(model, label, results, digest=(probe.digest(model) or "")[:12]))
+    return rows
+
+
+# ── output ────────────────────────────────────────────────────────────────────
+
+SUMMARY_FIELDS = [f for f in BenchRow.__dataclass_fields__ if f != "runs"]
+RUN_FIELDS     = list(BenchRun.__dataclass_fields__)
+
+# (field, header, format) for the printed table
+COLUMNS = [
+    ("model",           "Model",        "{}"),
+    ("options",         "Options",      "{}"),
+    ("cold_ttft_s",     "Cold TTFT s",  "{:.2f}"),
+    ("cold_load_s",     "Load s",       "{:.2f}"),
+    ("warm_ttft_p50",   "Warm TTFT p50", "{:.3f}"),
+    ("warm_ttft_p95",   "p95",          "{:.3f}"),
+    ("prefill_tps_p50", "Prefill tok/s", "{:.0f}"),
+    ("decode_tps_p50",  "Decode tok/s", "{:.1f}"),
+    ("errors",          "Errors",       "{}"),
+]
+
+
+def cell(row: BenchRow, key: str, fmt: str) -> str:
+    v = getattr(row, key)
+    return "—" if v is None else fmt.format(v)
+
+
+def default_csv_path() -> Path:
+    return log_dir() / f"bench-{time.strftime('%Y%m%d-%H%M%S')}.csv"
+
+
+def write_csv(path: Path, rows: List[BenchRow]) -> Tuple[Path, Path]:
+    """Write the summary to path and every request to <path>.runs.csv; returns both paths."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    runs_path = path.with_name(path.stem + ".runs.csv")
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+        w.writeheader()
+        for r in rows:
+            w.writerow({k: v for k, v in asdict(r).items() if k != "runs"})
+    with runs_path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=RUN_FIELDS)
+        w.writeheader()
+        for r in rows:
+            for run in r.runs:
+                w.writerow(asdict(run))
+    return path, runs_path
+
+
+def format_table(rows: List[BenchRow]) -> str:
+    headers = [h for _, h, _ in COLUMNS]
+    body = [[cell(r, k, f) for k, _, f in COLUMNS] for r in rows]
+    widths = [max(len(h), *(len(b[i]) for b in body)) if body else len(h) for i, h in enumerate(headers)]
+    lines = ["  ".join(h.ljust(w) for h, w in zip(headers, widths))]
+    lines.append("  ".join("-" * w for w in widths))
+    lines += ["  ".join(c.ljust(w) for c, w in zip(b, widths)) for b in body]
+    return "\n".join(lines)
+
+
+# ── CLI (also parses /bench arguments) ────────────────────────────────────────
+
+class _CommandParser(argparse.ArgumentParser):
+    """Raises ValueError instead of printing usage and exiting (for /bench)."""
+
+    def error(self, message: str):  # type: ignore[override]
+        raise ValueError(f"{self.prog}: {message}")
+
+
+def build_parser(prog: str = "python -m bots.model_bench", cls=argparse.ArgumentParser) -> argparse.ArgumentParser:
+    ap = cls(prog=prog, description="Benchmark Ollama models and option grids on a fixed prompt suite")
+    ap.add_argument("models", nargs="?", default="", help="Comma-separated model tags (default: current / hub-assistant)")
+    ap.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="Passes over the suite per combination (default: 2)")
+    ap.add_argument("--num_ctx", "--num-ctx", default="", help="num_ctx values to compare, e.g. 4096,8192")
+    ap.add_argument("--num_predict", "--num-predict", default="256", help="num_predict values (default: 256)")
+    ap.add_argument("--opt", action="append", default=[], metavar="KEY=V1,V2", help="Any other option grid (repeatable)")
+    ap.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Seed for options and generated prompts (default: 42)")
+    ap.add_argument("--long", default=",".join(map(str, LONG_TOKENS)), help="Long-context prompt sizes in tokens ('' = none)")
+    ap.add_argument("--no-demos", action="store_true", help="Skip the registry demo prompts")
+    ap.add_argument("--no-cold", action="store_true", help="Do not unload models first (warm runs only)")
+    ap.add_argument("--csv", default="", help="Summary CSV path (default: logs/bench-<time>.csv)")
+    ap.add_argument("--host", default="", help="Ollama host(s) (default: OLLAMA_HOST)")
+    ap.add_argument("--bot", default="", help="Use this bot module's MODEL and _options() as the base")
+    return ap
+
+
+def suite_from_args(args: argparse.Namespace) -> List[BenchPrompt]:
+    prompts = [] if args.no_demos else demo_prompts()
+    sizes = [int(s) for s in str(args.long).split(",") if s.strip()]
+    return prompts + [long_prompt(n, args.seed) for n in sizes]
+
+
+def grid_from_args(args: argparse.Namespace) -> Dict[str, List[Any]]:
+    specs = list(args.opt)
+    if args.num_ctx:
+        specs.append(f"num_ctx={args.num_ctx}")
+    if args.num_predict:
+        specs.append(f"num_predict={args.num_predict}")
+    return parse_grid(specs)
+
+
+def parse_bench_args(line: str) -> argparse.Namespace:
+    """Parse the argument string of /bench; raises ValueError instead of exiting."""
+    ap = build_parser(prog="/bench", cls=_CommandParser)
+    try:
+        return ap.parse_args(shlex.split(line))
+    except SystemExit as exc:   # -h / --help already printed the help
+        raise ValueError("") from exc
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    host = args.host or DEFAULT_HOST
+    from bots.ollama_sandbox import DEFAULT_MODEL, DEFAULT_OPTIONS   # late: the sandbox imports this module
+    base, model = dict(DEFAULT_OPTIONS), DEFAULT_MODEL
+    if args.bot:
+        import importlib
+        mod = importlib.import_module(f"bots.{args.bot}")
+        model = getattr(mod, "MODEL", model)
+        if callable(getattr(mod, "_options", None)):
+            base.update(mod._options())
+    models = [m.strip() for m in (args.models or model).split(",") if m.strip()]
+    # num_ctx & co. from this machine's profile of the first model, unless --bot pins them
+    base = apply_profile(base, models[0], host)
+    try:
+        grid = grid_from_args(args)
+    except ValueError as exc:
+        print(f"bench: {exc}", file=sys.stderr)
+        return 2
+    probe = probe_tags(host)
+    if not probe.ok:
+        print(f"bench: Ollama not reachable at {host}", file=sys.stderr)
+        return 2
+    missing = [m for m in models if not probe.has_model(m)]
+    if missing:
+        print(f"bench: model(s) not found on {host}: {', '.join(missing)}", file=sys.stderr)
+        return 2
+
+    prompts = suite_from_args(args)
+    combos  = len(expand_grid(base, grid))
+    print(f"bench: {len(models)} model(s) × {combos} option set(s) × {len(prompts)} prompts × {args.runs} runs"
+          f" on {host}  (seed {args.seed})")
+
+    def _progress(r: BenchRun) -> None:
+        mark = "ok" if r.ok else "!!"
+        ttft = "—" if r.ttft_s is None else f"{r.ttft_s:.2f}s"
+        print(f"  {mark} {r.model:<20} {r.options:<24} run {r.run} {r.prompt:<22} ttft {ttft}"
+              + (" (cold)" if r.cold else "") + (f"  {r.error}" if r.error else ""), flush=True)
+
+    rows = run_bench(host, models, prompts, base, grid, runs=max(1, args.runs), seed=args.seed,
+                     cold=not args.no_cold, on_run=_progress)
+    print()
+    print(format_table(rows))
+    summary, runs = write_csv(Path(args.csv) if args.csv else default_csv_path(), rows)
+    print(f"\nCSV: {summary}\n     {runs}")
+    return 0 if all(r.errors == 0 for r in rows) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
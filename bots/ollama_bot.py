@@ -20,7 +20,9 @@ Environment overrides:
 from __future__ import annotations
 import os
 from typing import Dict, Any, List
-import requests
+
+from bots.ollama_client import get_client
+from bots.options_profile import apply_profile
 
 MODEL    = os.environ.get("OLLAMA_MODEL", "hub-assistant")
 BASE_URL = (
@@ -43,7 +45,9 @@ BOT_SYSTEM = (
 
 # ── internal ─────────────────────────────────────────────────────────────────
 def _options() -> Dict[str, Any]:
-    return {"temperature": 0.3, "top_p": 0.9, "num_ctx": 8192, "num_predict": 1024}
+    # num_ctx / num_thread / num_batch / num_gpu: set here only to pin them;
+    # otherwise the machine profile fills them in (bots/options_profile.py)
+    return {"temperature": 0.3, "top_p": 0.9, "num_predict": 1024}
 
 
 def _chat(
@@ -51,15 +55,8 @@ def _chat(
     model: str = MODEL,
     base_url: str = BASE_URL,
 ) -> str:
-    payload = {
-        "model":    model,
-        "messages": messages,
-        "stream":   False,
-        "options":  _options(),
-    }
-    r = requests.post(f"{base_url.rstrip('/')}/api/chat", json=payload, timeout=180)
-    r.raise_for_status()
-    return r.json()["message"]["content"]
+    data = get_client(base_url).chat(model, messages, apply_profile(_options(), model, base_url), timeout=180)
+    return data["message"]["content"]
 
 
 # ── public run() ──────────────────────────────────────────────────────────────
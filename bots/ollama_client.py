@@ -0,0 +1,656 @@
+# -*- coding: utf-8 -*-
+"""
+ollama_client.py — Shared pooled HTTP client for every Ollama call site.
+
+Each host gets one keep-alive ``requests.Session`` with a bounded connection
+pool, so repeated chat turns reuse an open TCP connection instead of paying a
+fresh handshake per request.  The sandbox, runtime_engine, ollama_bot and
+demo_host_bot all go through ``get_client(host)``.
+
+Usage:
+    from bots.ollama_client import get_client
+    client = get_client("http://localhost:11434")
+    data   = client.chat("hub-assistant", messages, options)
+    for chunk in client.chat_stream("hub-assistant", messages, options):
+        print(chunk.get("message", {}).get("content", ""), end="")
+
+Async variants (httpx.AsyncClient when installed, otherwise the pooled sync
+session on a worker thread):
+    data = await client.achat("hub-assistant", messages, options)
+
+Every chat call takes cancel=CancelToken (bots.cancel): cancelling it from any
+thread closes the connection, so Ollama stops decoding, and raises Cancelled:
+    for chunk in client.chat_stream(model, messages, options, cancel=token): ...
+
+Reachability / model checks share one cached /api/tags probe per host:
+    probe = probe_tags(host)          # fetched at most once per PROBE_TTL_S
+    probe.ok, probe.hung, probe.stalled, probe.has_model("llama3.2")
+
+Several hosts (comma-separated, e.g. OLLAMA_HOST="http://ws1:11434,http://ws2:11434")
+get a bots.ollama_pool.HostPool instead — same chat/generate/tags methods,
+routed to the least-loaded healthy host that has the model, with failover:
+    client = get_client("http://ws1:11434,http://ws2:11434")
+
+Every request goes through the host's bots.resilience.HostGuard (client.guard):
+timeouts adapt to observed time-to-first-byte, a circuit breaker fails fast
+with CircuitOpen while the host is down, and idempotent reads retry.
+
+Environment overrides:
+    CITL_OLLAMA_POOL_SIZE        — keep-alive connections per host (default: 8)
+    CITL_OLLAMA_CONNECT_TIMEOUT  — connect timeout in seconds     (default: 3)
+    CITL_OLLAMA_READ_TIMEOUT     — read timeout in seconds        (default: 300)
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple, Union
+
+from bots.cancel import CancelToken, Cancelled, abort_response
+
+if TYPE_CHECKING:  # requests is imported by the first OllamaClient (~100 ms saved at startup)
+    import requests
+
+_HTTPX: Any = False   # not imported yet; None once known to be missing
+
+Timeout = Union[None, float, Tuple[float, float]]
+
+DEFAULT_HOST = (
+    os.environ.get("OLLAMA_HOST")
+    or os.environ.get("CITL_OLLAMA_HOST")
+    or "http://localhost:11434"
+)
+DEFAULT_POOL_SIZE       = int(os.environ.get("CITL_OLLAMA_POOL_SIZE", "8"))
+DEFAULT_CONNECT_TIMEOUT = float(os.environ.get("CITL_OLLAMA_CONNECT_TIMEOUT", "3"))
+DEFAULT_READ_TIMEOUT    = float(os.environ.get("CITL_OLLAMA_READ_TIMEOUT", "300"))
+PROBE_TTL_S             = 5.0   # how long one /api/tags probe answers every check
+
+
+def _httpx() -> Any:
+    """httpx, imported on the first async call (None if not installed).
+
+    Optional — enables a truly async client; the sync path never needs it,
+    so the sandbox does not pay for importing it at startup.
+    """
+    global _HTTPX
+    if _HTTPX is False:
+        try:
+            import httpx  # type: ignore
+            _HTTPX = httpx
+        except Exception:  # pragma: no cover - depends on environment
+            _HTTPX = None
+    return _HTTPX
+
+
+def normalize_host(host: Optional[str]) -> str:
+    """Return host as 'scheme://addr:port' without a trailing slash."""
+    h = (host or DEFAULT_HOST).strip().rstrip("/")
+    if "://" not in h:
+        h = "http://" + h
+    return h
+
+
+def split_hosts(spec: Optional[str]) -> List[str]:
+    """Split a comma/space-separated host list into normalized, de-duplicated hosts."""
+    parts = (spec or DEFAULT_HOST).replace(";", ",").replace(" ", ",").split(",")
+    hosts: List[str] = []
+    for p in parts:
+        if p.strip():
+            h = normalize_host(p)
+            if h not in hosts:
+                hosts.append(h)
+    return hosts
+
+
+def is_multi_host(spec: Optional[str]) -> bool:
+    return len(split_hosts(spec)) > 1
+
+
+# ── Client ────────────────────────────────────────────────────────────────────
+
+class OllamaClient:
+    """Pooled keep-alive client for a single Ollama host."""
+
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+    ):
+        self.host            = normalize_host(host)
+        self.pool_size       = max(1, int(pool_size))
+        self.connect_timeout = float(connect_timeout)
+        self.read_timeout    = float(read_timeout)
+
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        from bots.resilience import get_guard
+
+        self.guard = get_guard(self.host)   # breaker, adaptive timeouts, idempotent retries (bots/resilience.py)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_size,
+            pool_block=False,
+        )
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        # one httpx.AsyncClient per running event loop (they cannot be shared)
+        self._aclients: "weakref.WeakKeyDictionary[Any, Any]" = weakref.WeakKeyDictionary()
+
+    def __repr__(self) -> str:
+        return f"OllamaClient({self.host!r}, pool_size={self.pool_size})"
+
+    # ── plumbing ──────────────────────────────────────────────────────────────
+
+    def url(self, path: str) -> str:
+        return f"{self.host}/{path.lstrip('/')}"
+
+    def _timeout(self, timeout: Timeout) -> Tuple[float, float]:
+        """Turn None / a flat number / a (connect, read) pair into a pair."""
+        if timeout is None:
+            return (self.connect_timeout, self.read_timeout)
+        if isinstance(timeout, (tuple, list)):
+            return (float(timeout[0]), float(timeout[1]))
+        t = float(timeout)
+        return (min(self.connect_timeout, t), t)
+
+    # ── sync ──────────────────────────────────────────────────────────────────
+
+    def get(self, path: str, timeout: Timeout = None) -> requests.Response:
+        return self.guard.call(
+            lambda t: self._session.get(self.url(path), timeout=t), "GET", path, self._timeout(timeout),
+        )
+
+    def post(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        timeout: Timeout = None,
+        stream: bool = False,
+    ) -> requests.Response:
+        return self.guard.call(
+            lambda t: self._session.post(self.url(path), json=payload, timeout=t, stream=stream),
+            "POST", path, self._timeout(timeout), stream=stream,
+            model=payload.get("model") or "", options=payload.get("options"),
+        )
+
+    def tags(self, timeout: Timeout = 3) -> Dict[str, Any]:
+        r = self.get("/api/tags", timeout=timeout)
+        r.raise_for_status()
+        return r.json() or {}
+
+    def chat(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        options: Optional[Dict[str, Any]] = None,
+        timeout: Timeout = None,
+        cancel: Optional[CancelToken] = None,
+        **extra: Any,
+    ) -> Dict[str, Any]:
+        """
+        Non-streaming /api/chat. Returns the full response JSON.
+
+        With cancel, the reply is streamed and collected instead, so the
+        request can be aborted half-way (a plain POST cannot be).
+        """
+        if cancel is not None:
+            return collect_chat(self.chat_stream(model, messages, options, timeout, cancel=cancel, **extra))
+        payload = {"model": model, "messages": messages, "stream": False, "options": options or {}}
+        payload.update(extra)
+        r = self.post("/api/chat", payload, timeout=timeout)
+        r.raise_for_status()
+        return r.json()
+
+    def chat_stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        options: Optional[Dict[str, Any]] = None,
+        timeout: Timeout = None,
+        cancel: Optional[CancelToken] = None,
+        **extra: Any,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming /api/chat. Yields each decoded chunk, including the final done chunk.
+
+        Cancelling ``cancel`` shuts the connection down (Ollama stops decoding)
+        and raises Cancelled here; closing the generator early closes it too.
+        """
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+        payload = {"model": model, "messages": messages, "stream": True, "options": options or {}}
+        payload.update(extra)
+        with self.post("/api/chat", payload, timeout=timeout, stream=True) as resp:
+            resp.raise_for_status()
+            release = cancel.on_cancel(lambda: abort_response(resp)) if cancel is not None else None
+            try:
+                for raw in resp.iter_lines():
+                    if cancel is not None and cancel.cancelled:
+                        break
+                    if not raw:
+                        continue
+                    chunk = json.loads(raw)
+                    yield chunk
+                    if chunk.get("done"):
+                        break
+            except Exception as exc:
+                if cancel is not None and cancel.cancelled:
+                    raise Cancelled(cancel.reason) from None   # read failed because we shut it down
+                self.guard.record(exc)   # e.g. Ollama wedged half-way through the reply
+                raise
+            finally:
+                if release is not None:
+                    release()
+            if cancel is not None:
+                cancel.raise_if_cancelled()
+
+    def generate(
+        self,
+        model: str,
+        prompt: str,
+        options: Optional[Dict[str, Any]] = None,
+        timeout: Timeout = None,
+        **extra: Any,
+    ) -> Dict[str, Any]:
+        """Non-streaming /api/generate. Returns the full response JSON."""
+        payload: Dict[str, Any] = {"model": model, "prompt": prompt, "stream": False}
+        if options:
+            payload["options"] = options
+        payload.update(extra)
+        r = self.post("/api/generate", payload, timeout=timeout)
+        r.raise_for_status()
+        return r.json()
+
+    def close(self) -> None:
+        self._session.close()
+
+    # ── async ─────────────────────────────────────────────────────────────────
+
+    def _aclient(self):
+        loop = asyncio.get_running_loop()
+        client = self._aclients.get(loop)
+        if client is None:
+            httpx = _httpx()
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                ),
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            )
+            self._aclients[loop] = client
+        return client
+
+    def _ahttpx_timeout(self, timeout: Timeout):
+        connect, read = self._timeout(timeout)
+        return _httpx().Timeout(read, connect=connect)
+
+    async def aget(self, path: str, timeout: Timeout = None) -> Any:
+        """Async GET. Returns a response with .status_code / .json() / .raise_for_status()."""
+        if _httpx() is None:
+            return await asyncio.to_thread(self.get, path, timeout)
+        return await self.guard.acall(
+            lambda t: self._aclient().get(self.url(path), timeout=self._ahttpx_timeout(t)),
+            "GET", path, self._timeout(timeout),
+        )
+
+    async def apost(self, path: str, payload: Dict[str, Any], timeout: Timeout = None) -> Any:
+        if _httpx() is None:
+            return await asyncio.to_thread(self.post, path, payload, timeout)
+        return await self.guard.acall(
+            lambda t: self._aclient().post(self.url(path), json=payload, timeout=self._ahttpx_timeout(t)),
+            "POST", path, self._timeout(timeout), model=payload.get("model") or "", options=payload.get("options"),
+        )
+
+    async def atags(self, timeout: Timeout = 3) -> Dict[str, Any]:
+        r = await self.aget("/api/tags", timeout=timeout)
+        r.raise_for_status()
+        return r.json() or {}
+
+    async def achat(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        options: Optional[Dict[str, Any]] = None,
+        timeout: Timeout = None,
+        cancel: Optional[CancelToken] = None,
+        **extra: Any,
+    ) -> Dict[str, Any]:
+        if cancel is not None:
+            return collect_chat([c async for c in self.achat_stream(model, messages, options, timeout, cancel, **extra)])
+        payload = {"model": model, "messages": messages, "stream": False, "options": options or {}}
+        payload.update(extra)
+        r = await self.apost("/api/chat", payload, timeout=timeout)
+        r.raise_for_status()
+        return r.json()
+
+    async def achat_stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        options: Optional[Dict[str, Any]] = None,
+        timeout: Timeout = None,
+        cancel: Optional[CancelToken] = None,
+        **extra: Any,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+        payload = {"model": model, "messages": messages, "stream": True, "options": options or {}}
+        payload.update(extra)
+        if _httpx() is None:
+            # Fall back to draining the sync stream on a worker thread; the
+            # private token stops that thread when the consumer goes away.
+            token = cancel.child() if cancel is not None else CancelToken()
+            try:
+                async for chunk in pump_stream(
+                    lambda: self.chat_stream(model, messages, options, timeout, cancel=token, **extra)
+                ):
+                    yield chunk
+            finally:
+                token.cancel("consumer closed the stream")
+            return
+        loop = asyncio.get_running_loop()
+        await self.guard.abefore()
+        kind = self.guard.kind("POST", "/api/chat", stream=True)
+        warm = await self.guard.awarm("/api/chat", model, payload["options"])
+        adapted = self.guard.timeouts(kind, *self._timeout(timeout), warm=warm)
+        t0 = time.perf_counter()
+        try:
+            async with self._aclient().stream(
+                "POST", self.url("/api/chat"), json=payload, timeout=self._ahttpx_timeout(adapted),
+            ) as resp:
+                self.guard.check(resp, kind, t0, warm)
+                resp.raise_for_status()
+                release = None
+                if cancel is not None:
+                    # cancel() may come from any thread; closing has to happen on this loop
+                    release = cancel.on_cancel(
+                        lambda: asyncio.run_coroutine_threadsafe(resp.aclose(), loop)
+                    )
+                try:
+                    async for raw in resp.aiter_lines():
+                        if cancel is not None and cancel.cancelled:
+                            break
+                        if not raw:
+                            continue
+                        chunk = json.loads(raw)
+                        yield chunk
+                        if chunk.get("done"):
+                            break
+                except Exception:
+                    if cancel is not None and cancel.cancelled:
+                        raise Cancelled(cancel.reason) from None
+                    raise
+                finally:
+                    if release is not None:
+                        release()
+                if cancel is not None:
+                    cancel.raise_if_cancelled()
+        except Exception as exc:
+            if cancel is None or not cancel.cancelled:
+                self.guard.record(exc)   # e.g. Ollama wedged half-way through the reply
+            raise
+
+    async def agenerate(
+        self,
+        model: str,
+        prompt: str,
+        options: Optional[Dict[str, Any]] = None,
+        timeout: Timeout = None,
+        **extra: Any,
+    ) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"model": model, "prompt": prompt, "stream": False}
+        if options:
+            payload["options"] = options
+        payload.update(extra)
+        r = await self.apost("/api/generate", payload, timeout=timeout)
+        r.raise_for_status()
+        return r.json()
+
+    async def aclose(self) -> None:
+        """Close the async client bound to the running loop (if any)."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        client = self._aclients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+
+# ── Stream helpers ────────────────────────────────────────────────────────────
+
+def collect_chat(chunks: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fold /api/chat stream chunks into the response a non-streaming call returns."""
+    parts: List[str] = []
+    final: Dict[str, Any] = {}
+    for chunk in chunks:
+        parts.append((chunk.get("message") or {}).get("content", ""))
+        if chunk.get("done"):
+            final = chunk
+    out = dict(final)
+    out["message"] = {"role": "assistant", "content": "".join(parts)}
+    return out
+
+
+async def pump_stream(make_iter: Callable[[], Iterator[Any]]) -> AsyncIterator[Any]:
+    """Drain a blocking iterator on a worker thread and yield its items on the loop."""
+    queue: "asyncio.Queue[Any]" = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+    done = object()
+
+    def _pump() -> None:
+        try:
+            for item in make_iter():
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except BaseException as exc:  # surface errors to the consumer
+            loop.call_soon_threadsafe(queue.put_nowait, exc)
+        loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    threading.Thread(target=_pump, daemon=True).start()
+    while True:
+        item = await queue.get()
+        if item is done:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+# ── Shared per-host registry ──────────────────────────────────────────────────
+
+_CLIENTS: Dict[str, OllamaClient] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_client(host: Optional[str] = None, **kwargs: Any) -> OllamaClient:
+    """
+    Return the process-wide pooled client for host, creating it on first use.
+    kwargs (pool_size, connect_timeout, read_timeout) only apply on creation.
+    A multi-host spec returns the shared HostPool for those hosts.
+    """
+    if is_multi_host(host):
+        from bots.ollama_pool import get_pool   # late import: ollama_pool imports this module
+        return get_pool(host)  # type: ignore[return-value]
+    key = normalize_host(host)
+    client = _CLIENTS.get(key)
+    if client is not None:
+        return client
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = OllamaClient(key, **kwargs)
+            _CLIENTS[key] = client
+        return client
+
+
+def close_all() -> None:
+    """Close every pooled sync session (async clients close with their loop)."""
+    with _CLIENTS_LOCK:
+        for client in _CLIENTS.values():
+            client.close()
+        _CLIENTS.clear()
+
+
+# ── /api/tags probe (shared by reachability, hung and model checks) ───────────
+
+@dataclass
+class TagsProbe:
+    """One /api/tags round-trip, indexed for O(1) model lookups."""
+    host: str
+    ok: bool = False
+    hung: bool = False            # the connection itself timed out (port open, nothing accepting)
+    stalled: bool = False         # connected, but no answer in time: busy, or wedged if it lasts
+    error: str = ""
+    models: List[Dict[str, Any]] = field(default_factory=list)
+    elapsed: float = 0.0          # seconds the request took
+    at: float = 0.0               # time.monotonic() when it finished
+    names: FrozenSet[str] = field(default_factory=frozenset)
+    bases: FrozenSet[str] = field(default_factory=frozenset)
+
+    def __post_init__(self) -> None:
+        names = [m.get("name") or m.get("model") or "" for m in self.models]
+        self.names = frozenset(n for n in names if n)
+        self.bases = frozenset(n.split(":")[0] for n in self.names)
+
+    def has_model(self, model: str) -> bool:
+        """Exact tag match, or any tag of the same base name (llama3.2 ~ llama3.2:3b)."""
+        return model in self.names or model.split(":")[0] in self.bases
+
+    def digest(self, model: str) -> Optional[str]:
+        wanted = {model, f"{model}:latest"}
+        for m in self.models:
+            if m.get("name") in wanted or m.get("model") in wanted:
+                return m.get("digest")
+        return None
+
+
+class _Stalled(Exception):
+    """Connected to the host, but /api/tags did not answer within the timeout."""
+
+
+_PROBES: Dict[str, TagsProbe] = {}
+_PROBE_LOCKS: Dict[str, threading.Lock] = {}
+_PROBE_LOCKS_GUARD = threading.Lock()
+
+
+def probe_tags(host: Optional[str] = None, timeout: float = 2.0, max_age: float = PROBE_TTL_S) -> TagsProbe:
+    """
+    Fetch /api/tags once and reuse it for max_age seconds.  Concurrent callers
+    for the same host wait on the single in-flight request instead of sending
+    their own.  max_age=0 forces a fresh request.
+
+    A multi-host spec probes every host (in parallel) and merges the results:
+    ok if any host is up, models from all of them.
+    """
+    if is_multi_host(host):
+        return _probe_many(split_hosts(host), timeout, max_age)
+    key = normalize_host(host)
+    hit = _PROBES.get(key)
+    if hit is not None and max_age > 0 and time.monotonic() - hit.at < max_age:
+        return hit
+    with _PROBE_LOCKS_GUARD:
+        lock = _PROBE_LOCKS.setdefault(key, threading.Lock())
+    started = time.monotonic()
+    with lock:
+        hit = _PROBES.get(key)
+        # someone else finished a probe while we waited — use it
+        if hit is not None and hit.at >= started:
+            return hit
+        t0 = time.monotonic()
+        try:
+            probe = TagsProbe(key, ok=True, models=(_fetch_tags(key, timeout) or {}).get("models") or [])
+        except _Stalled as exc:
+            probe = TagsProbe(key, stalled=True, error=str(exc))   # busy (or wedged, if it lasts)
+        except TimeoutError as exc:
+            probe = TagsProbe(key, hung=True, error=str(exc))      # port open, connect timed out = hung
+        except Exception as exc:
+            probe = TagsProbe(key, error=str(exc))              # refused = simply not running
+        probe.at = time.monotonic()
+        probe.elapsed = probe.at - t0
+        _PROBES[key] = probe
+        return probe
+
+
+def _fetch_tags(host: str, timeout: float) -> Dict[str, Any]:
+    """
+    GET /api/tags with http.client instead of the pooled session.
+
+    The sandbox waits for this probe before its first prompt; http.client is
+    a fraction of the import cost of requests, which then loads after the
+    prompt is up.  A connect timeout raises TimeoutError; a server that
+    accepts the connection but does not answer in time (a loaded box
+    prefilling, or a wedged one) raises _Stalled.
+    """
+    import http.client
+    from urllib.parse import urlparse
+    url = urlparse(host)
+    conn_cls = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+    conn = conn_cls(url.hostname or "127.0.0.1", url.port, timeout=timeout)
+    try:
+        try:
+            conn.connect()
+        except TimeoutError as exc:
+            raise TimeoutError(f"{host}: connect timed out after {timeout:g} s") from exc
+        try:
+            conn.request("GET", f"{url.path.rstrip('/')}/api/tags")
+            r = conn.getresponse()
+            body = r.read()
+        except TimeoutError as exc:
+            raise _Stalled(f"{host}: connected, no answer in {timeout:g} s") from exc
+        if r.status >= 400:
+            raise OSError(f"{host}: HTTP {r.status} from /api/tags")
+        return json.loads(body or b"{}")
+    finally:
+        conn.close()
+
+
+def _probe_many(hosts: List[str], timeout: float, max_age: float) -> TagsProbe:
+    results: List[Optional[TagsProbe]] = [None] * len(hosts)
+
+    def _one(i: int) -> None:
+        results[i] = probe_tags(hosts[i], timeout=timeout, max_age=max_age)
+
+    threads = [threading.Thread(target=_one, args=(i,), daemon=True) for i in range(len(hosts))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    probes = [p for p in results if p is not None]
+    models: Dict[str, Dict[str, Any]] = {}
+    for p in probes:
+        for m in p.models:
+            models.setdefault(m.get("name") or m.get("model") or "", m)
+    return TagsProbe(
+        host=",".join(hosts),
+        ok=any(p.ok for p in probes),
+        hung=bool(probes) and all(p.hung for p in probes),
+        stalled=not any(p.ok for p in probes) and any(p.stalled for p in probes),
+        error="; ".join(f"{p.host}: {p.error}" for p in probes if p.error),
+        models=list(models.values()),
+        elapsed=max((p.elapsed for p in probes), default=0.0),
+        at=min((p.at for p in probes), default=time.monotonic()),
+    )
+
+
+def peek_probe(host: str) -> Optional[TagsProbe]:
+    """The cached probe for one host, however old, without any network I/O."""
+    return _PROBES.get(normalize_host(host))
+
+
+def invalidate_probe(host: Optional[str] = None) -> None:
+    """Forget cached probes (one host, a host list, or all) — e.g. after `ollama create`."""
+    if host is None:
+        _PROBES.clear()
+    else:
+        for h in split_hosts(host):
+            _PROBES.pop(h, None)
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+ollama_pool.py — Route requests across several Ollama hosts.
+
+In the lab several workstations run Ollama; pointing every sandbox at one of
+them overloads it while the others sit idle.  HostPool wraps one pooled
+OllamaClient per host and, for every request, picks:
+
+  1. hosts that are not cooling down after a failure
+  2. of those, hosts whose /api/tags lists the model (probes are cached and
+     refreshed in the background, so routing never waits on them)
+  3. the one with the fewest in-flight requests, then the lowest recent
+     latency (EWMA of time-to-first-byte)
+
+Connection errors, timeouts and 5xx responses mark the host down for a
+cooldown that doubles with each consecutive failure, and the request is
+retried on the next host.  A streamed reply fails over only before its first
+chunk; once tokens are on screen the error is raised to the caller.  A 404
+(model missing on that host) tries the other hosts without marking it down.
+A cancelled request (bots.cancel) is never retried elsewhere.
+
+HostPool has the same chat / chat_stream / generate / tags methods (and async
+variants) as OllamaClient, and get_client() returns it for a host list, so
+the sandbox, runtime_engine and ollama_bot need no changes to use it.
+
+Usage:
+    pool = get_client("http://ws1:11434,http://ws2:11434")   # or get_pool(...)
+    for chunk in pool.chat_stream("llama3.2", messages, options): ...
+    for row in pool.status(): print(row["host"], row["in_flight"], row["ewma_ms"])
+
+Environment overrides:
+    OLLAMA_HOST / CITL_OLLAMA_HOST  — may list several hosts, comma-separated
+    CITL_POOL_COOLDOWN_S            — first cooldown after a failure (default: 5; max 60)
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence
+
+import requests
+
+from bots.cancel import CancelToken
+from bots.ollama_client import (
+    PROBE_TTL_S,
+    OllamaClient,
+    Timeout,
+    get_client,
+    peek_probe,
+    probe_tags,
+    pump_stream,
+    split_hosts,
+)
+
+COOLDOWN_S     = float(os.environ.get("CITL_POOL_COOLDOWN_S", "5"))
+MAX_COOLDOWN_S = 60.0
+EWMA_ALPHA     = 0.3
+
+FAILOVER_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+
+@dataclass
+class HostState:
+    host: str
+    in_flight: int = 0
+    requests: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    ewma_s: Optional[float] = None     # recent time-to-first-byte
+    down_until: float = 0.0            # time.monotonic(); 0 = healthy
+    last_error: str = ""
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+
+class NoHostAvailable(requests.exceptions.ConnectionError):
+    """Every host in the pool failed (or is cooling down) for this request."""
+
+
+class HostPool:
+    """Least-loaded routing with failover over several Ollama hosts."""
+
+    def __init__(self, hosts: Sequence[str], cooldown_s: float = COOLDOWN_S):
+        self.hosts      = split_hosts(",".join(hosts))
+        self.cooldown_s = cooldown_s
+        self.states     = {h: HostState(h) for h in self.hosts}
+        self._lock      = threading.Lock()
+        self._refreshing: set = set()
+
+    def __repr__(self) -> str:
+        return f"HostPool({self.hosts!r})"
+
+    @property
+    def host(self) -> str:
+        return ",".join(self.hosts)
+
+    # ── routing ───────────────────────────────────────────────────────────────
+
+    def _refresh(self, host: str) -> None:
+        try:
+            p = probe_tags(host, max_age=0)
+            if not p.ok:
+                self._mark_failed(self.states[host], p.error or "probe failed")
+        finally:
+            with self._lock:
+                self._refreshing.discard(host)
+
+    def _has_model(self, host: str, model: Optional[str]) -> Optional[bool]:
+        """True / False from the cached probe, None if unknown; stale probes refresh in the background."""
+        p = peek_probe(host)
+        if p is None or time.monotonic() - p.at >= PROBE_TTL_S:
+            with self._lock:
+                start = host not in self._refreshing
+                self._refreshing.add(host)
+            if start:
+                threading.Thread(target=self._refresh, args=(host,), daemon=True).start()
+        if p is None or not p.ok or not model:
+            return None
+        return p.has_model(model)
+
+    def pick(self, model: Optional[str] = None, exclude: Sequence[str] = ()) -> Optional[HostState]:
+        """Choose the host for the next request (None when every host was excluded)."""
+        if all(peek_probe(h) is None for h in self.hosts):
+            probe_tags(self.host)   # first request: probe every host once, in parallel
+        with self._lock:
+            cands = [s for s in self.states.values() if s.host not in exclude]
+        if not cands:
+            return None
+        healthy = [s for s in cands if s.healthy]
+        if not healthy:
+            if exclude:
+                return None   # failover only walks healthy hosts
+            # everything is cooling down — try the one that comes back first
+            return min(cands, key=lambda s: s.down_until)
+        known = {s.host: self._has_model(s.host, model) for s in healthy}
+        preferred = ([s for s in healthy if known[s.host]]
+                     or [s for s in healthy if known[s.host] is None]
+                     or healthy)
+        with self._lock:
+            return min(preferred, key=lambda s: (s.in_flight, s.ewma_s or 0.0, s.requests))
+
+    def _begin(self, st: HostState) -> float:
+        with self._lock:
+            st.in_flight += 1
+            st.requests  += 1
+        return time.perf_counter()
+
+    def _end(self, st: HostState, t0: float, ttfb: Optional[float] = None) -> None:
+        with self._lock:
+            st.in_flight -= 1
+            if ttfb is not None:
+                st.ewma_s = ttfb if st.ewma_s is None else EWMA_ALPHA * ttfb + (1 - EWMA_ALPHA) * st.ewma_s
+                st.consecutive_failures = 0
+                st.down_until = 0.0
+
+    def _mark_failed(self, st: HostState, error: str) -> None:
+        with self._lock:
+            st.failures += 1
+            st.consecutive_failures += 1
+            st.last_error = error
+            backoff = self.cooldown_s * 2 ** (st.consecutive_failures - 1)
+            st.down_until = time.monotonic() + min(backoff, MAX_COOLDOWN_S)
+
+    def _should_fail_over(self, st: HostState, exc: Exception) -> bool:
+        """Mark st down where appropriate; True if the request may go to another host."""
+        if isinstance(exc, FAILOVER_ERRORS):
+            self._mark_failed(st, str(exc))
+            return True
+        if isinstance(exc, requests.exceptions.HTTPError) and exc.response is not None:
+            code = exc.response.status_code
+            if code >= 500:
+                self._mark_failed(st, f"HTTP {code}")
+                return True
+            return code == 404   # model not on this host — others may have it
+        return False
+
+    def _call(self, model: Optional[str], fn: Callable[[OllamaClient], Any]) -> Any:
+        tried: List[str] = []
+        last: Optional[Exception] = None
+        while len(tried) < len(self.hosts):
+            st = self.pick(model, exclude=tried)
+            if st is None:
+                break
+            tried.append(st.host)
+            t0 = self._begin(st)
+            try:
+                result = fn(get_client(st.host))
+            except Exception as exc:
+                self._end(st, t0)
+                if not self._should_fail_over(st, exc):
+                    raise
+                last = _more_telling(last, exc)
+                continue
+            self._end(st, t0, time.perf_counter() - t0)
+            return result
+        if last is not None:
+            raise last
+        raise NoHostAvailable(f"no Ollama host available in {self.host}")
+
+    # ── OllamaClient interface ────────────────────────────────────────────────
+
+    def get(self, path: str, timeout: Timeout = None) -> requests.Response:
+        return self._call(None, lambda c: c.get(path, timeout=timeout))
+
+    def post(self, path: str, payload: Dict[str, Any], timeout: Timeout = None, stream: bool = False) -> requests.Response:
+        return self._call(payload.get("model"), lambda c: c.post(path, payload, timeout=timeout, stream=stream))
+
+    def tags(self, timeout: Timeout = 3) -> Dict[str, Any]:
+        """Merged /api/tags of every reachable host."""
+        p = probe_tags(self.host, timeout=float(timeout if isinstance(timeout, (int, float)) else 3))
+        if not p.ok:
+            raise NoHostAvailable(p.error or f"no Ollama host reachable in {self.host}")
+        return {"models": p.models}
+
+    def chat(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        options: Optional[Dict[str, Any]] = None,
+        timeout: Timeout = None,
+        cancel: Optional[CancelToken] = None,
+        **extra: Any,
+    ) -> Dict[str, Any]:
+        return self._call(model, lambda c: c.chat(model, messages, options, timeout, cancel, **extra))
+
+    def generate(
+        self,
+        model: str,
+        prompt: str,
+        options: Optional[Dict[str, Any]] = None,
+        timeout: Timeout = None,
+        **extra: Any,
+    ) -> Dict[str, Any]:
+        return self._call(model, lambda c: c.generate(model, prompt, options, timeout, **extra))
+
+    def chat_stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        options: Optional[Dict[str, Any]] = None,
+        timeout: Timeout = None,
+        cancel: Optional[CancelToken] = None,
+        **extra: Any,
+    ) -> Iterator[Dict[str, Any]]:
+        """Streaming chat; fails over to another host only before the first chunk arrives."""
+        tried: List[str] = []
+        last: Optional[Exception] = None
+        while len(tried) < len(self.hosts):
+            st = self.pick(model, exclude=tried)
+            if st is None:
+                break
+            tried.append(st.host)
+            t0 = self._begin(st)
+            ttfb: Optional[float] = None
+            try:
+                for chunk in get_client(st.host).chat_stream(model, messages, options, timeout, cancel, **extra):
+                    if ttfb is None:
+                        ttfb = time.perf_counter() - t0
+                    yield chunk
+            except GeneratorExit:
+                self._end(st, t0, ttfb)
+                raise
+            except Exception as exc:
+                self._end(st, t0)
+                if ttfb is not None or not self._should_fail_over(st, exc):
+                    if ttfb is not None and isinstance(exc, FAILOVER_ERRORS):
+                        self._mark_failed(st, str(exc))   # next turn goes elsewhere
+                    raise
+                last = _more_telling(last, exc)
+                continue
+            self._end(st, t0, ttfb)
+            return
+        if last is not None:
+            raise last
+        raise NoHostAvailable(f"no Ollama host available in {self.host}")
+
+    def close(self) -> None:
+        for h in self.hosts:
+            get_client(h).close()
+
+    # ── async (worker threads over the sync routing) ─────────────────────────
+
+    async def achat(self, model: str, messages: List[Dict[str, str]], options: Optional[Dict[str, Any]] = None,
+                    timeout: Timeout = None, cancel: Optional[CancelToken] = None, **extra: Any) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.chat, model, messages, options, timeout, cancel, **extra)
+
+    async def agenerate(self, model: str, prompt: str, options: Optional[Dict[str, Any]] = None,
+                        timeout: Timeout = None, **extra: Any) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.generate, model, prompt, options, timeout, **extra)
+
+    async def atags(self, timeout: Timeout = 3) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.tags, timeout)
+
+    async def achat_stream(self, model: str, messages: List[Dict[str, str]], options: Optional[Dict[str, Any]] = None,
+                           timeout: Timeout = None, cancel: Optional[CancelToken] = None,
+                           **extra: Any) -> AsyncIterator[Dict[str, Any]]:
+        # the private token stops the worker thread (and the request) if the consumer goes away
+        token = cancel.child() if cancel is not None else CancelToken()
+        try:
+            async for chunk in pump_stream(
+                lambda: self.chat_stream(model, messages, options, timeout, cancel=token, **extra)
+            ):
+                yield chunk
+        finally:
+            token.cancel("consumer closed the stream")
+
+    async def aclose(self) -> None:
+        for h in self.hosts:
+            await get_client(h).aclose()
+
+    # ── status ────────────────────────────────────────────────────────────────
+
+    def status(self) -> List[Dict[str, Any]]:
+        """One row per host for /hosts and dashboards."""
+        now = time.monotonic()
+        rows = []
+        with self._lock:
+            states = list(self.states.values())
+        for s in states:
+            p = peek_probe(s.host)
+            rows.append({
+                "host": s.host,
+                "healthy": s.healthy and (p is None or p.ok),
+                "in_flight": s.in_flight,
+                "requests": s.requests,
+                "failures": s.failures,
+                "ewma_ms": s.ewma_s * 1000 if s.ewma_s is not None else None,
+                "cooldown_s": max(0.0, s.down_until - now),
+                "models": len(p.names) if p is not None else None,
+                "last_error": s.last_error,
+            })
+        return rows
+
+
+def _more_telling(prev: Optional[Exception], exc: Exception) -> Exception:
+    """Keep a 404 (model missing everywhere) over later connection errors."""
+    if isinstance(prev, requests.exceptions.HTTPError):
+        return prev
+    return exc
+
+
+_POOLS: Dict[str, HostPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(hosts: str) -> HostPool:
+    """Process-wide HostPool for a host list (same list → same pool and stats)."""
+    key = ",".join(split_hosts(hosts))
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = HostPool(key.split(","))
+            _POOLS[key] = pool
+        return pool
@@ -10,8 +10,22 @@ Usage:
     python -m bots.ollama_sandbox --bot ollama_bot       # load bot from registry
     python -m bots.ollama_sandbox --bot student_bot      # student's custom bot color
     python -m bots.ollama_sandbox --model llama3.2       # override model
+    python -m bots.ollama_sandbox --host http://ws1:11434,http://ws2:11434   # load-balance hosts
     python -m bots.ollama_sandbox --color "#FF6B6B"      # force a specific color
     python -m bots.ollama_sandbox --no-stream            # disable streaming
+    python -m bots.ollama_sandbox --no-markdown          # stream raw text instead of live Markdown
+    python -m bots.ollama_sandbox --ctx-budget 4096      # cap prompt tokens per turn
+    python -m bots.ollama_sandbox --summarize            # fold trimmed turns into a summary
+    python -m bots.ollama_sandbox --cache                # replay repeated prompts from disk
+    python -m bots.ollama_sandbox --fanout llama3.2,it_ticket_bot   # every message to several targets
+    python -m bots.ollama_sandbox --resume               # reopen the most recent session
+    python -m bots.ollama_sandbox --resume lab3          # reopen a /save'd session
+    python -m bots.ollama_sandbox --batch prompts.txt --concurrency 4   # no REPL; JSONL results
+    python -m bots.ollama_sandbox --batch cases.jsonl --chain           # prompts as one conversation
+    python -m bots.ollama_sandbox --keep-alive 2h --pin 2   # keep models loaded; pin the 2 most used
+    python -m bots.ollama_sandbox --on-cancel truncate      # keep Ctrl+C'd replies, marked truncated
+    python -m bots.ollama_sandbox --serve                   # host the lab's chat channels (port 6680)
+    python -m bots.ollama_sandbox --connect labbox --bot it_ticket_bot --nick alice   # join #it_ticket_bot
 
 Commands inside the sandbox:
     /help            Show all commands
@@ -25,19 +39,50 @@ Commands inside the sandbox:
     /color <hex>     Change bot response color live
     /bot <id>        Switch to a different registered bot
     /info            Show current session info
+    /stats [all]     Per-model TTFT / tokens-per-sec percentiles (all = every logged session)
+    /cache <cmd>     Response cache: stats | clear | on | off
+    /fanout <a,b,..> [msg]  Send to several models/bots at once (no msg = fan-out mode; off = stop)
+    /save <name>     Keep this session's transcript under a name (/save! replaces a saved one)
+    /load [name]     Reopen a saved session (no name = list them)
+    /host <url[,url]>  Switch host(s); several hosts are load-balanced with failover
+    /hosts           Per-host health, in-flight requests and latency
+    /markdown on|off Live Markdown rendering of streamed replies (terminals only)
+    /ps              Resident models: VRAM use, time to unload, pinned
+    /bench [models] [--runs N] [--num_ctx a,b]   Cold/warm TTFT, prefill + decode tok/s → table + CSV
+
+Selecting a model (/model, /bot, --bot, or a fallback) preloads it in the
+background, so the first message does not pay the cold load.
+
+Ctrl+C during a reply closes the connection, so Ollama stops generating.  The
+partial reply is dropped from history (the default; CITL_ON_CANCEL or
+--on-cancel truncate keeps it, marked "[truncated]") and is never cached.
+
+Every turn is appended to data/sessions/<name>.jsonl as it happens (--no-log to disable).
 """
 from __future__ import annotations
 
 import argparse
-import json
+import importlib
 import os
 import subprocess
 import sys
+import threading
 import time
 from pathlib import Path
-from typing import Dict, Any, List, Optional
-
-import requests
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from bots import startup_profile
+from bots.cancel import CancelToken, Cancelled
+from bots.context_window import ContextWindow
+from bots.fanout import DEFAULT_CONCURRENCY, FanoutResult, FanoutTarget, fanout, resolve_targets
+from bots.ollama_client import PROBE_TTL_S, get_client, invalidate_probe, is_multi_host, probe_tags
+from bots.ollama_supervisor import get_supervisor
+from bots.options_profile import MAX_NUM_CTX, PROFILE_KEYS, apply_profile, profile_options
+from bots.residency import KeepAlive, ResidencyManager, get_residency, model_for_bot
+from bots.response_cache import ResponseCache, get_cache, replay
+from bots.session_log import LoadedSession, SessionLog, list_sessions, load_tail, session_path
+from bots.stream_render import DEFAULT_FPS
+from bots.telemetry import METRICS, TelemetryLog, TurnStats
 
 # rich imports — available via requirements/hub.txt
 from rich.console import Console
@@ -46,6 +91,12 @@ from rich.rule import Rule
 from rich.text import Text
 from rich.markup import escape
 from rich.style import Style
+from rich.table import Table
+
+# Imported on first use to keep startup fast (python sandbox.py --profile-startup):
+#   requests (bots.ollama_client's pooled session)   — warmed after the first prompt
+#   bots.stream_markdown (rich.markdown, markdown_it) — warmed after the first prompt
+#   bots.batch / bots.chat_server / bots.model_bench  — --batch, --serve/--connect, /bench
 
 # ── Console (stderr=False so piped output is clean) ──────────────────────────
 console = Console(highlight=False)
@@ -57,12 +108,16 @@ DEFAULT_HOST   = (
     or "http://localhost:11434"
 )
 DEFAULT_MODEL  = os.environ.get("OLLAMA_MODEL", "hub-assistant")
+# num_ctx / num_thread / num_batch / num_gpu come from bots.options_profile
+DEFAULT_OPTIONS = {"temperature": 0.3, "top_p": 0.9, "num_predict": 1024}
 DEFAULT_COLOR  = "#22D3EE"   # bright cyan
 USER_COLOR     = "yellow"
 SYS_COLOR      = "dim white"
 ERROR_COLOR    = "bright_red"
 CMD_COLOR      = "bright_magenta"
 BORDER_DIM     = "grey46"
+ON_CANCEL      = os.environ.get("CITL_ON_CANCEL", "drop")   # drop | truncate (keep, marked)
+TRUNCATED_MARK = " [truncated]"
 
 DEFAULT_SYSTEM = (
     "You are the AI Training Hub Assistant — a concise, expert AI tutor. "
@@ -83,12 +138,7 @@ def hex_to_rich(hex_color: str) -> str:
 
 
 def ollama_models(host: str) -> List[str]:
-    try:
-        r = requests.get(f"{host.rstrip('/')}/api/tags", timeout=3)
-        r.raise_for_status()
-        return sorted(m["name"] for m in (r.json().get("models") or []) if m.get("name"))
-    except Exception:
-        return []
+    return sorted(probe_tags(host, timeout=3).names)
 
 
 def stream_chat(
@@ -98,44 +148,61 @@ def stream_chat(
     options: Dict[str, Any],
     bot_color: str,
     bot_name: str,
+    fps: float = DEFAULT_FPS,
+    meta: Optional[Dict[str, Any]] = None,
+    source: Optional[Iterable[Dict[str, Any]]] = None,
+    markdown: bool = False,
+    keep_alive: Optional[KeepAlive] = None,
+    cancel: Optional[CancelToken] = None,
 ) -> str:
-    """Stream tokens from Ollama, printing each with bot_color. Returns full text."""
-    console.print(f"[{bot_color}]  {bot_name} ▸[/{bot_color}] ", end="")
-    full = ""
+    """
+    Stream tokens from Ollama in frames colored with bot_color. Returns full text.
+    With markdown=True (and a terminal) the reply renders as live Markdown.
+    If meta is given it receives "t_first" (perf_counter of the first token),
+    "tokens" ([(offset_s, token), ...]) and "final" (Ollama's done chunk with
+    eval/prefill/load counters).  source replaces the HTTP stream (cache replay).
+    keep_alive (if given) is sent with the request.  Ctrl+C or cancelling
+    cancel closes the connection and sets meta["cancelled"]; the partial text
+    is returned.
+    """
+    markdown = markdown and console.is_terminal
+    console.print(f"[{bot_color}]  {bot_name} ▸[/{bot_color}] ", end="\n" if markdown else "")
+    meta = meta if meta is not None else {}
+    parts: List[str] = []
+    timings = meta.setdefault("tokens", [])
+    from bots.stream_markdown import make_renderer
+    out = make_renderer(bot_color, console, fps=fps, markdown=markdown)
+    t_req = time.perf_counter()
+    cancel = cancel if cancel is not None else CancelToken()
+    if source is None:
+        extra = {} if keep_alive is None else {"keep_alive": keep_alive}
+        source = get_client(host).chat_stream(model, messages, options, timeout=300, cancel=cancel, **extra)
     try:
-        payload = {"model": model, "messages": messages, "stream": True, "options": options}
-        with requests.post(
-            f"{host.rstrip('/')}/api/chat",
-            json=payload,
-            stream=True,
-            timeout=300,
-        ) as resp:
-            resp.raise_for_status()
-            for raw in resp.iter_lines():
-                if not raw:
-                    continue
-                chunk = json.loads(raw)
-                token = chunk.get("message", {}).get("content", "")
-                if token:
-                    # Write raw so ANSI codes in model output pass through
-                    sys.stdout.write(
-                        f"\033[0m"  # reset
-                        + f"\033[38;2;"
-                        + _hex_to_ansi(bot_color)
-                        + "m"
-                        + token
-                        + "\033[0m"
-                    )
-                    sys.stdout.flush()
-                    full += token
-                if chunk.get("done"):
-                    break
-    except KeyboardInterrupt:
-        pass  # user pressed Ctrl+C mid-stream — partial is fine
+        for chunk in source:
+            token = chunk.get("message", {}).get("content", "")
+            if token:
+                now = time.perf_counter()
+                if not parts:
+                    meta["t_first"] = now
+                out.write(token)
+                parts.append(token)
+                timings.append((now - t_req, token))
+            if chunk.get("done"):
+                meta["final"] = chunk
+    except (KeyboardInterrupt, Cancelled):
+        # Ctrl+C mid-stream: hang up now so Ollama stops decoding the rest
+        cancel.cancel("interrupted")
+        if hasattr(source, "close"):
+            source.close()
+        meta["cancelled"] = True
     except Exception as exc:
+        out.close()
         console.print(f"\n[{ERROR_COLOR}]Stream error: {escape(str(exc))}[/{ERROR_COLOR}]")
-    console.print()  # newline after streamed content
-    return full
+    finally:
+        out.close()  # flush the last frame, including on Ctrl+C
+    if not markdown:
+        console.print()  # newline after streamed content
+    return "".join(parts)
 
 
 def fetch_chat(
@@ -143,122 +210,86 @@ def fetch_chat(
     model: str,
     messages: List[Dict[str, str]],
     options: Dict[str, Any],
+    meta: Optional[Dict[str, Any]] = None,
+    keep_alive: Optional[KeepAlive] = None,
+    cancel: Optional[CancelToken] = None,
 ) -> str:
-    """Non-streaming fallback."""
-    payload = {"model": model, "messages": messages, "stream": False, "options": options}
-    r = requests.post(f"{host.rstrip('/')}/api/chat", json=payload, timeout=300)
-    r.raise_for_status()
-    return r.json()["message"]["content"]
-
-
-def _hex_to_ansi(hex_color: str) -> str:
-    """Convert '#RRGGBB' or 'RRGGBB' to '255;128;0' for ANSI escape."""
-    h = hex_color.strip().lstrip("#")
-    if len(h) != 6:
-        return "34;212;238"  # fallback cyan
-    r = int(h[0:2], 16)
-    g = int(h[2:4], 16)
-    b = int(h[4:6], 16)
-    return f"{r};{g};{b}"
+    """
+    Non-streaming fallback. meta (if given) receives the full response as "final".
+    With cancel, Ctrl+C aborts the request; meta["cancelled"] is set and "" returned.
+    """
+    extra = {} if keep_alive is None else {"keep_alive": keep_alive}
+    try:
+        data = get_client(host).chat(model, messages, options, timeout=300, cancel=cancel, **extra)
+    except (KeyboardInterrupt, Cancelled):
+        if cancel is None:
+            raise
+        cancel.cancel("interrupted")
+        if meta is not None:
+            meta["cancelled"] = True
+        return ""
+    if meta is not None:
+        meta["final"] = data
+    return data["message"]["content"]
 
 
 # ── Ollama process management ────────────────────────────────────────────────
 
-def _ping_ollama(host: str, timeout: float = 2.0) -> bool:
+def _ping_ollama(host: str, timeout: float = 2.0, fresh: bool = False) -> bool:
     """Return True if Ollama responds normally (not hung, not down)."""
-    try:
-        r = requests.get(f"{host.rstrip('/')}/api/tags", timeout=timeout)
-        return r.status_code == 200
-    except requests.exceptions.ConnectTimeout:
-        return False   # hung — treats as down so caller can kill+restart
-    except Exception:
-        return False
-
-
-def _ollama_is_hung(host: str) -> bool:
-    """Return True if Ollama is listening but not responding (connection timeout)."""
-    try:
-        requests.get(f"{host.rstrip('/')}/api/tags", timeout=2.0)
-        return False
-    except requests.exceptions.ConnectTimeout:
-        return True    # port open, no response = hung
-    except Exception:
-        return False   # refused = simply not running
-
-
-def _kill_ollama() -> None:
-    """Force-kill all Ollama processes so a clean restart can follow."""
-    if sys.platform == "win32":
-        for name in ("ollama.exe", "ollama_llama_server.exe"):
-            subprocess.run(["taskkill", "/F", "/IM", name], capture_output=True)
-    if sys.platform != "win32":
-        subprocess.run(["pkill", "-9", "-f", "ollama serve"], capture_output=True)
-        subprocess.run(["pkill", "-9", "-f", "ollama_llama"],  capture_output=True)
-    time.sleep(1)   # allow OS to release the port
-
-
-def _start_ollama_process(host: str) -> bool:
-    """Spawn 'ollama serve' silently; wait up to 15 s for it to respond."""
-    try:
-        kwargs: Dict[str, Any] = {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
-        if sys.platform == "win32":
-            kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW | subprocess.DETACHED_PROCESS
-        subprocess.Popen(["ollama", "serve"], **kwargs)
-    except FileNotFoundError:
-        return False
-    except Exception:
-        return False
-
-    console.print(f"  [{SYS_COLOR}]  Waiting", end="")
-    for _ in range(15):
-        time.sleep(1)
-        console.print(".", end="")
-        sys.stdout.flush()
-        if _ping_ollama(host, timeout=1.5):
-            console.print(f"  ready[/{SYS_COLOR}]")
-            return True
-    console.print(f"  timed out[/{SYS_COLOR}]")
-    return False
+    return probe_tags(host, timeout=timeout, max_age=0 if fresh else PROBE_TTL_S).ok
 
 
 def _ensure_ollama(sess: "Session") -> bool:
     """
-    Guarantee Ollama is reachable. Handles three cases automatically:
-      1. Already up           → nothing to do
-      2. Hung (timeout)       → kill + restart silently
-      3. Not running (refused)→ start silently
+    Guarantee Ollama is reachable.  A healthy server answers from the cached
+    probe.  Otherwise this machine's OllamaSupervisor (bots.ollama_supervisor)
+    starts it, or kills and restarts it if hung — or, when another sandbox
+    already supervises it, we wait for that one instead of racing it.
     Returns True if Ollama is reachable after all attempts.
     """
+    sup = get_supervisor(sess.host)
     if _ping_ollama(sess.host):
-        console.print(f"  [{sess.bot_color}] OK [/{sess.bot_color}]  Ollama ready  ({sess.host})")
+        ms = probe_tags(sess.host).elapsed * 1000
+        console.print(f"  [{sess.bot_color}] OK [/{sess.bot_color}]  Ollama ready  ({sess.host}, {ms:.0f} ms)")
+        if sup.local and not sup.leading:
+            # first sandbox on the machine becomes its supervisor (health thread)
+            threading.Thread(target=sup.lead, name="ollama-supervisor-lead", daemon=True).start()
         return True
 
-    if _ollama_is_hung(sess.host):
-        console.print(f"  [{SYS_COLOR}] .. [/{SYS_COLOR}]  Ollama hung — killing and restarting ...")
-        _kill_ollama()
+    st = sup.status()
+    if not sup.local:
+        console.print(f"  [{ERROR_COLOR}] !! [/{ERROR_COLOR}]  Ollama not reachable at {escape(sess.host)}"
+                      f" ({escape(st.error or 'no answer')}).")
+        console.print(f"  [{SYS_COLOR}]      It is not this machine — start it there, or /host <url>.[/{SYS_COLOR}]")
+        return False
+    if st.supervised and not sup.leading:
+        console.print(f"  [{SYS_COLOR}] .. [/{SYS_COLOR}]  Ollama {st.state} — pid {st.leader_pid} is supervising it; waiting ...")
+    elif st.state == "hung":
+        console.print(f"  [{SYS_COLOR}] .. [/{SYS_COLOR}]  Ollama not answering — checking ...")
     else:
         console.print(f"  [{SYS_COLOR}] .. [/{SYS_COLOR}]  Ollama not running — starting ...")
 
-    if _start_ollama_process(sess.host):
-        console.print(f"  [{sess.bot_color}] OK [/{sess.bot_color}]  Ollama started.")
+    st = sup.ensure()
+    if st.state == "busy":
+        console.print(f"  [{sess.bot_color}] OK [/{sess.bot_color}]  Ollama is up but slow to answer (busy).")
+        return True
+    if st.ready:
+        last = st.restarts[-1] if st.restarts else None
+        took = f" in {last.took_s:.1f} s" if last is not None and last.ok else ""
+        console.print(f"  [{sess.bot_color}] OK [/{sess.bot_color}]  Ollama started{took}.")
         return True
 
-    console.print(f"  [{ERROR_COLOR}] !! [/{ERROR_COLOR}]  Could not start Ollama automatically.")
+    console.print(f"  [{ERROR_COLOR}] !! [/{ERROR_COLOR}]  Could not start Ollama automatically"
+                  f"{': ' + escape(st.error) if st.error else '.'}")
     console.print(f"  [{SYS_COLOR}]      Install Ollama from  https://ollama.com[/{SYS_COLOR}]")
     console.print(f"  [{SYS_COLOR}]      Then type  /check  to retry.[/{SYS_COLOR}]")
     return False
 
 
 def _model_exists(host: str, model: str) -> bool:
-    """Return True if model (or prefix match) is in Ollama's local list."""
-    try:
-        r = requests.get(f"{host.rstrip('/')}/api/tags", timeout=3)
-        r.raise_for_status()
-        names = [m.get("name", "") for m in (r.json().get("models") or [])]
-        base = model.split(":")[0]
-        return any(n == model or n.startswith(base + ":") or n.split(":")[0] == base for n in names)
-    except Exception:
-        return False
+    """Return True if model (or a tag of the same base name) is in Ollama's local list."""
+    return probe_tags(host, timeout=3).has_model(model)
 
 
 def _find_modelfile() -> Optional[Path]:
@@ -282,6 +313,7 @@ def _ensure_model(sess: "Session") -> None:
     """
     if _model_exists(sess.host, sess.model):
         console.print(f"  [{sess.bot_color}] OK [/{sess.bot_color}]  Model '{sess.model}' ready.")
+        sess.preload()
         return
 
     console.print(f"  [{SYS_COLOR}] .. [/{SYS_COLOR}]  Model '{sess.model}' not found — fixing ...")
@@ -294,8 +326,10 @@ def _ensure_model(sess: "Session") -> None:
                 ["ollama", "create", sess.model, "-f", str(mf)],
                 capture_output=True, text=True,
             )
+            invalidate_probe(sess.host)   # model list changed (or may have)
             if result.returncode == 0:
                 console.print(f"  [{sess.bot_color}] OK [/{sess.bot_color}]  Model '{sess.model}' built.")
+                sess.preload()
                 return
         except Exception:
             pass
@@ -306,6 +340,7 @@ def _ensure_model(sess: "Session") -> None:
     if available:
         sess.model = available[0]
         console.print(f"  [{sess.bot_color}] >> [/{sess.bot_color}]  Using available model: {sess.model}")
+        sess.preload()
     else:
         console.print(
             f"  [{ERROR_COLOR}] !! [/{ERROR_COLOR}]  No models found.\n"
@@ -315,19 +350,55 @@ def _ensure_model(sess: "Session") -> None:
 
 # ── Public diagnostics entry (also called by /check and /host) ───────────────
 
-def run_startup_diagnostics(sess: "Session") -> None:
+def run_startup_diagnostics(sess: "Session", background: bool = False, fresh: bool = False) -> None:
     """
     Fully automatic Ollama + model check. No user prompts. No raw errors.
     Called at launch and on /check or /host.
+
+    Reachability, hung and model-present checks all answer from one cached
+    /api/tags probe.  When that probe says everything is fine we are done in a
+    single round-trip.  Otherwise the slow fix-ups (start/restart Ollama,
+    build or switch model) run on a background thread if background=True,
+    so the prompt appears right away; Session.ask waits for them to finish.
     """
     console.print(Rule(style=sess.bot_color))
     console.print(f"  [{SYS_COLOR}]Checking Ollama ...[/{SYS_COLOR}]")
+    if fresh:
+        invalidate_probe(sess.host)
 
-    ollama_ok = _ensure_ollama(sess)
-    if ollama_ok:
+    probe = probe_tags(sess.host)
+    if probe.ok and probe.has_model(sess.model):
+        _ensure_ollama(sess)
         _ensure_model(sess)
+        console.print(Rule(style=sess.bot_color))
+        return
+
+    def _fix() -> None:
+        try:
+            if _ensure_ollama(sess):
+                _ensure_model(sess)
+        finally:
+            console.print(Rule(style=sess.bot_color))
+            sess.ready.set()
+
+    sess.ready.clear()
+    if not background:
+        _fix()
+        return
+    console.print(
+        f"  [{SYS_COLOR}] .. [/{SYS_COLOR}]  Fixing in the background — start typing;"
+        f" messages wait until it finishes."
+    )
+    threading.Thread(target=_fix, name="startup-diagnostics", daemon=True).start()
 
-    console.print(Rule(style=sess.bot_color))
+
+def _warm_up(sess: "Session") -> None:
+    """Load what the first reply needs while the user is still typing it."""
+    try:
+        get_client(sess.host)                            # requests + the keep-alive session
+        importlib.import_module("bots.stream_markdown")  # rich.markdown, markdown_it
+    except Exception:
+        pass   # the first reply will import (and report) it instead
 
 
 # ── Session state ─────────────────────────────────────────────────────────────
@@ -341,6 +412,17 @@ class Session:
         bot_color: str,
         system_prompt: str,
         stream: bool = True,
+        ctx_budget: int = 0,
+        keep_last: int = 2,
+        summarize: bool = False,
+        telemetry: Optional[TelemetryLog] = None,
+        cache: Optional[ResponseCache] = None,
+        cache_time_scale: float = 0.0,
+        fanout: str = "",
+        fanout_concurrency: int = DEFAULT_CONCURRENCY,
+        log: Optional[SessionLog] = None,
+        markdown: bool = True,
+        on_cancel: str = ON_CANCEL,
     ):
         self.host          = host
         self.model         = model
@@ -348,43 +430,184 @@ class Session:
         self.bot_color     = hex_to_rich(bot_color)
         self.system_prompt = system_prompt
         self.stream        = stream
+        self.markdown      = markdown
         self.history: List[Dict[str, str]] = []
+        self.option_overrides: Dict[str, Any] = {}   # from the bot module's _options()
+        # Prompt budget defaults to whatever num_ctx leaves after the reply.
+        # Sized on first use (fit_window): profiling the model may ask Ollama,
+        # which must not delay the first prompt.
+        self.ctx_budget = ctx_budget           # 0 = follow num_ctx (which the profile sizes per model)
+        self.window = ContextWindow(keep_last=keep_last, summarize=summarize)
+        if ctx_budget:
+            self.window.budget = ctx_budget
+        self.telemetry  = telemetry if telemetry is not None else TelemetryLog()
+        self.last_stats: Optional[TurnStats] = None
+        self.cache            = cache          # None = response cache off
+        self.cache_time_scale = cache_time_scale
+        self.ready = threading.Event()         # cleared while diagnostics fix things up
+        self.ready.set()
+        self.fanout             = fanout       # "a,b,c" = every message goes to all of them
+        self.fanout_concurrency = fanout_concurrency
+        self.log = log                         # None = transcript not persisted
+        self.on_cancel = on_cancel             # Ctrl+C'd reply: "drop" it or "truncate" (keep, marked)
+
+    @property
+    def residency(self) -> ResidencyManager:
+        return get_residency(self.host)
+
+    def preload(self) -> None:
+        """Start loading the current model so the next message skips the cold load."""
+        self.residency.preload(self.model, self.options)   # same num_ctx etc. as ask() sends, or it reloads
 
     @property
     def options(self) -> Dict[str, Any]:
-        return {"temperature": 0.3, "top_p": 0.9, "num_ctx": 8192, "num_predict": 1024}
+        opts = profile_options(self.model, self.host)
+        opts.update(DEFAULT_OPTIONS)
+        opts.update(self.option_overrides)
+        return opts
+
+    def fit_window(self) -> ContextWindow:
+        """Size the context window to the current num_ctx (unless --ctx-budget) and return it."""
+        if not self.ctx_budget:
+            opts = self.options
+            self.window.budget = opts.get("num_ctx", MAX_NUM_CTX) - opts["num_predict"]
+        return self.window
 
     def messages(self, user_text: str) -> List[Dict[str, str]]:
-        msgs = [{"role": "system", "content": self.system_prompt}]
-        msgs += self.history
-        msgs.append({"role": "user", "content": user_text})
+        msgs, _ = self.fit_window().build(self.system_prompt, self.history, user_text)
         return msgs
 
     def ask(self, user_text: str) -> str:
+        if not self.ready.is_set():
+            with console.status(f"[{SYS_COLOR}]Waiting for Ollama diagnostics to finish…[/{SYS_COLOR}]"):
+                self.ready.wait()
         msgs = self.messages(user_text)
+        opts = self.options
+        meta: Dict[str, Any] = {}
+        t_start = time.perf_counter()
+        key, entry = self._cache_lookup(msgs, opts)
+        keep_alive = self.residency.keep_alive(self.model)
+        cancel = CancelToken()
         if self.stream:
             reply = stream_chat(
                 self.host, self.model, msgs,
-                self.options, self.bot_color, self.bot_name,
+                opts, self.bot_color, self.bot_name, meta=meta,
+                source=replay(entry, self.cache_time_scale) if entry else None,
+                markdown=self.markdown, keep_alive=keep_alive, cancel=cancel,
             )
         else:
-            with console.status(f"[{SYS_COLOR}]{self.bot_name} is thinking…[/{SYS_COLOR}]"):
-                reply = fetch_chat(self.host, self.model, msgs, self.options)
-            console.print(
-                Panel(
-                    Text(reply, style=Style(color=self.bot_color)),
-                    title=f"[bold {self.bot_color}]{self.bot_name}[/bold {self.bot_color}]",
-                    border_style=BORDER_DIM,
-                    padding=(0, 1),
+            if entry:
+                reply = entry["reply"]
+                meta["final"] = entry["final"]
+            else:
+                with console.status(f"[{SYS_COLOR}]{self.bot_name} is thinking…[/{SYS_COLOR}]"):
+                    reply = fetch_chat(
+                        self.host, self.model, msgs, opts, meta=meta, keep_alive=keep_alive, cancel=cancel,
+                    )
+            if not meta.get("cancelled"):
+                console.print(
+                    Panel(
+                        Text(reply, style=Style(color=self.bot_color)),
+                        title=f"[bold {self.bot_color}]{self.bot_name}[/bold {self.bot_color}]",
+                        border_style=BORDER_DIM,
+                        padding=(0, 1),
+                    )
                 )
-            )
+        if entry:
+            console.print(f"[{SYS_COLOR}]  (cached reply)[/{SYS_COLOR}]")
+        elif key and meta.get("final"):
+            # only complete replies are cached — cancelled ones have no final chunk
+            self.cache.put(key, self.model, reply, tokens=meta.get("tokens"), final=meta["final"])
+        self._record_stats(meta, t_start, cached=bool(entry))
+        if not entry:
+            self.residency.note_use(self.model, opts)
+        if meta.get("cancelled"):
+            if self.on_cancel != "truncate" or not reply:
+                console.print(f"[{SYS_COLOR}]  (cancelled — reply not kept)[/{SYS_COLOR}]")
+                return reply
+            reply += TRUNCATED_MARK
+            console.print(f"[{SYS_COLOR}]  (cancelled — partial reply kept as truncated)[/{SYS_COLOR}]")
         # commit to history
         self.history.append({"role": "user",      "content": user_text})
         self.history.append({"role": "assistant",  "content": reply})
+        if self.log is not None:
+            self.log.append_turn(
+                self.model, self.system_prompt, opts, user_text, reply,
+                self.last_stats.to_dict() if self.last_stats else None,
+            )
         return reply
 
+    def ask_fanout(self, user_text: str, spec: str = "") -> List[FanoutResult]:
+        """
+        Stream user_text to every target in spec (default: self.fanout) in
+        parallel.  Each target sees its own system prompt plus this session's
+        history; the replies are for comparison and are not added to history.
+        """
+        if not self.ready.is_set():
+            with console.status(f"[{SYS_COLOR}]Waiting for Ollama diagnostics to finish…[/{SYS_COLOR}]"):
+                self.ready.wait()
+        targets = resolve_targets(spec or self.fanout, self.system_prompt, self.model)
+        if not targets:
+            return []
+        # every target is profiled for itself and gets a window sized to its own num_ctx
+        per_target = {id(t): self._fanout_setup(t) for t in targets}
+        results = fanout(
+            self.host, targets,
+            lambda t: per_target[id(t)][1].build(t.system_prompt, self.history, user_text)[0],
+            lambda t: per_target[id(t)][0],
+            concurrency=self.fanout_concurrency,
+        )
+        for r in results:
+            if r.stats is not None:
+                self.telemetry.record(r.stats)
+        return results
+
+    def _fanout_setup(self, t: FanoutTarget) -> Tuple[Dict[str, Any], ContextWindow]:
+        """(options, window) for one fan-out target: its own profile under this session's options."""
+        opts = apply_profile({**DEFAULT_OPTIONS, **self.option_overrides}, t.model, self.host)
+        budget = self.ctx_budget or opts.get("num_ctx", MAX_NUM_CTX) - opts["num_predict"]
+        return opts, ContextWindow(budget=budget, keep_last=self.window.keep_last, summarize=self.window.summarize)
+
+    def _cache_lookup(self, msgs, opts):
+        """Return (key, entry): key is None when the cache is off or bypassed."""
+        if self.cache is None:
+            return None, None
+        if self.cache.should_bypass(opts):
+            self.cache.note_bypass()
+            return None, None
+        key = self.cache.key(self.host, self.model, msgs, opts)
+        return key, self.cache.get(key)
+
+    def _record_stats(self, meta: Dict[str, Any], t_start: float, cached: bool = False) -> None:
+        self.last_stats = TurnStats.from_response(
+            meta.get("final"),
+            model=self.model,
+            t_start=t_start,
+            t_end=time.perf_counter(),
+            t_first=meta.get("t_first"),
+            host=self.host,
+            bot=self.bot_name,
+            stream=self.stream,
+            cached=cached,
+        )
+        self.telemetry.record(self.last_stats)
+
     def clear(self):
         self.history.clear()
+        self.window.reset()
+        if self.log is not None:
+            self.log.mark_clear()
+
+    def load(self, path: Path) -> LoadedSession:
+        """Replace history with the tail of a saved transcript and keep appending to it."""
+        loaded = load_tail(path, self.fit_window().budget, self.window.keep_last, counter=self.window.counter)
+        self.history = loaded.history
+        self.window.reset()
+        self.system_prompt = loaded.system_prompt or self.system_prompt
+        self.model         = loaded.model or self.model
+        header = {k: v for k, v in loaded.header.items() if k not in ("type", "created")}
+        self.log = SessionLog(path, header=header)
+        return loaded
 
 
 # ── Print helpers ─────────────────────────────────────────────────────────────
@@ -419,15 +642,24 @@ def print_help(bot_color: str):
         ("/reset",         "Reset history + model + system prompt"),
         ("/history",       "Print conversation history"),
         ("/info",          "Show current session info"),
+        ("/stats [all]",   "TTFT / tokens-per-sec p50+p95 per model"),
+        ("/cache <cmd>",   "Response cache: stats | clear | on | off"),
+        ("/fanout <a,b> [msg]", "Send to several models/bots at once (no msg = mode, off = stop)"),
+        ("/save <name>",   "Keep this session's transcript under a name (/save! replaces one)"),
+        ("/load [name]",   "Reopen a saved session (no name = list saved sessions)"),
         ("/model <name>",  "Switch Ollama model"),
         ("/models",        "List available Ollama models"),
-        ("/host <url>",    "Switch Ollama host and re-run diagnostics"),
+        ("/host <url>",    "Switch Ollama host(s) and re-run diagnostics (a,b = load-balance)"),
+        ("/hosts",         "Health, in-flight requests and latency per host"),
+        ("/markdown on|off", "Live Markdown rendering while streaming"),
+        ("/ps",            "Resident models: VRAM, time to unload, pinned"),
+        ("/bench [models] [--runs N] [--num_ctx a,b]", "Benchmark models / options on a fixed suite (table + CSV)"),
         ("/system <text>", "Replace system prompt for this session"),
         ("/color <hex>",   "Change bot response color (#RRGGBB)"),
         ("/bot <id>",      "Switch to another registered bot"),
     ]
     lines = [
-        f"  [{CMD_COLOR}]{cmd:<22}[/{CMD_COLOR}] [{SYS_COLOR}]{desc}[/{SYS_COLOR}]"
+        f"  [{CMD_COLOR}]{escape(f'{cmd:<22}')}[/{CMD_COLOR}] [{SYS_COLOR}]{desc}[/{SYS_COLOR}]"
         for cmd, desc in cmds
     ]
     console.print(
@@ -441,13 +673,20 @@ def print_help(bot_color: str):
 
 
 def print_info(sess: Session):
+    opts = sess.options
     lines = [
         f"  [{SYS_COLOR}]Host:[/{SYS_COLOR}]    [{sess.bot_color}]{sess.host}[/{sess.bot_color}]",
+        f"  [{SYS_COLOR}]Ollama:[/{SYS_COLOR}]  [{sess.bot_color}]{escape(get_supervisor(sess.host).status().describe())}"
+        f"[/{sess.bot_color}]",
         f"  [{SYS_COLOR}]Model:[/{SYS_COLOR}]   [{sess.bot_color}]{sess.model}[/{sess.bot_color}]",
         f"  [{SYS_COLOR}]Bot:[/{SYS_COLOR}]     [{sess.bot_color}]{sess.bot_name}[/{sess.bot_color}]",
         f"  [{SYS_COLOR}]Color:[/{SYS_COLOR}]   [{sess.bot_color}]{sess.bot_color}[/{sess.bot_color}]",
-        f"  [{SYS_COLOR}]Stream:[/{SYS_COLOR}]  [{sess.bot_color}]{sess.stream}[/{sess.bot_color}]",
+        f"  [{SYS_COLOR}]Stream:[/{SYS_COLOR}]  [{sess.bot_color}]{sess.stream}[/{sess.bot_color}]"
+        f"  [{SYS_COLOR}]• Ctrl+C:[/{SYS_COLOR}] [{sess.bot_color}]{sess.on_cancel}[/{sess.bot_color}]",
         f"  [{SYS_COLOR}]History:[/{SYS_COLOR}] [{sess.bot_color}]{len(sess.history) // 2} turns[/{sess.bot_color}]",
+        f"  [{SYS_COLOR}]Context:[/{SYS_COLOR}] [{sess.bot_color}]{_context_usage(sess)}[/{sess.bot_color}]",
+        f"  [{SYS_COLOR}]Options:[/{SYS_COLOR}] [{sess.bot_color}]"
+        + "  ".join(f"{k}={opts[k]}" for k in PROFILE_KEYS if k in opts) + f"[/{sess.bot_color}]",
         f"  [{SYS_COLOR}]System:[/{SYS_COLOR}]  {escape(sess.system_prompt[:80])}…",
     ]
     console.print(
@@ -460,6 +699,278 @@ def print_info(sess: Session):
     )
 
 
+def _context_usage(sess: Session) -> str:
+    """Token usage of the payload the next turn would send (empty user message)."""
+    _, u = sess.fit_window().build(sess.system_prompt, sess.history, "")
+    text = f"~{u.total} / {u.budget} tokens ({u.pct:.0f}%)"
+    if u.dropped_turns:
+        text += f"  •  {u.dropped_turns} old turns trimmed"
+        if u.summary:
+            text += f", summarized in ~{u.summary}"
+    return text
+
+
+def _fmt_metric(value: Optional[float], unit: str) -> str:
+    if value is None:
+        return "—"
+    if unit == "s":
+        return f"{value:.2f}"
+    return f"{value:,.0f}" if unit == "tok" else f"{value:,.1f}"
+
+
+def print_stats(sess: Session, everything: bool = False):
+    records = sess.telemetry.load_all() if everything else sess.telemetry.records
+    agg = sess.telemetry.aggregate(records)
+    if not agg:
+        console.print(f"[{SYS_COLOR}]  (no completed turns yet)[/{SYS_COLOR}]")
+        return
+    table = Table(
+        title=f"Generation stats — {'all logged sessions' if everything else 'this session'} (p50 / p95)",
+        border_style=BORDER_DIM,
+        header_style=f"bold {sess.bot_color}",
+    )
+    table.add_column("Model")
+    table.add_column("Turns", justify="right")
+    for _, label, unit in METRICS:
+        table.add_column(f"{label}\n{unit}", justify="right")
+    for model, row in agg.items():
+        cells = [model, str(row["n"])]
+        for key, _, unit in METRICS:
+            p50, p95 = row[key]
+            cells.append(f"{_fmt_metric(p50, unit)} / {_fmt_metric(p95, unit)}")
+        table.add_row(*cells)
+    console.print(table)
+    if not everything:
+        console.print(f"[{SYS_COLOR}]  Log: {sess.telemetry.path}[/{SYS_COLOR}]")
+
+
+def print_fanout_summary(sess: Session, results: List[FanoutResult]):
+    table = Table(
+        title="Fan-out summary",
+        border_style=BORDER_DIM,
+        header_style=f"bold {sess.bot_color}",
+    )
+    for col in ("Target", "Model", "TTFT\ns", "Decode\ntok/s", "Tokens", "Total\ns"):
+        table.add_column(col, justify="left" if col in ("Target", "Model") else "right")
+    for r in results:
+        st = r.stats
+        if st is None:
+            table.add_row(r.target.label, r.target.model, "—", "—", "—", "cancelled")
+            continue
+        total = "error" if r.error else "cancelled" if r.cancelled else _fmt_metric(st.total_s, "s")
+        table.add_row(
+            f"[{hex_to_rich(r.target.color)}]{escape(r.target.label)}[/]",
+            escape(r.target.model),
+            _fmt_metric(st.ttft_s, "s"),
+            _fmt_metric(st.decode_tps, "tok/s"),
+            _fmt_metric(st.eval_tokens, "tok"),
+            total,
+        )
+    console.print(table)
+
+
+def run_fanout(sess: Session, text: str, spec: str = ""):
+    results = sess.ask_fanout(text, spec)
+    if not results:
+        console.print(f"[{ERROR_COLOR}]  No fan-out targets.  Usage: /fanout model1,model2 \\[message][/{ERROR_COLOR}]")
+        return
+    print_fanout_summary(sess, results)
+
+
+def save_session(sess: Session, name: str, overwrite: bool = False):
+    if not name:
+        console.print(f"[{ERROR_COLOR}]  Usage: /save <name>  (/save! <name> replaces a saved one)[/{ERROR_COLOR}]")
+        return
+    dest = session_path(name)
+    if dest.exists() and not overwrite and (sess.log is None or dest != sess.log.path):
+        console.print(f"[{ERROR_COLOR}]  A session named '{escape(name)}' is already saved — "
+                      f"/save! {escape(name)} replaces it[/{ERROR_COLOR}]")
+        return
+    if sess.log is None:
+        dest.unlink(missing_ok=True)   # replaced, not appended to: the transcript starts with our header
+        sess.log = SessionLog(dest, header=_log_header(sess))
+        for i in range(0, len(sess.history) - 1, 2):
+            sess.log.append_turn(sess.model, sess.system_prompt, sess.options,
+                                 sess.history[i]["content"], sess.history[i + 1]["content"])
+        path = sess.log.path
+    else:
+        path = sess.log.save_as(name, overwrite=overwrite)
+    console.print(f"[{SYS_COLOR}]  Saved → {escape(str(path))}  (new turns keep appending)[/{SYS_COLOR}]")
+
+
+def load_session(sess: Session, name: str):
+    if not name:
+        saved = list_sessions()
+        if not saved:
+            console.print(f"[{SYS_COLOR}]  (no saved sessions)[/{SYS_COLOR}]")
+            return
+        console.print(
+            Panel(
+                "\n".join(
+                    f"  [{sess.bot_color}]•[/{sess.bot_color}] {escape(p.stem):<32}"
+                    f" [{SYS_COLOR}]{time.strftime('%Y-%m-%d %H:%M', time.localtime(p.stat().st_mtime))}"
+                    f"  {p.stat().st_size / 1024:.0f} KiB[/{SYS_COLOR}]"
+                    for p in saved[:20]
+                ),
+                title="Saved Sessions",
+                border_style=BORDER_DIM,
+            )
+        )
+        return
+    path = session_path(name)
+    if not path.exists():
+        console.print(f"[{ERROR_COLOR}]  No saved session '{escape(name)}'  (/load lists them)[/{ERROR_COLOR}]")
+        return
+    loaded = sess.load(path)
+    note = "  (older turns left on disk)" if loaded.truncated else ""
+    console.print(
+        f"[{SYS_COLOR}]  Loaded [{sess.bot_color}]{escape(path.stem)}[/{sess.bot_color}]:"
+        f" {loaded.turns} turns, model {escape(sess.model)}{note}[/{SYS_COLOR}]"
+    )
+
+
+def _log_header(sess: Session) -> Dict[str, Any]:
+    return {"host": sess.host, "model": sess.model, "bot": sess.bot_name, "system": sess.system_prompt}
+
+
+def print_hosts(sess: Session):
+    if not is_multi_host(sess.host):
+        p = probe_tags(sess.host)
+        state = "up" if p.ok else ("busy" if p.stalled else "hung" if p.hung else "down")
+        console.print(f"[{SYS_COLOR}]  Single host {sess.host}: {state}.  /host a,b to load-balance.[/{SYS_COLOR}]")
+        return
+    table = Table(title="Ollama hosts", border_style=BORDER_DIM, header_style=f"bold {sess.bot_color}")
+    for col in ("Host", "State", "In flight", "Requests", "Failures", "TTFB ms", "Models", "Last error"):
+        table.add_column(col, justify="left" if col in ("Host", "State", "Last error") else "right")
+    for r in get_client(sess.host).status():
+        if r["healthy"]:
+            state = f"[{sess.bot_color}]up[/{sess.bot_color}]"
+        elif r["cooldown_s"]:
+            state = f"[{ERROR_COLOR}]down {r['cooldown_s']:.0f}s[/{ERROR_COLOR}]"
+        else:
+            state = f"[{ERROR_COLOR}]down[/{ERROR_COLOR}]"
+        table.add_row(
+            r["host"], state, str(r["in_flight"]), str(r["requests"]), str(r["failures"]),
+            _fmt_metric(r["ewma_ms"], "tok"), "—" if r["models"] is None else str(r["models"]),
+            escape(r["last_error"][:40]),
+        )
+    console.print(table)
+
+
+def print_resident(sess: Session):
+    res = sess.residency
+    rows = res.ps(max_age=0)
+    if not rows:
+        console.print(f"[{SYS_COLOR}]  No models loaded on {sess.host}.[/{SYS_COLOR}]")
+        return
+    table = Table(title="Resident models", border_style=BORDER_DIM, header_style=f"bold {sess.bot_color}")
+    for col in ("Model", "Host", "VRAM MB", "Size MB", "Unloads in", "Keep-alive"):
+        table.add_column(col, justify="right" if col.endswith("MB") else "left")
+    for m in rows:
+        left = m.expires_in_s
+        expiry = "never" if left is None else (f"{left / 60:.0f} min" if left >= 90 else f"{left:.0f} s")
+        ka = "pinned" if m.pinned else str(res.keep_alive(m.name))
+        table.add_row(m.name, m.host, f"{m.vram_mb:.0f}", f"{m.size_mb:.0f}", expiry, ka)
+    console.print(table)
+    budget = res.vram_budget_mb()
+    if res.policy.pin_n:
+        console.print(
+            f"[{SYS_COLOR}]  Pinning the {res.policy.pin_n} most used model(s) within "
+            f"{'an unknown' if budget is None else f'{budget} MB of'} VRAM budget.[/{SYS_COLOR}]"
+        )
+
+
+def run_bench_command(sess: Session, arg: str):
+    """/bench [models] [--runs N] [--num_ctx a,b] [--opt k=v,..] — same flags as python -m bots.model_bench."""
+    from bots import model_bench
+    try:
+        args  = model_bench.parse_bench_args(arg)
+        grid  = model_bench.grid_from_args(args)
+    except ValueError as exc:
+        if str(exc):
+            console.print(f"[{ERROR_COLOR}]  {escape(str(exc))}  (/bench -h for help)[/{ERROR_COLOR}]")
+        return
+    host    = args.host or sess.host
+    models  = [m.strip() for m in (args.models or sess.model).split(",") if m.strip()]
+    probe   = probe_tags(host)
+    missing = [m for m in models if not probe.has_model(m)]
+    if not probe.ok or missing:
+        what = f"model(s) not found: {', '.join(missing)}" if probe.ok else f"Ollama not reachable at {host}"
+        console.print(f"[{ERROR_COLOR}]  Bench: {escape(what)}[/{ERROR_COLOR}]")
+        return
+    prompts = model_bench.suite_from_args(args)
+    combos  = len(model_bench.expand_grid(sess.options, grid))
+    console.print(
+        f"[{SYS_COLOR}]  Bench: {len(models)} model(s) × {combos} option set(s) × {len(prompts)} prompts"
+        f" × {args.runs} runs  (seed {args.seed}, Ctrl+C to stop)[/{SYS_COLOR}]"
+    )
+
+    def _progress(r: model_bench.BenchRun) -> None:
+        mark = f"[{sess.bot_color}]ok[/{sess.bot_color}]" if r.ok else f"[{ERROR_COLOR}]!![/{ERROR_COLOR}]"
+        console.print(
+            f"  {mark} [{SYS_COLOR}]{escape(r.model)}  {escape(r.options)}  run {r.run}  {escape(r.prompt):<22}"
+            f" TTFT {_fmt_metric(r.ttft_s, 's')} s{' (cold)' if r.cold else ''}[/{SYS_COLOR}]"
+            + (f"  [{ERROR_COLOR}]{escape(r.error)}[/{ERROR_COLOR}]" if r.error else "")
+        )
+
+    try:
+        rows = model_bench.run_bench(
+            host, models, prompts, sess.options, grid, runs=max(1, args.runs), seed=args.seed,
+            cold=not args.no_cold, on_run=_progress,
+        )
+    except KeyboardInterrupt:
+        console.print(f"[{SYS_COLOR}]  Bench interrupted.[/{SYS_COLOR}]")
+        return
+    table = Table(title="Bench", border_style=BORDER_DIM, header_style=f"bold {sess.bot_color}")
+    for key, header, _ in model_bench.COLUMNS:
+        table.add_column(header, justify="left" if key in ("model", "options") else "right")
+    for row in rows:
+        table.add_row(*(escape(model_bench.cell(row, k, f)) for k, _, f in model_bench.COLUMNS))
+    console.print(table)
+    summary, runs = model_bench.write_csv(Path(args.csv) if args.csv else model_bench.default_csv_path(), rows)
+    console.print(f"[{SYS_COLOR}]  CSV: {escape(str(summary))}  (per request: {escape(runs.name)})[/{SYS_COLOR}]")
+
+
+def print_cache(sess: Session, arg: str):
+    sub = (arg or "stats").lower()
+    if sub == "on":
+        sess.cache = sess.cache or get_cache()
+        console.print(f"[{SYS_COLOR}]  Response cache on.[/{SYS_COLOR}]")
+        return
+    if sub == "off":
+        sess.cache = None
+        console.print(f"[{SYS_COLOR}]  Response cache off.[/{SYS_COLOR}]")
+        return
+    cache = sess.cache or get_cache()
+    if sub == "clear":
+        n = cache.clear()
+        console.print(f"[{SYS_COLOR}]  Cleared {n} cached replies.[/{SYS_COLOR}]")
+        return
+    if sub != "stats":
+        console.print(f"[{ERROR_COLOR}]  Usage: /cache stats|clear|on|off[/{ERROR_COLOR}]")
+        return
+    st = cache.stats()
+    rate = f"{st['hit_rate'] * 100:.0f}%" if st["hit_rate"] is not None else "—"
+    lines = [
+        f"  [{SYS_COLOR}]Enabled:[/{SYS_COLOR}]  [{sess.bot_color}]{sess.cache is not None}[/{sess.bot_color}]",
+        f"  [{SYS_COLOR}]Entries:[/{SYS_COLOR}]  [{sess.bot_color}]{st['entries']}[/{sess.bot_color}]"
+        f"  [{SYS_COLOR}]({st['bytes'] / 1024:.0f} KiB of {st['max_bytes'] / 1048576:.0f} MiB)[/{SYS_COLOR}]",
+        f"  [{SYS_COLOR}]Session:[/{SYS_COLOR}]  [{sess.bot_color}]{st['hits']} hits / {st['misses']} misses ({rate})"
+        f", {st['bypassed']} bypassed[/{sess.bot_color}]",
+        f"  [{SYS_COLOR}]TTL:[/{SYS_COLOR}]      [{sess.bot_color}]{st['ttl_hours']:g} h[/{sess.bot_color}]"
+        if st["ttl_hours"] else f"  [{SYS_COLOR}]TTL:[/{SYS_COLOR}]      none",
+        f"  [{SYS_COLOR}]File:[/{SYS_COLOR}]     {escape(st['path'])}",
+    ]
+    console.print(
+        Panel(
+            "\n".join(lines),
+            title=f"[bold {sess.bot_color}]Response Cache[/bold {sess.bot_color}]",
+            border_style=BORDER_DIM,
+            padding=(0, 1),
+        )
+    )
+
+
 def print_history(sess: Session):
     if not sess.history:
         console.print(f"[{SYS_COLOR}]  (no history yet)[/{SYS_COLOR}]")
@@ -503,12 +1014,42 @@ def handle_command(line: str, sess: Session, default_system: str) -> bool:
     elif cmd == "/info":
         print_info(sess)
 
+    elif cmd == "/stats":
+        print_stats(sess, everything=(arg.lower() == "all"))
+
+    elif cmd == "/cache":
+        print_cache(sess, arg)
+
+    elif cmd in ("/save", "/save!"):
+        save_session(sess, arg, overwrite=cmd == "/save!")
+
+    elif cmd == "/load":
+        load_session(sess, arg)
+
+    elif cmd == "/fanout":
+        spec, _, text = arg.partition(" ")
+        if not spec:
+            state = f"on → {sess.fanout}" if sess.fanout else "off"
+            console.print(f"[{SYS_COLOR}]  Fan-out {state}.  Usage: /fanout a,b \\[message] | off[/{SYS_COLOR}]")
+        elif spec.lower() == "off":
+            sess.fanout = ""
+            console.print(f"[{SYS_COLOR}]  Fan-out off.[/{SYS_COLOR}]")
+        elif text.strip():
+            console.print(Rule(style=BORDER_DIM))
+            run_fanout(sess, text.strip(), spec)
+            console.print(Rule(style=BORDER_DIM))
+        else:
+            sess.fanout = spec
+            console.print(f"[{SYS_COLOR}]  Fan-out on → [{sess.bot_color}]{escape(spec)}[/{sess.bot_color}]"
+                          f"  (/fanout off to stop)[/{SYS_COLOR}]")
+
     elif cmd == "/model":
         if not arg:
             console.print(f"[{ERROR_COLOR}]  Usage: /model <model-name>[/{ERROR_COLOR}]")
         else:
             sess.model = arg
             console.print(f"[{SYS_COLOR}]  Model → [{sess.bot_color}]{arg}[/{sess.bot_color}][/{SYS_COLOR}]")
+            sess.preload()
 
     elif cmd == "/models":
         names = ollama_models(sess.host)
@@ -544,15 +1085,33 @@ def handle_command(line: str, sess: Session, default_system: str) -> bool:
             _switch_bot(arg, sess)
 
     elif cmd == "/check":
-        run_startup_diagnostics(sess)
+        run_startup_diagnostics(sess, fresh=True)
+
+    elif cmd == "/markdown":
+        if arg.lower() in ("on", "off"):
+            sess.markdown = arg.lower() == "on"
+        state = "on" if sess.markdown else "off"
+        note = "" if console.is_terminal else "  (not a terminal — streaming stays raw)"
+        console.print(f"[{SYS_COLOR}]  Markdown rendering {state}.{note}[/{SYS_COLOR}]")
+
+    elif cmd == "/hosts":
+        print_hosts(sess)
+
+    elif cmd == "/ps":
+        print_resident(sess)
+
+    elif cmd == "/bench":
+        run_bench_command(sess, arg)
 
     elif cmd == "/host":
         if not arg:
-            console.print(f"[{ERROR_COLOR}]  Usage: /host http://<ip>:11434[/{ERROR_COLOR}]")
+            console.print(f"[{ERROR_COLOR}]  Usage: /host http://<ip>:11434\\[,http://<ip2>:11434][/{ERROR_COLOR}]")
         else:
+            policy    = sess.residency.policy   # --keep-alive / --pin carry over
             sess.host = arg.rstrip("/")
+            sess.residency.policy = policy
             console.print(f"  [{SYS_COLOR}]Host -> [{sess.bot_color}]{sess.host}[/{sess.bot_color}][/{SYS_COLOR}]")
-            run_startup_diagnostics(sess)
+            run_startup_diagnostics(sess, fresh=True)
 
     else:
         console.print(f"[{ERROR_COLOR}]  Unknown command: {escape(cmd)}  (try /help)[/{ERROR_COLOR}]")
@@ -575,14 +1134,68 @@ def _switch_bot(bot_id: str, sess: Session):
         meta = reg[bot_id]
         sess.bot_name  = meta.name
         sess.bot_color = hex_to_rich(meta.color)
+        sess.model     = model_for_bot(bot_id, sess.model)
         sess.clear()
         console.print(
-            f"[{sess.bot_color}]  Switched to {meta.name}  ({bot_id})[/{sess.bot_color}]"
+            f"[{sess.bot_color}]  Switched to {meta.name}  ({bot_id}, {sess.model})[/{sess.bot_color}]"
         )
+        sess.preload()
     except Exception as exc:
         console.print(f"[{ERROR_COLOR}]  Could not switch bot: {escape(str(exc))}[/{ERROR_COLOR}]")
 
 
+# ── Batch mode ────────────────────────────────────────────────────────────────
+
+def run_batch_mode(sess: Session, prompts_file: str, out: str, concurrency: int, chain: bool) -> int:
+    """Run a prompt file without the REPL. Returns a process exit code."""
+    from bots.batch import load_prompts, run_batch
+    try:
+        items = load_prompts(prompts_file)
+    except (OSError, ValueError, KeyError) as exc:
+        console.print(f"[{ERROR_COLOR}]Cannot read {escape(prompts_file)}: {escape(str(exc))}[/{ERROR_COLOR}]")
+        return 2
+    probe = probe_tags(sess.host)
+    if not probe.ok:
+        console.print(f"[{ERROR_COLOR}]Ollama not reachable at {sess.host}[/{ERROR_COLOR}]")
+        return 2
+    missing = sorted(m for m in {i.model or sess.model for i in items} if not probe.has_model(m))
+    if missing:
+        console.print(f"[{ERROR_COLOR}]Model(s) not found on {sess.host}: {escape(', '.join(missing))}[/{ERROR_COLOR}]")
+        return 2
+
+    out_path = Path(out) if out else Path(prompts_file).with_suffix(".results.jsonl")
+    mode = "chained conversation" if chain else f"independent, concurrency {concurrency}"
+    console.print(
+        f"[{sess.bot_color}]  Batch[/{sess.bot_color}] [{SYS_COLOR}]{len(items)} prompts → {sess.model}"
+        f"  ({mode})  •  {escape(str(out_path))}[/{SYS_COLOR}]"
+    )
+    done = [0]
+
+    def _progress(rec: Dict[str, Any], st: TurnStats) -> None:
+        done[0] += 1
+        st.bot = sess.bot_name
+        sess.telemetry.record(st)
+        mark = f"[{sess.bot_color}]ok[/{sess.bot_color}]" if rec["ok"] else f"[{ERROR_COLOR}]!![/{ERROR_COLOR}]"
+        console.print(
+            f"  {mark} [{SYS_COLOR}][{done[0]:>{len(str(len(items)))}}/{len(items)}] "
+            f"{_fmt_metric(rec['total_s'], 's')} s  {_fmt_metric(rec['eval_tokens'], 'tok')} tok"
+            f"  {escape(rec['id'])}[/{SYS_COLOR}]"
+            + (f"  [{ERROR_COLOR}]{escape(rec['error'])}[/{ERROR_COLOR}]" if rec["error"] else "")
+        )
+
+    summary = run_batch(
+        sess.host, items, sess.model, sess.system_prompt, sess.options, out_path,
+        concurrency=concurrency, chain=chain, window=sess.fit_window(), on_result=_progress,
+    )
+    console.print(
+        f"[{sess.bot_color}]  Done[/{sess.bot_color}] [{SYS_COLOR}]{summary.ok}/{summary.total} ok in "
+        f"{summary.wall_s:.2f} s  •  latency p50/p95 {_fmt_metric(summary.latency_p50, 's')} / "
+        f"{_fmt_metric(summary.latency_p95, 's')} s  •  TTFT p50 {_fmt_metric(summary.ttft_p50, 's')} s"
+        f"  •  {_fmt_metric(summary.tokens_per_s, 'tok/s')} tok/s aggregate[/{SYS_COLOR}]"
+    )
+    return 0 if summary.ok == summary.total else 1
+
+
 # ── Main REPL ─────────────────────────────────────────────────────────────────
 
 def main():
@@ -592,13 +1205,65 @@ def main():
     )
     ap.add_argument("--bot",      default="",         help="Bot ID from registry (sets name + color)")
     ap.add_argument("--model",    default="",         help="Ollama model tag (default: hub-assistant)")
-    ap.add_argument("--host",     default="",         help="Ollama host URL")
+    ap.add_argument("--host",     default="",         help="Ollama host URL (comma-separate several to load-balance)")
     ap.add_argument("--color",    default="",         help="Bot response color (#RRGGBB)")
     ap.add_argument("--system",   default="",         help="Override system prompt")
     ap.add_argument("--no-stream", action="store_true", help="Disable token streaming")
+    ap.add_argument("--no-markdown", action="store_true", help="Stream raw text instead of live Markdown")
+    ap.add_argument("--ctx-budget", type=int, default=0, help="Prompt token budget per turn (default: num_ctx - num_predict)")
+    ap.add_argument("--keep-last", type=int, default=2, help="Exchanges always kept verbatim (default: 2)")
+    ap.add_argument("--summarize", action="store_true", help="Replace trimmed turns with a rolling summary")
+    ap.add_argument("--cache", action="store_true", help="Enable the disk response cache")
+    ap.add_argument("--cache-bypass-sampling", action="store_true", help="Skip the cache when temperature > 0")
+    ap.add_argument("--cache-time-scale", type=float, default=0.0, help="Replay speed for cached streams (0 = instant, 1 = original)")
+    ap.add_argument("--fanout", default="", help="Send every message to these comma-separated models/bots")
+    ap.add_argument("--fanout-concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Parallel fan-out streams (default: 4)")
+    ap.add_argument("--resume", nargs="?", const="", default=None, metavar="NAME", help="Reopen a saved session (default: the most recent)")
+    ap.add_argument("--no-log", action="store_true", help="Do not write this session's transcript to data/sessions")
+    ap.add_argument("--batch", default="", metavar="FILE", help="Run prompts from a .txt/.jsonl file without the REPL")
+    ap.add_argument("--concurrency", type=int, default=1, help="Batch prompts in flight at once (default: 1)")
+    ap.add_argument("--chain", action="store_true", help="Batch prompts form one conversation (sent in order)")
+    ap.add_argument("--out", default="", help="Batch results JSONL (default: <prompts>.results.jsonl)")
+    ap.add_argument("--keep-alive", default="", help="keep_alive sent with every request (e.g. 30m, 2h, -1)")
+    ap.add_argument("--pin", type=int, default=None, metavar="N", help="Pin the N most used models that fit in VRAM")
+    ap.add_argument("--on-cancel", choices=("drop", "truncate"), default=ON_CANCEL,
+                    help="Ctrl+C'd replies: drop them (default) or keep them marked [truncated]")
+    ap.add_argument("--serve", nargs="?", const="0.0.0.0", default=None, metavar="ADDR",
+                    help="Host IRC-style channels (one per bot) for other sandboxes to --connect to")
+    ap.add_argument("--connect", default="", metavar="ADDR", help="Join a --serve chat server (host[:port])")
+    ap.add_argument("--nick", default="", help="Nick on the chat server (default: your login)")
+    ap.add_argument("--parallel", type=int, default=None,
+                    help="--serve: Ollama requests in flight at once (default: 4 or CITL_CHAT_PARALLEL; match OLLAMA_NUM_PARALLEL)")
+    ap.add_argument("--profile-startup", action="store_true",
+                    help="Print an import-time breakdown and startup phases at the first prompt")
     args = ap.parse_args()
+    if args.profile_startup:
+        startup_profile.start()   # no-op if sandbox.py started it before importing us
+    startup_profile.mark("arguments parsed")
+
+    if args.connect:
+        from bots import chat_server
+        nick = args.nick or os.environ.get("USER") or os.environ.get("USERNAME") or "student"
+        channel = f"#{args.bot}" if args.bot else chat_server.LOBBY
+        sys.exit(chat_server.run_client(args.connect, nick, channel, console))
 
     host          = args.host   or DEFAULT_HOST
+    if args.serve is not None:
+        from bots import chat_server
+
+        def _ready(srv: "chat_server.ChatServer") -> None:
+            console.print(
+                f"[{DEFAULT_COLOR}]  Chat server on port {srv.port}[/{DEFAULT_COLOR}] [{SYS_COLOR}]— "
+                f"{len(srv.channels)} channels, Ollama {escape(host)}, {srv.parallel} in flight. "
+                f"Students: --connect <this machine>:{srv.port}  •  Ctrl+C stops[/{SYS_COLOR}]"
+            )
+        sys.exit(chat_server.serve(
+            host, args.serve, on_ready=_ready, options=DEFAULT_OPTIONS,
+            default_model=args.model or DEFAULT_MODEL, default_system=args.system or DEFAULT_SYSTEM,
+            parallel=args.parallel or chat_server.DEFAULT_PARALLEL, telemetry=TelemetryLog(),
+        ))
+    # Start the /api/tags probe now so it overlaps registry + bot module loading.
+    threading.Thread(target=probe_tags, args=(host,), daemon=True).start()
     model         = args.model  or DEFAULT_MODEL
     bot_name      = "Hub Assistant"
     bot_color     = args.color  or DEFAULT_COLOR
@@ -620,18 +1285,21 @@ def main():
         except Exception as exc:
             console.print(f"[{ERROR_COLOR}]Registry error: {escape(str(exc))}[/{ERROR_COLOR}]")
 
-    # Try to also load BOT_SYSTEM from the bot module if it defines one
-    if args.bot and not args.system:
+    # Try to also load BOT_SYSTEM / MODEL / _options() from the bot module if it defines them
+    bot_options = None
+    if args.bot:
         try:
             import importlib
             mod = importlib.import_module(f"bots.{args.bot}")
-            if hasattr(mod, "BOT_SYSTEM"):
+            if hasattr(mod, "BOT_SYSTEM") and not args.system:
                 system_prompt = mod.BOT_SYSTEM
             if hasattr(mod, "MODEL") and not args.model:
                 model = mod.MODEL
+            bot_options = getattr(mod, "_options", None)
         except Exception:
             pass
 
+    startup_profile.mark("bot loaded")
     sess = Session(
         host=host,
         model=model,
@@ -639,12 +1307,50 @@ def main():
         bot_color=bot_color,
         system_prompt=system_prompt,
         stream=not args.no_stream,
+        markdown=not args.no_markdown,
+        ctx_budget=args.ctx_budget,
+        keep_last=args.keep_last,
+        summarize=args.summarize,
+        cache=get_cache() if args.cache else None,
+        cache_time_scale=args.cache_time_scale,
+        fanout=args.fanout,
+        fanout_concurrency=args.fanout_concurrency,
+        on_cancel=args.on_cancel,
     )
+    if sess.cache is not None and args.cache_bypass_sampling:
+        sess.cache.bypass_sampling = True
+    if callable(bot_options):
+        sess.option_overrides = dict(bot_options())
+    if args.keep_alive:
+        ka = args.keep_alive.strip()
+        sess.residency.policy.default_keep_alive = int(ka) if ka.lstrip("-").isdigit() else ka
+    if args.pin is not None:
+        sess.residency.policy.pin_n = max(0, args.pin)
+
+    if args.batch:
+        sys.exit(run_batch_mode(sess, args.batch, args.out, max(1, args.concurrency), args.chain))
+
+    if not args.no_log:
+        sess.log = SessionLog.new(header=_log_header(sess))
+
+    if args.resume is not None:
+        saved = list_sessions()
+        if args.resume or saved:
+            load_session(sess, args.resume or saved[0].stem)
+        else:
+            console.print(f"[{SYS_COLOR}]No saved sessions to resume.[/{SYS_COLOR}]")
+        if args.no_log:
+            sess.log = None
 
+    startup_profile.mark("session ready")
     print_header(sess)
 
     # ── Startup diagnostics ───────────────────────────────────────────────────
-    run_startup_diagnostics(sess)
+    run_startup_diagnostics(sess, background=True)
+    startup_profile.mark("first prompt")
+    if args.profile_startup:
+        console.print(Text(startup_profile.report(), style=SYS_COLOR), soft_wrap=True)
+    threading.Thread(target=_warm_up, args=(sess,), name="warm-up", daemon=True).start()
 
     # ── REPL loop ────────────────────────────────────────────────────────────
     consecutive_errors = 0
@@ -669,7 +1375,11 @@ def main():
         # ── Send to Ollama ────────────────────────────────────────────────────
         console.print(Rule(style=BORDER_DIM))
         try:
-            sess.ask(line)
+            import requests   # loaded by _warm_up / the request itself; needed for the excepts below
+            if sess.fanout:
+                run_fanout(sess, line)
+            else:
+                sess.ask(line)
             consecutive_errors = 0
         except requests.exceptions.ConnectionError:
             consecutive_errors += 1
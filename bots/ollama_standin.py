@@ -0,0 +1,735 @@
+# -*- coding: utf-8 -*-
+"""
+ollama_standin.py — Local stand-in for the Ollama HTTP API (no model needed).
+
+Speaks enough of the Ollama protocol for every client in this repo
+(stream_chat, runtime_engine.ollama_chat, ollama_bot.run, demo_host_bot, the
+/api/tags probes) to be exercised and benchmarked on CPU-only boxes:
+
+    GET  /  /api/version  /api/tags  /api/ps
+    POST /api/chat  /api/generate  /api/embed  /api/embeddings  /api/show
+
+Chat and generate stream NDJSON over chunked HTTP/1.1 (or answer in one
+JSON body with "stream": false), with Ollama-shaped final chunks
+(prompt_eval_count / eval_count and the matching *_duration fields).
+
+Synthetic mode knobs (StandinConfig / CLI flags):
+  • token rate (tokens/sec) and reply length
+  • time-to-first-token: a median plus lognormal jitter, seeded for repeatable runs
+  • cold-load delay, with per-model keep_alive residency reported by /api/ps
+    (an empty generate/chat preloads or, with keep_alive 0, unloads a model);
+    like Ollama, a request whose load options (num_ctx, num_batch, ...)
+    differ from the loaded runner's reloads the model
+  • injected failures: HTTP 500s, hung requests (to drill the supervisor's hang detection),
+    and connections dropped mid-stream
+  • counters: requests, emitted tokens, injected faults, streams the client
+    abandoned (stats()) — like Ollama, a stream stops decoding as soon as the
+    client disconnects
+
+Record / replay:
+  --upstream URL --record FILE   proxy to a real Ollama and append every
+                                 exchange (with chunk timings) to a cassette
+  --replay FILE                  answer from the cassette with the recorded
+                                 timing (--replay-speed 0 = instant)
+
+Usage:
+    python -m bots.ollama_standin --port 11435
+    python -m bots.ollama_standin --token-rate 40 --ttft 0.25 --ttft-jitter 0.3 --seed 1
+    python -m bots.ollama_standin --upstream http://localhost:11434 --record lab.cassette.jsonl
+    python -m bots.ollama_standin --replay lab.cassette.jsonl
+    OLLAMA_HOST=http://127.0.0.1:11435 python -m bots.ollama_sandbox
+
+From Python (benchmarks):
+    srv = start_standin(port=0, cfg=StandinConfig(token_rate=50, seed=1))
+    host = srv.url                       # e.g. http://127.0.0.1:54321
+    srv.cfg.stats()                      # {"requests": ..., "emitted_tokens": ...}
+    srv.shutdown()
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+DEFAULT_MODELS     = ["hub-assistant:latest", "llama3.2:latest"]
+DEFAULT_REPLY      = "This is a synthetic reply from the local Ollama stand-in server."
+DEFAULT_KEEP_ALIVE = 300.0          # seconds, like Ollama's "5m"
+MODEL_SIZE         = 2 * 1024 ** 3  # bytes reported for every model
+NS                 = 1_000_000_000
+RUNNER_KEYS        = ("num_ctx", "num_batch", "num_gpu", "num_thread", "main_gpu", "use_mmap", "use_mlock")
+DEFAULT_NUM_CTX    = 2048
+
+_FILLER = ("the model streams tokens at a steady rate so clients can be measured "
+           "without a GPU and every run is repeatable").split()
+
+
+def _now(offset_s: float = 0.0) -> str:
+    t = datetime.now(timezone.utc) + timedelta(seconds=offset_s)
+    return t.isoformat().replace("+00:00", "Z")
+
+
+def _tokens(text: str) -> List[str]:
+    """Split text into word-ish tokens that concatenate back to the original."""
+    out: List[str] = []
+    for i, word in enumerate(text.split(" ")):
+        out.append(word if i == 0 else " " + word)
+    return out
+
+
+def _keep_alive_s(value: Any) -> float:
+    """Ollama keep_alive ("5m", "1h", 300, -1, "0") → seconds; negative = forever."""
+    if value is None or value == "":
+        return DEFAULT_KEEP_ALIVE
+    if isinstance(value, (int, float)):
+        return float(value)
+    m = re.fullmatch(r"\s*(-?\d+(?:\.\d+)?)\s*(ms|s|m|h)?\s*", str(value))
+    if not m:
+        return DEFAULT_KEEP_ALIVE
+    n = float(m.group(1))
+    return n * {"ms": 0.001, "s": 1, "m": 60, "h": 3600, None: 1}[m.group(2)]
+
+
+def _prompt_chars(body: Dict[str, Any]) -> int:
+    if "messages" in body:
+        return sum(len(str(m.get("content", ""))) for m in body.get("messages") or [])
+    return len(str(body.get("prompt", ""))) + len(str(body.get("system", "")))
+
+
+def _embedding(text: str, dim: int) -> List[float]:
+    """Deterministic unit vector for text (same text → same vector)."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    vec = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+# ── config ────────────────────────────────────────────────────────────────────
+
+class StandinConfig:
+    """Mutable knobs and counters shared by all handler threads of one server."""
+
+    def __init__(
+        self,
+        models: Optional[List[str]] = None,
+        reply: str = DEFAULT_REPLY,
+        token_rate: float = 0.0,
+        tags_delay: float = 0.0,
+        reply_tokens: int = 0,
+        ttft_s: float = 0.0,
+        ttft_jitter: float = 0.0,
+        load_s: float = 0.0,
+        error_rate: float = 0.0,
+        hang_rate: float = 0.0,
+        hang_s: float = 30.0,
+        drop_rate: float = 0.0,
+        embed_dim: int = 384,
+        seed: Optional[int] = None,
+        cassette: Optional["Cassette"] = None,
+        upstream: str = "",
+        replay_speed: float = 1.0,
+    ):
+        self.models       = list(models or DEFAULT_MODELS)
+        self.reply        = reply
+        self.token_rate   = token_rate     # tokens/sec; 0 = as fast as possible
+        self.tags_delay   = tags_delay     # seconds before answering /api/tags (slow-server drills)
+        self.reply_tokens = reply_tokens   # >0: synthesize replies of exactly this many tokens
+        self.ttft_s       = ttft_s         # median delay before the first token
+        self.ttft_jitter  = ttft_jitter    # lognormal sigma around ttft_s; 0 = fixed
+        self.load_s       = load_s         # cold-load delay when a model is not resident
+        self.error_rate   = error_rate     # fraction of requests answered with HTTP 500
+        self.hang_rate    = hang_rate      # fraction of requests that never answer
+        self.hang_s       = hang_s         # how long a hung request holds the socket
+        self.hung         = False          # True = every request hangs (server wedged)
+        self.drop_rate    = drop_rate      # fraction of streams cut off half-way
+        self.embed_dim    = embed_dim
+        self.cassette     = cassette
+        self.upstream     = upstream.rstrip("/")
+        self.replay_speed = replay_speed
+        self.rng          = random.Random(seed)
+        self.loaded: Dict[str, float] = {}  # model → expiry (time.time(); inf = forever)
+        self.runner: Dict[str, Dict[str, Any]] = {}   # model → load options it was loaded with
+        self.loads           = 0       # cold loads, including reloads for other load options
+        self.requests        = 0
+        self.emitted_tokens  = 0
+        self.errors_injected = 0
+        self.hangs_injected  = 0
+        self.drops_injected  = 0
+        self.client_aborts   = 0       # streams stopped because the client went away
+        self.lock = threading.Lock()
+
+    def roll(self, p: float) -> bool:
+        if p <= 0:
+            return False
+        with self.lock:
+            return self.rng.random() < p
+
+    def sample_ttft(self) -> float:
+        if self.ttft_s <= 0:
+            return 0.0
+        if self.ttft_jitter <= 0:
+            return self.ttft_s
+        with self.lock:
+            return self.ttft_s * math.exp(self.rng.gauss(0.0, self.ttft_jitter))
+
+    def reply_text(self) -> str:
+        if self.reply_tokens <= 0:
+            return self.reply
+        return " ".join(_FILLER[i % len(_FILLER)] for i in range(self.reply_tokens))
+
+    def has_model(self, model: str) -> bool:
+        return model in self.models or f"{model}:latest" in self.models
+
+    def resident(self) -> Dict[str, float]:
+        """Loaded models and their expiry, after dropping expired ones."""
+        now = time.time()
+        with self.lock:
+            for m in [m for m, exp in self.loaded.items() if exp <= now]:
+                del self.loaded[m]
+                self.runner.pop(m, None)
+            return dict(self.loaded)
+
+    def touch(self, model: str, keep_alive: Any) -> None:
+        ka = _keep_alive_s(keep_alive)
+        with self.lock:
+            if ka == 0:
+                self.loaded.pop(model, None)
+                self.runner.pop(model, None)
+            else:
+                self.loaded[model] = math.inf if ka < 0 else time.time() + ka
+
+    def count_tokens(self, n: int) -> None:
+        with self.lock:
+            self.emitted_tokens += n
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "emitted_tokens": self.emitted_tokens,
+                "errors_injected": self.errors_injected,
+                "hangs_injected": self.hangs_injected,
+                "drops_injected": self.drops_injected,
+                "client_aborts": self.client_aborts,
+                "loads": self.loads,
+                "resident": sorted(self.loaded),
+            }
+
+
+# ── cassettes ─────────────────────────────────────────────────────────────────
+
+class Cassette:
+    """
+    JSONL file of recorded exchanges, one per line:
+        {"key": ..., "method": ..., "path": ..., "request": {...}, "status": 200,
+         "chunks": [[offset_s, chunk], ...]}        (streamed)
+         or "response": {...}                        (single JSON body)
+    Identical requests recorded several times replay round-robin.
+    """
+
+    def __init__(self, path: str, mode: str = "replay"):
+        self.path = Path(path)
+        self.mode = mode
+        self.entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._next: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if mode == "replay":
+            for line in self.path.read_text(encoding="utf-8").splitlines():
+                if line.strip():
+                    e = json.loads(line)
+                    self.entries.setdefault(e["key"], []).append(e)
+
+    @staticmethod
+    def key(method: str, path: str, body: Dict[str, Any]) -> str:
+        # stream / keep_alive do not change the answer, so they are not part of the key
+        norm = {k: v for k, v in body.items() if k not in ("stream", "keep_alive")}
+        blob = json.dumps([method, path, norm], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            hits = self.entries.get(key)
+            if not hits:
+                return None
+            i = self._next.get(key, 0)
+            self._next[key] = i + 1
+            return hits[i % len(hits)]
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self.entries.values())
+
+
+# ── handler ───────────────────────────────────────────────────────────────────
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, so pooled clients can reuse sockets
+    disable_nagle_algorithm = True   # like Go's net/http; avoids 40 ms delayed-ACK stalls
+    cfg: StandinConfig               # set per server class in start_standin()
+
+    def log_message(self, fmt, *args):
+        return
+
+    # ── wire helpers ──────────────────────────────────────────────────────────
+
+    def _send_json(self, code: int, obj: Any) -> None:
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _send_chunk(self, obj: Dict[str, Any]) -> None:
+        data = (json.dumps(obj) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _send_stream(self, chunks: Iterator[Dict[str, Any]]) -> None:
+        self._start_stream()
+        for obj in chunks:
+            self._send_chunk(obj)
+        self._end_stream()
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length", "0") or "0")
+        raw = self.rfile.read(length) if length else b"{}"
+        try:
+            return json.loads(raw.decode("utf-8", errors="replace")) or {}
+        except Exception:
+            return {}
+
+    def _drop(self) -> None:
+        """Cut the connection without finishing the response."""
+        self.close_connection = True
+        try:
+            self.wfile.flush()
+            self.connection.shutdown(2)
+        except OSError:
+            pass
+
+    # ── fault injection ───────────────────────────────────────────────────────
+
+    def _inject_faults(self) -> bool:
+        """Apply hang / error injection. True if the request was consumed."""
+        cfg = self.cfg
+        if cfg.hung or cfg.roll(cfg.hang_rate):
+            with cfg.lock:
+                cfg.hangs_injected += 1
+            time.sleep(cfg.hang_s)   # socket open, no answer — what a wedged Ollama looks like
+            self._drop()
+            return True
+        if cfg.roll(cfg.error_rate):
+            with cfg.lock:
+                cfg.errors_injected += 1
+            self._send_json(500, {"error": "stand-in: injected failure"})
+            return True
+        return False
+
+    # ── routes ────────────────────────────────────────────────────────────────
+
+    def do_GET(self):
+        p = urlparse(self.path).path
+        with self.cfg.lock:
+            self.cfg.requests += 1
+        if self._inject_faults():
+            return
+        if self.cfg.cassette is not None:
+            self._cassette("GET", p, {})
+            return
+        if p == "/":
+            body = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif p == "/api/version":
+            self._send_json(200, {"version": "0.0.0-standin"})
+        elif p == "/api/tags":
+            if self.cfg.tags_delay:
+                time.sleep(self.cfg.tags_delay)
+            self._send_json(200, {"models": [
+                {"name": m, "model": m, "modified_at": _now(), "size": MODEL_SIZE,
+                 "digest": f"standin-{m}", "details": {"family": "standin"}} for m in self.cfg.models
+            ]})
+        elif p == "/api/ps":
+            self._send_json(200, {"models": [self._ps_entry(m, exp) for m, exp in self.cfg.resident().items()]})
+        else:
+            self._send_json(404, {"error": f"not found: {p}"})
+
+    def do_POST(self):
+        p = urlparse(self.path).path
+        with self.cfg.lock:
+            self.cfg.requests += 1
+        body = self._read_json()
+        if self._inject_faults():
+            return
+        if self.cfg.cassette is not None:
+            self._cassette("POST", p, body)
+            return
+        if p not in ("/api/chat", "/api/generate", "/api/embed", "/api/embeddings", "/api/show"):
+            self._send_json(404, {"error": f"not found: {p}"})
+            return
+        model = body.get("model", "")
+        if not self.cfg.has_model(model):
+            self._send_json(404, {"error": f"model '{model}' not found"})
+            return
+        if p in ("/api/embed", "/api/embeddings"):
+            self._embed(p, model, body)
+            return
+        if p == "/api/show":
+            self._send_json(200, self._show(model))
+            return
+        chat = p == "/api/chat"
+        if not (body.get("messages") if chat else body.get("prompt")):
+            self._load_only(model, chat, body)   # Ollama's preload / unload idiom
+            return
+        load_s = self._load(model, body)
+        if body.get("stream", True):
+            self._stream_reply(model, chat, body, load_s)
+        else:
+            self._whole_reply(model, chat, body, load_s)
+
+    # ── synthetic model ───────────────────────────────────────────────────────
+
+    def _ps_entry(self, model: str, expires: float) -> Dict[str, Any]:
+        exp = "0001-01-01T00:00:00Z" if expires == math.inf else _now(expires - time.time())
+        ctx = self.cfg.runner.get(model, {}).get("num_ctx", DEFAULT_NUM_CTX)
+        return {"name": model, "model": model, "size": MODEL_SIZE, "size_vram": MODEL_SIZE,
+                "digest": f"standin-{model}", "details": {"family": "standin"}, "expires_at": exp,
+                "context_length": ctx}
+
+    def _show(self, model: str) -> Dict[str, Any]:
+        """/api/show shaped like a small GQA model whose weights are MODEL_SIZE."""
+        return {
+            "modelfile": f"FROM {model}\n", "parameters": "", "template": "{{ .Prompt }}",
+            "details": {"family": "standin", "parameter_size": "3.2B", "quantization_level": "Q4_K_M"},
+            "model_info": {
+                "general.architecture": "standin", "general.parameter_count": 3_200_000_000,
+                "standin.block_count": 28, "standin.context_length": 131072,
+                "standin.embedding_length": 3072, "standin.attention.head_count": 24,
+                "standin.attention.head_count_kv": 8,
+            },
+        }
+
+    def _load(self, model: str, body: Dict[str, Any]) -> float:
+        """Simulate a cold load if model is not resident with the body's load options. Returns seconds spent."""
+        opts = body.get("options") or {}
+        want = {k: opts[k] for k in RUNNER_KEYS if opts.get(k) is not None}
+        resident = model in self.cfg.resident()   # drops expired runners first
+        with self.cfg.lock:
+            warm = resident and self.cfg.runner.get(model) == want
+            self.cfg.runner[model] = want
+            if not warm:
+                self.cfg.loads += 1
+        if warm:
+            return 0.0
+        if self.cfg.load_s <= 0:
+            return 0.0
+        time.sleep(self.cfg.load_s)
+        return self.cfg.load_s
+
+    def _load_only(self, model: str, chat: bool, body: Dict[str, Any]) -> None:
+        ka = _keep_alive_s(body.get("keep_alive"))
+        load_s = self._load(model, body) if ka != 0 else 0.0
+        self.cfg.touch(model, body.get("keep_alive"))
+        obj: Dict[str, Any] = {"model": model, "created_at": _now(), "done": True,
+                               "done_reason": "unload" if ka == 0 else "load",
+                               "load_duration": int(load_s * NS), "total_duration": int(load_s * NS)}
+        if chat:
+            obj["message"] = {"role": "assistant", "content": ""}
+        else:
+            obj["response"] = ""
+        self._send_json(200, obj)
+
+    def _final(
+        self,
+        model: str,
+        chat: bool,
+        text: str,
+        body: Dict[str, Any],
+        n_tokens: int,
+        load_s: float,
+        ttft_s: float,
+        decode_s: float,
+    ) -> Dict[str, Any]:
+        obj: Dict[str, Any] = {
+            "model": model, "created_at": _now(), "done": True, "done_reason": "stop",
+            "total_duration": int((load_s + ttft_s + decode_s) * NS),
+            "load_duration": int(load_s * NS),
+            "prompt_eval_count": max(1, _prompt_chars(body) // 4),
+            "prompt_eval_duration": int(ttft_s * NS),
+            "eval_count": n_tokens,
+            "eval_duration": int(decode_s * NS),
+        }
+        if chat:
+            obj["message"] = {"role": "assistant", "content": text}
+        else:
+            obj["response"] = text
+        return obj
+
+    def _stream_reply(self, model: str, chat: bool, body: Dict[str, Any], load_s: float) -> None:
+        cfg = self.cfg
+        toks = _tokens(cfg.reply_text())
+        delay = 1.0 / cfg.token_rate if cfg.token_rate > 0 else 0.0
+        drop_at = len(toks) // 2 if cfg.roll(cfg.drop_rate) else -1
+        ttft_s = cfg.sample_ttft()
+        self._start_stream()
+        if ttft_s:
+            time.sleep(ttft_s)
+        t0 = time.perf_counter()
+        for i, tok in enumerate(toks):
+            if i == drop_at:
+                with cfg.lock:
+                    cfg.drops_injected += 1
+                self._drop()
+                return
+            if delay and i:
+                time.sleep(delay)
+            obj: Dict[str, Any] = {"model": model, "created_at": _now(), "done": False}
+            if chat:
+                obj["message"] = {"role": "assistant", "content": tok}
+            else:
+                obj["response"] = tok
+            try:
+                self._send_chunk(obj)
+            except (BrokenPipeError, ConnectionResetError):
+                # client disconnected (cancelled): stop decoding, as Ollama does
+                self.close_connection = True
+                with cfg.lock:
+                    cfg.client_aborts += 1
+                return
+            cfg.count_tokens(1)
+        decode_s = time.perf_counter() - t0
+        self._send_chunk(self._final(model, chat, "", body, len(toks), load_s, ttft_s, decode_s))
+        self._end_stream()
+        cfg.touch(model, body.get("keep_alive"))
+
+    def _whole_reply(self, model: str, chat: bool, body: Dict[str, Any], load_s: float) -> None:
+        cfg = self.cfg
+        text = cfg.reply_text()
+        n = len(_tokens(text))
+        ttft_s = cfg.sample_ttft()
+        decode_s = (n - 1) / cfg.token_rate if cfg.token_rate > 0 else 0.0
+        time.sleep(ttft_s + decode_s)
+        cfg.count_tokens(n)
+        self._send_json(200, self._final(model, chat, text, body, n, load_s, ttft_s, decode_s))
+        cfg.touch(model, body.get("keep_alive"))
+
+    def _embed(self, path: str, model: str, body: Dict[str, Any]) -> None:
+        load_s = self._load(model, body)
+        if path == "/api/embeddings":   # legacy single-prompt endpoint
+            self._send_json(200, {"embedding": _embedding(str(body.get("prompt", "")), self.cfg.embed_dim)})
+        else:
+            inputs = body.get("input", "")
+            inputs = inputs if isinstance(inputs, list) else [inputs]
+            self._send_json(200, {
+                "model": model,
+                "embeddings": [_embedding(str(t), self.cfg.embed_dim) for t in inputs],
+                "total_duration": int(load_s * NS), "load_duration": int(load_s * NS),
+                "prompt_eval_count": sum(max(1, len(str(t)) // 4) for t in inputs),
+            })
+        self.cfg.touch(model, body.get("keep_alive"))
+
+    # ── record / replay ───────────────────────────────────────────────────────
+
+    def _cassette(self, method: str, path: str, body: Dict[str, Any]) -> None:
+        cas = self.cfg.cassette
+        key = Cassette.key(method, path, body)
+        if cas.mode == "record":
+            self._record(cas, key, method, path, body)
+            return
+        entry = cas.lookup(key)
+        if entry is None:
+            self._send_json(404 if method == "POST" else 502,
+                            {"error": f"stand-in: no cassette entry for {method} {path}"})
+            return
+        self._replay(entry, body.get("stream", True) if method == "POST" else False)
+
+    def _replay(self, entry: Dict[str, Any], want_stream: bool) -> None:
+        chunks: List[Tuple[float, Dict[str, Any]]] = [tuple(c) for c in entry.get("chunks") or []]
+        if not chunks:
+            resp = entry.get("response", {})
+            self._send_json(entry.get("status", 200), resp)
+            return
+        speed = self.cfg.replay_speed
+        if not want_stream:
+            # recorded as a stream, asked for one body: join the text into the final chunk
+            final = dict(chunks[-1][1])
+            text = "".join((c.get("message") or {}).get("content", "") or c.get("response", "")
+                           for _, c in chunks[:-1])
+            if "message" in final:
+                final["message"] = {"role": "assistant", "content": text}
+            else:
+                final["response"] = text
+            if speed > 0:
+                time.sleep(chunks[-1][0] * speed)
+            self.cfg.count_tokens(len(chunks) - 1)
+            self._send_json(entry.get("status", 200), final)
+            return
+        self._start_stream()
+        t0 = time.perf_counter()
+        for offset, obj in chunks:
+            if speed > 0:
+                wait = offset * speed - (time.perf_counter() - t0)
+                if wait > 0:
+                    time.sleep(wait)
+            self._send_chunk(obj)
+            if not obj.get("done"):
+                self.cfg.count_tokens(1)
+        self._end_stream()
+
+    def _record(self, cas: Cassette, key: str, method: str, path: str, body: Dict[str, Any]) -> None:
+        import requests   # only the recorder talks to a real Ollama
+
+        url = self.cfg.upstream + path
+        t0 = time.perf_counter()
+        try:
+            r = requests.request(method, url, json=body if method == "POST" else None,
+                                 stream=True, timeout=(5, 600))
+        except requests.RequestException as exc:
+            self._send_json(502, {"error": f"stand-in: upstream {url} failed: {exc}"})
+            return
+        entry: Dict[str, Any] = {"key": key, "method": method, "path": path, "request": body,
+                                 "status": r.status_code}
+        with r:
+            if "ndjson" in r.headers.get("Content-Type", ""):
+                chunks: List[Tuple[float, Dict[str, Any]]] = []
+                self._start_stream()
+                for raw in r.iter_lines():
+                    if not raw:
+                        continue
+                    obj = json.loads(raw)
+                    chunks.append((round(time.perf_counter() - t0, 4), obj))
+                    self._send_chunk(obj)
+                    if not obj.get("done"):
+                        self.cfg.count_tokens(1)
+                self._end_stream()
+                entry["chunks"] = chunks
+            else:
+                try:
+                    resp = r.json()
+                except ValueError:
+                    resp = {"error": r.text}
+                entry["response"] = resp
+                self._send_json(r.status_code, resp)
+        cas.record(entry)
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+    cfg: StandinConfig
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle_error(self, request, client_address) -> None:
+        # a pooled client dropping an idle keep-alive socket is routine, not a traceback
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+def _make_server(host: str, port: int, cfg: StandinConfig) -> StandinServer:
+    handler = type("BoundHandler", (Handler,), {"cfg": cfg})
+    srv = StandinServer((host, port), handler)
+    srv.cfg = cfg
+    return srv
+
+
+def start_standin(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    cfg: Optional[StandinConfig] = None,
+) -> StandinServer:
+    """Start a stand-in server on a background thread. port=0 picks a free port."""
+    srv = _make_server(host, port, cfg or StandinConfig())
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Local Ollama stand-in server")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=11435)
+    ap.add_argument("--model", action="append", default=[], help="model name to advertise (repeatable)")
+    ap.add_argument("--reply", default=DEFAULT_REPLY, help="text every request streams back")
+    ap.add_argument("--reply-tokens", type=int, default=0, help="synthesize replies of N tokens instead of --reply")
+    ap.add_argument("--token-rate", type=float, default=0.0, help="tokens/sec (0 = unthrottled)")
+    ap.add_argument("--ttft", type=float, default=0.0, help="median seconds before the first token")
+    ap.add_argument("--ttft-jitter", type=float, default=0.0, help="lognormal sigma around --ttft (0 = fixed)")
+    ap.add_argument("--load", type=float, default=0.0, help="cold-load seconds for non-resident models")
+    ap.add_argument("--tags-delay", type=float, default=0.0, help="seconds before answering /api/tags")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    ap.add_argument("--hang-rate", type=float, default=0.0, help="fraction of requests that never answer")
+    ap.add_argument("--hang", action="store_true", help="every request hangs (a wedged server)")
+    ap.add_argument("--hang-seconds", type=float, default=30.0, help="how long hung requests hold the socket")
+    ap.add_argument("--drop-rate", type=float, default=0.0, help="fraction of streams cut off half-way")
+    ap.add_argument("--seed", type=int, default=None, help="seed for jitter and fault injection")
+    ap.add_argument("--upstream", default="", help="real Ollama to proxy when recording")
+    ap.add_argument("--record", default="", metavar="FILE", help="append proxied exchanges to a cassette")
+    ap.add_argument("--replay", default="", metavar="FILE", help="answer from a recorded cassette")
+    ap.add_argument("--replay-speed", type=float, default=1.0, help="replay timing scale (0 = instant)")
+    args = ap.parse_args()
+
+    if args.record and not args.upstream:
+        ap.error("--record needs --upstream")
+    cassette = None
+    if args.record:
+        cassette = Cassette(args.record, mode="record")
+    elif args.replay:
+        cassette = Cassette(args.replay, mode="replay")
+    cfg = StandinConfig(
+        models=args.model or None, reply=args.reply, token_rate=args.token_rate,
+        tags_delay=args.tags_delay, reply_tokens=args.reply_tokens,
+        ttft_s=args.ttft, ttft_jitter=args.ttft_jitter, load_s=args.load,
+        error_rate=args.error_rate, hang_rate=args.hang_rate, hang_s=args.hang_seconds,
+        drop_rate=args.drop_rate, seed=args.seed,
+        cassette=cassette, upstream=args.upstream, replay_speed=args.replay_speed,
+    )
+    cfg.hung = args.hang
+    srv = _make_server(args.host, args.port, cfg)
+    mode = "synthetic"
+    if args.record:
+        mode = f"recording {args.upstream} → {args.record}"
+    elif args.replay:
+        mode = f"replaying {args.replay} ({len(cassette)} exchanges)"
+    print(f"Ollama stand-in listening on {srv.url}  [{mode}]")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(cfg.stats()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,558 @@
+# -*- coding: utf-8 -*-
+"""
+ollama_supervisor.py — One supervisor per machine owns `ollama serve`.
+
+Recovery used to live in every sandbox: serial 2 s probes to spot a hang,
+`pkill -9`, sleep 1 s, then up to 15 one-second polls — 5–20 s, with every
+open sandbox racing to kill the same daemon.  Now one process per machine
+holds a lock file and supervises the local Ollama:
+
+  • readiness   — /api/tags polled with exponential backoff (50 ms → 0.8 s),
+                  so a server that is up in 300 ms is seen in ~300 ms
+  • hangs       — a health thread probes every CITL_SUPERVISOR_INTERVAL s;
+                  HANG_PROBES probes in a row whose connect times out, or
+                  /api/tags unanswered for CITL_SUPERVISOR_STALL_S (a slow
+                  answer alone is "busy": a loaded box, not a hang), trigger
+                  a restart; a server that went away is restarted too
+  • restarts    — kill the process group it started itself, wait for the
+                  port, respawn after a random jitter; at most MAX_RESTARTS
+                  per RESTART_WINDOW_S, then "failed".  A server it found
+                  running is never killed: a hung one is only reported
+  • history     — every restart (when, why, how long, ok) is kept in the
+                  state file, across supervisors
+
+The lock is an OS file lock, so it is released when the holder exits or
+crashes; the next sandbox that calls ensure() takes over.  Other processes
+(sandboxes, the hub) read the state file the leader rewrites on every health
+tick instead of probing Ollama themselves.  A remote OLLAMA_HOST cannot be
+supervised from here; status() then reports the shared /api/tags probe.
+
+Usage:
+    sup = get_supervisor(host)
+    sup.lead()                      # become this machine's supervisor if nobody is
+    st = sup.status()               # state, models, pid, restart history
+    st = sup.ensure()               # start / restart / wait for the leader until ready
+
+    python -m bots.ollama_supervisor            # dedicated supervisor (Ctrl+C stops)
+    python -m bots.ollama_supervisor --status   # state and restart history
+
+Environment overrides:
+    CITL_SUPERVISOR_DIR            — lock + state files (default: <repo>/data/supervisor)
+    CITL_SUPERVISOR_INTERVAL       — seconds between health probes (default: 2)
+    CITL_SUPERVISOR_READY_TIMEOUT  — seconds to wait for a (re)start (default: 20)
+    CITL_SUPERVISOR_STALL_S        — seconds /api/tags may go unanswered before a restart (default: 300)
+    CITL_OLLAMA_CMD                — command that serves Ollama (default: "ollama serve")
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import shlex
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+from bots.ollama_client import TagsProbe, is_multi_host, normalize_host, probe_tags
+from bots.options_profile import is_local_host
+
+INTERVAL_S        = float(os.environ.get("CITL_SUPERVISOR_INTERVAL", "2"))
+READY_TIMEOUT_S   = float(os.environ.get("CITL_SUPERVISOR_READY_TIMEOUT", "20"))
+OLLAMA_CMD        = os.environ.get("CITL_OLLAMA_CMD", "ollama serve")
+STALL_RESTART_S   = float(os.environ.get("CITL_SUPERVISOR_STALL_S", "300"))
+HEALTH_TIMEOUT_S  = 5.0     # connect / answer slower than this: "hung" / "busy"
+HANG_PROBES       = 3       # hung probes in a row before a restart
+BACKOFF_START_S   = 0.05    # readiness / port polling: first wait ...
+BACKOFF_MAX_S     = 0.8     # ... doubling up to this
+RESTART_JITTER_S  = 0.5     # random delay before respawning
+MAX_RESTARTS      = 5       # restarts allowed per window before giving up
+RESTART_WINDOW_S  = 300.0
+HISTORY           = 20      # restarts kept in the state file
+STALE_S           = max(3 * INTERVAL_S, 5.0)   # leader heartbeat older than this = gone
+
+
+def supervisor_dir() -> Path:
+    env = os.environ.get("CITL_SUPERVISOR_DIR")
+    if env:
+        return Path(env)
+    if getattr(sys, "frozen", False):
+        return Path(sys.executable).parent / "data" / "supervisor"
+    return Path(__file__).resolve().parents[1] / "data" / "supervisor"
+
+
+# ── machine lock ──────────────────────────────────────────────────────────────
+
+class MachineLock:
+    """Non-blocking exclusive file lock; the OS drops it when the process dies."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fh: Any = None
+
+    @property
+    def held(self) -> bool:
+        return self._fh is not None
+
+    def try_acquire(self) -> bool:
+        if self._fh is not None:
+            return True
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fh = open(self.path, "a+b")
+        except OSError:
+            return False
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fh.close()
+            return False
+        fh.seek(0)
+        fh.truncate()
+        fh.write(str(os.getpid()).encode())
+        fh.flush()
+        self._fh = fh
+        return True
+
+    def release(self) -> None:
+        if self._fh is None:
+            return
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                self._fh.seek(0)
+                msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+        except OSError:
+            pass
+        self._fh.close()
+        self._fh = None
+
+
+# ── status ────────────────────────────────────────────────────────────────────
+
+@dataclass
+class Restart:
+    at: float                 # time.time() the restart began
+    reason: str               # "not running" | "hung" | "exited"
+    took_s: float = 0.0
+    ok: bool = False
+    error: str = ""
+
+
+@dataclass
+class SupervisorStatus:
+    host: str
+    state: str = "unknown"    # ready | busy | starting | restarting | hung | down | failed | remote
+    supervised: bool = False  # a live leader wrote this (vs. a direct probe)
+    leader_pid: Optional[int] = None
+    ollama_pid: Optional[int] = None   # set when the supervisor started the server
+    updated: float = 0.0      # time.time() of the leader's last health tick
+    probe_ms: float = 0.0
+    models: List[str] = field(default_factory=list)
+    error: str = ""
+    restarts: List[Restart] = field(default_factory=list)
+
+    @property
+    def ready(self) -> bool:
+        return self.state in ("ready", "busy")   # busy = serving, just slow to answer /api/tags
+
+    def recent_restarts(self, window: float = RESTART_WINDOW_S) -> List[Restart]:
+        now = time.time()
+        return [r for r in self.restarts if now - r.at < window]
+
+    def describe(self) -> str:
+        """One line for /info and the hub: state, who supervises, last restart."""
+        who = (f"supervised by pid {self.leader_pid}" + (" (this process)" if self.leader_pid == os.getpid() else "")
+               if self.supervised else "unsupervised")
+        text = f"{self.state} • {who}"
+        if self.restarts:
+            last = self.restarts[-1]
+            when = time.strftime("%H:%M:%S", time.localtime(last.at))
+            text += (f" • {len(self.restarts)} (re)start(s), last {when} ({last.reason}, "
+                     f"{last.took_s:.1f} s, {'ok' if last.ok else 'failed'})")
+        return text
+
+    def to_json(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "SupervisorStatus":
+        restarts = [Restart(**r) for r in data.pop("restarts", []) or []]
+        known = {k: v for k, v in data.items() if k in cls.__dataclass_fields__}
+        return cls(restarts=restarts, **known)
+
+
+def _state_from_probe(probe: TagsProbe) -> str:
+    if probe.ok:
+        return "ready"
+    if probe.stalled:
+        return "busy"
+    return "hung" if probe.hung else "down"
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    if sys.platform == "win32":
+        out = subprocess.run(["tasklist", "/FI", f"PID eq {pid}", "/NH"], capture_output=True, text=True)
+        return str(pid) in (out.stdout or "")
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# ── supervisor ────────────────────────────────────────────────────────────────
+
+class OllamaSupervisor:
+    """Owns the local `ollama serve` while it holds the machine lock; a reader otherwise."""
+
+    def __init__(self, host: Optional[str] = None, cmd: str = OLLAMA_CMD):
+        self.host  = normalize_host(host) if not is_multi_host(host) else (host or "")
+        self.cmd   = cmd
+        self.local = is_local_host(self.host) and not is_multi_host(self.host)
+        url = urlparse(self.host)
+        self._addr = (url.hostname or "127.0.0.1", url.port or 11434)
+        name = f"{socket.gethostname().lower()}-{self._addr[1]}"
+        self._lock_file  = MachineLock(supervisor_dir() / f"{name}.lock")
+        self._state_path = supervisor_dir() / f"{name}.json"
+        self._status = SupervisorStatus(host=self.host)
+        self._proc: Optional[subprocess.Popen] = None
+        self._fix_lock = threading.Lock()     # one start/restart at a time
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._hung = 0
+        self._stalled_since: Optional[float] = None   # time.monotonic() of the first unanswered probe
+
+    def __repr__(self) -> str:
+        return f"OllamaSupervisor({self.host!r}, leading={self.leading})"
+
+    @property
+    def leading(self) -> bool:
+        return self._lock_file.held
+
+    # ── leadership ────────────────────────────────────────────────────────────
+
+    def lead(self) -> bool:
+        """Become this machine's supervisor unless another process is. True if leading."""
+        if not self.local:
+            return False
+        if self.leading:
+            return True
+        if not self._lock_file.try_acquire():
+            return False
+        prev = self._read_state()
+        self._status = SupervisorStatus(
+            host=self.host, leader_pid=os.getpid(), supervised=True,
+            ollama_pid=prev.ollama_pid if prev and _pid_alive(prev.ollama_pid) else None,
+            restarts=(prev.restarts if prev else [])[-HISTORY:],
+        )
+        self._stop.clear()
+        self._tick()
+        self._thread = threading.Thread(target=self._health_loop, name="ollama-supervisor", daemon=True)
+        self._thread.start()
+        return True
+
+    def close(self) -> None:
+        """Stop supervising (Ollama keeps running) and release the lock."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=INTERVAL_S + HEALTH_TIMEOUT_S)
+            self._thread = None
+        if self.leading:
+            self._status.supervised = False
+            self._write_state()
+            self._lock_file.release()
+
+    # ── status ────────────────────────────────────────────────────────────────
+
+    def status(self) -> SupervisorStatus:
+        """The leader's view if one is alive, else a direct (cached) /api/tags probe."""
+        if self.leading:
+            return self._status
+        st = self._read_state() if self.local else None
+        if st is not None and st.supervised and time.time() - st.updated < STALE_S:
+            return st
+        probe = probe_tags(self.host)
+        return SupervisorStatus(
+            host=self.host,
+            state=_state_from_probe(probe) if self.local else
+            ("ready" if probe.ok else "remote"),
+            probe_ms=probe.elapsed * 1000,
+            models=sorted(probe.names),
+            error=probe.error,
+            restarts=st.restarts if st is not None else [],
+        )
+
+    def ensure(
+        self,
+        timeout: float = READY_TIMEOUT_S,
+        on_progress: Optional[Callable[[SupervisorStatus], None]] = None,
+    ) -> SupervisorStatus:
+        """
+        Make Ollama ready: as the leader start / restart it now; as a follower
+        wait for the leader (taking over if it goes away).  Returns the final
+        status; a remote host is only probed.
+        """
+        deadline = time.monotonic() + timeout
+        delay = BACKOFF_START_S
+        while True:
+            if self.lead():
+                with self._fix_lock:
+                    if self._status.state == "failed":
+                        self._status.state = "down"   # asked explicitly: try again
+                    self._tick()
+                    if not self._status.ready:
+                        reason = "hung" if self._status.state == "hung" else "not running"
+                        self._restart(reason, deadline, force=True)
+                return self._status
+            st = self.status()
+            if on_progress is not None:
+                on_progress(st)
+            if st.ready or st.state in ("failed", "remote") or time.monotonic() >= deadline:
+                return st
+            time.sleep(delay)
+            delay = min(delay * 2, BACKOFF_MAX_S)
+
+    # ── health thread (leader) ────────────────────────────────────────────────
+
+    def _health_loop(self) -> None:
+        while not self._stop.wait(INTERVAL_S):
+            with self._fix_lock:
+                prev = self._status.state
+                self._tick()
+                st = self._status.state
+                since = self._stalled_since
+                stalled = since is not None and time.monotonic() - since >= STALL_RESTART_S
+                if (st == "hung" and self._hung >= HANG_PROBES) or (st == "busy" and stalled):
+                    self._restart("hung", time.monotonic() + READY_TIMEOUT_S)
+                elif st == "down" and (prev == "ready" or self._proc is not None):
+                    # it was serving (or we started it) and went away; a server
+                    # that was never up is only started when someone asks (ensure)
+                    self._restart("exited", time.monotonic() + READY_TIMEOUT_S)
+
+    def _tick(self) -> None:
+        """One health probe; updates and persists the status."""
+        if self._status.state == "failed":
+            self._status.updated = time.time()
+            self._write_state()
+            return
+        probe = probe_tags(self.host, timeout=HEALTH_TIMEOUT_S, max_age=0)
+        state = _state_from_probe(probe)
+        self._hung = self._hung + 1 if state == "hung" else 0
+        if state != "busy":
+            self._stalled_since = None
+        elif self._stalled_since is None:
+            self._stalled_since = time.monotonic() - probe.elapsed
+        self._status.state    = state
+        self._status.probe_ms = probe.elapsed * 1000
+        if state != "busy":                      # busy: keep the last model list it gave us
+            self._status.models = sorted(probe.names)
+        self._status.error    = probe.error
+        self._status.updated  = time.time()
+        if self._proc is not None and self._proc.poll() is not None:
+            self._proc = None
+            self._status.ollama_pid = None
+        self._write_state()
+
+    # ── restart ───────────────────────────────────────────────────────────────
+
+    def _restart(self, reason: str, deadline: float, force: bool = False) -> None:
+        """Kill (if needed), respawn and wait for readiness; force skips the rate limit."""
+        if reason == "hung" and not self._owns_server():
+            # not ours: other processes (every student's generation) may depend on it
+            self._status.error = ("not answering, and not started by this supervisor — left running; "
+                                  "restart Ollama by hand, then /check")
+            self._write_state()
+            return
+        if not force and len(self._status.recent_restarts()) >= MAX_RESTARTS:
+            self._status.state = "failed"
+            self._status.error = f"{MAX_RESTARTS} restarts in {RESTART_WINDOW_S / 60:.0f} min — giving up until /check"
+            self._write_state()
+            return
+        rec = Restart(at=time.time(), reason=reason)
+        self._status.restarts = (self._status.restarts + [rec])[-HISTORY:]
+        self._status.state = "restarting" if reason == "hung" else "starting"
+        self._write_state()
+        t0 = time.monotonic()
+        if self._owns_server():
+            self._kill()
+            self._wait_port_free(min(deadline, time.monotonic() + 5))
+        time.sleep(random.uniform(0, RESTART_JITTER_S))
+        rec.ok = self._spawn(rec) and self._wait_ready(deadline)
+        rec.took_s = time.monotonic() - t0
+        self._hung, self._stalled_since = 0, None
+        if rec.ok:
+            self._status.state = "ready"
+            from bots.resilience import get_guard   # late: pulls in requests
+            get_guard(self.host).reset()             # callers in this process stop failing fast now
+        else:
+            rec.error = rec.error or "not ready in time"
+            self._status.state = "down"
+            self._status.error = rec.error
+        self._status.updated = time.time()
+        self._write_state()
+
+    def _spawn(self, rec: Restart) -> bool:
+        kwargs: Dict[str, Any] = {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL,
+                                  "stdin": subprocess.DEVNULL}
+        if sys.platform == "win32":
+            kwargs["creationflags"] = (subprocess.CREATE_NO_WINDOW | subprocess.DETACHED_PROCESS
+                                       | subprocess.CREATE_NEW_PROCESS_GROUP)
+        else:
+            kwargs["start_new_session"] = True   # own process group: killable with its runners
+        try:
+            self._proc = subprocess.Popen(shlex.split(self.cmd, posix=sys.platform != "win32"), **kwargs)
+        except OSError as exc:   # not installed, not executable
+            rec.error = f"could not run {self.cmd!r}: {exc}"
+            return False
+        self._status.ollama_pid = self._proc.pid
+        return True
+
+    def _owns_server(self) -> bool:
+        """True while the server is one this process spawned and it is still running."""
+        return self._proc is not None and self._proc.poll() is None
+
+    def _kill(self) -> None:
+        """Kill the server this process started, with its runners; never one it found running."""
+        if self._proc is None:
+            return
+        pid = self._proc.pid
+        if sys.platform == "win32":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)], capture_output=True)
+        else:
+            try:
+                os.killpg(pid, signal.SIGKILL)   # its own session: the runners go with it
+            except OSError:
+                try:
+                    self._proc.kill()
+                except OSError:
+                    pass
+        try:
+            self._proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            pass
+        self._proc = None
+        self._status.ollama_pid = None
+
+    def _wait_port_free(self, deadline: float) -> None:
+        delay = BACKOFF_START_S
+        while time.monotonic() < deadline:
+            try:
+                with socket.create_connection(self._addr, timeout=0.5):
+                    pass
+            except OSError:
+                return   # refused: the old server is gone
+            time.sleep(delay)
+            delay = min(delay * 2, BACKOFF_MAX_S)
+
+    def _wait_ready(self, deadline: float) -> bool:
+        delay = BACKOFF_START_S
+        while True:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return False
+            probe = probe_tags(self.host, timeout=min(HEALTH_TIMEOUT_S, max(left, 0.1)), max_age=0)
+            if probe.ok:
+                self._status.models = sorted(probe.names)
+                self._status.error = ""
+                return True
+            if self._proc is not None and self._proc.poll() is not None:
+                return False   # exited (port taken, crashed) — no point waiting
+            time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+            delay = min(delay * 2, BACKOFF_MAX_S)
+
+    # ── state file ────────────────────────────────────────────────────────────
+
+    def _read_state(self) -> Optional[SupervisorStatus]:
+        try:
+            return SupervisorStatus.from_json(json.loads(self._state_path.read_text(encoding="utf-8")))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _write_state(self) -> None:
+        try:
+            self._state_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self._state_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(self._status.to_json(), indent=2), encoding="utf-8")
+            os.replace(tmp, self._state_path)
+        except OSError:
+            pass   # a read-only checkout still supervises; others just probe
+
+
+_SUPERVISORS: Dict[str, OllamaSupervisor] = {}
+_SUPERVISORS_LOCK = threading.Lock()
+
+
+def get_supervisor(host: Optional[str] = None) -> OllamaSupervisor:
+    """Process-wide supervisor handle for host (not leading until lead() / ensure())."""
+    key = host if is_multi_host(host) else normalize_host(host)
+    with _SUPERVISORS_LOCK:
+        sup = _SUPERVISORS.get(key)
+        if sup is None:
+            sup = _SUPERVISORS[key] = OllamaSupervisor(key)
+        return sup
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+
+def _print_status(st: SupervisorStatus) -> None:
+    print(f"{st.host}: {st.describe()}")
+    if st.error:
+        print(f"  error: {st.error}")
+    for r in st.restarts:
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(r.at))
+        print(f"  {when}  {r.reason:<11} {r.took_s:5.1f} s  {'ok' if r.ok else 'failed: ' + r.error}")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Supervise this machine's Ollama server")
+    ap.add_argument("--host", default=None, help="Ollama host (default: OLLAMA_HOST or localhost:11434)")
+    ap.add_argument("--status", action="store_true", help="Print state and restart history, then exit")
+    args = ap.parse_args()
+
+    sup = get_supervisor(args.host)
+    if args.status:
+        _print_status(sup.status())
+        return 0
+    if not sup.local:
+        print(f"{sup.host} is not this machine — nothing to supervise.")
+        return 1
+    st = sup.ensure()
+    if not sup.leading:
+        print(f"Already supervised by pid {st.leader_pid}.")
+        _print_status(st)
+        return 1
+    print(f"Supervising {sup.host} (pid {os.getpid()}); Ctrl+C stops supervising, Ollama keeps running.")
+    _print_status(st)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sup.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
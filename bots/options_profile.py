@@ -0,0 +1,426 @@
+# -*- coding: utf-8 -*-
+"""
+options_profile.py — Generation options sized to this machine and model.
+
+Session.options, ollama_bot._options() and bot_schema.default_spec() all
+hardcoded num_ctx 8192.  On the CPU-only and 8 GB-VRAM lab machines that
+spills the KV cache out of VRAM (or swaps RAM) and prefill crawls.
+
+profile_options(model, host) picks the hardware-dependent options instead:
+
+  • num_thread — physical cores
+  • num_gpu    — layers to offload: all when weights + KV cache fit in VRAM,
+                 a proportional share when they do not, 0 without a GPU
+  • num_ctx    — the largest power of two whose KV cache fits next to the
+                 weights (VRAM, or half of RAM on CPU), capped by the model's
+                 context_length and CITL_MAX_NUM_CTX / CITL_CPU_MAX_NUM_CTX
+  • num_batch  — 512 with the whole model on GPU, 256 otherwise
+
+Inputs are core count and RAM (psutil when installed, else the OS), VRAM
+from bots.gpu_status.get_gpus, and the model's weights size and layer /
+head / context metadata from /api/show.  Each chosen profile is persisted
+per machine in data/profiles/<hostname>.json, keyed by model and digest, and
+recomputed when the model is re-created or the hardware changes.  A remote
+OLLAMA_HOST is not this machine, so it only gets num_ctx: CITL_MAX_NUM_CTX
+capped by the model's context_length (unprofiled_options), and chooses the
+rest itself.  The same goes when profiling fails or is disabled.
+
+Explicit values win: call sites merge the profile *under* their own
+options, so a bot spec or _options() that sets num_ctx keeps it.
+
+Usage:
+    opts = apply_profile({"temperature": 0.3, "num_predict": 1024}, "llama3.2", host)
+    get_profiler().explain("llama3.2", host)    # machine, model metadata, choice
+
+Environment overrides:
+    CITL_PROFILE_DIR        — where profiles are kept (default: <repo>/data/profiles)
+    CITL_MAX_NUM_CTX        — largest num_ctx chosen; what a remote host gets (default: 8192)
+    CITL_CPU_MAX_NUM_CTX    — largest num_ctx without a GPU (default: 4096)
+    CITL_NO_PROFILE=1       — disable profiling (num_ctx as for a remote host)
+"""
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from bots.gpu_status import get_gpus
+from bots.ollama_client import get_client, probe_tags, split_hosts
+from bots.residency import VRAM_HEADROOM_MB
+
+try:  # optional — physical core count and exact RAM; the OS fallbacks are close enough
+    import psutil  # type: ignore
+except Exception:  # pragma: no cover - depends on environment
+    psutil = None  # type: ignore
+
+PROFILE_KEYS     = ("num_ctx", "num_thread", "num_batch", "num_gpu")
+MAX_NUM_CTX      = int(os.environ.get("CITL_MAX_NUM_CTX", "8192"))
+CPU_MAX_NUM_CTX  = int(os.environ.get("CITL_CPU_MAX_NUM_CTX", "4096"))
+MIN_NUM_CTX      = 2048
+RAM_FRACTION     = 0.5          # share of RAM a CPU-only model (weights + KV) may take
+DEFAULT_KV_BYTES = 128 * 1024   # KV cache per token when /api/show has no metadata (8B, GQA, f16)
+RETRY_S          = 30.0         # an unreachable Ollama is asked again after this long
+MB               = 1024 * 1024
+
+
+def profile_dir() -> Path:
+    env = os.environ.get("CITL_PROFILE_DIR")
+    if env:
+        return Path(env)
+    if getattr(sys, "frozen", False):
+        return Path(sys.executable).parent / "data" / "profiles"
+    return Path(__file__).resolve().parents[1] / "data" / "profiles"
+
+
+# ── machine ───────────────────────────────────────────────────────────────────
+
+def _physical_cores() -> int:
+    logical = os.cpu_count() or 1
+    if psutil is not None:
+        try:
+            return psutil.cpu_count(logical=False) or logical
+        except Exception:
+            pass
+    try:  # Linux: distinct (physical id, core id) pairs
+        pairs, phys = set(), "0"
+        for line in Path("/proc/cpuinfo").read_text().splitlines():
+            key, _, value = line.partition(":")
+            if key.strip() == "physical id":
+                phys = value.strip()
+            elif key.strip() == "core id":
+                pairs.add((phys, value.strip()))
+        if pairs:
+            return len(pairs)
+    except OSError:
+        pass
+    return max(1, logical // 2) if logical >= 4 else logical   # assume SMT
+
+
+def _ram_mb() -> int:
+    if psutil is not None:
+        try:
+            return int(psutil.virtual_memory().total / MB)
+        except Exception:
+            pass
+    if sys.platform == "win32":
+        import ctypes
+
+        class _MemStatus(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                        ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                        ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                        ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                        ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+        st = _MemStatus()
+        st.dwLength = ctypes.sizeof(_MemStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(st)):  # type: ignore[attr-defined]
+            return int(st.ullTotalPhys / MB)
+        return 0
+    try:
+        return int(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / MB)
+    except (ValueError, OSError, AttributeError):
+        return 0
+
+
+@dataclass
+class MachineInfo:
+    hostname: str
+    cores: int        # physical
+    threads: int      # logical
+    ram_mb: int
+    vram_mb: int      # all GPUs together (Ollama splits layers across them)
+    gpus: str = ""
+
+    @classmethod
+    def detect(cls) -> "MachineInfo":
+        gpus = get_gpus()
+        return cls(
+            hostname=socket.gethostname() or "localhost",
+            cores=_physical_cores(),
+            threads=os.cpu_count() or 1,
+            ram_mb=_ram_mb(),
+            vram_mb=sum(g.get("vram_total_mb") or 0 for g in gpus),
+            gpus=", ".join(g.get("name") or "GPU" for g in gpus),
+        )
+
+    @property
+    def fingerprint(self) -> str:
+        """Changes when the hardware does (RAM rounded to GiB, so free-memory jitter does not count)."""
+        return f"{self.cores}c/{self.threads}t/{round(self.ram_mb / 1024)}G/{self.vram_mb}M"
+
+
+# ── model ─────────────────────────────────────────────────────────────────────
+
+@dataclass
+class ModelMeta:
+    name: str
+    digest: str = ""
+    size_mb: float = 0.0               # weights on disk ≈ weights in memory
+    layers: int = 0
+    context_length: int = 0
+    kv_bytes_per_token: int = 0
+    quantization: str = ""
+
+    @classmethod
+    def from_show(cls, name: str, show: Dict[str, Any], size: int = 0, digest: str = "") -> "ModelMeta":
+        info = show.get("model_info") or {}
+        arch = info.get("general.architecture", "")
+
+        def _get(key: str) -> int:
+            try:
+                return int(info.get(f"{arch}.{key}") or 0)
+            except (TypeError, ValueError):
+                return 0
+
+        layers, embed = _get("block_count"), _get("embedding_length")
+        heads = _get("attention.head_count")
+        kv_heads = _get("attention.head_count_kv") or heads
+        # K and V, f16, per layer: kv_heads × head_dim each
+        kv = 2 * 2 * layers * kv_heads * (embed // heads) if layers and embed and heads else 0
+        return cls(
+            name=name, digest=digest, size_mb=size / MB, layers=layers,
+            context_length=_get("context_length"), kv_bytes_per_token=kv,
+            quantization=(show.get("details") or {}).get("quantization_level", ""),
+        )
+
+
+def fetch_model_meta(host: Optional[str], model: str, timeout: float = 5.0) -> Optional[ModelMeta]:
+    """/api/show + the /api/tags size for model; None when Ollama or the model is missing."""
+    probe = probe_tags(host)
+    if not probe.ok or not probe.has_model(model):
+        return None
+    entry = next((m for m in probe.models if (m.get("name") or m.get("model")) in (model, f"{model}:latest")), {})
+    try:
+        r = get_client(host).post("/api/show", {"model": model}, timeout=timeout)
+        r.raise_for_status()
+        show = r.json() or {}
+    except Exception:
+        show = {}   # older Ollama / stand-in: size alone still sizes num_gpu
+    return ModelMeta.from_show(model, show, size=int(entry.get("size") or 0), digest=entry.get("digest") or "")
+
+
+# ── choice ────────────────────────────────────────────────────────────────────
+
+def _pow2_floor(n: float) -> int:
+    p = MIN_NUM_CTX
+    while p * 2 <= n:
+        p *= 2
+    return p
+
+
+def choose_options(machine: MachineInfo, meta: Optional[ModelMeta]) -> Dict[str, int]:
+    """Pick num_ctx / num_thread / num_batch / num_gpu for model on machine."""
+    weights = meta.size_mb if meta else 0.0
+    kv_mb   = (meta.kv_bytes_per_token if meta and meta.kv_bytes_per_token else DEFAULT_KV_BYTES) / MB
+    layers  = meta.layers if meta and meta.layers else 0
+    cap     = MAX_NUM_CTX
+    if meta and meta.context_length:
+        cap = min(cap, meta.context_length)
+    opts: Dict[str, int] = {"num_thread": max(1, machine.cores)}
+    vram = max(0, machine.vram_mb - VRAM_HEADROOM_MB)
+
+    if vram and (not weights or weights + MIN_NUM_CTX * kv_mb <= vram):
+        # everything on the GPU; the KV cache gets what the weights leave
+        ctx = (vram - weights) / kv_mb
+        opts["num_batch"] = 512
+        if layers:
+            opts["num_gpu"] = layers + 1        # + the output layer
+    elif vram:
+        # partial offload: as many layers as fit next to a minimal KV cache
+        share = max(0.0, (vram - MIN_NUM_CTX * kv_mb) / weights)
+        opts["num_gpu"] = int((layers or 32) * share)
+        opts["num_batch"] = 256
+        ctx = (machine.ram_mb * RAM_FRACTION - weights * (1 - share)) / kv_mb
+        cap = min(cap, CPU_MAX_NUM_CTX)
+    else:
+        opts["num_gpu"] = 0
+        opts["num_batch"] = 256
+        ctx = (machine.ram_mb * RAM_FRACTION - weights) / kv_mb if machine.ram_mb else MIN_NUM_CTX
+        cap = min(cap, CPU_MAX_NUM_CTX)
+    opts["num_ctx"] = min(_pow2_floor(ctx), max(MIN_NUM_CTX, cap))
+    return opts
+
+
+# ── profiler ──────────────────────────────────────────────────────────────────
+
+@dataclass
+class Profile:
+    model: str
+    digest: str
+    machine: str       # MachineInfo.fingerprint
+    options: Dict[str, int]
+    meta: Optional[Dict[str, Any]] = None
+    at: float = 0.0
+
+
+class OptionsProfiler:
+    """Chooses and persists per-model profiles for this machine."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self._machine: Optional[MachineInfo] = None
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._mem: Dict[str, Profile] = {}     # model → profile (also unpersisted fallbacks)
+        self._loaded = False
+
+    @property
+    def machine(self) -> MachineInfo:
+        if self._machine is None:
+            self._machine = MachineInfo.detect()
+        return self._machine
+
+    def _file(self) -> Path:
+        if self.path is None:
+            name = "".join(c if c.isalnum() or c in "-_." else "_" for c in self.machine.hostname)
+            self.path = profile_dir() / f"{name}.json"
+        return self.path
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            data = json.loads(self._file().read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        for model, p in (data.get("models") or {}).items():
+            try:
+                prof = Profile(**p)
+            except TypeError:
+                continue
+            if prof.machine == self.machine.fingerprint:
+                self._mem[model] = prof
+
+    def _save(self) -> None:
+        persisted = {m: asdict(p) for m, p in self._mem.items() if p.meta is not None}
+        data = {"machine": asdict(self.machine), "models": persisted}
+        path = self._file()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            pass   # a read-only checkout still gets the in-memory profile
+
+    def profile(self, model: str, host: Optional[str] = None) -> Profile:
+        """The profile for model: memory, then disk, then /api/show + a fresh choice."""
+        with self._lock:
+            self._load()
+            hit = self._mem.get(model)
+            # the digest check is free when the shared /api/tags probe is warm
+            digest = probe_tags(host).digest(model) if hit is not None and hit.meta is not None else None
+            if hit is not None and (
+                (hit.meta is not None and (digest is None or digest == hit.digest))
+                or (hit.meta is None and time.time() - hit.at < RETRY_S)
+            ):
+                return hit
+        meta = fetch_model_meta(host, model)
+        prof = Profile(
+            model=model,
+            digest=meta.digest if meta else "",
+            machine=self.machine.fingerprint,
+            options=choose_options(self.machine, meta),
+            meta=asdict(meta) if meta else None,
+            at=time.time(),
+        )
+        with self._lock:
+            self._mem[model] = prof
+            if meta is not None:
+                self._save()
+        return prof
+
+    def options(self, model: str, host: Optional[str] = None) -> Dict[str, int]:
+        if os.environ.get("CITL_NO_PROFILE") == "1":
+            return unprofiled_options(model, host)
+        try:
+            return dict(self.profile(model, host).options)
+        except Exception:
+            return unprofiled_options(model, host)   # profiling must never break a chat turn
+
+    def explain(self, model: str, host: Optional[str] = None) -> Dict[str, Any]:
+        prof = self.profile(model, host)
+        return {"machine": asdict(self.machine), "model": prof.meta, "options": prof.options,
+                "file": str(self._file())}
+
+    def forget(self, model: Optional[str] = None) -> None:
+        """Drop one (or every) profile so the next call re-profiles."""
+        with self._lock:
+            self._load()
+            if model is None:
+                self._mem.clear()
+            else:
+                self._mem.pop(model, None)
+            self._save()
+
+
+_PROFILER: Optional[OptionsProfiler] = None
+_PROFILER_LOCK = threading.Lock()
+
+
+def get_profiler() -> OptionsProfiler:
+    """The process-wide profiler (one machine, one profile file)."""
+    global _PROFILER
+    with _PROFILER_LOCK:
+        if _PROFILER is None:
+            _PROFILER = OptionsProfiler()
+        return _PROFILER
+
+
+def is_local_host(host: Optional[str]) -> bool:
+    """True when every host in the spec is this machine (its hardware is what we can measure)."""
+    local = {"localhost", "127.0.0.1", "::1", "0.0.0.0", socket.gethostname().lower()}
+    return all(urlparse(h).hostname in local for h in split_hosts(host))
+
+
+_UNPROFILED: Dict[Tuple[str, str], Tuple[float, Optional[int]]] = {}   # (host, model) -> (at, context_length)
+_UNPROFILED_LOCK = threading.Lock()
+
+
+def unprofiled_options(model: str, host: Optional[str] = None) -> Dict[str, int]:
+    """
+    num_ctx for hardware we cannot measure: CITL_MAX_NUM_CTX, capped by the
+    model's context_length from /api/show (asked once per host and model).
+    Always explicit — the server's own default (OLLAMA_CONTEXT_LENGTH) is
+    not visible from here, so nothing downstream has to guess it.
+    """
+    key = (host or "", model)
+    with _UNPROFILED_LOCK:
+        hit = _UNPROFILED.get(key)
+    if hit is None or (hit[1] is None and time.time() - hit[0] >= RETRY_S):
+        try:
+            meta = fetch_model_meta(host, model)
+        except Exception:
+            meta = None
+        hit = (time.time(), meta.context_length if meta else None)
+        with _UNPROFILED_LOCK:
+            _UNPROFILED[key] = hit
+    ctx = MAX_NUM_CTX
+    if hit[1]:
+        ctx = min(ctx, hit[1])
+    return {"num_ctx": ctx}
+
+
+def profile_options(model: str, host: Optional[str] = None) -> Dict[str, int]:
+    """
+    num_ctx / num_thread / num_batch / num_gpu for model on this machine.  A
+    remote Ollama's hardware is unknown here, so it only gets num_ctx
+    (unprofiled_options) and chooses the rest itself.
+    """
+    if not is_local_host(host):
+        return unprofiled_options(model, host)
+    return get_profiler().options(model, host)
+
+
+def apply_profile(options: Dict[str, Any], model: str, host: Optional[str] = None) -> Dict[str, Any]:
+    """options with the machine profile filled in underneath (explicit keys win)."""
+    merged: Dict[str, Any] = profile_options(model, host)
+    merged.update({k: v for k, v in options.items() if v is not None})
+    return merged
@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+"""
+residency.py — Which models Ollama keeps loaded, and for how long.
+
+Ollama unloads a model keep_alive after its last request (5 minutes unless
+told otherwise), and the next request pays the full load — often longer than
+the reply itself.  Switching with /model or /bot, or falling back to another
+model in _ensure_model, always paid it on the first message.
+
+ResidencyManager puts that under a policy:
+
+  • ps()          — /api/ps of every host: resident models, VRAM use, expiry
+  • keep_alive()  — the keep_alive to send with each request for a model
+                    (per-model overrides, -1 for pinned models)
+  • preload()     — load a model in the background (empty /api/generate) as
+                    soon as it is selected, instead of on the first message.
+                    It sends the caller's load options (LOAD_KEYS: num_ctx,
+                    num_batch, num_gpu, ...): Ollama reloads the runner when
+                    a request's load options differ from the loaded ones, so
+                    a preload with other options would be wasted
+  • note_use()    — count requests per model; with pin_n > 0 the N most used
+                    models that fit in the VRAM budget (from
+                    bots.gpu_status.get_gpus) are pinned with keep_alive -1,
+                    and models that drop out of the top N go back to the
+                    default keep_alive
+
+Usage:
+    res = get_residency(host)
+    res.preload("llama3.2", opts)                         # returns at once
+    client.chat_stream(model, msgs, opts, keep_alive=res.keep_alive(model))
+    res.note_use(model, opts)
+    for m in res.ps(): print(m.name, m.vram_mb, m.expires_in_s)
+
+Environment overrides:
+    CITL_KEEP_ALIVE         — default keep_alive for requests (default: 30m)
+    CITL_KEEP_ALIVE_MODELS  — per-model overrides, e.g. "llama3.2=2h,hub-assistant=-1"
+    CITL_PIN_MODELS         — pin this many hot models (default: 0 = off)
+    CITL_VRAM_BUDGET_MB     — VRAM pinned models may use (default: GPU total - headroom)
+    CITL_VRAM_HEADROOM_MB   — VRAM left free for other models (default: 1024)
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from bots.gpu_status import get_gpus
+from bots.ollama_client import get_client, normalize_host, probe_tags, split_hosts
+
+KeepAlive = Union[str, int]
+
+DEFAULT_KEEP_ALIVE = os.environ.get("CITL_KEEP_ALIVE", "30m")
+PIN_MODELS         = int(os.environ.get("CITL_PIN_MODELS", "0"))
+VRAM_HEADROOM_MB   = int(os.environ.get("CITL_VRAM_HEADROOM_MB", "1024"))
+PS_TTL_S           = 2.0   # /api/ps answers repeated ps() calls for this long
+MB                 = 1024 * 1024
+# Options that pick how the runner is loaded; a request that changes any of them reloads the model
+LOAD_KEYS          = ("num_ctx", "num_batch", "num_gpu", "num_thread", "main_gpu", "use_mmap", "use_mlock")
+
+
+def _parse_overrides(spec: str) -> Dict[str, KeepAlive]:
+    """"a=1h,b=-1" → {"a": "1h", "b": -1}."""
+    out: Dict[str, KeepAlive] = {}
+    for item in spec.split(","):
+        name, sep, value = item.partition("=")
+        if sep and name.strip() and value.strip():
+            v = value.strip()
+            out[name.strip()] = int(v) if v.lstrip("-").isdigit() else v
+    return out
+
+
+def load_options(options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """The LOAD_KEYS part of request options (unset keys left out, as Ollama then uses its defaults)."""
+    return {k: options[k] for k in LOAD_KEYS if options and options.get(k) is not None}
+
+
+def _parse_expiry(value: Optional[str]) -> Optional[float]:
+    """/api/ps expires_at → epoch seconds; None = never (pinned) or unknown."""
+    if not value:
+        return None
+    v = value.strip().replace("Z", "+00:00")
+    # Go prints nanoseconds; fromisoformat takes at most microseconds
+    if "." in v:
+        head, _, rest = v.partition(".")
+        digits = "".join(c for c in rest if c.isdigit())
+        v = f"{head}.{digits[:6].ljust(6, '0')}{rest[len(digits):]}"
+    try:
+        dt = datetime.fromisoformat(v)
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    # keep_alive -1 shows up as the zero time (0001-01-01) or centuries ahead
+    if dt.year < 1970 or dt.year > 2200:
+        return None
+    return dt.timestamp()
+
+
+@dataclass
+class ResidentModel:
+    """One /api/ps entry."""
+    host: str
+    name: str
+    size: int = 0                   # bytes, whole model
+    size_vram: int = 0              # bytes of it in VRAM (the rest is on CPU)
+    expires_at: Optional[float] = None   # epoch seconds; None = never
+    pinned: bool = False            # pinned by this manager
+    context_length: Optional[int] = None  # num_ctx it was loaded with (newer Ollama reports it)
+
+    @property
+    def vram_mb(self) -> float:
+        return self.size_vram / MB
+
+    @property
+    def size_mb(self) -> float:
+        return self.size / MB
+
+    @property
+    def expires_in_s(self) -> Optional[float]:
+        return None if self.expires_at is None else max(0.0, self.expires_at - time.time())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "host": self.host, "name": self.name, "size_mb": round(self.size_mb),
+            "vram_mb": round(self.vram_mb), "expires_in_s": self.expires_in_s, "pinned": self.pinned,
+            "context_length": self.context_length,
+        }
+
+
+@dataclass
+class ResidencyPolicy:
+    default_keep_alive: KeepAlive = DEFAULT_KEEP_ALIVE
+    overrides: Dict[str, KeepAlive] = field(
+        default_factory=lambda: _parse_overrides(os.environ.get("CITL_KEEP_ALIVE_MODELS", ""))
+    )
+    pin_n: int = PIN_MODELS
+    vram_budget_mb: Optional[int] = None   # None = from get_gpus()
+
+    def keep_alive_for(self, model: str) -> KeepAlive:
+        if model in self.overrides:
+            return self.overrides[model]
+        return self.overrides.get(model.split(":")[0], self.default_keep_alive)
+
+
+# ── Manager ───────────────────────────────────────────────────────────────────
+
+class ResidencyManager:
+    """Keep-alive policy, preloading and hot-model pinning for one host (or host list)."""
+
+    def __init__(self, host: Optional[str] = None, policy: Optional[ResidencyPolicy] = None):
+        self.host   = ",".join(split_hosts(host))
+        self.policy = policy or ResidencyPolicy()
+        self.uses: Counter = Counter()
+        self.pinned: Set[str] = set()
+        self._lock = threading.Lock()
+        self._loading: Dict[Tuple[str, str], threading.Thread] = {}   # (model, load options) -> preload
+        self._loaded: Dict[str, Dict[str, Any]] = {}   # model -> load options it was last sent with
+        self._ps: List[ResidentModel] = []
+        self._ps_at = 0.0
+
+    def __repr__(self) -> str:
+        return f"ResidencyManager({self.host!r}, pinned={sorted(self.pinned)})"
+
+    # ── /api/ps ───────────────────────────────────────────────────────────────
+
+    def forget_ps(self) -> None:
+        """Drop the cached /api/ps (a request just loaded a model): the next ps() asks again."""
+        self._ps_at = 0.0
+
+    def ps(self, max_age: float = PS_TTL_S) -> List[ResidentModel]:
+        """Resident models on every host, cached for max_age seconds (0 = fresh)."""
+        if max_age > 0 and time.monotonic() - self._ps_at < max_age:
+            return list(self._ps)
+        rows: List[ResidentModel] = []
+        for h in split_hosts(self.host):
+            try:
+                r = get_client(h).get("/api/ps", timeout=2)
+                r.raise_for_status()
+                models = (r.json() or {}).get("models") or []
+            except Exception:
+                continue   # down or an Ollama without /api/ps — nothing resident we can see
+            for m in models:
+                name = m.get("name") or m.get("model") or ""
+                rows.append(ResidentModel(
+                    host=h, name=name,
+                    size=int(m.get("size") or 0), size_vram=int(m.get("size_vram") or 0),
+                    expires_at=_parse_expiry(m.get("expires_at")),
+                    pinned=self._base(name) in {self._base(p) for p in self.pinned},
+                    context_length=m.get("context_length") or None,
+                ))
+        self._ps, self._ps_at = rows, time.monotonic()
+        return list(rows)
+
+    def is_resident(self, model: str, max_age: float = PS_TTL_S, options: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Is model loaded?  With options, only if it was loaded with the same load
+        options — as far as /api/ps (context_length) and our own record tell.
+        """
+        rows = [m for m in self.ps(max_age) if self._same(m.name, model)]
+        if not rows or options is None:
+            return bool(rows)
+        want = load_options(options)
+        known = self._loaded.get(self._base(model))
+        if known is not None and known != want:
+            return False
+        ctx = want.get("num_ctx")
+        return any(ctx is None or m.context_length is None or m.context_length == ctx for m in rows)
+
+    # ── policy ────────────────────────────────────────────────────────────────
+
+    def keep_alive(self, model: str) -> KeepAlive:
+        """keep_alive to send with every request for model (pinned = -1)."""
+        if model in self.pinned:
+            return -1
+        return self.policy.keep_alive_for(model)
+
+    def preload(self, model: str, options: Optional[Dict[str, Any]] = None,
+                wait: bool = False) -> Optional[threading.Thread]:
+        """
+        Load model now with an empty /api/generate so the first real message
+        skips the cold load.  options: the options the session's requests will
+        send — their load options go with the preload, or the first request
+        would reload the runner anyway.  Runs on a daemon thread (joined if
+        wait=True), which does nothing if the model is already resident with
+        those options.  Returns None when that load is already in flight.
+        """
+        if not model:
+            return None
+        opts = load_options(options)
+        key = (self._base(model), repr(sorted(opts.items())))
+        with self._lock:
+            t = self._loading.get(key)
+            if t is not None and t.is_alive():
+                return None
+            t = threading.Thread(target=self._load, args=(model, opts, key), name=f"preload-{model}", daemon=True)
+            self._loading[key] = t
+        t.start()
+        if wait:
+            t.join()
+        return t
+
+    def unload(self, model: str) -> bool:
+        """Evict model now (keep_alive 0).  Returns False if the host refused."""
+        self.pinned.discard(model)
+        self._loaded.pop(self._base(model), None)
+        return self._send(model, 0)
+
+    def note_use(self, model: str, options: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Count one request for model (sent with options); with pinning on, re-pin
+        in the background.
+        """
+        with self._lock:
+            self.uses[model] += 1
+            if options is not None:
+                self._loaded[self._base(model)] = load_options(options)
+        if self.policy.pin_n > 0:
+            threading.Thread(target=self.repin, name="repin", daemon=True).start()
+
+    # ── pinning ───────────────────────────────────────────────────────────────
+
+    def vram_budget_mb(self) -> Optional[int]:
+        """VRAM pinned models may occupy: env/policy override, else GPU total minus headroom."""
+        env = os.environ.get("CITL_VRAM_BUDGET_MB")
+        if env:
+            return int(env)
+        if self.policy.vram_budget_mb is not None:
+            return self.policy.vram_budget_mb
+        total = sum(g.get("vram_total_mb") or 0 for g in get_gpus())
+        return max(0, total - VRAM_HEADROOM_MB) if total else None
+
+    def hot_set(self) -> List[str]:
+        """The most used models, up to pin_n, that fit in the VRAM budget together."""
+        budget = self.vram_budget_mb()
+        if self.policy.pin_n <= 0 or budget is None:
+            return []
+        sizes = self._sizes_mb()
+        chosen: List[str] = []
+        used = 0.0
+        with self._lock:
+            ranked = [m for m, _ in self.uses.most_common()]
+        for model in ranked:
+            need = sizes.get(model, sizes.get(self._base(model), 0.0))
+            if not need or used + need > budget:
+                continue   # unknown size (not pulled) or does not fit
+            chosen.append(model)
+            used += need
+            if len(chosen) >= self.policy.pin_n:
+                break
+        return chosen
+
+    def repin(self) -> List[str]:
+        """Pin the hot set (keep_alive -1) and release models that left it."""
+        hot = set(self.hot_set())
+        with self._lock:
+            added, dropped = hot - self.pinned, self.pinned - hot
+            self.pinned = hot
+        # A keep_alive-only request has to carry the options the model is loaded with, or Ollama
+        # reloads it with defaults; unknown options -> leave it, its next request sends keep_alive -1
+        for model in added:
+            opts = self._loaded.get(self._base(model))
+            if opts is not None:
+                self._send(model, -1, opts)
+        for model in dropped:
+            opts = self._loaded.get(self._base(model))
+            if opts is not None and self.is_resident(model, options=opts):
+                self._send(model, self.policy.keep_alive_for(model), opts)
+        return sorted(hot)
+
+    # ── internal ──────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _base(name: str) -> str:
+        return name[: -len(":latest")] if name.endswith(":latest") else name
+
+    def _same(self, a: str, b: str) -> bool:
+        return self._base(a) == self._base(b)
+
+    def _sizes_mb(self) -> Dict[str, float]:
+        """Model sizes: VRAM use when resident, otherwise the /api/tags file size."""
+        sizes: Dict[str, float] = {}
+        for m in probe_tags(self.host).models:
+            name = m.get("name") or m.get("model") or ""
+            if name and m.get("size"):
+                sizes[self._base(name)] = sizes[name] = int(m["size"]) / MB
+        for m in self.ps():
+            if m.size_vram:
+                sizes[self._base(m.name)] = sizes[m.name] = m.vram_mb
+        return sizes
+
+    def _send(self, model: str, keep_alive: KeepAlive, options: Optional[Dict[str, Any]] = None) -> bool:
+        """Empty /api/generate; options = the load options (LOAD_KEYS) to load it with, if it loads."""
+        try:
+            get_client(self.host).generate(model, "", options=options or None, timeout=(3, 600),
+                                           keep_alive=keep_alive)
+            if options is not None and keep_alive != 0:
+                with self._lock:
+                    self._loaded[self._base(model)] = dict(options)
+            return True
+        except Exception:
+            return False
+        finally:
+            self._ps_at = 0.0   # residency changed
+
+    def _load(self, model: str, options: Dict[str, Any], key: Tuple[str, str]) -> None:
+        try:
+            if not self.is_resident(model, max_age=0, options=options):
+                self._send(model, self.keep_alive(model), options)
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+
+
+_MANAGERS: Dict[str, ResidencyManager] = {}
+_MANAGERS_LOCK = threading.Lock()
+
+
+def get_residency(host: Optional[str] = None) -> ResidencyManager:
+    """The process-wide ResidencyManager for host (or host list)."""
+    key = ",".join(normalize_host(h) for h in split_hosts(host))
+    with _MANAGERS_LOCK:
+        mgr = _MANAGERS.get(key)
+        if mgr is None:
+            mgr = _MANAGERS[key] = ResidencyManager(key)
+        return mgr
+
+
+def model_for_bot(bot_id: str, default: str) -> str:
+    """The Ollama model a registry bot runs on (its module's MODEL), else default."""
+    try:
+        import importlib
+        return getattr(importlib.import_module(f"bots.{bot_id}"), "MODEL", default) or default
+    except Exception:
+        return default
+
+
+def options_for_bot(bot_id: str, model: str, host: Optional[str] = None) -> Dict[str, Any]:
+    """The options a registry bot's requests send: its module's _options() over the machine profile."""
+    from bots.options_profile import apply_profile   # late: options_profile imports this module
+    try:
+        import importlib
+        own = getattr(importlib.import_module(f"bots.{bot_id}"), "_options", dict)()
+    except Exception:
+        own = {}
+    return apply_profile(own, model, host)
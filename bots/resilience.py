@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""
+resilience.py — Fail fast when an Ollama host is down or wedged.
+
+With flat 180–300 s timeouts, a dead or wedged Ollama makes every queued
+request in the hub and the demo API hang for minutes.  Every OllamaClient
+request goes through its host's HostGuard, which adds:
+
+  • adaptive timeouts — once a host has answered MIN_SAMPLES requests of a
+    kind (e.g. streamed /api/chat), the read timeout becomes READ_FACTOR ×
+    the p95 time-to-first-byte seen for that kind (streamed: the first token;
+    non-streamed: the whole reply), clamped to [READ_FLOOR_S, the caller's
+    timeout].  The connect timeout becomes the p95 TTFB, clamped to
+    [CONNECT_FLOOR_S, the caller's connect timeout].  Only warm requests
+    adapt and give samples: a chat / generate / embed whose model is not
+    known to be resident with its load options (ResidencyManager, /api/ps)
+    may pay a cold load, so it keeps the caller's read timeout.
+  • a circuit breaker — THRESHOLD consecutive failures (connection errors,
+    timeouts, HTTP 5xx) open it, and calls then fail at once with
+    CircuitOpen ("Ollama at … is unavailable …") instead of each waiting out
+    its own timeout.
+  • half-open probing — once the cooldown (COOLDOWN_S, doubling every time it
+    re-opens, up to MAX_COOLDOWN_S) is over, one caller probes /api/tags.
+    Success closes the breaker; failure re-opens it.  Other callers keep
+    failing fast while the probe runs.
+  • bounded retries with jitter — idempotent requests only (GETs, and POSTs
+    to IDEMPOTENT_PATHS) get up to RETRIES more attempts, with full-jitter
+    exponential backoff.  Chat and generate are never retried.
+
+CircuitOpen is a requests ConnectionError, so code that already handles an
+unreachable Ollama (the sandbox's error line, HostPool failover) handles an
+open breaker the same way.
+
+Usage:
+    guard = get_guard("http://localhost:11434")
+    resp  = guard.call(lambda t: session.get(url, timeout=t), "GET", "/api/tags", (3, 300))
+    for row in status(): print(row["host"], row["state"], row["timeouts"])
+
+Environment overrides:
+    CITL_BREAKER_THRESHOLD       — consecutive failures that open the breaker (default: 3)
+    CITL_BREAKER_COOLDOWN_S      — first cooldown before a half-open probe (default: 5; max 60)
+    CITL_ADAPTIVE_MIN_SAMPLES    — TTFB samples before timeouts adapt (default: 5)
+    CITL_ADAPTIVE_READ_FACTOR    — read timeout = this × p95 TTFB (default: 4)
+    CITL_ADAPTIVE_READ_FLOOR_S   — never adapt the read timeout below this (default: 60)
+    CITL_OLLAMA_RETRIES          — extra attempts for idempotent requests (default: 2)
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import requests
+
+from bots.cancel import Cancelled
+from bots.telemetry import percentile
+
+THRESHOLD       = int(os.environ.get("CITL_BREAKER_THRESHOLD", "3"))
+COOLDOWN_S      = float(os.environ.get("CITL_BREAKER_COOLDOWN_S", "5"))
+MAX_COOLDOWN_S  = 60.0
+MIN_SAMPLES     = int(os.environ.get("CITL_ADAPTIVE_MIN_SAMPLES", "5"))
+READ_FACTOR     = float(os.environ.get("CITL_ADAPTIVE_READ_FACTOR", "4"))
+READ_FLOOR_S    = float(os.environ.get("CITL_ADAPTIVE_READ_FLOOR_S", "60"))
+CONNECT_FLOOR_S = 0.5
+RETRIES         = int(os.environ.get("CITL_OLLAMA_RETRIES", "2"))
+RETRY_BASE_S    = 0.2
+PROBE_TIMEOUT_S = 2.0
+SAMPLES         = 50     # TTFB samples kept per kind
+
+IDEMPOTENT_PATHS = frozenset({"/api/tags", "/api/show", "/api/ps", "/api/version"})
+LOADING_PATHS    = frozenset({"/api/chat", "/api/generate", "/api/embed", "/api/embeddings"})   # may load a model
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+
+class CircuitOpen(requests.exceptions.ConnectionError):
+    """The host's breaker is open: the call was not sent."""
+
+
+def is_host_failure(exc: BaseException) -> bool:
+    """Connection errors and timeouts (requests or httpx) count against the host; anything else does not."""
+    if isinstance(exc, (Cancelled, CircuitOpen)):
+        return False
+    if isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, TimeoutError,
+                        ConnectionError)):
+        return True
+    return type(exc).__module__.startswith("httpx") and type(exc).__name__ in (
+        "ConnectError", "ConnectTimeout", "ReadTimeout", "WriteTimeout", "PoolTimeout", "ReadError",
+        "RemoteProtocolError", "TimeoutException", "NetworkError",
+    )
+
+
+def backoff_s(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number attempt (0-based)."""
+    return random.uniform(0, RETRY_BASE_S * 2 ** attempt)
+
+
+# ── per-host guard ────────────────────────────────────────────────────────────
+
+class HostGuard:
+    """Circuit breaker, adaptive timeouts and idempotent retries for one Ollama host."""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.failures = 0
+        self.successes = 0
+        self.rejected = 0
+        self.retries = 0
+        self.opened = 0
+        self.last_error = ""
+        self.open_until = 0.0            # time.monotonic()
+        self.cooldown_s = COOLDOWN_S
+        self._ttfb: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"HostGuard({self.host!r}, {self.state})"
+
+    # ── timeouts ──────────────────────────────────────────────────────────────
+
+    def timeouts(self, kind: str, connect: float, read: float, warm: bool = True) -> Tuple[float, float]:
+        """(connect, read) for a request of kind, given what the caller asked for; cold keeps read."""
+        with self._lock:
+            samples = list(self._ttfb.get(kind, ()))
+        if len(samples) < MIN_SAMPLES:
+            return connect, read
+        p95 = percentile(samples, 95)
+        return (min(connect, max(CONNECT_FLOOR_S, p95)),
+                min(read, max(READ_FLOOR_S, READ_FACTOR * p95)) if warm else read)
+
+    def warm(self, path: str, model: str = "", options: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        False when the request may load a model first: a LOADING_PATHS call for
+        a model /api/ps does not show resident with these load options.
+        """
+        if "/" + path.lstrip("/") not in LOADING_PATHS or not model:
+            return True
+        try:
+            from bots.residency import get_residency   # late import: residency uses the client
+            return get_residency(self.host).is_resident(model, options=options)
+        except Exception:
+            return False
+
+    # ── breaker ───────────────────────────────────────────────────────────────
+
+    def _reject(self, why: str) -> CircuitOpen:
+        self.rejected += 1
+        return CircuitOpen(
+            f"Ollama at {self.host} is unavailable ({why}; last error: {self.last_error or 'none'}) — "
+            f"failing fast instead of waiting on a timeout"
+        )
+
+    def before(self) -> None:
+        """Raise CircuitOpen unless a request may go out now (running the half-open probe if due)."""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            left = self.open_until - time.monotonic()
+            if self.state == HALF_OPEN:
+                raise self._reject("a recovery probe is running")
+            if left > 0:
+                raise self._reject(f"{self.consecutive_failures} consecutive failures; next probe in {left:.0f} s")
+            self.state = HALF_OPEN
+        from bots.ollama_client import probe_tags   # late import: ollama_client imports this module
+        probe = probe_tags(self.host, timeout=PROBE_TIMEOUT_S, max_age=0)
+        if probe.ok:
+            self.success()
+            return
+        self.failure(probe.error or "recovery probe failed")
+        with self._lock:
+            raise self._reject("recovery probe failed")
+
+    def success(self, kind: str = "", ttfb_s: Optional[float] = None) -> None:
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.state = CLOSED
+            self.cooldown_s = COOLDOWN_S
+            if kind and ttfb_s is not None:
+                self._ttfb.setdefault(kind, deque(maxlen=SAMPLES)).append(ttfb_s)
+
+    def failure(self, error: Any) -> None:
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = str(error)[:300]
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive_failures >= THRESHOLD):
+                if self.state == HALF_OPEN:
+                    self.cooldown_s = min(self.cooldown_s * 2, MAX_COOLDOWN_S)
+                self.state = OPEN
+                self.opened += 1
+                self.open_until = time.monotonic() + self.cooldown_s
+
+    def reset(self) -> None:
+        """Close the breaker (e.g. the server was just restarted)."""
+        self.success()
+
+    # ── calls ─────────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def kind(method: str, path: str, stream: bool = False) -> str:
+        """Requests of one kind share TTFB samples, e.g. "POST /api/chat stream"."""
+        return f"{method} /{path.lstrip('/')}" + (" stream" if stream else "")
+
+    @staticmethod
+    def idempotent(method: str, path: str) -> bool:
+        return method == "GET" or "/" + path.lstrip("/") in IDEMPOTENT_PATHS
+
+    def check(self, resp: Any, kind: str, t0: float, warm: bool = True) -> bool:
+        """
+        Record a response (its headers arrived perf_counter() - t0 after sending);
+        True if it is a 5xx.  A cold request's TTFB includes a load: not sampled.
+        """
+        code = getattr(resp, "status_code", 200)
+        if code >= 500:
+            self.failure(f"HTTP {code}")
+            return True
+        self.success(kind if warm else "", time.perf_counter() - t0)
+        if not warm:
+            from bots.residency import get_residency   # the model is loading now: /api/ps is stale
+            get_residency(self.host).forget_ps()
+        return False
+
+    def record(self, exc: BaseException) -> None:
+        """Count exc against the host if it is a connection failure (e.g. a stream that died half-way)."""
+        if is_host_failure(exc):
+            self.failure(exc)
+
+    async def abefore(self) -> None:
+        """Async before(); the half-open probe runs on a worker thread."""
+        if self.state != CLOSED:
+            await asyncio.to_thread(self.before)
+
+    def call(self, fn: Callable[[Tuple[float, float]], Any], method: str, path: str,
+             timeout: Tuple[float, float], stream: bool = False,
+             model: str = "", options: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Send fn((connect, read)) through the breaker and return its response, retrying
+        idempotent requests.  5xx responses are returned for the caller's raise_for_status().
+        model / options: what the request loads, if anything (see warm()).
+        """
+        kind = self.kind(method, path, stream)
+        attempts = 1 + (max(0, RETRIES) if self.idempotent(method, path) else 0)
+        for attempt in range(attempts):
+            self.before()
+            warm = self.warm(path, model, options)
+            t0 = time.perf_counter()
+            try:
+                resp = fn(self.timeouts(kind, *timeout, warm=warm))
+            except Exception as exc:
+                if not is_host_failure(exc):
+                    raise
+                self.failure(exc)
+                if attempt + 1 >= attempts or self.state != CLOSED:
+                    raise
+            else:
+                if not self.check(resp, kind, t0, warm) or attempt + 1 >= attempts or self.state != CLOSED:
+                    return resp
+                resp.close()
+            with self._lock:
+                self.retries += 1
+            time.sleep(backoff_s(attempt))
+
+    async def awarm(self, path: str, model: str = "", options: Optional[Dict[str, Any]] = None) -> bool:
+        """Async warm(); a /api/ps lookup runs on a worker thread."""
+        if "/" + path.lstrip("/") not in LOADING_PATHS or not model:
+            return True
+        return await asyncio.to_thread(self.warm, path, model, options)
+
+    async def acall(self, fn: Callable[[Tuple[float, float]], Awaitable[Any]], method: str, path: str,
+                    timeout: Tuple[float, float], model: str = "", options: Optional[Dict[str, Any]] = None) -> Any:
+        """Async call()."""
+        kind = self.kind(method, path)
+        attempts = 1 + (max(0, RETRIES) if self.idempotent(method, path) else 0)
+        for attempt in range(attempts):
+            await self.abefore()
+            warm = await self.awarm(path, model, options)
+            t0 = time.perf_counter()
+            try:
+                resp = await fn(self.timeouts(kind, *timeout, warm=warm))
+            except Exception as exc:
+                if not is_host_failure(exc):
+                    raise
+                self.failure(exc)
+                if attempt + 1 >= attempts or self.state != CLOSED:
+                    raise
+            else:
+                if not self.check(resp, kind, t0, warm) or attempt + 1 >= attempts or self.state != CLOSED:
+                    return resp
+                await resp.aclose()
+            with self._lock:
+                self.retries += 1
+            await asyncio.sleep(backoff_s(attempt))
+
+    # ── status ────────────────────────────────────────────────────────────────
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            kinds = {k: list(v) for k, v in self._ttfb.items()}
+            row = {
+                "host": self.host,
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failures": self.failures,
+                "successes": self.successes,
+                "rejected": self.rejected,
+                "retries": self.retries,
+                "opened": self.opened,
+                "retry_in_s": max(0.0, self.open_until - time.monotonic()) if self.state == OPEN else 0.0,
+                "last_error": self.last_error,
+            }
+        row["timeouts"] = {}
+        for kind, samples in sorted(kinds.items()):
+            connect, read = self.timeouts(kind, float("inf"), float("inf"))
+            row["timeouts"][kind] = {
+                "samples": len(samples),
+                "ttfb_p95_s": percentile(samples, 95),
+                "connect_s": None if connect == float("inf") else connect,
+                "read_s": None if read == float("inf") else read,
+            }
+        return row
+
+
+_GUARDS: Dict[str, HostGuard] = {}
+_GUARDS_LOCK = threading.Lock()
+
+
+def get_guard(host: str) -> HostGuard:
+    """The process-wide guard for a (normalized) host."""
+    guard = _GUARDS.get(host)
+    if guard is None:
+        with _GUARDS_LOCK:
+            guard = _GUARDS.setdefault(host, HostGuard(host))
+    return guard
+
+
+def status() -> List[Dict[str, Any]]:
+    """One row per host this process has talked to: breaker state, counters, adapted timeouts."""
+    with _GUARDS_LOCK:
+        guards = list(_GUARDS.values())
+    return [g.snapshot() for g in guards]
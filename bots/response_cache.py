@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+response_cache.py — Opt-in disk cache for Ollama chat replies.
+
+Lab students send the same demo prompts over and over; each one costs a
+full generation.  ResponseCache stores finished replies in a small SQLite
+file keyed on:
+
+    sha256(model digest from /api/tags + normalized messages + options)
+
+so a rebuilt model (new digest) never serves stale answers.  Streamed hits
+replay with the original per-token timing, optionally compressed
+(time_scale=0 replays instantly, 1.0 in real time).
+
+  • size bound (MB) with least-recently-used eviction
+  • TTL per entry
+  • bypass_sampling=True skips the cache whenever temperature > 0
+
+Usage:
+    cache = get_cache()                              # shared, process-wide
+    key   = cache.key(host, model, messages, options)
+    entry = cache.get(key)                           # None on miss / expired
+    cache.put(key, model, reply, tokens=[(t, tok), ...], final=done_chunk)
+
+Environment overrides:
+    CITL_RESPONSE_CACHE        — "1" enables the cache in runtime_engine
+    CITL_CACHE_DIR             — cache directory (default: <repo>/data/cache)
+    CITL_CACHE_MAX_MB          — size bound (default: 64)
+    CITL_CACHE_TTL_HOURS       — entry lifetime (default: 168 = one week)
+    CITL_CACHE_BYPASS_SAMPLING — "1" skips the cache when temperature > 0
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from bots.ollama_client import probe_tags
+
+DIGEST_TTL_S = 60.0   # how long a /api/tags digest lookup is trusted
+
+
+def cache_dir() -> Path:
+    """<repo>/data/cache, or next to the frozen EXE, unless CITL_CACHE_DIR is set."""
+    env = os.environ.get("CITL_CACHE_DIR")
+    if env:
+        return Path(env)
+    if getattr(sys, "frozen", False):
+        return Path(sys.executable).parent / "data" / "cache"
+    return Path(__file__).resolve().parents[1] / "data" / "cache"
+
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+# ── model digests ─────────────────────────────────────────────────────────────
+
+def model_digest(host: str, model: str) -> str:
+    """Digest of model from the shared /api/tags probe; falls back to the name."""
+    return probe_tags(host, timeout=3, max_age=DIGEST_TTL_S).digest(model) or f"name:{model}"
+
+
+def normalize_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Keep only role/content, with surrounding whitespace stripped."""
+    return [
+        {"role": str(m.get("role", "")), "content": str(m.get("content", "")).strip()}
+        for m in messages
+    ]
+
+
+# ── cache ─────────────────────────────────────────────────────────────────────
+
+class ResponseCache:
+    """SQLite-backed LRU + TTL cache of finished chat replies."""
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        max_mb: float = float(os.environ.get("CITL_CACHE_MAX_MB", "64")),
+        ttl_s: float = float(os.environ.get("CITL_CACHE_TTL_HOURS", "168")) * 3600,
+        bypass_sampling: bool = _env_flag("CITL_CACHE_BYPASS_SAMPLING"),
+    ):
+        self.path            = Path(path) if path else cache_dir() / "responses.sqlite3"
+        self.max_bytes       = int(max_mb * 1024 * 1024)
+        self.ttl_s           = ttl_s
+        self.bypass_sampling = bypass_sampling
+        self.hits            = 0
+        self.misses          = 0
+        self.bypassed        = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT, reply TEXT, tokens TEXT, final TEXT,"
+            " size INTEGER, created REAL, last_used REAL, hits INTEGER DEFAULT 0)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(last_used)")
+        self._db.commit()
+
+    # ── keys ──────────────────────────────────────────────────────────────────
+
+    def key(
+        self,
+        host: str,
+        model: str,
+        messages: List[Dict[str, Any]],
+        options: Optional[Dict[str, Any]],
+    ) -> str:
+        blob = json.dumps(
+            {
+                "digest": model_digest(host, model),
+                "messages": normalize_messages(messages),
+                "options": options or {},
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def should_bypass(self, options: Optional[Dict[str, Any]]) -> bool:
+        """True when bypass_sampling is on and these options sample (temperature > 0).  No side effects."""
+        if not self.bypass_sampling:
+            return False
+        temp = (options or {}).get("temperature", 0.8)   # Ollama's own default is 0.8
+        return float(temp or 0) > 0
+
+    def note_bypass(self) -> None:
+        """Count a lookup the caller skipped because should_bypass() said so."""
+        with self._lock:
+            self.bypassed += 1
+
+    # ── get / put ─────────────────────────────────────────────────────────────
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT model, reply, tokens, final, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            if self.ttl_s and now - row[4] > self.ttl_s:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                self.misses += 1
+                return None
+            self._db.execute(
+                "UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+            self._db.commit()
+            self.hits += 1
+        return {
+            "model":  row[0],
+            "reply":  row[1],
+            "tokens": json.loads(row[2] or "[]"),
+            "final":  json.loads(row[3] or "{}"),
+        }
+
+    def put(
+        self,
+        key: str,
+        model: str,
+        reply: str,
+        tokens: Optional[List[Tuple[float, str]]] = None,
+        final: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        if not reply:
+            return
+        tokens_json = json.dumps([[round(t, 4), tok] for t, tok in (tokens or [])], ensure_ascii=False)
+        final_json  = json.dumps(
+            {k: v for k, v in (final or {}).items() if k not in ("message", "response")},
+            ensure_ascii=False,
+        )
+        size = len(reply.encode("utf-8")) + len(tokens_json) + len(final_json)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (key, model, reply, tokens, final, size, created, last_used, hits)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, model, reply, tokens_json, final_json, size, now, now),
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        """Drop expired rows, then least-recently-used rows until under max_bytes."""
+        if self.ttl_s:
+            self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_s,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute(
+            "SELECT key, size FROM responses ORDER BY last_used ASC"
+        ).fetchall():
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    # ── admin ─────────────────────────────────────────────────────────────────
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            n, size, stored_hits = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": n,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "ttl_hours": self.ttl_s / 3600 if self.ttl_s else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": (self.hits / lookups) if lookups else None,
+            "lifetime_hits": stored_hits,
+            "path": str(self.path),
+        }
+
+    def clear(self) -> int:
+        with self._lock:
+            n = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+            self._db.execute("VACUUM")
+        return n
+
+
+def replay(entry: Dict[str, Any], time_scale: float = 0.0) -> Iterator[Dict[str, Any]]:
+    """
+    Yield Ollama-style stream chunks for a cached entry.  Token offsets are
+    multiplied by time_scale (0 = instant, 1 = original timing).
+    """
+    model = entry.get("model", "")
+    t0 = time.perf_counter()
+    tokens = entry.get("tokens") or [[0.0, entry.get("reply", "")]]
+    for offset, tok in tokens:
+        if time_scale > 0:
+            delay = offset * time_scale - (time.perf_counter() - t0)
+            if delay > 0:
+                time.sleep(delay)
+        yield {"model": model, "message": {"role": "assistant", "content": tok}, "done": False}
+    final = dict(entry.get("final") or {})
+    final.update({"model": model, "message": {"role": "assistant", "content": ""}, "done": True})
+    yield final
+
+
+_CACHE: Optional[ResponseCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache() -> ResponseCache:
+    """Process-wide shared cache (created on first use)."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = ResponseCache()
+        return _CACHE
+
+
+def cache_enabled() -> bool:
+    """True when CITL_RESPONSE_CACHE turns the cache on for library callers."""
+    return _env_flag("CITL_RESPONSE_CACHE")
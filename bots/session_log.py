@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+session_log.py — Append-only JSONL transcripts for sandbox sessions.
+
+Every finished turn is appended to the session's log the moment it happens,
+so closing the sandbox (or a crash) loses nothing and nothing is ever
+re-serialized.  One JSON object per line:
+
+    {"type": "session", "created": ..., "host": ..., "model": ..., "bot": ..., "system": ...}
+    {"type": "turn", "ts": ..., "model": ..., "system": ..., "options": {...},
+     "user": ..., "assistant": ..., "stats": {...}}
+    {"type": "clear", "ts": ...}                        # /clear — history restarts here
+
+Turn records are self-contained (model, system prompt, options and TurnStats
+timings), so any turn can be replayed or benchmarked later on its own.
+
+Loading is lazy: load_tail() reads the file backwards in blocks and stops as
+soon as it has enough turns to fill the token window (or reaches a clear
+marker), so long transcripts open in constant time.
+
+Usage:
+    log = SessionLog.new(header={"host": host, "model": model, "bot": name, "system": prompt})
+    log.append_turn(model, system_prompt, options, user_text, reply, stats.to_dict())
+    loaded = load_tail(session_path("demo"), budget=7168)
+
+Environment overrides:
+    CITL_SESSIONS_DIR   — transcript directory (default: <repo>/data/sessions)
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import secrets
+import shutil
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from bots.context_window import MESSAGE_OVERHEAD, estimate_tokens
+
+BLOCK_BYTES = 64 * 1024
+
+
+def sessions_dir() -> Path:
+    """<repo>/data/sessions, or next to the frozen EXE, unless CITL_SESSIONS_DIR is set."""
+    env = os.environ.get("CITL_SESSIONS_DIR")
+    if env:
+        return Path(env)
+    if getattr(sys, "frozen", False):
+        return Path(sys.executable).parent / "data" / "sessions"
+    return Path(__file__).resolve().parents[1] / "data" / "sessions"
+
+
+def session_path(name: str) -> Path:
+    """Transcript path for a /save name (unsafe characters become '_')."""
+    safe = re.sub(r"[^\w.-]", "_", name.strip()) or "session"
+    return sessions_dir() / f"{safe}.jsonl"
+
+
+def list_sessions() -> List[Path]:
+    """Saved transcripts, newest first."""
+    d = sessions_dir()
+    if not d.is_dir():
+        return []
+    return sorted(d.glob("*.jsonl"), key=lambda p: p.stat().st_mtime, reverse=True)
+
+
+# ── writing ───────────────────────────────────────────────────────────────────
+
+class SessionLog:
+    """Appends session records to one JSONL file; the header is written on first append."""
+
+    def __init__(self, path: Path, header: Optional[Dict[str, Any]] = None, auto_named: bool = False):
+        self.path       = Path(path)
+        self.header     = dict(header or {})
+        self.auto_named = auto_named   # name made up by new(): /save renames the file instead of copying it
+        self._lock      = threading.Lock()
+
+    @classmethod
+    def new(cls, header: Optional[Dict[str, Any]] = None) -> "SessionLog":
+        """
+        Log under an auto-generated name (renamed by /save).  pid + random
+        suffix: a lab's sandboxes started in the same second get their own files.
+        """
+        name = f"session-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{secrets.token_hex(2)}.jsonl"
+        return cls(sessions_dir() / name, header, auto_named=True)
+
+    @property
+    def name(self) -> str:
+        return self.path.stem
+
+    def append(self, record: Dict[str, Any]) -> None:
+        record.setdefault("ts", time.time())
+        with self._lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                new = not self.path.exists()
+                with self.path.open("a", encoding="utf-8") as f:
+                    if new:
+                        head = {"type": "session", "created": record["ts"], **self.header}
+                        f.write(json.dumps(head, ensure_ascii=False) + "\n")
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            except OSError:
+                pass  # persistence must never break a chat turn
+
+    def append_turn(
+        self,
+        model: str,
+        system: str,
+        options: Dict[str, Any],
+        user: str,
+        assistant: str,
+        stats: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.append({
+            "type": "turn", "model": model, "system": system, "options": options,
+            "user": user, "assistant": assistant, "stats": stats or {},
+        })
+
+    def mark_clear(self) -> None:
+        if self.path.exists():   # nothing to clear in a log that was never written
+            self.append({"type": "clear"})
+
+    def save_as(self, name: str, overwrite: bool = False) -> Path:
+        """
+        Continue this log under name.  An auto-named log is renamed in place;
+        a named one is copied so the original transcript stays as it was.
+        Raises FileExistsError if another transcript has that name, unless
+        overwrite (it is then replaced, never appended to).
+        """
+        dest = session_path(name)
+        if dest == self.path:
+            return dest
+        with self._lock:
+            if dest.exists() and not overwrite:
+                raise FileExistsError(dest)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            if not self.path.exists():
+                dest.unlink(missing_ok=True)   # nothing to carry over: start dest fresh, header first
+            if self.path.exists():
+                if self.auto_named:
+                    os.replace(self.path, dest)
+                else:
+                    shutil.copyfile(self.path, dest)
+            self.path, self.auto_named = dest, False
+        return dest
+
+
+# ── lazy loading ──────────────────────────────────────────────────────────────
+
+def _reverse_lines(path: Path, block: int = BLOCK_BYTES) -> Iterator[bytes]:
+    """Yield non-empty lines of path from last to first, reading block bytes at a time."""
+    with path.open("rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos  = f.tell()
+        rest = b""
+        while pos > 0:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            lines = (f.read(step) + rest).split(b"\n")
+            rest = lines.pop(0)   # may be cut mid-line; finished on the next block
+            for line in reversed(lines):
+                if line.strip():
+                    yield line
+        if rest.strip():
+            yield rest
+
+
+def _read_header(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        try:
+            head = json.loads(f.readline() or "{}")
+        except ValueError:
+            return {}
+    return head if head.get("type") == "session" else {}
+
+
+@dataclass
+class LoadedSession:
+    path: Path
+    header: Dict[str, Any]
+    history: List[Dict[str, str]] = field(default_factory=list)
+    system_prompt: str = ""
+    model: str = ""
+    turns: int = 0          # turns loaded into history
+    truncated: bool = False  # older turns exist but were not read
+
+
+def load_tail(
+    path: Path,
+    budget: int,
+    keep_last: int = 2,
+    counter: Callable[[str], int] = estimate_tokens,
+) -> LoadedSession:
+    """
+    Read just enough of a transcript to fill budget tokens of history
+    (always at least keep_last turns), newest turns first.  Stops at the
+    most recent clear marker.
+    """
+    path = Path(path)
+    out = LoadedSession(path=path, header=_read_header(path))
+    turns: List[Dict[str, Any]] = []
+    used = 0
+    for raw in _reverse_lines(path):
+        try:
+            rec = json.loads(raw)
+        except ValueError:
+            continue   # torn last line from a crash — skip it
+        kind = rec.get("type")
+        if kind == "clear" or kind == "session":
+            break
+        if kind != "turn":
+            continue
+        cost = counter(rec.get("user", "")) + counter(rec.get("assistant", "")) + 2 * MESSAGE_OVERHEAD
+        if len(turns) >= keep_last and used + cost > budget:
+            out.truncated = True
+            break
+        used += cost
+        turns.append(rec)
+        out.model = out.model or rec.get("model", "")
+        out.system_prompt = out.system_prompt or rec.get("system", "")
+    turns.reverse()
+    for rec in turns:
+        out.history.append({"role": "user",      "content": rec.get("user", "")})
+        out.history.append({"role": "assistant", "content": rec.get("assistant", "")})
+    out.turns = len(turns)
+    out.system_prompt = out.system_prompt or out.header.get("system", "")
+    out.model = out.model or out.header.get("model", "")
+    return out
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+startup_profile.py — Where does startup time go?  (--profile-startup)
+
+`python -X importtime` is not available to the frozen sandbox.exe, so this
+module times imports in-process: it wraps builtins.__import__ and records,
+for every module imported for the first time, its self and cumulative time
+and nesting depth — the same breakdown -X importtime prints.  mark() adds
+named phases (registry loaded, session built, first prompt) so imports can
+be compared with the rest of startup.
+
+Stdlib only, so it can be started before anything heavy is imported:
+
+    from bots import startup_profile
+    startup_profile.start()              # first thing in the entry point
+    import bots.ollama_sandbox           # imports are timed from here
+    ...
+    startup_profile.mark("first prompt")
+    print(startup_profile.report())
+
+Modules loaded through importlib.import_module() bypass __import__; their
+time is counted in the caller's self time.
+
+Environment overrides:
+    CITL_PROFILE_STARTUP         — "1" profiles like --profile-startup
+    CITL_PROFILE_MIN_MS          — hide imports faster than this, cumulative (default: 2)
+"""
+from __future__ import annotations
+
+import builtins
+import os
+import sys
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+MIN_MS = float(os.environ.get("CITL_PROFILE_MIN_MS", "2"))
+
+
+def requested(argv: Optional[List[str]] = None) -> bool:
+    """True if --profile-startup is on the command line or CITL_PROFILE_STARTUP is set."""
+    argv = sys.argv if argv is None else argv
+    return "--profile-startup" in argv or os.environ.get("CITL_PROFILE_STARTUP", "") not in ("", "0")
+
+
+class ImportProfiler:
+    """Times first-time imports via builtins.__import__, -X importtime style."""
+
+    def __init__(self) -> None:
+        self.t0 = time.perf_counter()
+        # (order, depth, module, self_s, cumulative_s) in completion order
+        self.records: List[Tuple[int, int, str, float, float]] = []
+        self.marks: List[Tuple[str, float]] = []
+        self._orig: Any = None
+        self._local = threading.local()
+        self._order = 0
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self._orig is not None
+
+    def start(self) -> None:
+        if self._orig is None:
+            self._orig = builtins.__import__
+            builtins.__import__ = self._import
+
+    def stop(self) -> None:
+        if self._orig is not None:
+            builtins.__import__ = self._orig
+            self._orig = None
+
+    def mark(self, label: str) -> None:
+        self.marks.append((label, time.perf_counter() - self.t0))
+
+    def _import(self, name: str, globals: Any = None, locals: Any = None, fromlist: Any = (), level: int = 0) -> Any:
+        orig = self._orig or builtins.__import__
+        key = name
+        if level and globals:
+            pkg = (globals.get("__package__") or "").split(".")
+            key = ".".join(pkg[: len(pkg) - level + 1] + ([name] if name else []))
+        if not key:
+            return orig(name, globals, locals, fromlist, level)
+        mod = sys.modules.get(key)
+        if mod is not None:
+            # "from pkg import sub" loads pkg.sub through the fromlist
+            missing = [f for f in (fromlist or ()) if isinstance(f, str) and f != "*" and not hasattr(mod, f)]
+            if not missing:
+                return orig(name, globals, locals, fromlist, level)
+            key = f"{key}.{missing[0]}" if len(missing) == 1 else f"{key}.{{{','.join(missing)}}}"
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        with self._lock:
+            order = self._order
+            self._order += 1
+        stack.append(0.0)   # time spent in nested first-time imports
+        t = time.perf_counter()
+        try:
+            return orig(name, globals, locals, fromlist, level)
+        finally:
+            cum = time.perf_counter() - t
+            children = stack.pop()
+            if stack:
+                stack[-1] += cum
+            self.records.append((order, len(stack), key, cum - children, cum))
+
+    def report(self, min_ms: float = MIN_MS, top: int = 12) -> str:
+        """Import tree (slower than min_ms), the slowest imports, and the phase marks."""
+        lines = ["import time:  self [ms] | cumulative | imported package"]
+        for _, depth, name, self_s, cum in sorted(self.records):
+            if cum * 1000 >= min_ms:
+                lines.append(f"import time: {self_s * 1000:9.1f} | {cum * 1000:10.1f} | {'  ' * depth}{name}")
+        roots = [r for r in self.records if r[1] == 0]
+        total = sum(r[4] for r in roots)
+        lines.append("")
+        lines.append(f"Imports: {total * 1000:.0f} ms in {len(self.records)} modules; slowest (self time):")
+        for _, _, name, self_s, cum in sorted(self.records, key=lambda r: -r[3])[:top]:
+            lines.append(f"  {self_s * 1000:8.1f} ms  {name}  (cumulative {cum * 1000:.1f} ms)")
+        if self.marks:
+            lines.append("")
+            lines.append("Phases (ms since start):")
+            prev = 0.0
+            for label, at in self.marks:
+                lines.append(f"  {at * 1000:8.0f}  {label:<24} +{(at - prev) * 1000:.0f}")
+                prev = at
+        return "\n".join(lines)
+
+
+_PROFILER: Optional[ImportProfiler] = None
+
+
+def start() -> ImportProfiler:
+    """Start the process-wide profiler (idempotent)."""
+    global _PROFILER
+    if _PROFILER is None:
+        _PROFILER = ImportProfiler()
+    _PROFILER.start()
+    return _PROFILER
+
+
+def get_profiler() -> Optional[ImportProfiler]:
+    return _PROFILER
+
+
+def mark(label: str) -> None:
+    """Record a phase if profiling is on; a no-op otherwise."""
+    if _PROFILER is not None:
+        _PROFILER.mark(label)
+
+
+def report(min_ms: float = MIN_MS) -> str:
+    """Stop timing imports and return the breakdown ("" if profiling was never started)."""
+    if _PROFILER is None:
+        return ""
+    _PROFILER.stop()
+    return _PROFILER.report(min_ms)
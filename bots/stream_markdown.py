@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+stream_markdown.py — Live Markdown rendering for streamed replies.
+
+Streaming used to print raw text, and only the non-stream Panel rendered
+Markdown (after the whole reply arrived).  MarkdownRenderer gives both: the
+reply is drawn as Markdown while it streams.
+
+Rendering the whole reply on every frame costs O(reply) per frame, which
+turns quadratic over a long answer.  Instead the reply is split into blocks
+as it arrives:
+
+  • the open block — the current paragraph, list, heading or fenced code
+    block — lives in a rich.live region and is re-rendered each frame
+  • a block that completes (blank line, closing ``` fence, heading line) is
+    printed once as Markdown above the live region and never touched again
+
+so each frame costs O(open block), and write() itself is O(token).
+
+When the console is not a terminal (piped, redirected, CI logs) use
+make_renderer(), which falls back to the raw FrameRenderer automatically.
+
+Usage:
+    with make_renderer("#22D3EE", console) as out:
+        for token in tokens:
+            out.write(token)
+"""
+from __future__ import annotations
+
+import threading
+from typing import List, Optional, Union
+
+from rich.console import Console
+from rich.live import Live
+from rich.markdown import Markdown
+from rich.text import Text
+
+from bots.stream_render import DEFAULT_FPS, FrameRenderer
+
+FENCES = ("```", "~~~")
+
+
+class MarkdownRenderer:
+    """Streams tokens into a live Markdown region, freezing completed blocks."""
+
+    def __init__(
+        self,
+        color: str,
+        console: Optional[Console] = None,
+        fps: float = DEFAULT_FPS,
+        code_theme: str = "monokai",
+    ):
+        self.console    = console or Console()
+        self.style      = color
+        self.fps        = fps
+        self.code_theme = code_theme
+        self.blocks     = 0          # completed blocks printed (for benchmarks)
+        self._lines: List[str] = []  # finished lines of the open block
+        self._line      = ""         # the line still being written
+        self._fence: Optional[str] = None
+        self._frozen: List[str] = []  # completed blocks waiting to be printed
+        self._lock      = threading.Lock()
+        self._live: Optional[Live] = None
+
+    # ── public ────────────────────────────────────────────────────────────────
+
+    def write(self, token: str) -> None:
+        if not token:
+            return
+        if self._live is None:
+            self._start()
+        with self._lock:
+            parts = token.split("\n")
+            self._line += parts[0]
+            for part in parts[1:]:
+                self._end_line(self._line)
+                self._line = part
+        self._print_frozen()
+        if not self.fps:
+            self.refresh()   # fps=0: redraw on every token (worst case, for benchmarks)
+
+    def refresh(self) -> None:
+        if self._live is not None:
+            self._live.refresh()
+
+    def close(self) -> None:
+        if self._live is None:
+            return
+        with self._lock:
+            if self._line:
+                self._lines.append(self._line)
+                self._line = ""
+            self._freeze()
+        self._print_frozen()
+        self._live.stop()   # transient: the (now empty) live region disappears
+        self._live = None
+
+    def __enter__(self) -> "MarkdownRenderer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ── internal ──────────────────────────────────────────────────────────────
+
+    def _start(self) -> None:
+        self._live = Live(
+            console=self.console,
+            get_renderable=self._renderable,
+            auto_refresh=self.fps > 0,
+            refresh_per_second=self.fps or 4,
+            transient=True,
+            vertical_overflow="visible",
+            redirect_stdout=False,
+            redirect_stderr=False,
+        )
+        self._live.start()
+
+    def _markdown(self, text: str) -> Markdown:
+        return Markdown(text, code_theme=self.code_theme, style=self.style)
+
+    def _renderable(self):
+        """The open block only — what the live region redraws each frame."""
+        with self._lock:
+            if self._fence is None and not self._lines and not self._line:
+                return Text("")
+            text = "\n".join(self._lines + [self._line])
+            if self._fence is not None:
+                text += "\n" + self._fence   # close the fence so the partial code block highlights
+        return self._markdown(text)
+
+    def _end_line(self, line: str) -> None:
+        """Called with the lock held for every completed line."""
+        stripped = line.strip()
+        if self._fence is not None:
+            self._lines.append(line)
+            if stripped.startswith(self._fence) and len(self._lines) > 1:
+                self._fence = None
+                self._freeze()
+            return
+        if stripped.startswith(FENCES):
+            self._freeze()               # paragraph before the code block
+            self._fence = stripped[:3]
+            self._lines.append(line)
+            return
+        if not stripped:
+            self._freeze()               # blank line ends a paragraph / list
+            return
+        if stripped.startswith("#"):
+            self._freeze()
+            self._lines.append(line)
+            self._freeze()               # a heading is a block of its own
+            return
+        self._lines.append(line)
+
+    def _freeze(self) -> None:
+        """Close the open block (lock held); _print_frozen() prints it."""
+        if not self._lines:
+            return
+        text = "\n".join(self._lines)
+        if self._fence is not None:
+            text += "\n" + self._fence   # stream ended inside a code block
+            self._fence = None
+        self._lines = []
+        self._frozen.append(text)
+
+    def _print_frozen(self) -> None:
+        # Printed outside self._lock: console.print takes the Live lock, and the
+        # refresh thread takes the Live lock before calling _renderable().
+        while self._frozen:
+            text = self._frozen.pop(0)
+            self.blocks += 1
+            self.console.print(self._markdown(text))
+
+
+def make_renderer(
+    color: str,
+    console: Optional[Console] = None,
+    fps: float = DEFAULT_FPS,
+    markdown: bool = True,
+) -> Union[MarkdownRenderer, FrameRenderer]:
+    """MarkdownRenderer on a terminal, the raw FrameRenderer otherwise."""
+    console = console or Console()
+    if markdown and console.is_terminal:
+        return MarkdownRenderer(color, console=console, fps=fps)
+    return FrameRenderer(color, out=console.file, fps=fps)
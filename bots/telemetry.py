@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+telemetry.py — Per-turn generation telemetry for Ollama chats.
+
+Ollama's final chunk (stream) or response body (non-stream) carries
+eval_count / eval_duration / prompt_eval_count / prompt_eval_duration /
+load_duration in nanoseconds.  TurnStats turns those plus client-side
+timings into the numbers we size lab hardware with:
+
+  • time-to-first-token (client clock)
+  • decode tokens/sec
+  • prompt tokens and prefill time (and prefill tokens/sec)
+  • model load time
+
+TelemetryLog keeps this session's records in memory for /stats and appends
+each one to a size-rotated JSONL file under logs/ for offline analysis.
+
+Usage:
+    log = TelemetryLog()
+    log.record(TurnStats.from_response(final, model=..., t_start=..., t_first=..., t_end=...))
+    for model, agg in log.aggregate().items(): ...
+
+Environment overrides:
+    CITL_LOG_DIR            — directory for telemetry JSONL (default: <repo>/logs)
+    CITL_TELEMETRY_MAX_MB   — rotate after this size (default: 5)
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+NS = 1e9
+
+# metrics shown by /stats, in display order: (field, label, unit)
+METRICS = [
+    ("ttft_s",        "TTFT",    "s"),
+    ("decode_tps",    "Decode",  "tok/s"),
+    ("prompt_tokens", "Prompt",  "tok"),
+    ("prefill_s",     "Prefill", "s"),
+    ("prefill_tps",   "Prefill", "tok/s"),
+    ("load_s",        "Load",    "s"),
+]
+
+
+def log_dir() -> Path:
+    """<repo>/logs, or next to the frozen EXE, unless CITL_LOG_DIR is set."""
+    env = os.environ.get("CITL_LOG_DIR")
+    if env:
+        return Path(env)
+    if getattr(sys, "frozen", False):
+        return Path(sys.executable).parent / "logs"
+    return Path(__file__).resolve().parents[1] / "logs"
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Linear-interpolated percentile (pct in 0..100); None for no data."""
+    vals = sorted(v for v in values if v is not None)
+    if not vals:
+        return None
+    k = (len(vals) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(vals) - 1)
+    return vals[lo] + (vals[hi] - vals[lo]) * (k - lo)
+
+
+def _ratio(count: Optional[int], seconds: Optional[float]) -> Optional[float]:
+    if not count or not seconds:
+        return None
+    return count / seconds
+
+
+@dataclass
+class TurnStats:
+    model: str
+    ts: float = field(default_factory=time.time)
+    host: str = ""
+    bot: str = ""
+    stream: bool = True
+    ok: bool = True
+    cached: bool = False
+    ttft_s: Optional[float] = None
+    total_s: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    prefill_s: Optional[float] = None
+    prefill_tps: Optional[float] = None
+    eval_tokens: Optional[int] = None
+    decode_s: Optional[float] = None
+    decode_tps: Optional[float] = None
+    load_s: Optional[float] = None
+
+    @classmethod
+    def from_response(
+        cls,
+        final: Optional[Dict[str, Any]],
+        model: str,
+        t_start: float,
+        t_end: float,
+        t_first: Optional[float] = None,
+        **extra: Any,
+    ) -> "TurnStats":
+        """Build stats from Ollama's final chunk / response plus perf_counter timestamps."""
+        final = final or {}
+
+        def _secs(key: str) -> Optional[float]:
+            v = final.get(key)
+            return v / NS if isinstance(v, (int, float)) else None
+
+        prefill_s = _secs("prompt_eval_duration")
+        decode_s  = _secs("eval_duration")
+        st = cls(
+            model=model,
+            ttft_s=(t_first - t_start) if t_first is not None else None,
+            total_s=t_end - t_start,
+            prompt_tokens=final.get("prompt_eval_count"),
+            prefill_s=prefill_s,
+            prefill_tps=_ratio(final.get("prompt_eval_count"), prefill_s),
+            eval_tokens=final.get("eval_count"),
+            decode_s=decode_s,
+            decode_tps=_ratio(final.get("eval_count"), decode_s),
+            load_s=_secs("load_duration"),
+            **extra,
+        )
+        if not final:
+            st.ok = False
+        return st
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class TelemetryLog:
+    """In-memory session records plus an append-only, size-rotated JSONL file."""
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        max_bytes: int = int(float(os.environ.get("CITL_TELEMETRY_MAX_MB", "5")) * 1024 * 1024),
+        backups: int = 3,
+        enabled: bool = True,
+    ):
+        self.path      = Path(path) if path else log_dir() / "sandbox_telemetry.jsonl"
+        self.max_bytes = max_bytes
+        self.backups   = backups
+        self.enabled   = enabled
+        self.records: List[TurnStats] = []
+        self._lock = threading.Lock()
+
+    def record(self, stats: TurnStats) -> None:
+        with self._lock:
+            self.records.append(stats)
+            if not self.enabled:
+                return
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._rotate_if_needed()
+                with self.path.open("a", encoding="utf-8") as f:
+                    f.write(json.dumps(stats.to_dict()) + "\n")
+            except OSError:
+                pass  # telemetry must never break a chat turn
+
+    def _rotate_if_needed(self) -> None:
+        try:
+            if self.path.stat().st_size < self.max_bytes:
+                return
+        except FileNotFoundError:
+            return
+        for i in range(self.backups - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}")
+            if src.exists():
+                os.replace(src, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+
+    def load_all(self) -> List[TurnStats]:
+        """Every record on disk (oldest backup first), for cross-session stats."""
+        out: List[TurnStats] = []
+        files = [self.path.with_name(f"{self.path.name}.{i}") for i in range(self.backups, 0, -1)]
+        for p in files + [self.path]:
+            if not p.exists():
+                continue
+            for line in p.read_text(encoding="utf-8", errors="ignore").splitlines():
+                try:
+                    out.append(TurnStats(**json.loads(line)))
+                except Exception:
+                    continue
+        return out
+
+    def aggregate(
+        self,
+        records: Optional[Iterable[TurnStats]] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """{model: {"n": count, metric: (p50, p95), ...}} over ok, uncached records."""
+        by_model: Dict[str, List[TurnStats]] = {}
+        for r in (self.records if records is None else records):
+            if r.ok and not r.cached:
+                by_model.setdefault(r.model, []).append(r)
+        out: Dict[str, Dict[str, Any]] = {}
+        for model, recs in sorted(by_model.items()):
+            agg: Dict[str, Any] = {"n": len(recs)}
+            for key, _, _ in METRICS:
+                vals = [getattr(r, key) for r in recs]
+                agg[key] = (percentile(vals, 50), percentile(vals, 95))
+            out[model] = agg
+        return out
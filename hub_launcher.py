@@ -17,8 +17,11 @@ import webbrowser
 import time
 import threading
 import traceback
+import urllib.request
 from pathlib import Path
 
+READY_TIMEOUT_S = float(os.environ.get("AI_TRAINING_HUB_READY_TIMEOUT", "60"))
+
 
 def _pause(msg="\n  Press Enter to close..."):
     try:
@@ -27,6 +30,21 @@ def _pause(msg="\n  Press Enter to close..."):
         pass
 
 
+def wait_until_ready(url: str, proc: subprocess.Popen, timeout: float = READY_TIMEOUT_S) -> bool:
+    """Poll Streamlit's health endpoint until it answers (True) or the server exits / times out."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and proc.poll() is None:
+        for path in ("/_stcore/health", "/healthz"):   # newer / older Streamlit
+            try:
+                with urllib.request.urlopen(url + path, timeout=1) as r:
+                    if r.status == 200:
+                        return True
+            except Exception:
+                pass
+        time.sleep(0.1)
+    return False
+
+
 def find_repo_root() -> Path:
     """Repo root = directory containing this EXE (or script)."""
     if getattr(sys, "frozen", False):
@@ -98,14 +116,19 @@ def main():
     if sys.platform == "win32":
         flags = subprocess.CREATE_NO_WINDOW   # hide the Streamlit console spam
 
+    t0 = time.monotonic()
     proc = subprocess.Popen(cmd, env=env, cwd=str(repo_root), creationflags=flags)
     print("  Server starting...")
 
-    # -- Open browser after a short delay -------------------------------------
+    # -- Open browser as soon as the server answers ---------------------------
     def _open():
-        time.sleep(3)
+        if not wait_until_ready(url, proc):
+            if proc.poll() is None:
+                print(f"  Server not answering after {READY_TIMEOUT_S:.0f} s - opening the browser anyway.")
+            else:
+                return   # server exited; main() reports it
         webbrowser.open(url)
-        print(f"  Browser opened: {url}")
+        print(f"  Browser opened: {url}  (server ready in {time.monotonic() - t0:.1f} s)")
         print()
         print("  -- The full GUI is now running in your browser --------------")
         print("  Tabs: Environment . Install . Ollama . Scaffold . Bot Builder")
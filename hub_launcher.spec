@@ -11,7 +11,7 @@ a = Analysis(
     pathex=[str(ROOT)],
     binaries=[],
     datas=[],
-    hiddenimports=["webbrowser", "threading", "subprocess"],
+    hiddenimports=["webbrowser", "threading", "subprocess", "urllib.request"],
     hookspath=[],
     runtime_hooks=[],
     excludes=[
@@ -8,6 +8,7 @@ Run from the repo root:
     python sandbox.py --bot ollama_bot --color "#FF6B6B"
     python sandbox.py --model llama3.2
     python sandbox.py --no-stream
+    python sandbox.py --profile-startup     # import-time breakdown up to the first prompt
 
 Or as a compiled EXE (built with build_exe.ps1):
     sandbox.exe
@@ -41,6 +42,11 @@ if sys.platform == "win32":
 if not getattr(sys, "frozen", False):
     sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+# --profile-startup: time every import from here on (stdlib-only module)
+from bots import startup_profile  # noqa: E402
+if startup_profile.requested():
+    startup_profile.start()
+
 # ── Import with visible error ─────────────────────────────────────────────────
 try:
     from bots.ollama_sandbox import main
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+bench_cancel.py — Does cancelling a request stop the server decoding?
+
+Starts a stand-in server that streams --reply-tokens tokens at --token-rate
+tokens/s and counts every token it actually writes.  Each path is cancelled
+after --cancel-at tokens (or the same time for non-streaming calls) from
+another thread, the way Ctrl+C / the hub's Stop button does:
+
+  abandon        — stop reading but keep the stream open (the old behaviour
+                   of a worker thread draining a stream nobody reads)
+  chat_stream    — OllamaClient.chat_stream(cancel=token)
+  chat           — OllamaClient.chat(cancel=token)  (blocking call)
+  achat_stream   — OllamaClient.achat_stream(cancel=token)
+  pool           — HostPool.chat_stream(cancel=token)
+  runtime_engine — app.runtime_engine.ollama_chat(cancel=token)
+
+"emitted" should stay within a few tokens of "read"; "abandon" runs to the
+full reply.
+
+Run from the repo root:
+    python scripts/bench/bench_cancel.py
+    python scripts/bench/bench_cancel.py --reply-tokens 4000 --token-rate 500 --cancel-at 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.runtime_engine import ollama_chat  # noqa: E402
+from bots.cancel import CancelToken, Cancelled  # noqa: E402
+from bots.ollama_client import get_client  # noqa: E402
+from bots.ollama_pool import HostPool  # noqa: E402
+from bots.ollama_standin import StandinConfig, start_standin  # noqa: E402
+
+MODEL  = "hub-assistant"
+MSGS   = [{"role": "user", "content": "hello"}]
+SETTLE = 0.5   # seconds to let the server notice the disconnect before counting
+
+
+def _stream(chunks, token, cancel_at):
+    """Read chunks until cancel_at tokens, then cancel from another thread. Returns tokens read."""
+    read = 0
+    try:
+        for chunk in chunks:
+            if (chunk.get("message") or {}).get("content"):
+                read += 1
+            if read == cancel_at:
+                threading.Thread(target=token.cancel, args=("bench",)).start()
+    except Cancelled:
+        pass
+    return read
+
+
+def _timed(fn, token, after_s):
+    """Call a blocking fn, cancelling token after after_s seconds."""
+    threading.Timer(after_s, token.cancel, args=("bench",)).start()
+    try:
+        fn()
+    except Cancelled:
+        pass
+    return None   # nothing is read before the reply completes
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark request cancellation")
+    ap.add_argument("--reply-tokens", type=int, default=2000)
+    ap.add_argument("--token-rate", type=float, default=200.0)
+    ap.add_argument("--cancel-at", type=int, default=50, help="tokens read before cancelling")
+    args = ap.parse_args()
+
+    srv = start_standin(cfg=StandinConfig(
+        models=[f"{MODEL}:latest"], token_rate=args.token_rate, reply_tokens=args.reply_tokens,
+    ))
+    client = get_client(srv.url)
+    after_s = args.cancel_at / args.token_rate
+
+    def abandon(token):
+        chunks = client.chat_stream(MODEL, MSGS, {})
+        read = 0
+        for chunk in chunks:
+            read += 1
+            if read == args.cancel_at:
+                break
+        time.sleep(args.reply_tokens / args.token_rate + SETTLE)   # stream left open, unread
+        chunks.close()
+        return read
+
+    def achat_stream(token):
+        async def _run():
+            read = 0
+            try:
+                async for chunk in client.achat_stream(MODEL, MSGS, {}, cancel=token):
+                    read += 1
+                    if read == args.cancel_at:
+                        token.cancel("bench")
+            except Cancelled:
+                pass
+            return read
+        return asyncio.run(_run())
+
+    paths = [
+        ("abandon", abandon),
+        ("chat_stream", lambda t: _stream(client.chat_stream(MODEL, MSGS, {}, cancel=t), t, args.cancel_at)),
+        ("chat", lambda t: _timed(lambda: client.chat(MODEL, MSGS, {}, cancel=t), t, after_s)),
+        ("achat_stream", achat_stream),
+        ("pool", lambda t: _stream(HostPool([srv.url]).chat_stream(MODEL, MSGS, {}, cancel=t), t, args.cancel_at)),
+        ("runtime_engine", lambda t: _timed(lambda: ollama_chat(srv.url, MODEL, MSGS, {}, cancel=t), t, after_s)),
+    ]
+
+    print(f"Cancellation — {args.reply_tokens}-token replies at {args.token_rate:g} tok/s,"
+          f" cancelled after {args.cancel_at} tokens (~{after_s:.2f} s)")
+    print(f"  {'path':<15} {'read':>6} {'emitted':>8} {'wasted':>7}  aborted")
+    for label, fn in paths:
+        before = srv.cfg.stats()
+        read = fn(CancelToken())
+        time.sleep(SETTLE)
+        after = srv.cfg.stats()
+        emitted = after["emitted_tokens"] - before["emitted_tokens"]
+        aborted = after["client_aborts"] - before["client_aborts"]
+        shown = "—" if read is None else str(read)
+        wasted = "—" if read is None else str(emitted - read)
+        print(f"  {label:<15} {shown:>6} {emitted:>8} {wasted:>7}  {'yes' if aborted else 'no'}")
+
+    srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
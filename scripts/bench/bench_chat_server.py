@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+bench_chat_server.py — A lab of separate sandboxes vs one --serve chat server.
+
+Starts a stand-in Ollama server (decoding at --token-rate tokens/s, at most
+--slots requests at once, like one GPU box) and --seats students spread over
+--channels channels, each sending --messages lines at random moments within
+--spread seconds:
+
+  sandboxes — every seat has its own client and connection pool; every line
+              is its own request (today's lab)
+  server    — every seat connects to one bots.chat_server.ChatServer; lines
+              that arrive while a channel's bot is busy share its next reply
+
+Reports Ollama requests, tokens generated, and the time from a line being
+sent until its answer starts streaming (p50 / p95).
+
+Run from the repo root:
+    python scripts/bench/bench_chat_server.py
+    python scripts/bench/bench_chat_server.py --seats 30 --channels 3 --messages 3 --slots 2
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from bots.chat_server import LOBBY, ChatClient, ChatServer  # noqa: E402
+from bots.ollama_client import OllamaClient  # noqa: E402
+from bots.ollama_standin import StandinConfig, start_standin  # noqa: E402
+
+MODEL = "hub-assistant"
+
+
+def _limit_slots(srv, slots: int) -> None:
+    """Serialize generation on a server to `slots` concurrent requests."""
+    sem = threading.BoundedSemaphore(slots)
+    handler = srv.RequestHandlerClass
+    orig = handler.do_POST
+
+    def do_POST(self):  # noqa: N802 - http.server naming
+        with sem:
+            orig(self)
+
+    handler.do_POST = do_POST
+
+
+def _schedule(args):
+    """(delay_s, seat, channel) for every line, the same for both runs."""
+    rng = random.Random(args.seed)
+    lines = []
+    for seat in range(args.seats):
+        for _ in range(args.messages):
+            lines.append((rng.uniform(0, args.spread), seat, seat % args.channels))
+    return sorted(lines)
+
+
+def _pct(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def run_sandboxes(host, lines, seats):
+    clients = [OllamaClient(host) for _ in range(seats)]
+    waits = []
+    lock = threading.Lock()
+    t0 = time.perf_counter()
+
+    def _one(delay, seat, channel):
+        time.sleep(max(0.0, delay - (time.perf_counter() - t0)))
+        sent = time.perf_counter()
+        msgs = [{"role": "user", "content": f"seat {seat} in channel {channel}"}]
+        first = True
+        for chunk in clients[seat].chat_stream(MODEL, msgs, {}):
+            if first and (chunk.get("message") or {}).get("content"):
+                first = False
+                with lock:
+                    waits.append(time.perf_counter() - sent)
+
+    threads = [threading.Thread(target=_one, args=line) for line in lines]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - t0, waits
+
+
+def run_server(host, lines, seats, channels, parallel):
+    loop = asyncio.new_event_loop()
+    server = ChatServer(host, parallel=parallel)
+    names = [LOBBY] + [c for c in server.channels if c != LOBBY]
+    ready = threading.Event()
+
+    def _serve():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.start("127.0.0.1", 0))
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=_serve, daemon=True).start()
+    ready.wait()
+
+    waits = []
+    lock = threading.Lock()
+    sent_at = {}    # channel → send times of lines not yet answered
+    clients = []
+    for seat in range(seats):
+        c = ChatClient(f"127.0.0.1:{server.port}", f"seat{seat}")
+        c.send({"type": "join", "channel": names[seat % channels]})
+        clients.append(c)
+
+    def _listen(c, watch):
+        first = set()
+        for ev in c.events():
+            if not watch:
+                continue
+            if ev["type"] == "token" and ev["id"] not in first:
+                first.add(ev["id"])
+                now = time.perf_counter()
+                with lock:
+                    for t in sent_at.pop(ev["channel"], []):
+                        waits.append(now - t)
+
+    # one listener per channel measures when replies start
+    watchers = {}
+    for seat, c in enumerate(clients):
+        ch = names[seat % channels]
+        watch = ch not in watchers
+        watchers.setdefault(ch, c)
+        threading.Thread(target=_listen, args=(c, watch), daemon=True).start()
+    time.sleep(0.3)
+
+    t0 = time.perf_counter()
+    for delay, seat, channel in lines:
+        time.sleep(max(0.0, delay - (time.perf_counter() - t0)))
+        with lock:
+            sent_at.setdefault(names[channel], []).append(time.perf_counter())
+        clients[seat].send({"type": "say", "channel": names[channel], "text": f"seat {seat} here"})
+    while True:
+        time.sleep(0.1)
+        with lock:
+            if not any(sent_at.values()) and not any(ch.job for ch in server.channels.values()):
+                break
+    dt = time.perf_counter() - t0
+    status = server.status()
+    for c in clients:
+        c.close()
+    loop.call_soon_threadsafe(server.close)
+    return dt, waits, status
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the multi-user chat server")
+    ap.add_argument("--seats", type=int, default=30)
+    ap.add_argument("--channels", type=int, default=3)
+    ap.add_argument("--messages", type=int, default=2, help="lines per seat")
+    ap.add_argument("--spread", type=float, default=10.0, help="seconds over which lines are sent")
+    ap.add_argument("--token-rate", type=float, default=100.0)
+    ap.add_argument("--reply-tokens", type=int, default=60)
+    ap.add_argument("--slots", type=int, default=2, help="requests the stand-in decodes at once")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    lines = _schedule(args)
+    print(f"Chat server — {args.seats} seats, {args.channels} channels, {len(lines)} lines over "
+          f"{args.spread:g} s; {args.reply_tokens}-token replies at {args.token_rate:g} tok/s, {args.slots} slot(s)")
+    for label in ("sandboxes", "server"):
+        srv = start_standin(cfg=StandinConfig(
+            models=[f"{MODEL}:latest"], token_rate=args.token_rate, reply_tokens=args.reply_tokens,
+        ))
+        _limit_slots(srv, args.slots)
+        if label == "sandboxes":
+            dt, waits = run_sandboxes(srv.url, lines, args.seats)
+            extra = ""
+        else:
+            dt, waits, status = run_server(srv.url, lines, args.seats, args.channels, args.slots)
+            extra = f"   {status['batched']} lines batched"
+        st = srv.cfg.stats()
+        chats = st["requests"]
+        print(f"  {label:<10} {dt:6.1f} s  {chats:4d} requests  {st['emitted_tokens']:6d} tokens   "
+              f"wait p50 {_pct(waits, 50):5.2f} s  p95 {_pct(waits, 95):5.2f} s{extra}")
+        srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
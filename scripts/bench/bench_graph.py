@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+bench_graph.py — A langgraph bot run as a DAG vs one step after another.
+
+Starts a stand-in Ollama server (decoding at --token-rate tokens/s) and runs
+the default spec's langgraph nodes (planner, tool, writer, verifier) with
+--tools tool calls that each take --tool-ms, through
+app.runtime_engine.run_bot_graph:
+
+  sequential  CITL_GRAPH_CONCURRENCY=1 equivalent — every node in turn
+  graph       independent branches (planner, each tool) at once
+  rerun       the same question again — nodes come from the memo
+
+Reports the wall time next to the sum of all steps and the critical path.
+
+Run from the repo root:
+    python scripts/bench/bench_graph.py
+    python scripts/bench/bench_graph.py --tools 4 --tool-ms 500
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app import runtime_engine  # noqa: E402
+from app.bot_schema import default_spec  # noqa: E402
+from bots import graph_executor  # noqa: E402
+from bots.ollama_standin import StandinConfig, start_standin  # noqa: E402
+
+MODEL    = "hub-assistant"
+QUESTION = "How do I deploy with Docker?"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the langgraph DAG executor")
+    ap.add_argument("--tools", type=int, default=2, help="tool calls alongside the planner")
+    ap.add_argument("--tool-ms", type=float, default=300.0, help="time each tool call takes")
+    ap.add_argument("--token-rate", type=float, default=100.0)
+    ap.add_argument("--reply-tokens", type=int, default=30)
+    args = ap.parse_args()
+
+    os.environ["CITL_RESPONSE_CACHE"] = "0"   # time generation, not replays
+    srv = start_standin(cfg=StandinConfig(
+        models=[f"{MODEL}:latest"], token_rate=args.token_rate, reply_tokens=args.reply_tokens,
+    ))
+    tools = [f"lookup{i}" for i in range(args.tools)]
+    for name in tools:
+        runtime_engine.register_tool(name, lambda q: time.sleep(args.tool_ms / 1000) or "result")
+    spec = default_spec()
+    spec["runtime"].update(base_url=srv.url, model=MODEL)
+    spec["agent"].update(framework="langgraph", tools=tools)
+
+    print(f"langgraph DAG — planner + {args.tools} tool(s) of {args.tool_ms:g} ms, writer, verifier; "
+          f"{args.reply_tokens}-token replies at {args.token_rate:g} tok/s")
+    try:
+        for label, concurrency in (("sequential", 1), ("graph", 4), ("rerun", 4)):
+            if label != "rerun":
+                graph_executor.clear_memo()
+            graph_executor.DEFAULT_CONCURRENCY = concurrency
+            r = runtime_engine.run_bot_graph(spec, QUESTION, [])
+            print(f"  {label:<10}  wall {r['wall_ms']:6.0f} ms   sum of steps {r['sum_ms']:6.0f} ms   "
+                  f"critical path {r['critical_ms']:6.0f} ms  ({' → '.join(r['critical_path'])})")
+    finally:
+        srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
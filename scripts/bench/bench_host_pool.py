@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+bench_host_pool.py — One host vs a HostPool of several stand-in servers.
+
+Starts --hosts stand-in servers (each decoding at --token-rate tokens/s and
+serving at most --slots requests at a time, like a GPU box running one
+model) and fires --requests streamed chats from --clients threads:
+
+  single — every request to the first host (today's OLLAMA_HOST behaviour)
+  pool   — bots.ollama_pool.HostPool over all hosts
+
+Then kills one host halfway through a pool run to show failover: requests
+keep succeeding and the dead host is skipped while it cools down.
+
+Run from the repo root:
+    python scripts/bench/bench_host_pool.py
+    python scripts/bench/bench_host_pool.py --hosts 4 --clients 8 --requests 64
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from bots.ollama_client import get_client  # noqa: E402
+from bots.ollama_pool import HostPool  # noqa: E402
+from bots.ollama_standin import StandinConfig, start_standin  # noqa: E402
+
+MODEL = "hub-assistant"
+MSGS  = [{"role": "user", "content": "hello"}]
+
+
+def _limit_slots(srv, slots: int) -> None:
+    """Serialize generation on a server to `slots` concurrent requests."""
+    sem = threading.BoundedSemaphore(slots)
+    handler = srv.RequestHandlerClass
+    orig = handler.do_POST
+
+    def do_POST(self):  # noqa: N802 - http.server naming
+        with sem:
+            orig(self)
+
+    handler.do_POST = do_POST
+
+
+def _drive(client, n: int, clients: int, on_half=None):
+    lock = threading.Lock()
+    counts = {"ok": 0, "err": 0, "sent": 0}
+
+    def _worker():
+        while True:
+            with lock:
+                if counts["sent"] >= n:
+                    return
+                counts["sent"] += 1
+                if on_half is not None and counts["sent"] == n // 2:
+                    on_half()
+            try:
+                for _ in client.chat_stream(MODEL, MSGS, {}):
+                    pass
+                with lock:
+                    counts["ok"] += 1
+            except Exception:
+                with lock:
+                    counts["err"] += 1
+
+    threads = [threading.Thread(target=_worker) for _ in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - t0, counts
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark multi-host routing")
+    ap.add_argument("--hosts", type=int, default=3)
+    ap.add_argument("--clients", type=int, default=6)
+    ap.add_argument("--requests", type=int, default=36)
+    ap.add_argument("--token-rate", type=float, default=200.0)
+    ap.add_argument("--slots", type=int, default=1)
+    args = ap.parse_args()
+
+    servers = []
+    for _ in range(args.hosts):
+        srv = start_standin(cfg=StandinConfig(models=[f"{MODEL}:latest"], token_rate=args.token_rate))
+        _limit_slots(srv, args.slots)
+        servers.append(srv)
+
+    print(f"Host pool — {args.hosts} stand-ins × {args.slots} slot(s) at {args.token_rate:g} tok/s,"
+          f" {args.requests} requests from {args.clients} clients")
+    dt, c = _drive(get_client(servers[0].url), args.requests, args.clients)
+    print(f"  single  {dt:7.2f} s   {c['ok']:3d} ok  {c['err']:3d} failed")
+
+    pool = HostPool([s.url for s in servers])
+    dt, c = _drive(pool, args.requests, args.clients)
+    print(f"  pool    {dt:7.2f} s   {c['ok']:3d} ok  {c['err']:3d} failed   "
+          + "  ".join(f"{r['requests']}" for r in pool.status()) + " requests per host")
+
+    victim = servers[-1]
+
+    def _kill():
+        victim.shutdown()
+        victim.server_close()
+
+    pool = HostPool([s.url for s in servers])
+    dt, c = _drive(pool, args.requests, args.clients, on_half=_kill)
+    down = [r["host"] for r in pool.status() if not r["healthy"]]
+    print(f"  failover {dt:6.2f} s   {c['ok']:3d} ok  {c['err']:3d} failed   down: {', '.join(down) or '—'}")
+
+    for s in servers[:-1]:
+        s.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+bench_markdown_stream.py — Live Markdown streaming cost vs reply length.
+
+Streams synthetic Markdown replies (paragraphs, lists and fenced code) of
+1k, 2k and 4k tokens into a terminal Console writing to memory, redrawing
+on every token (the worst case; the sandbox redraws at most --fps times a
+second):
+
+  naive  — re-render Markdown(whole reply so far) on every token
+  blocks — bots.stream_markdown.MarkdownRenderer (open block only)
+
+If per-token cost stays flat as the reply grows, rendering is linear; the
+naive variant's per-token cost grows with the reply (quadratic overall).
+
+Run from the repo root:
+    python scripts/bench/bench_markdown_stream.py
+    python scripts/bench/bench_markdown_stream.py --sizes 1000 4000 8000 --naive-max 0
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from rich.console import Console  # noqa: E402
+from rich.live import Live  # noqa: E402
+from rich.markdown import Markdown  # noqa: E402
+
+from bots.stream_markdown import MarkdownRenderer  # noqa: E402
+
+COLOR = "#22D3EE"
+
+
+def _reply_tokens(n: int):
+    """Word tokens of a Markdown reply: prose paragraphs, a list and a code block, repeating."""
+    section = (
+        "Ollama keeps a model resident for keep_alive seconds after the last request so the next "
+        "one skips the load .\n\n"
+        "- pin hot models with keep_alive -1\n- unload with keep_alive 0\n- check /api/ps\n\n"
+        "```python\nfor chunk in client.chat_stream(model, messages):\n    print(chunk)\n```\n\n"
+    )
+    words = []
+    for piece in section.split(" "):
+        words.append(piece + " ")
+    out = []
+    while len(out) < n:
+        out.extend(words)
+    return out[:n]
+
+
+def _console():
+    return Console(file=io.StringIO(), force_terminal=True, width=100, color_system="truecolor")
+
+
+def naive(tokens):
+    console = _console()
+    text = ""
+    with Live(console=console, auto_refresh=False, transient=True, vertical_overflow="visible") as live:
+        for tok in tokens:
+            text += tok
+            live.update(Markdown(text, style=COLOR), refresh=True)
+
+
+def blocks(tokens):
+    r = MarkdownRenderer(COLOR, console=_console(), fps=0)
+    for tok in tokens:
+        r.write(tok)
+    r.close()
+    return r.blocks
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark live Markdown streaming")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 2000, 4000])
+    ap.add_argument("--naive-max", type=int, default=1000,
+                    help="largest size to run the naive variant at (it is quadratic; 0 = skip)")
+    args = ap.parse_args()
+
+    print("Live Markdown — redraw on every token; per-token cost should stay flat")
+    for n in args.sizes:
+        tokens = _reply_tokens(n)
+        variants = [("blocks", blocks)] + ([("naive", naive)] if n <= args.naive_max else [])
+        for label, fn in variants:
+            t0 = time.perf_counter()
+            fn(tokens)
+            dt = time.perf_counter() - t0
+            print(f"  {n:6d} tok  {label:<7} {dt:8.2f} s   {dt / n * 1e6:9.1f} µs/token")
+
+
+if __name__ == "__main__":
+    main()
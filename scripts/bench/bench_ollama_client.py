@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+bench_ollama_client.py — Per-request overhead: fresh connection vs pooled client.
+
+Starts the local Ollama stand-in (bots/ollama_standin.py) on an ephemeral port
+and times N small non-streaming /api/chat calls two ways:
+
+  before  — requests.post(...) per call (new TCP connection every time)
+  after   — bots.ollama_client.get_client(host).chat(...) (keep-alive pool)
+
+Run from the repo root:
+    python scripts/bench/bench_ollama_client.py
+    python scripts/bench/bench_ollama_client.py --n 500
+    python scripts/bench/bench_ollama_client.py --host http://127.0.0.1:11434 --model llama3.2
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import requests  # noqa: E402
+
+from bots.ollama_client import get_client  # noqa: E402
+from bots.ollama_standin import start_standin  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+def _time_calls(fn, n: int):
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return samples
+
+
+def _report(label: str, samples):
+    samples = sorted(samples)
+    p95 = samples[int(0.95 * (len(samples) - 1))]
+    print(f"  {label:<8} mean {statistics.mean(samples):7.3f} ms   "
+          f"p50 {statistics.median(samples):7.3f} ms   p95 {p95:7.3f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark pooled vs per-call Ollama connections")
+    ap.add_argument("--n", type=int, default=200, help="requests per variant")
+    ap.add_argument("--host", default="", help="real Ollama host (default: start a stand-in)")
+    ap.add_argument("--model", default="hub-assistant")
+    args = ap.parse_args()
+
+    srv = None
+    host = args.host
+    if not host:
+        srv = start_standin(port=0)
+        host = srv.url
+    payload = {"model": args.model, "messages": MESSAGES, "stream": False, "options": {}}
+
+    def before():
+        r = requests.post(f"{host}/api/chat", json=payload, timeout=30)
+        r.raise_for_status()
+        r.json()
+
+    client = get_client(host)
+
+    def after():
+        client.chat(args.model, MESSAGES, {}, timeout=30)
+
+    # warm both paths once so neither pays import / first-resolve costs
+    before()
+    after()
+
+    print(f"Ollama client overhead — {args.n} requests against {host}")
+    b = _time_calls(before, args.n)
+    a = _time_calls(after, args.n)
+    _report("before", b)
+    _report("after", a)
+    print(f"  speedup  {statistics.mean(b) / max(statistics.mean(a), 1e-9):.2f}x mean per-request")
+
+    if srv is not None:
+        srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+bench_rag_packer.py — RAG context size: every hit verbatim vs the packer.
+
+Chunks a synthetic handbook the way app/rag_engine.simple_chunk does (900
+chars, 150 overlap) and ingests it twice (handbook.pdf and a re-uploaded
+handbook-copy.pdf).  A query's --top-k hits are a run of neighbouring chunks
+from both copies, best first, as a vector store returns them.  For a bot
+with --num-ctx and a few turns of history, compares:
+
+  verbatim   the old build_context_with_rag — every hit appended as is
+  packed     app.runtime_engine.pack_rag_context — neighbours merged,
+             duplicates dropped, filled up to what num_ctx leaves over
+
+Reports RAG tokens, whether the prompt still fits num_ctx, and packing time.
+(The tree imports chromadb for simple_chunk, so the bench carries a copy.)
+
+Run from the repo root:
+    python scripts/bench/bench_rag_packer.py
+    python scripts/bench/bench_rag_packer.py --top-k 12 --num-ctx 4096
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.bot_schema import default_spec  # noqa: E402
+from app.runtime_engine import pack_rag_context  # noqa: E402
+from bots.context_window import estimate_tokens  # noqa: E402
+
+QUESTION = "How do I reset my password from off campus?"
+HISTORY  = [{"role": "user", "content": "Hi, I can't log in to the portal."},
+            {"role": "assistant", "content": "Sorry to hear that. Are you on campus or off campus?"}] * 2
+WORDS    = ("password reset account login VPN Wi-Fi printer Docker portal email quota student faculty "
+            "multi-factor token help desk ticket lab workstation campus network drive").split()
+
+
+def simple_chunk(text: str, chunk_size: int = 900, overlap: int = 150) -> list:
+    s = " ".join(text.split())
+    return [s[i:i + chunk_size] for i in range(0, len(s), max(1, chunk_size - overlap))]
+
+
+def make_hits(top_k: int) -> list:
+    rng = random.Random(7)
+    chunks = simple_chunk(" ".join(rng.choice(WORDS) for _ in range(6000)))
+    centre = len(chunks) // 2
+    order = [centre, centre + 1, centre - 1, centre + 2, centre - 2, centre + 3]
+    hits = []
+    for c in order:                     # each chunk from the original, then from the copy
+        for src in ("handbook.pdf", "handbook-copy.pdf"):
+            hits.append({"text": chunks[c], "meta": {"source": src, "chunk": c}, "distance": 0.1 * len(hits)})
+    return hits[:top_k]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the token-budgeted RAG context packer")
+    ap.add_argument("--top-k", type=int, default=8)
+    ap.add_argument("--num-ctx", type=int, default=2048)
+    ap.add_argument("--max-tokens", type=int, default=512)
+    ap.add_argument("--runs", type=int, default=200)
+    args = ap.parse_args()
+
+    spec = default_spec()
+    spec["generation"].update(num_ctx=args.num_ctx, max_tokens=args.max_tokens)
+    hits = make_hits(args.top_k)
+    verbatim = "You may use the following sources:\n" + "\n".join(
+        f"[{i}] ({h['meta']['source']}) {h['text']}" for i, h in enumerate(hits, start=1))
+    packed = pack_rag_context(spec, hits, QUESTION, HISTORY)
+    times = []
+    for _ in range(args.runs):
+        t0 = time.perf_counter()
+        pack_rag_context(spec, hits, QUESTION, HISTORY)
+        times.append(time.perf_counter() - t0)
+
+    a = packed.arithmetic
+    print(f"RAG context — {args.top_k} hits, num_ctx {args.num_ctx}: {a['num_ctx']} - system {a['system']} "
+          f"- history {a['history']} - question {a['user']} - reply {a['reply']} = {a['rag']} tokens for RAG")
+    for label, tokens, spans in (("verbatim", estimate_tokens(verbatim), len(hits)),
+                                 ("packed", packed.used, len(packed.sources))):
+        fits = "fits" if tokens <= a["rag"] else f"overflows num_ctx by {tokens - a['rag']}"
+        print(f"  {label:<9} {tokens:6d} tokens   {spans:2d} source(s)   {fits}")
+    print(f"\n  packed: {packed.merged} hit(s) merged into neighbours, {packed.duplicates} duplicate(s), "
+          f"{packed.over_budget} left out, {packed.cut} cut; "
+          f"median {statistics.median(times) * 1e6:.0f} µs per pack")
+
+
+if __name__ == "__main__":
+    main()
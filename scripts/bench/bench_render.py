@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+bench_render.py — Tokens/sec rendered: per-token write+flush vs FrameRenderer.
+
+Renders a synthetic token stream two ways and reports throughput and the
+number of write syscalls issued:
+
+  per-token  — the old stream_chat loop (ANSI-wrap, write, flush per token)
+  frames     — bots.stream_render.FrameRenderer at --fps
+
+Each variant is measured writing to a pipe and (POSIX only) to a pty, with a
+reader thread draining the other end the way a terminal would.
+
+Run from the repo root:
+    python scripts/bench/bench_render.py
+    python scripts/bench/bench_render.py --tokens 50000 --fps 60
+"""
+import argparse
+import io
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from bots.stream_render import FrameRenderer, hex_to_ansi  # noqa: E402
+
+COLOR = "#22D3EE"
+
+
+def _tokens(n: int):
+    words = ["def", " main", "():", "\n   ", " return", " 42", " #", " ok", " the", " model"]
+    return [words[i % len(words)] for i in range(n)]
+
+
+def _open_sink(kind: str):
+    """Return (writer text stream, closer) with a thread draining the read side."""
+    if kind == "pty":
+        import pty
+        master, slave = pty.openpty()
+        rfd, wfd = master, slave
+    else:
+        rfd, wfd = os.pipe()
+
+    def _drain():
+        try:
+            while os.read(rfd, 65536):
+                pass
+        except OSError:
+            pass
+
+    t = threading.Thread(target=_drain, daemon=True)
+    t.start()
+    out = io.TextIOWrapper(io.FileIO(wfd, "w", closefd=True), encoding="utf-8", write_through=True)
+
+    def _close():
+        out.close()
+        t.join(timeout=2)
+        try:
+            os.close(rfd)
+        except OSError:
+            pass
+
+    return out, _close
+
+
+def per_token(out, tokens):
+    writes = 0
+    for tok in tokens:
+        out.write("\033[0m" + "\033[38;2;" + hex_to_ansi(COLOR) + "m" + tok + "\033[0m")
+        out.flush()
+        writes += 1
+    return writes
+
+
+def frames(out, tokens, fps):
+    r = FrameRenderer(COLOR, out=out, fps=fps)
+    for tok in tokens:
+        r.write(tok)
+    r.close()
+    return r.frames
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark streamed-token rendering")
+    ap.add_argument("--tokens", type=int, default=20000)
+    ap.add_argument("--fps", type=float, default=30.0)
+    args = ap.parse_args()
+
+    tokens = _tokens(args.tokens)
+    sinks = ["pipe"] + (["pty"] if sys.platform != "win32" else [])
+    print(f"Render benchmark — {args.tokens} tokens, frames at {args.fps:g} fps")
+    for sink in sinks:
+        for label, fn in (("per-token", lambda o: per_token(o, tokens)),
+                          ("frames", lambda o: frames(o, tokens, args.fps))):
+            out, close = _open_sink(sink)
+            t0 = time.perf_counter()
+            writes = fn(out)
+            dt = time.perf_counter() - t0
+            close()
+            print(f"  {sink:<4} {label:<10} {args.tokens / dt:12,.0f} tok/s   {writes:7d} writes   {dt * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
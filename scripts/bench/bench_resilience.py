@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+bench_resilience.py — How long queued requests wait on a wedged Ollama.
+
+Starts a stand-in Ollama server, sends --warm healthy chat turns (so the
+host guard has time-to-first-byte samples), then wedges it (every request
+hangs) and drains a queue of --requests chat turns, --concurrency at a time,
+each with a flat --timeout read timeout:
+
+  flat timeout   breaker and adaptive timeouts off — every request waits out
+                 its own timeout
+  guarded        bots.resilience as shipped: the read timeout adapts to the
+                 observed TTFB (floored at --read-floor), THRESHOLD failures
+                 open the breaker and the rest of the queue fails at once
+
+Reports the time until every request has failed, and the median wait.
+
+Run from the repo root:
+    python scripts/bench/bench_resilience.py
+    python scripts/bench/bench_resilience.py --requests 40 --timeout 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from bots import resilience  # noqa: E402
+from bots.ollama_client import get_client  # noqa: E402
+from bots.ollama_standin import StandinConfig, start_standin  # noqa: E402
+
+MODEL    = "hub-assistant"
+MESSAGES = [{"role": "user", "content": "How do I reset my password?"}]
+
+THRESHOLD, MIN_SAMPLES = resilience.THRESHOLD, resilience.MIN_SAMPLES   # restored after the flat run
+
+
+def drain(args, guarded: bool) -> list:
+    srv = start_standin(cfg=StandinConfig(models=[f"{MODEL}:latest"], reply_tokens=20, hang_s=3600))
+    client = get_client(srv.url)
+    try:
+        for _ in range(args.warm):
+            client.chat(MODEL, MESSAGES, {}, timeout=(3, args.timeout))
+        if not guarded:
+            client.guard.reset()
+            resilience.THRESHOLD, resilience.MIN_SAMPLES = 10 ** 9, 10 ** 9
+        srv.cfg.hung = True
+
+        def one(_):
+            t0 = time.perf_counter()
+            try:
+                client.chat(MODEL, MESSAGES, {}, timeout=(3, args.timeout))
+            except Exception:
+                pass
+            return time.perf_counter() - t0
+
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            t0 = time.perf_counter()
+            waits = list(pool.map(one, range(args.requests)))
+        return [time.perf_counter() - t0] + waits
+    finally:
+        resilience.THRESHOLD, resilience.MIN_SAMPLES = THRESHOLD, MIN_SAMPLES
+        srv.shutdown()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark failing fast on a wedged Ollama")
+    ap.add_argument("--requests", type=int, default=20)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--timeout", type=float, default=10.0, help="flat read timeout the caller asks for")
+    ap.add_argument("--read-floor", type=float, default=2.0, help="lowest adapted read timeout")
+    ap.add_argument("--warm", type=int, default=10, help="healthy turns before the server wedges")
+    args = ap.parse_args()
+
+    os.environ["CITL_RESPONSE_CACHE"] = "0"   # every turn has to reach the server
+    resilience.READ_FLOOR_S = args.read_floor
+    print(f"Wedged Ollama — {args.requests} queued chat turns, {args.concurrency} at a time, "
+          f"{args.timeout:g} s read timeout, breaker after {THRESHOLD} failures")
+    for label, guarded in (("flat timeout", False), ("guarded", True)):
+        total, *waits = drain(args, guarded)
+        print(f"  {label:<13} all failed after {total:6.1f} s   median wait {statistics.median(waits):6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+bench_run_bot_stream.py — When does a spec-driven bot's answer start to show?
+
+Starts a stand-in Ollama server (decoding at --token-rate tokens/s) and runs
+the default spec under every agent framework, --runs times each:
+
+  run_bot         app.runtime_engine.run_bot — nothing to show until the
+                  whole reply (every call of a multi-call pattern) is done
+  run_bot_stream  app.runtime_engine.run_bot_stream — the first token event
+                  of the final stage (earlier stages still run to completion)
+
+Reports the median time until the first text can be shown, and the total.
+
+Run from the repo root:
+    python scripts/bench/bench_run_bot_stream.py
+    python scripts/bench/bench_run_bot_stream.py --runs 5 --reply-tokens 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+
+from app.bot_schema import default_spec  # noqa: E402
+from app.runtime_engine import run_bot, run_bot_stream  # noqa: E402
+from bots.graph_executor import clear_memo  # noqa: E402
+from bots.ollama_standin import StandinConfig, start_standin  # noqa: E402
+
+MODEL      = "hub-assistant"
+FRAMEWORKS = ("none", "langgraph", "crewai", "autogen")
+
+
+def time_blocking(spec) -> tuple:
+    clear_memo()   # langgraph nodes would otherwise come from the previous run
+    t0 = time.perf_counter()
+    run_bot(spec, "How do I deploy with Docker?", [])
+    dt = time.perf_counter() - t0
+    return dt, dt
+
+
+def time_stream(spec) -> tuple:
+    clear_memo()
+    t0 = time.perf_counter()
+    first = None
+    for ev in run_bot_stream(spec, "How do I deploy with Docker?", []):
+        if first is None and ev["type"] == "token":
+            first = time.perf_counter() - t0
+    return first, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark run_bot vs run_bot_stream time to first text")
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--token-rate", type=float, default=50.0)
+    ap.add_argument("--reply-tokens", type=int, default=100)
+    args = ap.parse_args()
+
+    os.environ["CITL_RESPONSE_CACHE"] = "0"   # time generation, not replays
+    srv = start_standin(cfg=StandinConfig(
+        models=[f"{MODEL}:latest"], token_rate=args.token_rate, reply_tokens=args.reply_tokens,
+    ))
+    print(f"run_bot vs run_bot_stream — {args.reply_tokens}-token replies at {args.token_rate:g} tok/s, "
+          f"{args.runs} runs")
+    print(f"  {'framework':<10} {'run_bot':>16} {'run_bot_stream':>16} {'total':>9}")
+    try:
+        for fw in FRAMEWORKS:
+            spec = default_spec()
+            spec["runtime"].update(base_url=srv.url, model=MODEL)
+            spec["agent"]["framework"] = fw
+            blocking = [time_blocking(spec) for _ in range(args.runs)]
+            stream = [time_stream(spec) for _ in range(args.runs)]
+            first_b = statistics.median(b[0] for b in blocking) * 1000
+            first_s = statistics.median(s[0] for s in stream) * 1000
+            total = statistics.median(s[1] for s in stream) * 1000
+            print(f"  {fw:<10} {first_b:13.0f} ms {first_s:13.0f} ms {total:6.0f} ms")
+    finally:
+        srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+bench_startup.py — Time from `python sandbox.py` to the first "You »" prompt.
+
+Starts a stand-in Ollama server and launches the sandbox --runs times as a
+fresh process (no warm imports), timing each launch until the prompt is
+written to stdout.  For context it also times a bare interpreter and a bare
+`import bots.ollama_sandbox` (both to process exit).
+
+Fails (exit code 1) when the median time to the first prompt is over the
+budget, so it can gate a build:
+
+    first prompt  median 278 ms  (budget 400 ms)  OK
+
+Run from the repo root:
+    python scripts/bench/bench_startup.py
+    python scripts/bench/bench_startup.py --runs 10 --budget-ms 400
+    python scripts/bench/bench_startup.py --profile     # + one --profile-startup breakdown
+
+Environment overrides:
+    CITL_STARTUP_BUDGET_MS       — default for --budget-ms (default: 400)
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+
+from bots.ollama_standin import StandinConfig, start_standin  # noqa: E402
+
+MODEL          = "hub-assistant"
+PROMPT         = "You »".encode("utf-8")
+BUDGET_MS      = float(os.environ.get("CITL_STARTUP_BUDGET_MS", "400"))
+PROMPT_TIMEOUT = 30.0   # seconds before a launch counts as hung
+
+
+def _env(host: str) -> dict:
+    env = dict(os.environ, OLLAMA_HOST=host, PYTHONIOENCODING="utf-8", PYTHONPATH=ROOT)
+    env.pop("CITL_PROFILE_STARTUP", None)
+    return env
+
+
+def time_to_prompt(host: str, extra: list) -> float:
+    """Seconds from spawning sandbox.py until the prompt appears on its stdout."""
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "sandbox.py"), "--no-log", *extra],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        env=_env(host), cwd=ROOT,
+    )
+    seen = b""
+    try:
+        while PROMPT not in seen:
+            chunk = proc.stdout.read1(4096)
+            if not chunk:
+                raise RuntimeError(f"sandbox exited before its prompt:\n{seen.decode('utf-8', 'replace')}")
+            seen += chunk
+            if time.perf_counter() - t0 > PROMPT_TIMEOUT:
+                raise RuntimeError("no prompt within %.0f s" % PROMPT_TIMEOUT)
+        return time.perf_counter() - t0
+    finally:
+        proc.stdin.close()   # EOF at the prompt = /quit
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def time_command(host: str, code: str) -> float:
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], env=_env(host), cwd=ROOT, check=True)
+    return time.perf_counter() - t0
+
+
+def _row(label: str, samples: list) -> float:
+    ms = [s * 1000 for s in samples]
+    med = statistics.median(ms)
+    print(f"  {label:<26} median {med:6.0f} ms   min {min(ms):6.0f}   max {max(ms):6.0f}")
+    return med
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark sandbox time to first prompt")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--budget-ms", type=float, default=BUDGET_MS, help="fail if the median is over this")
+    ap.add_argument("--bot", default="", help="launch with --bot (loads the registry and bot module)")
+    ap.add_argument("--profile", action="store_true", help="print one --profile-startup breakdown")
+    args = ap.parse_args()
+
+    srv = start_standin(cfg=StandinConfig(models=[f"{MODEL}:latest"]))
+    extra = ["--model", MODEL] + (["--bot", args.bot] if args.bot else [])
+    try:
+        time_to_prompt(srv.url, extra)   # warm the OS file cache and __pycache__
+        print(f"Sandbox startup — {args.runs} launches, stand-in Ollama at {srv.url}")
+        _row("python -c pass", [time_command(srv.url, "pass") for _ in range(args.runs)])
+        _row("import bots.ollama_sandbox",
+             [time_command(srv.url, "import bots.ollama_sandbox") for _ in range(args.runs)])
+        med = _row("first prompt", [time_to_prompt(srv.url, extra) for _ in range(args.runs)])
+        over = med > args.budget_ms
+        print(f"\n  first prompt  median {med:.0f} ms  (budget {args.budget_ms:.0f} ms)  "
+              f"{'OVER BUDGET' if over else 'OK'}")
+        if args.profile:
+            out = subprocess.run(
+                [sys.executable, os.path.join(ROOT, "sandbox.py"), "--no-log", "--profile-startup", *extra],
+                input=b"", capture_output=True, env=_env(srv.url), cwd=ROOT,
+            ).stdout.decode("utf-8", "replace")
+            print("\n" + out[out.find("Imports:"):out.find(PROMPT.decode("utf-8"))].rstrip())
+    finally:
+        srv.shutdown()
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+bench_startup_diagnostics.py — Time-to-first-prompt for sandbox startup checks.
+
+Compares two ways of running the launch diagnostics against the local
+Ollama stand-in:
+
+  legacy  — the old sequence: ping, hung check, model check, each its own
+            GET /api/tags on a fresh connection
+  probe   — bots.ollama_client.probe_tags: one shared, cached probe that
+            answers all three questions
+
+Scenarios: a healthy server, and one whose /api/tags answers slowly
+(--slow seconds), which is what a busy or half-hung Ollama looks like.
+
+Run from the repo root:
+    python scripts/bench/bench_startup_diagnostics.py
+    python scripts/bench/bench_startup_diagnostics.py --runs 20 --slow 0.3
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from bots.ollama_client import invalidate_probe, probe_tags  # noqa: E402
+from bots.ollama_standin import StandinConfig, start_standin  # noqa: E402
+
+MODEL = "hub-assistant"
+
+
+def legacy(host: str) -> bool:
+    def _ping() -> bool:
+        try:
+            return requests.get(f"{host}/api/tags", timeout=2.0).status_code == 200
+        except Exception:
+            return False
+
+    def _hung() -> bool:
+        try:
+            requests.get(f"{host}/api/tags", timeout=2.0)
+            return False
+        except requests.exceptions.ConnectTimeout:
+            return True
+        except Exception:
+            return False
+
+    def _exists() -> bool:
+        try:
+            data = requests.get(f"{host}/api/tags", timeout=3).json()
+            names = [m.get("name", "") for m in (data.get("models") or [])]
+            base = MODEL.split(":")[0]
+            return any(n == MODEL or n.split(":")[0] == base for n in names)
+        except Exception:
+            return False
+
+    ok = _ping()
+    if not ok:
+        _hung()
+    return ok and _exists()
+
+
+def probe(host: str) -> bool:
+    invalidate_probe(host)   # measure a cold start, not a cache hit
+    p = probe_tags(host)
+    return p.ok and p.has_model(MODEL)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark startup diagnostics")
+    ap.add_argument("--runs", type=int, default=10)
+    ap.add_argument("--slow", type=float, default=0.2, help="/api/tags delay for the slow scenario")
+    args = ap.parse_args()
+
+    print(f"Startup diagnostics — {args.runs} runs, model {MODEL!r}")
+    for scenario, delay in (("healthy", 0.0), (f"slow {args.slow:g}s", args.slow)):
+        srv = start_standin(cfg=StandinConfig(models=[f"{MODEL}:latest"], tags_delay=delay))
+        try:
+            for label, fn in (("legacy", legacy), ("probe", probe)):
+                before = srv.cfg.requests
+                times = []
+                for _ in range(args.runs):
+                    t0 = time.perf_counter()
+                    assert fn(srv.url)
+                    times.append(time.perf_counter() - t0)
+                calls = (srv.cfg.requests - before) / args.runs
+                print(f"  {scenario:<10} {label:<7} median {statistics.median(times) * 1000:8.1f} ms"
+                      f"   {calls:.0f} /api/tags calls")
+        finally:
+            srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+bench_supervisor.py — How long until Ollama serves again?
+
+Uses the stand-in server as the supervised "ollama serve" command, with a
+scratch supervisor directory, and times --runs of each:
+
+  cold start — nothing listening:
+      legacy     the old sandbox sequence: spawn, then a 1 s sleep + ping
+                 until it answers
+      supervisor OllamaSupervisor.ensure(): spawn, readiness with backoff
+  crash      — the server is killed while a supervisor leads; time until
+               its health thread has it serving again (the old code only
+               noticed when the next message failed and the user ran /check)
+
+Run from the repo root:
+    python scripts/bench/bench_supervisor.py
+    python scripts/bench/bench_supervisor.py --runs 5 --interval 0.5
+"""
+import argparse
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+
+from bots import ollama_supervisor  # noqa: E402
+from bots.ollama_client import probe_tags  # noqa: E402
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _cmd(port: int) -> str:
+    return f"{sys.executable} -m bots.ollama_standin --port {port}"
+
+
+def legacy_start(host: str, port: int) -> float:
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(_cmd(port).split(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            start_new_session=True)
+    try:
+        for _ in range(15):
+            time.sleep(1)
+            if probe_tags(host, timeout=1.5, max_age=0).ok:
+                return time.perf_counter() - t0
+        return float("nan")
+    finally:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+
+
+def supervisor_runs(host: str, port: int, runs: int):
+    """(cold start seconds, crash recovery seconds) for one supervisor."""
+    sup = ollama_supervisor.OllamaSupervisor(host, cmd=_cmd(port))
+    t0 = time.perf_counter()
+    st = sup.ensure()
+    cold = time.perf_counter() - t0 if st.ready else float("nan")
+    crashes = []
+    for _ in range(runs):
+        os.killpg(st.ollama_pid, signal.SIGKILL)
+        t0 = time.perf_counter()
+        before = len(st.restarts)
+        while time.perf_counter() - t0 < 30:
+            time.sleep(0.02)
+            st = sup.status()
+            if len(st.restarts) > before and st.ready:
+                crashes.append(time.perf_counter() - t0)
+                break
+    pid = sup.status().ollama_pid
+    sup.close()
+    if pid:
+        os.killpg(pid, signal.SIGKILL)
+    return cold, crashes
+
+
+def _fmt(samples) -> str:
+    ms = [s * 1000 for s in samples if s == s]
+    if not ms:
+        return "—"
+    return f"median {statistics.median(ms):6.0f} ms   max {max(ms):6.0f} ms"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark Ollama start / recovery")
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--interval", type=float, default=2.0, help="supervisor health interval (s)")
+    args = ap.parse_args()
+
+    ollama_supervisor.INTERVAL_S = args.interval
+    os.environ["CITL_SUPERVISOR_DIR"] = tempfile.mkdtemp(prefix="citl-supervisor-")
+    os.environ["PYTHONPATH"] = ROOT   # for the spawned stand-in
+
+    legacy, cold, crash = [], [], []
+    for _ in range(args.runs):
+        port = _free_port()
+        legacy.append(legacy_start(f"http://127.0.0.1:{port}", port))
+    for _ in range(args.runs):
+        port = _free_port()
+        c, k = supervisor_runs(f"http://127.0.0.1:{port}", port, 1)
+        cold.append(c)
+        crash.extend(k)
+
+    print(f"Ollama start / recovery — stand-in server, {args.runs} runs, health interval {args.interval:g} s")
+    print(f"  cold start  legacy      {_fmt(legacy)}")
+    print(f"  cold start  supervisor  {_fmt(cold)}")
+    print(f"  crash       supervisor  {_fmt(crash)}   (legacy: until the next message fails + /check)")
+
+
+if __name__ == "__main__":
+    main()